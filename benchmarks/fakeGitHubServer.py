@@ -0,0 +1,284 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import json
+import re
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Optional
+
+OWNER = 'bench'
+TAG = 'v1.0.0'
+UPDATED_AT = '2024-01-01T00:00:00Z'
+LAST_MODIFIED = 'Mon, 01 Jan 2024 00:00:00 GMT'
+BLOCK = bytes(range(256)) * 4096
+CHUNK_SIZE = 64 * 1024
+
+REPOSITORY_PATH = re.compile(r'^/repos/(?P<owner>[^/]+)/repo(?P<index>\d+)(?P<rest>/.*)?$')
+DOWNLOAD_PATH = re.compile(r'^/downloads/(?P<index>\d+)/(?P<name>[^/]+)$')
+RANGE_HEADER = re.compile(r'^bytes=(?P<start>\d+)-(?P<end>\d*)$')
+
+
+@dataclass
+class FakeGitHubConfig:
+    packages: int
+    asset_size: int
+    latency: float = 0.0
+    bandwidth: Optional[int] = None
+    rate_limit: Optional[int] = None
+    rate_window: float = 60.0
+
+
+class FakeGitHubServer(object):
+
+    def __init__(self, config: FakeGitHubConfig, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.config = config
+        self._server = FakeHTTPServer((host, port), self)
+        self._thread = Thread(target=self._server.serve_forever, name='FakeGitHubServer', daemon=True)
+        self._lock = Lock()
+        self._api_calls = 0
+        self._bytes_sent = 0
+        self._window_start = time.time()
+        self._window_calls = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host!s}:{port}'
+
+    @property
+    def api_calls(self) -> int:
+        with self._lock:
+            return self._api_calls
+
+    @property
+    def bytes_sent(self) -> int:
+        with self._lock:
+            return self._bytes_sent
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def get_asset_name(self, index: int) -> str:
+        return f'package{index}_1.0.0_arm64.deb'
+
+    def get_package_configs(self) -> list[dict[str, Any]]:
+        return [
+            {
+                'package': f'package{index}',
+                'release': {'owner': OWNER, 'repo': f'repo{index}', 'tag': TAG, 'matcher': '*.deb'},
+            }
+            for index in range(self.config.packages)
+        ]
+
+    def get_file_configs(self) -> list[dict[str, Any]]:
+        return [
+            {'package': f'package{index}', 'file_url': f'{self.url}/downloads/{index}/{self.get_asset_name(index)}'}
+            for index in range(self.config.packages)
+        ]
+
+    def count_api_call(self) -> dict[str, str]:
+        with self._lock:
+            self._api_calls += 1
+            now = time.time()
+
+            if now - self._window_start >= self.config.rate_window:
+                self._window_start, self._window_calls = now, 0
+
+            self._window_calls += 1
+
+            if not self.config.rate_limit:
+                return {}
+
+            remaining = self.config.rate_limit - self._window_calls
+
+            return {
+                'X-RateLimit-Limit': str(self.config.rate_limit),
+                'X-RateLimit-Remaining': str(max(0, remaining)),
+                'X-RateLimit-Reset': str(int(self._window_start + self.config.rate_window) + 1),
+                'X-RateLimit-Exceeded': 'true' if remaining < 0 else '',
+            }
+
+    def count_bytes(self, size: int) -> None:
+        with self._lock:
+            self._bytes_sent += size
+
+    def get_repository(self, index: int) -> dict[str, Any]:
+        url = f'{self.url}/repos/{OWNER}/repo{index}'
+        return {
+            'id': index + 1,
+            'name': f'repo{index}',
+            'full_name': f'{OWNER}/repo{index}',
+            'private': False,
+            'url': url,
+            'releases_url': f'{url}/releases{{/id}}',
+        }
+
+    def get_release(self, index: int) -> dict[str, Any]:
+        url = f'{self.url}/repos/{OWNER}/repo{index}/releases/{index + 1}'
+        return {
+            'id': index + 1,
+            'tag_name': TAG,
+            'name': TAG,
+            'draft': False,
+            'prerelease': False,
+            'url': url,
+            'assets_url': f'{url}/assets',
+            'created_at': UPDATED_AT,
+            'published_at': UPDATED_AT,
+        }
+
+    def get_asset(self, index: int) -> dict[str, Any]:
+        name = self.get_asset_name(index)
+        return {
+            'id': index + 1,
+            'name': name,
+            'size': self.config.asset_size,
+            'content_type': 'application/vnd.debian.binary-package',
+            'state': 'uploaded',
+            'url': f'{self.url}/repos/{OWNER}/repo{index}/releases/assets/{index + 1}',
+            'browser_download_url': f'{self.url}/downloads/{index}/{name}',
+            'created_at': UPDATED_AT,
+            'updated_at': UPDATED_AT,
+        }
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeHTTPServer'
+
+    @property
+    def fake(self) -> 'FakeGitHubServer':
+        return self.server.fake
+
+    def do_HEAD(self) -> None:
+        self._handle(send_body=False)
+
+    def do_GET(self) -> None:
+        self._handle(send_body=True)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _handle(self, send_body: bool) -> None:
+        if self.fake.config.latency:
+            time.sleep(self.fake.config.latency)
+
+        path = self.path.split('?', 1)[0]
+
+        if match := REPOSITORY_PATH.match(path):
+            self._handle_api(int(match['index']), match['rest'] or '')
+        elif match := DOWNLOAD_PATH.match(path):
+            self._send_file(int(match['index']), send_body)
+        else:
+            self._send_json(404, {'message': 'Not Found'})
+
+    def _handle_api(self, index: int, rest: str) -> None:
+        headers = self.fake.count_api_call()
+
+        if headers.pop('X-RateLimit-Exceeded', ''):
+            self._send_json(403, {'message': 'API rate limit exceeded'}, headers)
+        elif index >= self.fake.config.packages:
+            self._send_json(404, {'message': 'Not Found'}, headers)
+        elif rest == '':
+            self._send_json(200, self.fake.get_repository(index), headers)
+        elif rest in [f'/releases/tags/{TAG}', '/releases/latest', f'/releases/{index + 1}']:
+            self._send_json(200, self.fake.get_release(index), headers)
+        elif rest == f'/releases/{index + 1}/assets':
+            self._send_json(200, [self.fake.get_asset(index)] if 'page=2' not in self.path else [], headers)
+        elif rest == f'/releases/assets/{index + 1}':
+            self._handle_asset(index, headers)
+        else:
+            self._send_json(404, {'message': 'Not Found'}, headers)
+
+    def _handle_asset(self, index: int, headers: dict[str, str]) -> None:
+        if self.headers.get('Accept') != 'application/octet-stream':
+            self._send_json(200, self.fake.get_asset(index), headers)
+            return
+
+        self.send_response(302)
+        self.send_header('Location', f'{self.fake.url}/downloads/{index}/{self.fake.get_asset_name(index)}')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_file(self, index: int, send_body: bool) -> None:
+        size = self.fake.config.asset_size
+        start, end = 0, size - 1
+
+        if match := RANGE_HEADER.match(self.headers.get('Range', '')):
+            start, end = int(match['start']), min(int(match['end'] or end), end)
+
+        if start > end:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(206 if self.headers.get('Range') else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', f'"{index}-{size}"')
+        self.send_header('Last-Modified', LAST_MODIFIED)
+        if self.headers.get('Range'):
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+
+        if send_body:
+            self._write_body(start, end + 1)
+
+    def _write_body(self, start: int, end: int) -> None:
+        began = time.perf_counter()
+        offset = start
+
+        while offset < end:
+            position = offset % len(BLOCK)
+            length = min(CHUNK_SIZE, end - offset, len(BLOCK) - position)
+            self.wfile.write(BLOCK[position:position + length])
+            offset += length
+
+            if self.fake.config.bandwidth:
+                delay = (offset - start) / self.fake.config.bandwidth - (time.perf_counter() - began)
+                time.sleep(max(0.0, delay))
+
+        self.fake.count_bytes(end - start)
+
+    def _send_json(self, status: int, data: Any, headers: Optional[dict[str, str]] = None) -> None:
+        body = json.dumps(data).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], fake: FakeGitHubServer) -> None:
+        super().__init__(address, FakeGitHubHandler)
+        self.fake = fake
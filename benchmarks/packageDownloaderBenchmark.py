@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from tempfile import TemporaryDirectory
+from typing import Any, Optional
+
+from common_utility import ISessionProvider, SessionProvider
+from common_utility.jsonLoader import JsonLoader
+from context_logger import setup_logging
+from fakeGitHubServer import FakeGitHubConfig, FakeGitHubServer
+
+from package_downloader import (
+    IPackageStore,
+    PackageStore,
+    ResumableDownloader,
+    RunMetrics,
+    RepositoryProvider,
+    RequestScheduler,
+    ChecksumResolver,
+    AssetDownloader,
+    DebDownloader,
+    PackageDownloader,
+    AsyncSessionProvider,
+    AsyncDebDownloader,
+    AsyncPackageDownloader,
+)
+
+SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024**2, 'GB': 1024**3}
+SIZE_PATTERN = re.compile(r'^(?P<value>\d+(\.\d+)?)\s*(?P<unit>[KMG]?B?)$', re.IGNORECASE)
+
+
+@dataclass
+class Scenario:
+    engine: str
+    source: str
+    packages: int
+    asset_size: int
+    workers: int
+    warm: bool
+
+    @property
+    def key(self) -> str:
+        run = 'warm' if self.warm else 'cold'
+        return f'{self.engine}/{self.source}/{self.packages}x{self.asset_size}/{self.workers}w/{run}'
+
+
+@dataclass
+class Result:
+    scenario: Scenario
+    wall_time: float
+    peak_rss_kb: int
+    api_calls: int
+    bytes_sent: int
+    packages_downloaded: int
+    report: dict[str, Any]
+
+
+def main() -> None:
+    arguments = _get_arguments()
+    results: list[Result] = []
+
+    for scenario in _get_scenarios(arguments):
+        results.extend(_run_scenario(scenario, arguments))
+
+    output = [asdict(result) for result in results]
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(output, file, indent=2)
+
+    if arguments.baseline and (regressions := _compare(results, arguments.baseline, arguments.tolerance)):
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        sys.exit(1)
+
+
+def _get_scenarios(arguments: Namespace) -> list[Scenario]:
+    return [
+        Scenario(engine, arguments.source, packages, _parse_size(size), arguments.workers, False)
+        for engine in arguments.engines
+        for packages in arguments.packages
+        for size in arguments.sizes
+    ]
+
+
+def _run_scenario(scenario: Scenario, arguments: Namespace) -> list[Result]:
+    config = FakeGitHubConfig(
+        scenario.packages,
+        scenario.asset_size,
+        arguments.latency,
+        _parse_size(arguments.bandwidth) if arguments.bandwidth else None,
+        arguments.rate_limit,
+        arguments.rate_window,
+    )
+    server = FakeGitHubServer(config)
+    server.start()
+    results = []
+
+    try:
+        with TemporaryDirectory() as temp_dir:
+            config_path = os.path.join(temp_dir, 'packages.json')
+            download_dir = os.path.join(temp_dir, 'packages')
+
+            with open(config_path, 'w') as file:
+                configs = server.get_file_configs() if scenario.source == 'file' else server.get_package_configs()
+                json.dump(configs, file)
+
+            for warm in [False, True] if arguments.warm else [False]:
+                run_scenario = Scenario(**dict(asdict(scenario), warm=warm))
+                api_calls, bytes_sent = server.api_calls, server.bytes_sent
+                client_result = _run_in_process(run_scenario, server.url, config_path, download_dir)
+                result = Result(
+                    run_scenario,
+                    client_result['wall_time'],
+                    client_result['peak_rss_kb'],
+                    server.api_calls - api_calls,
+                    server.bytes_sent - bytes_sent,
+                    client_result['packages_downloaded'],
+                    client_result['report'],
+                )
+                _print_result(result)
+                results.append(result)
+    finally:
+        server.stop()
+
+    return results
+
+
+def _run_in_process(scenario: Scenario, api_url: str, config_path: str, download_dir: str) -> dict[str, Any]:
+    context = multiprocessing.get_context('spawn')
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        result: dict[str, Any] = executor.submit(
+            _run_client, scenario, api_url, config_path, download_dir
+        ).result()
+
+    return result
+
+
+def _run_client(scenario: Scenario, api_url: str, config_path: str, download_dir: str) -> dict[str, Any]:
+    setup_logging('package-downloader-benchmark', 'error')
+
+    run_metrics = RunMetrics()
+    session_provider = SessionProvider()
+    package_store = PackageStore(download_dir, session_provider, run_metrics)
+    start = time.perf_counter()
+
+    if scenario.engine == 'async':
+        async_deb_downloader = AsyncDebDownloader(
+            AsyncSessionProvider(max_connections=scenario.workers),
+            download_dir,
+            package_store,
+            api_url=api_url,
+            run_metrics=run_metrics,
+        )
+        results = AsyncPackageDownloader(
+            config_path, JsonLoader(), async_deb_downloader, scenario.workers, run_metrics
+        ).download_packages()
+    else:
+        results = _run_threaded_client(
+            scenario, api_url, config_path, download_dir, session_provider, package_store, run_metrics
+        )
+
+    return {
+        'wall_time': time.perf_counter() - start,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'packages_downloaded': len([result for result in results if result]),
+        'report': run_metrics.get_report(),
+    }
+
+
+def _run_threaded_client(
+    scenario: Scenario,
+    api_url: str,
+    config_path: str,
+    download_dir: str,
+    session_provider: ISessionProvider,
+    package_store: IPackageStore,
+    run_metrics: RunMetrics,
+) -> list[Optional[str]]:
+    file_downloader = ResumableDownloader(session_provider, download_dir, run_metrics=run_metrics)
+    request_scheduler = RequestScheduler(run_metrics=run_metrics)
+    repository_provider = RepositoryProvider(
+        scenario.workers, request_scheduler=request_scheduler, run_metrics=run_metrics, base_url=api_url
+    )
+    checksum_resolver = ChecksumResolver(session_provider, request_scheduler)
+    asset_downloader = AssetDownloader(
+        file_downloader,
+        package_store=package_store,
+        checksum_resolver=checksum_resolver,
+        request_scheduler=request_scheduler,
+        run_metrics=run_metrics,
+    )
+    deb_downloader = DebDownloader(
+        repository_provider,
+        asset_downloader,
+        file_downloader,
+        package_store=package_store,
+        request_scheduler=request_scheduler,
+        run_metrics=run_metrics,
+    )
+
+    try:
+        return PackageDownloader(
+            config_path, JsonLoader(), deb_downloader, scenario.workers, run_metrics=run_metrics
+        ).download_packages()
+    finally:
+        repository_provider.close()
+
+
+def _compare(results: list[Result], baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path) as file:
+        baseline = {Scenario(**item['scenario']).key: item for item in json.load(file)}
+
+    regressions = []
+
+    for result in results:
+        if not (expected := baseline.get(result.scenario.key)):
+            continue
+
+        key = result.scenario.key
+
+        if result.wall_time > expected['wall_time'] * (1 + tolerance):
+            regressions.append(f'{key}: wall time {result.wall_time:.2f}s > {expected["wall_time"]:.2f}s')
+        if result.peak_rss_kb > expected['peak_rss_kb'] * (1 + tolerance):
+            regressions.append(f'{key}: peak RSS {result.peak_rss_kb} KB > {expected["peak_rss_kb"]} KB')
+        if result.api_calls > expected['api_calls']:
+            regressions.append(f'{key}: API calls {result.api_calls} > {expected["api_calls"]}')
+
+    return regressions
+
+
+def _print_result(result: Result) -> None:
+    throughput = result.bytes_sent / result.wall_time / 1024**2 if result.wall_time else 0.0
+    print(
+        f'{result.scenario.key:<48} wall={result.wall_time:8.2f}s rss={result.peak_rss_kb / 1024:7.1f}MB '
+        f'api={result.api_calls:5d} throughput={throughput:8.1f}MB/s '
+        f'ok={result.packages_downloaded}/{result.scenario.packages}',
+        flush=True,
+    )
+
+
+def _parse_size(value: str) -> int:
+    if not (match := SIZE_PATTERN.match(value.strip())):
+        raise ValueError(f'Invalid size: {value}')
+
+    unit = match['unit'].upper()
+
+    return int(float(match['value']) * SIZE_UNITS[unit if not unit or unit.endswith('B') else f'{unit}B'])
+
+
+def _get_arguments() -> Namespace:
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-p', '--packages', help='package counts', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('-s', '--sizes', help='asset sizes (e.g. 16KB, 1MB, 1GB)', nargs='+', default=['16KB', '1MB'])
+    parser.add_argument(
+        '-e', '--engines', help='download engines', nargs='+', choices=['threaded', 'async'], default=['threaded']
+    )
+    parser.add_argument('--source', help='package source', choices=['release', 'file'], default='release')
+    parser.add_argument('-w', '--workers', help='number of concurrent package downloads', type=int, default=8)
+    parser.add_argument('--warm', help='also measure a second run against the populated store', action='store_true')
+    parser.add_argument('--latency', help='server latency per request in seconds', type=float, default=0.0)
+    parser.add_argument('--bandwidth', help='server bandwidth per connection (e.g. 10MB)')
+    parser.add_argument('--rate-limit', help='API requests allowed per rate limit window', type=int)
+    parser.add_argument('--rate-window', help='rate limit window in seconds', type=float, default=60.0)
+    parser.add_argument('-o', '--output', help='write results as JSON to this path')
+    parser.add_argument('-b', '--baseline', help='compare against results JSON and fail on regressions')
+    parser.add_argument('-t', '--tolerance', help='allowed relative regression', type=float, default=0.25)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from dataclasses import dataclass, asdict
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin',
+                           'debian-package-downloader.py')
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+\d+ \|\s+(?P<cumulative>\d+) \|(?P<indent>\s+)(?P<name>\S+)$')
+OPTIONAL_STACKS = ['github', 'aiohttp']
+
+
+@dataclass
+class Result:
+    runs: int
+    wall_time: float
+    import_time: float
+    modules: int
+    optional_stacks: list[str]
+    top_imports: list[tuple[str, float]]
+
+
+def main() -> None:
+    arguments = _get_arguments()
+    result = _run(arguments)
+
+    _print_result(result)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(asdict(result), file, indent=2)
+
+    if arguments.baseline and (regressions := _compare(result, arguments.baseline, arguments.tolerance)):
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        sys.exit(1)
+
+
+def _run(arguments: Namespace) -> Result:
+    command = [sys.executable, SCRIPT_PATH, '--help']
+    wall_times = []
+
+    for _ in range(arguments.runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        wall_times.append(time.perf_counter() - start)
+
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *command[1:]], check=True, stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE, text=True
+    )
+    imports = _parse_import_times(process.stderr)
+    top_level = [(name, cumulative) for name, cumulative, level in imports if level == 0]
+    loaded = {name.split('.', 1)[0] for name, _, _ in imports}
+
+    return Result(
+        runs=arguments.runs,
+        wall_time=statistics.median(wall_times),
+        import_time=sum(cumulative for _, cumulative in top_level),
+        modules=len(imports),
+        optional_stacks=[stack for stack in OPTIONAL_STACKS if stack in loaded],
+        top_imports=sorted(top_level, key=lambda item: item[1], reverse=True)[:arguments.top],
+    )
+
+
+def _parse_import_times(output: str) -> list[tuple[str, float, int]]:
+    imports = []
+
+    for line in output.splitlines():
+        if match := IMPORT_TIME_PATTERN.match(line):
+            level = (len(match['indent']) - 1) // 2
+            imports.append((match['name'], int(match['cumulative']) / 1e6, level))
+
+    return imports
+
+
+def _compare(result: Result, baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path) as file:
+        expected = json.load(file)
+
+    regressions = []
+
+    if result.wall_time > expected['wall_time'] * (1 + tolerance):
+        regressions.append(f'wall time {result.wall_time:.3f}s > {expected["wall_time"]:.3f}s')
+    if result.import_time > expected['import_time'] * (1 + tolerance):
+        regressions.append(f'import time {result.import_time:.3f}s > {expected["import_time"]:.3f}s')
+    if stacks := sorted(set(result.optional_stacks) - set(expected['optional_stacks'])):
+        regressions.append(f'optional stacks loaded at startup: {", ".join(stacks)}')
+
+    return regressions
+
+
+def _print_result(result: Result) -> None:
+    print(
+        f'startup wall={result.wall_time * 1000:7.1f}ms imports={result.import_time * 1000:7.1f}ms '
+        f'modules={result.modules} optional={",".join(result.optional_stacks) or "-"}',
+        flush=True,
+    )
+
+    for name, cumulative in result.top_imports:
+        print(f'  {name:<40} {cumulative * 1000:7.1f}ms')
+
+
+def _get_arguments() -> Namespace:
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-r', '--runs', help='number of fresh interpreter runs', type=int, default=10)
+    parser.add_argument('--top', help='number of slowest top level imports to show', type=int, default=10)
+    parser.add_argument('-o', '--output', help='write results as JSON to this path')
+    parser.add_argument('-b', '--baseline', help='compare against results JSON and fail on regressions')
+    parser.add_argument('-t', '--tolerance', help='allowed relative regression', type=float, default=0.25)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,16 +5,70 @@
 # SPDX-License-Identifier: MIT
 
 import os
+import json
+import re
+import signal
+import sys
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from typing import Callable, Optional, Union
 
-from common_utility import SessionProvider, FileDownloader
+from common_utility import SessionProvider
 from common_utility.jsonLoader import JsonLoader
 from context_logger import get_logger, setup_logging
 
-from package_downloader import DebDownloader, RepositoryProvider, AssetDownloader, PackageDownloader
+from package_downloader import (
+    DebDownloader,
+    RepositoryProvider,
+    AssetDownloader,
+    PackageDownloader,
+    IPackageDownloader,
+    MetadataCache,
+    PackageStore,
+    ResumableDownloader,
+    ChecksumResolver,
+    GraphQLTransport,
+    ReleaseResolver,
+    ReleaseIndex,
+    LocalPackageIndex,
+    AptRepositoryIndexer,
+    RequestScheduler,
+    RunMetrics,
+    measure,
+    write_report,
+    AsyncSessionProvider,
+    AsyncDebDownloader,
+    AsyncPackageDownloader,
+    ConfigSource,
+    PackageWatcher,
+    StatusServer,
+    TransferShaper,
+    parse_rate,
+    MirrorSelector,
+    MIRROR_STATS_FILE_NAME,
+    LanCache,
+    LanCacheServer,
+    PackageConfigReader,
+    is_json_lines,
+    DownloadTransaction,
+    DeltaUpdater,
+    PackagePlanner,
+    DownloadPlan,
+    StreamWriter,
+    DEFAULT_CHUNK_SIZE,
+    IArtifactSource,
+    ArtifactSourceRouter,
+    GitHubSource,
+    GiteaSource,
+    GitLabSource,
+    HttpIndexSource,
+)
 
 log = get_logger('PackageDownloaderApp')
 
+METADATA_CACHE_DIR_NAME = '.metadata-cache'
+ASYNC_HOST_CONNECTIONS = 6
+PLAN_WORKERS = 16
+
 
 def main() -> None:
     arguments = _get_arguments()
@@ -23,19 +77,353 @@ def main() -> None:
 
     log.info('Starting package downloader', arguments=vars(arguments))
 
-    json_loader = JsonLoader()
+    run_metrics = RunMetrics() if arguments.report or arguments.plan else None
+
+    try:
+        _download_packages(arguments, run_metrics)
+    finally:
+        if run_metrics and arguments.report:
+            write_report(run_metrics, arguments.report)
 
+
+def _download_packages(arguments: Namespace, run_metrics: Optional[RunMetrics]) -> None:
+    download_dir = os.path.abspath(arguments.download)
     session_provider = SessionProvider()
-    repository_provider = RepositoryProvider()
-    file_downloader = FileDownloader(session_provider, os.path.abspath(arguments.download))
-    asset_downloader = AssetDownloader(file_downloader)
-    deb_downloader = DebDownloader(repository_provider, asset_downloader, file_downloader)
+    download_transaction = None if arguments.plan else DownloadTransaction(download_dir, arguments.atomic, run_metrics)
+    package_store = None if arguments.no_store else PackageStore(
+        download_dir, session_provider, run_metrics, download_transaction
+    )
+    file_downloader = ResumableDownloader(
+        session_provider,
+        download_dir,
+        max_retries=arguments.retries,
+        parallel_ranges=arguments.ranges,
+        run_metrics=run_metrics,
+        transfer_shaper=_create_transfer_shaper(arguments),
+        mirror_selector=MirrorSelector(
+            session_provider, os.path.join(download_dir, MIRROR_STATS_FILE_NAME), run_metrics=run_metrics
+        ),
+        min_rate=parse_rate(arguments.min_rate) or 0,
+        stall_timeout=arguments.stall_timeout,
+        download_transaction=download_transaction,
+        stream_writer=_create_stream_writer(arguments),
+    )
+
+    if arguments.plan:
+        _plan_packages(arguments, download_dir, session_provider, package_store, file_downloader, run_metrics)
+        return
+
+    if arguments.engine == 'async':
+        create_downloader, close = _create_async_engine(
+            arguments, download_dir, package_store, download_transaction, run_metrics
+        )
+    else:
+        create_downloader, _, close = _create_threaded_engine(
+            arguments, download_dir, session_provider, package_store, file_downloader, download_transaction, run_metrics
+        )
+
+    try:
+        if arguments.watch:
+            config_source = ConfigSource(session_provider, arguments.package_config, download_dir)
+            _watch(arguments, config_source, create_downloader, package_store, run_metrics)
+            return
+
+        with measure(run_metrics, 'config_download'):
+            package_config_path = file_downloader.download(arguments.package_config, skip_if_exists=False)
+
+        create_downloader(package_config_path).download_packages()
+        _index_repository(arguments, run_metrics)
+    finally:
+        close()
+
+    if download_transaction and download_transaction.is_rolled_back():
+        sys.exit(1)
+
+
+def _plan_packages(
+    arguments: Namespace,
+    download_dir: str,
+    session_provider: SessionProvider,
+    package_store: Optional[PackageStore],
+    file_downloader: ResumableDownloader,
+    run_metrics: Optional[RunMetrics],
+) -> None:
+    _, create_planner, close = _create_threaded_engine(
+        arguments, download_dir, session_provider, package_store, file_downloader, None, run_metrics
+    )
+
+    try:
+        with measure(run_metrics, 'config_download'):
+            package_config_path = file_downloader.download(arguments.package_config, skip_if_exists=False)
+
+        plan = create_planner(package_config_path).plan()
+    finally:
+        close()
+
+    _print_plan(plan)
+
+    if arguments.plan_output:
+        with open(arguments.plan_output, 'w') as file:
+            json.dump(plan.to_dict(), file, indent=2)
+
+    if plan.get_summary()['failed']:
+        sys.exit(1)
+
+
+def _print_plan(plan: DownloadPlan) -> None:
+    for package in plan.packages:
+        for planned in package.files:
+            size = f'{planned.size:>12}' if planned.size is not None else f'{"?":>12}'
+            print(f'{package.action:<9} {package.package:<32} {planned.action:<9} {size}  {planned.file_name}')
+        if package.error:
+            print(f'{package.action:<9} {package.package:<32} {package.error}')
+
+    summary = plan.get_summary()
+    api_calls = summary['api_calls'] if summary['api_calls'] is not None else '?'
+
+    print(
+        f'packages={summary["packages"]} download={summary["download"]} cached={summary["cached"]} '
+        f'local={summary["local"]} failed={summary["failed"]} download_bytes={summary["download_bytes"]} '
+        f'unknown_sizes={summary["unknown_sizes"]} api_calls={api_calls} duration={summary["duration"]:.2f}s'
+    )
+
+
+def _watch(
+    arguments: Namespace,
+    config_source: ConfigSource,
+    create_downloader: Callable[[str], IPackageDownloader],
+    package_store: Optional[PackageStore],
+    run_metrics: Optional[RunMetrics],
+) -> None:
+    watcher = PackageWatcher(
+        config_source,
+        create_downloader,
+        arguments.watch,
+        lambda: _index_repository(arguments, run_metrics),
+        run_metrics=run_metrics,
+    )
+    servers: list[Union[StatusServer, LanCacheServer]] = []
+
+    if arguments.status_port is not None:
+        servers.append(StatusServer(watcher, arguments.status_host, arguments.status_port))
+
+    if arguments.serve_cache is not None and package_store:
+        servers.append(LanCacheServer(package_store, arguments.serve_cache_host, arguments.serve_cache, run_metrics))
+
+    for server in servers:
+        server.start()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        log.info('Interrupted, stopping')
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def _index_repository(arguments: Namespace, run_metrics: Optional[RunMetrics]) -> None:
+    if arguments.apt_index:
+        with measure(run_metrics, 'apt_index'):
+            AptRepositoryIndexer(os.path.abspath(arguments.download), run_metrics=run_metrics).index()
+
+
+def _create_async_engine(
+    arguments: Namespace,
+    download_dir: str,
+    package_store: Optional[PackageStore],
+    download_transaction: Optional[DownloadTransaction],
+    run_metrics: Optional[RunMetrics],
+) -> tuple[Callable[[str], IPackageDownloader], Callable[[], None]]:
+    async_session_provider = AsyncSessionProvider(
+        max_connections=max(arguments.workers, arguments.host_connections or ASYNC_HOST_CONNECTIONS),
+        max_connections_per_host=arguments.host_connections or ASYNC_HOST_CONNECTIONS,
+    )
+    async_deb_downloader = AsyncDebDownloader(
+        async_session_provider,
+        download_dir,
+        package_store,
+        verify=not arguments.no_verify,
+        api_url=arguments.api_url,
+        chunk_size=arguments.chunk_size,
+        run_metrics=run_metrics,
+        download_transaction=download_transaction,
+        stream_writer=_create_stream_writer(arguments),
+        local_package_index=LocalPackageIndex(download_dir),
+        transfer_shaper=_create_transfer_shaper(arguments),
+        request_scheduler=RequestScheduler(max_retries=arguments.api_retries, run_metrics=run_metrics),
+    )
+
+    def create_downloader(package_config_path: str) -> IPackageDownloader:
+        return AsyncPackageDownloader(
+            package_config_path,
+            JsonLoader(),
+            async_deb_downloader,
+            arguments.workers,
+            run_metrics,
+            _create_config_reader(arguments, package_config_path),
+            download_transaction,
+        )
+
+    return create_downloader, lambda: None
+
+
+def _create_threaded_engine(
+    arguments: Namespace,
+    download_dir: str,
+    session_provider: SessionProvider,
+    package_store: Optional[PackageStore],
+    file_downloader: ResumableDownloader,
+    download_transaction: Optional[DownloadTransaction],
+    run_metrics: Optional[RunMetrics],
+) -> tuple[Callable[[str], IPackageDownloader], Callable[[str], PackagePlanner], Callable[[], None]]:
+    metadata_cache = None
+    cache_dir = arguments.cache_dir
+
+    if not cache_dir and arguments.watch:
+        cache_dir = os.path.join(download_dir, METADATA_CACHE_DIR_NAME)
+
+    if cache_dir:
+        cache_ttl = min(arguments.cache_ttl, arguments.watch) if arguments.watch else arguments.cache_ttl
+        metadata_cache = MetadataCache(os.path.abspath(cache_dir), cache_ttl, arguments.cache_size, run_metrics)
+
+    request_scheduler = RequestScheduler(max_retries=arguments.api_retries, run_metrics=run_metrics)
+    repository_provider = RepositoryProvider(
+        max(arguments.workers, 1), metadata_cache, request_scheduler, run_metrics, arguments.api_url
+    )
+    checksum_resolver = None if arguments.no_verify else ChecksumResolver(session_provider, request_scheduler)
+    local_package_index = LocalPackageIndex(download_dir)
+    lan_cache = None
+
+    if arguments.lan_cache and package_store:
+        lan_cache = LanCache(session_provider, file_downloader, arguments.lan_cache, run_metrics=run_metrics)
+
+    delta_updater = None
+
+    if arguments.delta or arguments.delta_url:
+        delta_updater = DeltaUpdater(
+            session_provider,
+            file_downloader,
+            download_dir,
+            local_package_index,
+            arguments.delta_url,
+            run_metrics=run_metrics,
+            download_transaction=download_transaction,
+        )
+
+    def create_deb_downloader() -> tuple[DebDownloader, Optional[ReleaseResolver]]:
+        asset_downloader = AssetDownloader(
+            file_downloader,
+            metadata_cache,
+            package_store,
+            checksum_resolver,
+            request_scheduler,
+            run_metrics,
+            lan_cache=lan_cache,
+            delta_updater=delta_updater,
+        )
+        release_resolver = _create_release_resolver(arguments, session_provider, request_scheduler)
+        artifact_source = _create_artifact_source(
+            arguments, session_provider, metadata_cache, request_scheduler, run_metrics
+        )
+        deb_downloader = DebDownloader(
+            repository_provider,
+            asset_downloader,
+            file_downloader,
+            metadata_cache,
+            package_store,
+            release_resolver,
+            request_scheduler,
+            run_metrics,
+            ReleaseIndex(metadata_cache, request_scheduler),
+            local_package_index,
+            lan_cache,
+            artifact_source,
+        )
+
+        return deb_downloader, release_resolver
+
+    def create_downloader(package_config_path: str) -> IPackageDownloader:
+        deb_downloader, release_resolver = create_deb_downloader()
+
+        return PackageDownloader(
+            package_config_path,
+            JsonLoader(),
+            deb_downloader,
+            arguments.workers,
+            release_resolver,
+            run_metrics,
+            _create_config_reader(arguments, package_config_path),
+            download_transaction,
+        )
+
+    def create_planner(package_config_path: str) -> PackagePlanner:
+        deb_downloader, release_resolver = create_deb_downloader()
+
+        return PackagePlanner(
+            package_config_path,
+            JsonLoader(),
+            deb_downloader,
+            max(arguments.workers, PLAN_WORKERS),
+            release_resolver,
+            session_provider,
+            run_metrics,
+        )
+
+    return create_downloader, create_planner, repository_provider.close
+
+
+def _create_config_reader(arguments: Namespace, package_config_path: str) -> Optional[PackageConfigReader]:
+    if arguments.stream or is_json_lines(package_config_path):
+        return PackageConfigReader()
+
+    return None
+
+
+def _create_transfer_shaper(arguments: Namespace) -> TransferShaper:
+    return TransferShaper(parse_rate(arguments.max_rate), parse_rate(arguments.host_rate), arguments.host_connections)
+
+
+def _create_artifact_source(
+    arguments: Namespace,
+    session_provider: SessionProvider,
+    metadata_cache: Optional[MetadataCache],
+    request_scheduler: RequestScheduler,
+    run_metrics: Optional[RunMetrics],
+) -> IArtifactSource:
+    sources: list[IArtifactSource] = [
+        GiteaSource(session_provider, metadata_cache, request_scheduler, run_metrics),
+        GitLabSource(session_provider, metadata_cache, request_scheduler, run_metrics),
+        HttpIndexSource(session_provider, metadata_cache, request_scheduler, run_metrics),
+    ]
+
+    if arguments.github_rest:
+        sources.append(
+            GitHubSource(session_provider, metadata_cache, request_scheduler, run_metrics, arguments.api_url)
+        )
+
+    return ArtifactSourceRouter(sources)
+
+
+def _create_stream_writer(arguments: Namespace) -> StreamWriter:
+    return StreamWriter(arguments.chunk_size, not arguments.no_preallocate)
+
 
-    package_config_path = file_downloader.download(arguments.package_config, skip_if_exists=False)
+def _create_release_resolver(
+    arguments: Namespace, session_provider: SessionProvider, request_scheduler: RequestScheduler
+) -> Optional[ReleaseResolver]:
+    if not arguments.graphql:
+        return None
 
-    package_downloader = PackageDownloader(package_config_path, json_loader, deb_downloader)
+    graphql_url = re.sub(r'/v3$', '', arguments.api_url.rstrip('/')) + '/graphql'
 
-    package_downloader.download_packages()
+    return ReleaseResolver(
+        GraphQLTransport(session_provider, graphql_url),
+        os.environ.get('GITHUB_TOKEN'),
+        request_scheduler=request_scheduler,
+    )
 
 
 def _get_arguments() -> Namespace:
@@ -43,6 +431,85 @@ def _get_arguments() -> Namespace:
     parser.add_argument('-f', '--log-file', help='log file path')
     parser.add_argument('-l', '--log-level', help='logging level', default='info')
     parser.add_argument('-d', '--download', help='package download location', default='/tmp/packages')
+    parser.add_argument('-w', '--workers', help='number of concurrent package downloads', type=int, default=1)
+    parser.add_argument(
+        '--stream', help='read the package config entry by entry (always on for .jsonl configs)', action='store_true'
+    )
+    parser.add_argument(
+        '-e',
+        '--engine',
+        help='download engine, async handles large package counts',
+        choices=['threaded', 'async'],
+        default='threaded',
+    )
+    parser.add_argument(
+        '--host-connections', help=f'maximum connections per host (async default: {ASYNC_HOST_CONNECTIONS})', type=int
+    )
+    parser.add_argument('--max-rate', help='total download bandwidth limit per second (e.g. 2MB)')
+    parser.add_argument('--host-rate', help='download bandwidth limit per second and host (e.g. 512KB)')
+    parser.add_argument('--min-rate', help='treat downloads slower than this per second as stalled (e.g. 16KB)')
+    parser.add_argument(
+        '--stall-timeout', help='seconds below the minimum rate before switching mirror', type=float, default=10.0
+    )
+    parser.add_argument('--api-url', help='GitHub API base URL', default='https://api.github.com')
+    parser.add_argument('--cache-dir', help='GitHub metadata cache location (disabled when not set)')
+    parser.add_argument('--cache-ttl', help='metadata cache revalidation interval in seconds', type=float, default=300)
+    parser.add_argument('--cache-size', help='maximum number of metadata cache entries', type=int, default=1000)
+    parser.add_argument(
+        '--graphql',
+        help='resolve public releases in batched GraphQL queries (uses GITHUB_TOKEN for releases without a token)',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--github-rest',
+        help='read GitHub releases as plain REST records through the shared artifact source instead of PyGithub',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--api-retries', help='GitHub API retries on server errors and rate limiting', type=int, default=5
+    )
+    parser.add_argument('--watch', help='keep running and sync packages at this interval in seconds', type=float)
+    parser.add_argument('--status-host', help='status endpoint address in watch mode', default='127.0.0.1')
+    parser.add_argument('--status-port', help='serve sync status as JSON on this port in watch mode', type=int)
+    parser.add_argument(
+        '--lan-cache', help='look up packages with a known SHA256 in the cache served by this LAN peer URL first'
+    )
+    parser.add_argument(
+        '--serve-cache', help='serve the package store to LAN peers on this port in watch mode', type=int
+    )
+    parser.add_argument('--serve-cache-host', help='LAN cache server address in watch mode', default='0.0.0.0')
+    parser.add_argument(
+        '--delta', help='rebuild release assets from bsdiff delta assets against the local version', action='store_true'
+    )
+    parser.add_argument('--delta-url', help='also look up bsdiff deltas on this server (implies --delta)')
+    parser.add_argument(
+        '--plan',
+        help='resolve all packages and report downloads, cache hits, bytes and API calls without downloading',
+        action='store_true',
+    )
+    parser.add_argument('--plan-output', help='write the plan as JSON to this path')
+    parser.add_argument('--apt-index', help='generate Packages, Packages.gz and Release files', action='store_true')
+    parser.add_argument('--report', help='write a JSON run report with timings and counters to this path')
+    parser.add_argument('--retries', help='download retries without progress before giving up', type=int, default=5)
+    parser.add_argument(
+        '--chunk-size', help='read chunk and write buffer size in bytes per download', type=int,
+        default=DEFAULT_CHUNK_SIZE,
+    )
+    parser.add_argument(
+        '--no-preallocate', help='do not reserve disk space for downloads before writing', action='store_true'
+    )
+    parser.add_argument('--ranges', help='parallel byte ranges per large file download', type=int, default=1)
+    parser.add_argument(
+        '--no-verify', help='do not verify release assets against published checksums', action='store_true'
+    )
+    parser.add_argument(
+        '--atomic',
+        help='roll back the whole run when any package fails instead of keeping the successful downloads',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--no-store', help='always download packages, even when unchanged since last run', action='store_true'
+    )
 
     parser.add_argument('package_config', help='package config JSON file path or URL')
 
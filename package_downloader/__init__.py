@@ -1,6 +1,103 @@
-from .releaseConfig import *
-from .packageConfig import *
-from .repositoryProvider import *
-from .assetDownloader import *
-from .debDownloader import *
-from .packageDownloader import *
+from importlib import import_module
+from typing import Any
+
+_EXPORTS = {
+    'assetMatcher': ['AssetMatcher', 'get_asset_matcher'],
+    'releaseConfig': ['SOURCE_GITHUB', 'SOURCE_GITEA', 'SOURCE_GITLAB', 'SOURCE_HTTP', 'ReleaseConfig'],
+    'fileDigest': [
+        'HASH_CHUNK_SIZE', 'SHA256_DIGEST_PREFIX', 'IntegrityError', 'FileDigest', 'StreamHasher',
+        'IVerifyingFileDownloader', 'parse_asset_digest', 'hash_file', 'get_streamed_digest', 'download_verified',
+    ],
+    'streamWriter': [
+        'DEFAULT_CHUNK_SIZE', 'MIN_CHUNK_SIZE', 'COPY_CHUNK_SIZE', 'FALLOC_FL_KEEP_SIZE', 'UNSUPPORTED_COPY_ERRORS',
+        'StreamFile', 'IStreamWriter', 'StreamWriter', 'reserve_space', 'copy_file', 'append_file',
+    ],
+    'runMetrics': ['PhaseTiming', 'IRunMetrics', 'RunMetrics', 'measure', 'increment', 'write_report'],
+    'downloadTransaction': [
+        'STAGING_DIR_NAME', 'BACKUP_DIR_NAME', 'JOURNAL_FILE_NAME', 'MANIFEST_FILE_NAME', 'ManifestEntry',
+        'IDownloadTransaction', 'DownloadTransaction', 'run_atomically', 'get_staging_path', 'promote_staged',
+        'is_downloaded',
+    ],
+    'requestScheduler': [
+        'SECONDARY_RATE_LIMIT_MESSAGE', 'RateLimitWaitError', 'RateLimitBudget', 'IRequestScheduler',
+        'RequestScheduler', 'execute_scheduled', 'execute_scheduled_async',
+    ],
+    'transferShaper': [
+        'RATE_UNITS', 'RATE_PATTERN', 'Throttle', 'AsyncThrottle', 'TokenBucket', 'TransferOptions', 'PrioritySlots',
+        'AsyncPrioritySlots', 'ITransferShaper', 'TransferShaper', 'transfer_options', 'get_transfer_options',
+        'shaped_transfer', 'shaped_transfer_async', 'parse_rate',
+    ],
+    'mirrorSelector': [
+        'MIRROR_STATS_FILE_NAME', 'REFERENCE_SIZE', 'MirrorStats', 'IMirrorSelector', 'MirrorSelector',
+        'download_mirrored',
+    ],
+    'lanCache': ['SHA256_PATH', 'SHA256_HEADER', 'ILanCache', 'LanCache', 'fetch_cached'],
+    'debianVersion': ['CONSTRAINT_PATTERN', 'OPERATORS', 'DebianVersion', 'VersionConstraint', 'parse_tag_version'],
+    'packageConfig': ['PackageConfig'],
+    'packageConfigReader': ['JSON_LINES_SUFFIXES', 'WHITESPACE_PATTERN', 'IPackageConfigReader', 'PackageConfigReader',
+                            'is_json_lines'],
+    'metadataCache': ['EVICTION_RATIO', 'JsonRequest', 'CacheEntry', 'IMetadataCache', 'MetadataCache'],
+    'packageStore': ['STORE_DIR_NAME', 'LINK_SUFFIX', 'IPackageStore', 'PackageStore'],
+    'downloadPlan': [
+        'PLAN_DOWNLOAD', 'PLAN_CACHED', 'PLAN_LOCAL', 'PLAN_FAILED', 'PlannedFile', 'PlannedPackage', 'DownloadPlan',
+        'is_stored',
+    ],
+    'resumableDownloader': [
+        'PART_SUFFIX', 'VALIDATOR_SUFFIX', 'LAYOUT_SUFFIX', 'THROTTLED_CHUNK_SIZE', 'IncompleteDownloadError',
+        'StalledTransferError', 'RemoteFileChangedError', 'RangeNotSupportedError', 'StallDetector',
+        'ResumableDownloader',
+    ],
+    'checksumResolver': [
+        'SUMS_FILE_NAMES', 'IChecksumResolver', 'ChecksumResolver', 'is_checksum_asset', 'parse_checksums',
+    ],
+    'releaseResolver': [
+        'GITHUB_GRAPHQL_URL', 'RELEASE_FIELDS', 'ResolvedAsset', 'ResolvedRelease', 'IGraphQLTransport',
+        'GraphQLTransport', 'IReleaseResolver', 'ReleaseResolver',
+    ],
+    'releaseIndex': ['RELEASES_PER_PAGE', 'IReleaseIndex', 'ReleaseIndex'],
+    'localPackageIndex': [
+        'AR_MAGIC', 'AR_HEADER_SIZE', 'CONTROL_MEMBERS', 'ARCHITECTURE_ALL', 'LocalPackage', 'ILocalPackageIndex',
+        'LocalPackageIndex', 'read_deb_control', 'read_deb_control_text', 'parse_control',
+    ],
+    'deltaUpdater': [
+        'DELTA_SUFFIX', 'REBUILD_SUFFIX', 'BSDIFF_MAGIC', 'BSDIFF_HEADER_SIZE', 'DELTA_CHUNK_SIZE',
+        'DEB_FILE_NAME_PATTERN', 'IDeltaUpdater', 'DeltaUpdater', 'update_delta', 'apply_bsdiff',
+    ],
+    'aptRepositoryIndexer': [
+        'INDEX_CACHE_FILE_NAME', 'RELEASE_HASHES', 'IndexedPackage', 'IAptRepositoryIndexer', 'AptRepositoryIndexer',
+    ],
+    'repositoryProvider': ['GITHUB_API_URL', 'IRepositoryProvider', 'RepositoryProvider'],
+    'artifactSource': [
+        'SOURCE_PAGE_SIZE', 'OCTET_STREAM', 'IArtifactSource', 'ArtifactSource', 'GitHubSource', 'GiteaSource',
+        'GitLabSource', 'HttpIndexSource', 'LinkParser', 'ArtifactSourceRouter', 'find_release',
+    ],
+    'assetDownloader': ['ASSETS_PER_PAGE', 'IAssetDownloader', 'AssetDownloader'],
+    'debDownloader': ['IDebDownloader', 'DebDownloader'],
+    'packageDownloader': ['STREAM_BATCH_SIZE', 'IPackageDownloader', 'PackageDownloader'],
+    'packagePlanner': ['IPackagePlanner', 'PackagePlanner'],
+    'asyncSessionProvider': ['IAsyncSessionProvider', 'AsyncSessionProvider'],
+    'asyncDebDownloader': ['ASYNC_ASSETS_PER_PAGE', 'IAsyncDebDownloader', 'AsyncDebDownloader'],
+    'asyncPackageDownloader': ['AsyncPackageDownloader'],
+    'configSource': ['DEFAULT_CONFIG_FILE_NAME', 'IConfigSource', 'ConfigSource'],
+    'packageWatcher': ['WatchStatus', 'IPackageWatcher', 'PackageWatcher'],
+    'statusServer': ['STATUS_PATHS', 'StatusServer', 'StatusRequestHandler', 'StatusHTTPServer'],
+    'lanCacheServer': ['SHA256_PATTERN', 'LanCacheServer', 'LanCacheRequestHandler', 'LanCacheHTTPServer'],
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name: str) -> Any:
+    if not (module := _MODULES.get(name)):
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_MODULES})
@@ -0,0 +1,36 @@
+from .assetMatcher import *
+from .releaseConfig import *
+from .fileDigest import *
+from .streamWriter import *
+from .runMetrics import *
+from .downloadTransaction import *
+from .requestScheduler import *
+from .transferShaper import *
+from .mirrorSelector import *
+from .lanCache import *
+from .debianVersion import *
+from .packageConfig import *
+from .packageConfigReader import *
+from .metadataCache import *
+from .packageStore import *
+from .downloadPlan import *
+from .resumableDownloader import *
+from .checksumResolver import *
+from .releaseResolver import *
+from .releaseIndex import *
+from .localPackageIndex import *
+from .deltaUpdater import *
+from .aptRepositoryIndexer import *
+from .repositoryProvider import *
+from .artifactSource import *
+from .assetDownloader import *
+from .debDownloader import *
+from .packageDownloader import *
+from .packagePlanner import *
+from .asyncSessionProvider import *
+from .asyncDebDownloader import *
+from .asyncPackageDownloader import *
+from .configSource import *
+from .packageWatcher import *
+from .statusServer import *
+from .lanCacheServer import *
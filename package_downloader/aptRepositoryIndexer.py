@@ -0,0 +1,182 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Optional
+
+from context_logger import get_logger
+
+from package_downloader import (
+    DebianVersion,
+    read_deb_control_text,
+    parse_control,
+    IRunMetrics,
+    increment,
+    HASH_CHUNK_SIZE,
+)
+
+log = get_logger('AptRepositoryIndexer')
+
+INDEX_CACHE_FILE_NAME = '.apt-index.json'
+RELEASE_HASHES = [('MD5Sum', 'md5'), ('SHA1', 'sha1'), ('SHA256', 'sha256')]
+
+
+@dataclass
+class IndexedPackage:
+    file_name: str
+    mtime_ns: int
+    size: int
+    control: str
+    md5: str
+    sha1: str
+    sha256: str
+
+    def is_unchanged(self, stat: os.stat_result) -> bool:
+        return (self.mtime_ns, self.size) == (stat.st_mtime_ns, stat.st_size)
+
+    @property
+    def fields(self) -> dict[str, str]:
+        return parse_control(self.control)
+
+    def to_stanza(self) -> str:
+        return (
+            f'{self.control.strip()}\n'
+            f'Filename: ./{self.file_name}\n'
+            f'Size: {self.size}\n'
+            f'MD5sum: {self.md5}\n'
+            f'SHA1: {self.sha1}\n'
+            f'SHA256: {self.sha256}\n'
+        )
+
+
+class IAptRepositoryIndexer(object):
+
+    def index(self) -> str:
+        raise NotImplementedError()
+
+
+class AptRepositoryIndexer(IAptRepositoryIndexer):
+
+    def __init__(self, repository_dir: str, max_workers: int = 4, run_metrics: Optional[IRunMetrics] = None) -> None:
+        self._repository_dir = repository_dir
+        self._cache_path = os.path.join(repository_dir, INDEX_CACHE_FILE_NAME)
+        self._max_workers = max_workers
+        self._run_metrics = run_metrics
+
+    def index(self) -> str:
+        cached = self._load_cache()
+        packages: list[IndexedPackage] = []
+        changed: list[tuple[str, os.stat_result]] = []
+
+        with os.scandir(self._repository_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.deb') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if (package := cached.get(entry.name)) and package.is_unchanged(stat):
+                    packages.append(package)
+                else:
+                    changed.append((entry.name, stat))
+
+        with ThreadPoolExecutor(max(1, self._max_workers), thread_name_prefix='AptRepositoryIndexer') as executor:
+            scanned = list(executor.map(lambda item: self._scan_package(*item), changed))
+
+        increment(self._run_metrics, 'apt_index_reused', len(packages))
+        increment(self._run_metrics, 'apt_index_scanned', len(changed))
+
+        packages.extend(package for package in scanned if package)
+        packages.sort(key=_get_sort_key)
+
+        self._save_cache(packages)
+        packages_path = self._write_indexes(packages)
+
+        log.info('Repository index updated', directory=self._repository_dir, packages=len(packages),
+                 scanned=len(changed))
+
+        return packages_path
+
+    def _scan_package(self, file_name: str, stat: os.stat_result) -> Optional[IndexedPackage]:
+        file_path = os.path.join(self._repository_dir, file_name)
+
+        try:
+            control = read_deb_control_text(file_path)
+        except Exception as error:
+            log.warning('Skipping unreadable package', file=file_path, error=error)
+            return None
+
+        hashes = [hashlib.md5(), hashlib.sha1(), hashlib.sha256()]
+
+        with open(file_path, 'rb') as file:
+            while chunk := file.read(HASH_CHUNK_SIZE):
+                for digest in hashes:
+                    digest.update(chunk)
+
+        log.debug('Scanned package', file=file_name)
+
+        md5, sha1, sha256 = (digest.hexdigest() for digest in hashes)
+
+        return IndexedPackage(file_name, stat.st_mtime_ns, stat.st_size, control, md5, sha1, sha256)
+
+    def _write_indexes(self, packages: list[IndexedPackage]) -> str:
+        content = ''.join(f'{package.to_stanza()}\n' for package in packages).encode()
+        packages_path = os.path.join(self._repository_dir, 'Packages')
+        compressed = gzip.compress(content, mtime=0)
+
+        _write_atomic(packages_path, content)
+        _write_atomic(f'{packages_path}.gz', compressed)
+        _write_atomic(os.path.join(self._repository_dir, 'Release'), _create_release(packages, content, compressed))
+
+        return packages_path
+
+    def _load_cache(self) -> dict[str, IndexedPackage]:
+        try:
+            with open(self._cache_path) as file:
+                return {item['file_name']: IndexedPackage(**item) for item in json.load(file)}
+        except FileNotFoundError:
+            return {}
+        except Exception as error:
+            log.warning('Failed to load repository index cache, rescanning', file=self._cache_path, error=error)
+            return {}
+
+    def _save_cache(self, packages: list[IndexedPackage]) -> None:
+        _write_atomic(self._cache_path, json.dumps([asdict(package) for package in packages]).encode())
+
+
+def _get_sort_key(package: IndexedPackage) -> tuple[str, DebianVersion, str]:
+    fields = package.fields
+
+    try:
+        version = DebianVersion.parse(fields.get('Version', ''))
+    except ValueError:
+        version = DebianVersion(0, '0')
+
+    return fields.get('Package', ''), version, package.file_name
+
+
+def _create_release(packages: list[IndexedPackage], content: bytes, compressed: bytes) -> bytes:
+    architectures = sorted({package.fields.get('Architecture', 'all') for package in packages})
+    date = datetime.now(timezone.utc).strftime('%a, %d %b %Y %H:%M:%S UTC')
+    lines = [f'Date: {date}', f'Architectures: {" ".join(architectures)}']
+
+    for field, algorithm in RELEASE_HASHES:
+        lines.append(f'{field}:')
+        for name, data in [('Packages', content), ('Packages.gz', compressed)]:
+            lines.append(f' {hashlib.new(algorithm, data).hexdigest()} {len(data):>16} {name}')
+
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _write_atomic(file_path: str, data: bytes) -> None:
+    temp_path = f'{file_path}.tmp'
+
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+
+    os.replace(temp_path, file_path)
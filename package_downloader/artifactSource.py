@@ -0,0 +1,395 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from html.parser import HTMLParser
+from threading import Lock
+from typing import Any, Mapping, Optional
+from urllib.parse import quote, unquote, urljoin, urlparse
+
+from common_utility import ISessionProvider
+from context_logger import get_logger
+from requests import HTTPError, Response
+
+from package_downloader import (
+    ReleaseConfig,
+    SOURCE_GITHUB,
+    SOURCE_GITEA,
+    SOURCE_GITLAB,
+    SOURCE_HTTP,
+    IMetadataCache,
+    IRequestScheduler,
+    execute_scheduled,
+    IRunMetrics,
+    measure,
+    ResolvedAsset,
+    ResolvedRelease,
+    VersionConstraint,
+    parse_tag_version,
+    parse_asset_digest,
+    GITHUB_API_URL,
+)
+
+log = get_logger('ArtifactSource')
+
+SOURCE_PAGE_SIZE = 50
+OCTET_STREAM = 'application/octet-stream'
+
+
+class IArtifactSource(object):
+
+    def supports(self, config: ReleaseConfig) -> bool:
+        raise NotImplementedError()
+
+    def list_releases(self, config: ReleaseConfig) -> list[ResolvedRelease]:
+        raise NotImplementedError()
+
+    def get_release(self, config: ReleaseConfig, tag: Optional[str] = None) -> Optional[ResolvedRelease]:
+        raise NotImplementedError()
+
+    def list_assets(self, config: ReleaseConfig, release: ResolvedRelease) -> list[ResolvedAsset]:
+        raise NotImplementedError()
+
+    def get_headers(self, config: ReleaseConfig) -> dict[str, str]:
+        raise NotImplementedError()
+
+
+class ArtifactSource(IArtifactSource):
+
+    def __init__(
+        self,
+        source: str,
+        session_provider: ISessionProvider,
+        metadata_cache: Optional[IMetadataCache] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+        timeout: float = 30.0,
+    ) -> None:
+        self._source = source
+        self._session_provider = session_provider
+        self._metadata_cache = metadata_cache
+        self._request_scheduler = request_scheduler
+        self._run_metrics = run_metrics
+        self._timeout = timeout
+        self._releases: dict[str, list[ResolvedRelease]] = {}
+        self._locks: dict[str, Lock] = {}
+        self._lock = Lock()
+
+    def supports(self, config: ReleaseConfig) -> bool:
+        return config.source == self._source
+
+    def list_releases(self, config: ReleaseConfig) -> list[ResolvedRelease]:
+        key = f'{self._get_base_url(config)}|{config.full_name.lower()}'
+
+        with self._lock:
+            lock = self._locks.setdefault(key, Lock())
+
+        with lock:
+            if (releases := self._releases.get(key)) is None:
+                with measure(self._run_metrics, 'release_listing'):
+                    releases = self._releases[key] = self._load_releases(config)
+                log.info('Listed repository releases', repo=config.full_name, source=self._source,
+                         releases=len(releases))
+
+        return releases
+
+    def get_release(self, config: ReleaseConfig, tag: Optional[str] = None) -> Optional[ResolvedRelease]:
+        data = self._get_data(config, self._get_release_url(config, tag))
+        return self._parse_release(config, data) if data else None
+
+    def list_assets(self, config: ReleaseConfig, release: ResolvedRelease) -> list[ResolvedAsset]:
+        return release.assets
+
+    def get_headers(self, config: ReleaseConfig) -> dict[str, str]:
+        return {'Accept': OCTET_STREAM, **self._get_auth_headers(config.raw_token)}
+
+    def _load_releases(self, config: ReleaseConfig) -> list[ResolvedRelease]:
+        releases: list[ResolvedRelease] = []
+        page = 1
+
+        while True:
+            items = self._get_data(config, self._get_releases_url(config, page)) or []
+            releases.extend(self._parse_release(config, item) for item in items if _is_published(item))
+
+            if len(items) < SOURCE_PAGE_SIZE:
+                return releases
+
+            page += 1
+
+    def _get_data(self, config: ReleaseConfig, url: str) -> Any:
+        token = config.raw_token
+
+        def request(headers: dict[str, str]) -> tuple[Mapping[str, Any], Any]:
+            response = execute_scheduled(self._request_scheduler, token, lambda: self._send(url, token, headers))
+            return response.headers, None if response.status_code == 304 else self._parse_response(response)
+
+        try:
+            if self._metadata_cache:
+                return self._metadata_cache.fetch_json(url, request, token)
+            return request({})[1]
+        except HTTPError as error:
+            if error.response is not None and error.response.status_code == 404:
+                log.debug('Release metadata not found', url=url, source=self._source)
+                return None
+            raise error
+
+    def _send(self, url: str, token: Optional[str], headers: dict[str, str]) -> Response:
+        request_headers = {'Accept': 'application/json', **self._get_auth_headers(token), **headers}
+        response = self._session_provider.get_session().get(url, headers=request_headers, timeout=self._timeout)
+
+        if response.status_code != 304:
+            response.raise_for_status()
+
+        return response
+
+    def _parse_response(self, response: Response) -> Any:
+        return response.json()
+
+    def _get_auth_headers(self, token: Optional[str]) -> dict[str, str]:
+        return {'Authorization': f'token {token}'} if token else {}
+
+    def _get_base_url(self, config: ReleaseConfig) -> str:
+        return (config.url or '').rstrip('/')
+
+    def _get_releases_url(self, config: ReleaseConfig, page: int) -> str:
+        raise NotImplementedError()
+
+    def _get_release_url(self, config: ReleaseConfig, tag: Optional[str]) -> str:
+        raise NotImplementedError()
+
+    def _parse_release(self, config: ReleaseConfig, data: Any) -> ResolvedRelease:
+        assets = [
+            ResolvedAsset(
+                asset['name'],
+                asset.get('size') or 0,
+                self._get_asset_url(asset),
+                _get_updated_at(asset),
+                parse_asset_digest(asset.get('digest')),
+            )
+            for asset in data.get('assets') or []
+        ]
+
+        return ResolvedRelease(config.full_name, data['tag_name'], assets)
+
+    def _get_asset_url(self, asset: dict[str, Any]) -> str:
+        return str(asset['browser_download_url'])
+
+
+class GitHubSource(ArtifactSource):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        metadata_cache: Optional[IMetadataCache] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+        api_url: str = GITHUB_API_URL,
+    ) -> None:
+        super().__init__(SOURCE_GITHUB, session_provider, metadata_cache, request_scheduler, run_metrics)
+        self._api_url = api_url.rstrip('/')
+
+    def _get_base_url(self, config: ReleaseConfig) -> str:
+        return f'{self._api_url}/repos/{config.full_name}'
+
+    def _get_releases_url(self, config: ReleaseConfig, page: int) -> str:
+        return f'{self._get_base_url(config)}/releases?per_page={SOURCE_PAGE_SIZE}&page={page}'
+
+    def _get_release_url(self, config: ReleaseConfig, tag: Optional[str]) -> str:
+        release = f'tags/{quote(tag, safe="")}' if tag else 'latest'
+        return f'{self._get_base_url(config)}/releases/{release}'
+
+    def _get_asset_url(self, asset: dict[str, Any]) -> str:
+        return str(asset['url'])
+
+
+class GiteaSource(ArtifactSource):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        metadata_cache: Optional[IMetadataCache] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+    ) -> None:
+        super().__init__(SOURCE_GITEA, session_provider, metadata_cache, request_scheduler, run_metrics)
+
+    def _get_base_url(self, config: ReleaseConfig) -> str:
+        return f'{super()._get_base_url(config)}/api/v1/repos/{config.full_name}'
+
+    def _get_releases_url(self, config: ReleaseConfig, page: int) -> str:
+        return f'{self._get_base_url(config)}/releases?limit={SOURCE_PAGE_SIZE}&page={page}'
+
+    def _get_release_url(self, config: ReleaseConfig, tag: Optional[str]) -> str:
+        release = f'tags/{quote(tag, safe="")}' if tag else 'latest'
+        return f'{self._get_base_url(config)}/releases/{release}'
+
+
+class GitLabSource(ArtifactSource):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        metadata_cache: Optional[IMetadataCache] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+    ) -> None:
+        super().__init__(SOURCE_GITLAB, session_provider, metadata_cache, request_scheduler, run_metrics)
+
+    def _get_base_url(self, config: ReleaseConfig) -> str:
+        return f'{super()._get_base_url(config)}/api/v4/projects/{quote(config.full_name, safe="")}'
+
+    def _get_releases_url(self, config: ReleaseConfig, page: int) -> str:
+        return f'{self._get_base_url(config)}/releases?per_page={SOURCE_PAGE_SIZE}&page={page}'
+
+    def _get_release_url(self, config: ReleaseConfig, tag: Optional[str]) -> str:
+        release = quote(tag, safe='') if tag else 'permalink/latest'
+        return f'{self._get_base_url(config)}/releases/{release}'
+
+    def _get_auth_headers(self, token: Optional[str]) -> dict[str, str]:
+        return {'PRIVATE-TOKEN': token} if token else {}
+
+    def _parse_release(self, config: ReleaseConfig, data: Any) -> ResolvedRelease:
+        released_at = data.get('released_at') or ''
+        assets = [
+            ResolvedAsset(link['name'], 0, link.get('direct_asset_url') or link['url'], released_at)
+            for link in (data.get('assets') or {}).get('links') or []
+        ]
+
+        return ResolvedRelease(config.full_name, data['tag_name'], assets)
+
+
+class HttpIndexSource(ArtifactSource):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        metadata_cache: Optional[IMetadataCache] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+    ) -> None:
+        super().__init__(SOURCE_HTTP, session_provider, metadata_cache, request_scheduler, run_metrics)
+
+    def get_release(self, config: ReleaseConfig, tag: Optional[str] = None) -> Optional[ResolvedRelease]:
+        if (entries := self._get_data(config, self._get_index_url(config, tag))) is None:
+            return None
+
+        assets = [ResolvedAsset(name, 0, url, '') for name, url in entries if not name.endswith('/')]
+
+        if not tag and not assets and (latest := _get_latest_directory(entries)):
+            return self.get_release(config, latest)
+
+        return ResolvedRelease(config.full_name, tag or '', assets)
+
+    def list_assets(self, config: ReleaseConfig, release: ResolvedRelease) -> list[ResolvedAsset]:
+        if release.assets:
+            return release.assets
+
+        resolved = self.get_release(config, release.tag)
+
+        return resolved.assets if resolved else []
+
+    def get_headers(self, config: ReleaseConfig) -> dict[str, str]:
+        return self._get_auth_headers(config.raw_token)
+
+    def _load_releases(self, config: ReleaseConfig) -> list[ResolvedRelease]:
+        entries = self._get_data(config, self._get_index_url(config)) or []
+        return [ResolvedRelease(config.full_name, name.rstrip('/')) for name, _ in entries if name.endswith('/')]
+
+    def _parse_response(self, response: Response) -> Any:
+        parser = LinkParser()
+        parser.feed(response.text)
+        return _get_index_entries(response.url, parser.links)
+
+    def _get_auth_headers(self, token: Optional[str]) -> dict[str, str]:
+        return {'Authorization': f'Bearer {token}'} if token else {}
+
+    def _get_index_url(self, config: ReleaseConfig, tag: Optional[str] = None) -> str:
+        return f'{self._get_base_url(config)}/{quote(tag, safe="")}/' if tag else f'{self._get_base_url(config)}/'
+
+
+class LinkParser(HTMLParser):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        if tag == 'a' and (href := dict(attrs).get('href')):
+            self.links.append(href)
+
+
+class ArtifactSourceRouter(IArtifactSource):
+
+    def __init__(self, sources: list[IArtifactSource]) -> None:
+        self._sources = sources
+
+    def supports(self, config: ReleaseConfig) -> bool:
+        return any(source.supports(config) for source in self._sources)
+
+    def list_releases(self, config: ReleaseConfig) -> list[ResolvedRelease]:
+        return self._get_source(config).list_releases(config)
+
+    def get_release(self, config: ReleaseConfig, tag: Optional[str] = None) -> Optional[ResolvedRelease]:
+        return self._get_source(config).get_release(config, tag)
+
+    def list_assets(self, config: ReleaseConfig, release: ResolvedRelease) -> list[ResolvedAsset]:
+        return self._get_source(config).list_assets(config, release)
+
+    def get_headers(self, config: ReleaseConfig) -> dict[str, str]:
+        return self._get_source(config).get_headers(config)
+
+    def _get_source(self, config: ReleaseConfig) -> IArtifactSource:
+        for source in self._sources:
+            if source.supports(config):
+                return source
+
+        raise ValueError(f'No artifact source configured for {config.source} releases')
+
+
+def find_release(
+    source: IArtifactSource, config: ReleaseConfig, constraint: VersionConstraint
+) -> Optional[ResolvedRelease]:
+    releases = [
+        (version, release) for release in source.list_releases(config) if (version := parse_tag_version(release.tag))
+    ]
+
+    for version, release in sorted(releases, key=lambda item: item[0], reverse=True):
+        if constraint.matches(version):
+            log.debug('Found release matching version', repo=config.full_name, tag=release.tag,
+                      constraint=str(constraint))
+            return release
+
+    log.debug('No release matching version', repo=config.full_name, constraint=str(constraint))
+
+    return None
+
+
+def _is_published(item: dict[str, Any]) -> bool:
+    return not (item.get('draft') or item.get('prerelease') or item.get('upcoming_release'))
+
+
+def _get_updated_at(asset: dict[str, Any]) -> str:
+    return str(asset.get('updated_at') or asset.get('created_at') or '')
+
+
+def _get_latest_directory(entries: list[tuple[str, str]]) -> Optional[str]:
+    versions = [(version, name.rstrip('/')) for name, _ in entries if (version := parse_tag_version(name.rstrip('/')))]
+    return max(versions, key=lambda item: item[0])[1] if versions else None
+
+
+def _get_index_entries(index_url: str, links: list[str]) -> list[tuple[str, str]]:
+    index = urlparse(index_url)
+    entries = []
+
+    for link in links:
+        url = urljoin(index_url, link)
+        parsed = urlparse(url)
+
+        if parsed.query or parsed.netloc != index.netloc or not parsed.path.startswith(index.path):
+            continue
+
+        if name := unquote(parsed.path[len(index.path):]).lstrip('/'):
+            if '/' not in name.rstrip('/'):
+                entries.append((name, url))
+
+    return entries
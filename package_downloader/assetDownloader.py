@@ -2,62 +2,349 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
-import fnmatch
-from typing import Optional
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
 
 from common_utility import IFileDownloader
 from context_logger import get_logger
-from github.GitRelease import GitRelease
-from github.GitReleaseAsset import GitReleaseAsset
 
-from package_downloader import ReleaseConfig
+from package_downloader import (
+    ReleaseConfig,
+    IMetadataCache,
+    IPackageStore,
+    FileDigest,
+    IChecksumResolver,
+    download_verified,
+    get_streamed_digest,
+    ResolvedRelease,
+    ResolvedAsset,
+    IRequestScheduler,
+    execute_scheduled,
+    IRunMetrics,
+    measure,
+    ILanCache,
+    fetch_cached,
+    IDeltaUpdater,
+    update_delta,
+    DELTA_SUFFIX,
+    PlannedFile,
+    PLAN_CACHED,
+    PLAN_DOWNLOAD,
+    is_stored,
+)
+
+if TYPE_CHECKING:
+    from github.GitRelease import GitRelease
+    from github.GitReleaseAsset import GitReleaseAsset
 
 log = get_logger('AssetDownloader')
 
+ASSETS_PER_PAGE = 100
+
+D = TypeVar('D')
+
 
 class IAssetDownloader(object):
 
     def download(
-        self, config: ReleaseConfig, release: GitRelease, first_match_only: bool = False, skip_if_exists: bool = True
+        self,
+        config: ReleaseConfig,
+        release: GitRelease,
+        first_match_only: bool = False,
+        skip_if_exists: bool = True,
+        digest: Optional[FileDigest] = None,
     ) -> list[str]:
         raise NotImplementedError()
 
+    def download_resolved(
+        self,
+        config: ReleaseConfig,
+        release: ResolvedRelease,
+        first_match_only: bool = False,
+        skip_if_exists: bool = True,
+        digest: Optional[FileDigest] = None,
+        headers: Optional[dict[str, str]] = None,
+    ) -> list[str]:
+        raise NotImplementedError()
+
+    def plan(self, config: ReleaseConfig, release: GitRelease, first_match_only: bool = False) -> list[PlannedFile]:
+        raise NotImplementedError()
+
+    def plan_resolved(
+        self, config: ReleaseConfig, release: ResolvedRelease, first_match_only: bool = False
+    ) -> list[PlannedFile]:
+        raise NotImplementedError()
+
 
 class AssetDownloader(IAssetDownloader):
 
-    def __init__(self, file_downloader: IFileDownloader) -> None:
+    def __init__(
+        self,
+        file_downloader: IFileDownloader,
+        metadata_cache: Optional[IMetadataCache] = None,
+        package_store: Optional[IPackageStore] = None,
+        checksum_resolver: Optional[IChecksumResolver] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+        max_workers: int = 4,
+        lan_cache: Optional[ILanCache] = None,
+        delta_updater: Optional[IDeltaUpdater] = None,
+    ) -> None:
         self._file_downloader = file_downloader
+        self._metadata_cache = metadata_cache
+        self._package_store = package_store
+        self._checksum_resolver = checksum_resolver
+        self._request_scheduler = request_scheduler
+        self._run_metrics = run_metrics
+        self._max_workers = max_workers
+        self._lan_cache = lan_cache
+        self._delta_updater = delta_updater
+        self._assets: dict[str, list[GitReleaseAsset]] = {}
+        self._locks: dict[str, Lock] = {}
+        self._lock = Lock()
 
     def download(
-        self, config: ReleaseConfig, release: GitRelease, first_match_only: bool = False, skip_if_exists: bool = True
+        self,
+        config: ReleaseConfig,
+        release: GitRelease,
+        first_match_only: bool = False,
+        skip_if_exists: bool = True,
+        digest: Optional[FileDigest] = None,
     ) -> list[str]:
-        assets = release.get_assets()
+        assets = self._get_release_assets(config, release)
+        selected = config.asset_matcher.select(assets, lambda asset: asset.name, first_match_only)
+
+        if not selected:
+            log.error('No matching asset found', release=config, assets=[asset.name for asset in assets])
+            raise ValueError('No matching asset found')
 
-        log.debug('Retrieved asset list', release=config, assets=[asset.name for asset in assets])
+        token = config.raw_token
+        deltas = self._get_deltas(assets, lambda asset: asset.name, lambda asset: asset.url)
 
-        downloaded_files = []
+        return self._download_all(
+            config,
+            selected,
+            lambda asset: asset.name,
+            lambda asset: self._download_asset(
+                asset, token, skip_if_exists, digest or self._resolve_digest(asset, assets, token), deltas
+            ),
+        )
 
-        for asset in assets:
-            if fnmatch.fnmatch(asset.name, config.matcher):
-                log.info('Found matching asset', release=config, asset=asset.name)
+    def download_resolved(
+        self,
+        config: ReleaseConfig,
+        release: ResolvedRelease,
+        first_match_only: bool = False,
+        skip_if_exists: bool = True,
+        digest: Optional[FileDigest] = None,
+        headers: Optional[dict[str, str]] = None,
+    ) -> list[str]:
+        selected = config.asset_matcher.select(release.assets, lambda asset: asset.name, first_match_only)
 
-                downloaded_files.append(self._download_asset(asset, config.raw_token))
+        if not selected:
+            log.error('No matching asset found', release=config, assets=[asset.name for asset in release.assets])
+            raise ValueError('No matching asset found')
 
-                if first_match_only:
-                    break
+        deltas = self._get_deltas(release.assets, lambda asset: asset.name, lambda asset: asset.download_url)
 
-        if not downloaded_files:
-            log.error('No matching asset found', release=config, assets=[asset.name for asset in assets])
+        return self._download_all(
+            config,
+            selected,
+            lambda asset: asset.name,
+            lambda asset: self._download_resolved_asset(asset, release.assets, skip_if_exists, digest, deltas, headers),
+        )
+
+    def plan(self, config: ReleaseConfig, release: GitRelease, first_match_only: bool = False) -> list[PlannedFile]:
+        assets = self._get_release_assets(config, release)
+        selected = config.asset_matcher.select(assets, lambda asset: asset.name, first_match_only)
+
+        if not selected:
+            raise ValueError('No matching asset found')
+
+        store = self._package_store
+
+        return [
+            self._plan_file(asset.url, asset.name, asset.size, store.get_asset_key(asset) if store else None)
+            for asset in selected
+        ]
+
+    def plan_resolved(
+        self, config: ReleaseConfig, release: ResolvedRelease, first_match_only: bool = False
+    ) -> list[PlannedFile]:
+        selected = config.asset_matcher.select(release.assets, lambda asset: asset.name, first_match_only)
+
+        if not selected:
             raise ValueError('No matching asset found')
 
-        return downloaded_files
+        store = self._package_store
+
+        return [
+            self._plan_file(
+                asset.download_url,
+                asset.name,
+                asset.size or None,
+                store.create_url_key(asset.download_url, None, asset.updated_at) if store else None,
+            )
+            for asset in selected
+        ]
+
+    def _plan_file(self, url: str, file_name: str, size: Optional[int], key: Optional[str]) -> PlannedFile:
+        return PlannedFile(file_name, url, PLAN_CACHED if is_stored(self._package_store, key) else PLAN_DOWNLOAD, size)
+
+    def _get_release_assets(self, config: ReleaseConfig, release: GitRelease) -> list[GitReleaseAsset]:
+        key = release.url
+
+        with self._lock:
+            lock = self._locks.setdefault(key, Lock())
+
+        with lock:
+            if (assets := self._assets.get(key)) is None:
+                with measure(self._run_metrics, 'asset_listing'):
+                    assets = execute_scheduled(
+                        self._request_scheduler, config.raw_token, lambda: self._get_assets(release)
+                    )
+                log.debug('Retrieved asset list', release=config, assets=len(assets))
+                self._assets[key] = assets
+
+        return assets
+
+    def _download_all(
+        self, config: ReleaseConfig, assets: list[D], get_name: Callable[[D], str], download: Callable[[D], str]
+    ) -> list[str]:
+        for asset in assets:
+            log.info('Found matching asset', release=config, asset=get_name(asset))
+
+        if len(assets) == 1 or self._max_workers <= 1:
+            return [download(asset) for asset in assets]
+
+        with ThreadPoolExecutor(min(self._max_workers, len(assets)), thread_name_prefix='AssetDownloader') as executor:
+            futures = [executor.submit(copy_context().run, download, asset) for asset in assets]
+            return [future.result() for future in futures]
+
+    def _get_deltas(self, assets: list[D], get_name: Callable[[D], str], get_url: Callable[[D], str]) -> dict[str, str]:
+        if not self._delta_updater:
+            return {}
+
+        return {get_name(asset): get_url(asset) for asset in assets if get_name(asset).endswith(DELTA_SUFFIX)}
+
+    def _download_resolved_asset(
+        self,
+        asset: ResolvedAsset,
+        assets: list[ResolvedAsset],
+        skip_if_exists: bool,
+        digest: Optional[FileDigest],
+        deltas: dict[str, str],
+        headers: Optional[dict[str, str]] = None,
+    ) -> str:
+        if headers is None:
+            headers = {'Accept': 'application/octet-stream'}
+
+        asset_digest = digest or self._resolve_resolved_digest(asset, assets, headers)
+        key = None
+
+        if self._package_store and skip_if_exists:
+            key = self._package_store.create_url_key(asset.download_url, None, asset.updated_at)
+
+        with measure(self._run_metrics, 'asset_download'):
+            return self._download_file(asset.download_url, asset.name, headers, key, asset_digest, deltas)
+
+    def _get_assets(self, release: GitRelease) -> list[GitReleaseAsset]:
+        from github.GitReleaseAsset import GitReleaseAsset
+
+        if not self._metadata_cache:
+            return list(release.get_assets())
+
+        assets: list[GitReleaseAsset] = []
+        page = 1
+
+        while True:
+            url = f'{release.url}/assets?per_page={ASSETS_PER_PAGE}&page={page}'
+            items = self._metadata_cache.get_json(release.requester, url)
+            assets.extend(GitReleaseAsset(release.requester, {}, item, completed=True) for item in items)
+
+            if len(items) < ASSETS_PER_PAGE:
+                return assets
+
+            page += 1
+
+    def _resolve_digest(
+        self, asset: GitReleaseAsset, assets: list[GitReleaseAsset], token: Optional[str]
+    ) -> Optional[FileDigest]:
+        if not self._checksum_resolver:
+            return None
+
+        return self._checksum_resolver.resolve(asset, assets, token)
+
+    def _resolve_resolved_digest(
+        self, asset: ResolvedAsset, assets: list[ResolvedAsset], headers: dict[str, str]
+    ) -> Optional[FileDigest]:
+        if not self._checksum_resolver:
+            return None
+
+        digest = self._checksum_resolver.resolve_resolved(asset, assets, headers)
+
+        return digest if digest.sha256 or digest.size is not None else None
+
+    def _download_asset(
+        self,
+        asset: GitReleaseAsset,
+        token: Optional[str] = None,
+        skip_if_exists: bool = True,
+        digest: Optional[FileDigest] = None,
+        deltas: Optional[dict[str, str]] = None,
+    ) -> str:
+        key = self._package_store.get_asset_key(asset) if self._package_store and skip_if_exists else None
+
+        with measure(self._run_metrics, 'asset_download'):
+            return self._download_file(asset.url, asset.name, self._get_headers(token), key, digest, deltas or {})
+
+    def _download_file(
+        self,
+        url: str,
+        file_name: str,
+        headers: dict[str, str],
+        key: Optional[str],
+        digest: Optional[FileDigest],
+        deltas: dict[str, str],
+    ) -> str:
+        if not (self._package_store and key):
+            log.debug('Downloading asset', asset=file_name)
+
+            if file_path := update_delta(self._delta_updater, file_name, digest, deltas, headers):
+                return file_path
+
+            if digest:
+                return download_verified(self._file_downloader, digest, url, file_name, headers)
+
+            return self._file_downloader.download(url, file_name, headers)
+
+        if file_path := self._package_store.get(key, file_name):
+            log.info('Asset unchanged, skipping download', asset=file_name, file=file_path)
+            return file_path
+
+        if file_path := fetch_cached(self._lan_cache, file_name, digest):
+            return self._package_store.put(key, file_path, digest.sha256 if digest else None)
+
+        log.debug('Downloading asset', asset=file_name)
+
+        if file_path := update_delta(self._delta_updater, file_name, digest, deltas, headers, skip_if_exists=False):
+            return self._package_store.put(key, file_path, digest.sha256 if digest else None)
+
+        if digest:
+            file_path = download_verified(self._file_downloader, digest, url, file_name, headers, skip_if_exists=False)
+        else:
+            file_path = self._file_downloader.download(url, file_name, headers, skip_if_exists=False)
 
-    def _download_asset(self, asset: GitReleaseAsset, token: Optional[str] = None) -> str:
-        log.debug('Downloading asset', asset=asset.name)
+        return self._package_store.put(key, file_path, get_streamed_digest(self._file_downloader, file_path, digest))
 
+    def _get_headers(self, token: Optional[str]) -> dict[str, str]:
         headers = {'Accept': 'application/octet-stream'}
 
         if token:
             headers['Authorization'] = f'token {token}'
 
-        return self._file_downloader.download(asset.url, asset.name, headers)
+        return headers
@@ -0,0 +1,52 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import fnmatch
+import re
+from functools import lru_cache
+from typing import Callable, TypeVar
+
+A = TypeVar('A')
+
+
+class AssetMatcher(object):
+
+    def __init__(self, patterns: tuple[str, ...], architectures: tuple[str, ...] = ()) -> None:
+        self.patterns = patterns
+        self.architectures = architectures
+        self._pattern_regexes = [re.compile(fnmatch.translate(pattern)) for pattern in patterns]
+        alternatives = '|'.join(f'(?:{fnmatch.translate(pattern)})' for pattern in patterns)
+        self._regex = re.compile(f'{_get_architecture_filter(architectures)}(?:{alternatives})')
+
+    def matches(self, name: str) -> bool:
+        return self._regex.match(name) is not None
+
+    def select(self, assets: list[A], get_name: Callable[[A], str], first_match_only: bool = False) -> list[A]:
+        matched = [asset for asset in assets if self.matches(get_name(asset))]
+
+        if first_match_only and matched:
+            return [min(matched, key=lambda asset: self._get_rank(get_name(asset)))]
+
+        return matched
+
+    def _get_rank(self, name: str) -> int:
+        return next(index for index, regex in enumerate(self._pattern_regexes) if regex.match(name))
+
+    def __repr__(self) -> str:
+        architectures = f', architectures={list(self.architectures)}' if self.architectures else ''
+        return f'AssetMatcher(patterns={list(self.patterns)}{architectures})'
+
+
+@lru_cache(maxsize=None)
+def get_asset_matcher(patterns: tuple[str, ...], architectures: tuple[str, ...] = ()) -> AssetMatcher:
+    return AssetMatcher(patterns, architectures)
+
+
+def _get_architecture_filter(architectures: tuple[str, ...]) -> str:
+    if not architectures:
+        return ''
+
+    names = '|'.join(re.escape(architecture) for architecture in architectures)
+
+    return rf'(?=.*(?<![^_.-])(?:{names})(?![^_.-]))'
@@ -0,0 +1,430 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import AsyncIterator, Iterator, Mapping
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional
+from urllib.parse import quote, urlparse
+
+from context_logger import get_logger
+
+from package_downloader import (
+    PackageConfig,
+    ReleaseConfig,
+    SOURCE_GITHUB,
+    FileDigest,
+    IntegrityError,
+    StreamHasher,
+    parse_asset_digest,
+    IPackageStore,
+    IAsyncSessionProvider,
+    is_checksum_asset,
+    parse_checksums,
+    IRunMetrics,
+    increment,
+    GITHUB_API_URL,
+    IDownloadTransaction,
+    PART_SUFFIX,
+    get_staging_path,
+    promote_staged,
+    IStreamWriter,
+    StreamWriter,
+    DebianVersion,
+    VersionConstraint,
+    parse_tag_version,
+    ILocalPackageIndex,
+    ITransferShaper,
+    AsyncThrottle,
+    TransferOptions,
+    transfer_options,
+    shaped_transfer_async,
+    IRequestScheduler,
+    execute_scheduled_async,
+)
+
+if TYPE_CHECKING:
+    from aiohttp import ClientResponse
+
+log = get_logger('AsyncDebDownloader')
+
+ASYNC_ASSETS_PER_PAGE = 100
+
+
+@dataclass
+class _JsonResponse:
+    data: Any
+    headers: Mapping[str, Any]
+
+
+class IAsyncDebDownloader(object):
+
+    async def download(self, config: PackageConfig) -> Optional[str]:
+        raise NotImplementedError()
+
+    async def close(self) -> None:
+        raise NotImplementedError()
+
+
+class AsyncDebDownloader(IAsyncDebDownloader):
+
+    def __init__(
+        self,
+        session_provider: IAsyncSessionProvider,
+        download_location: str,
+        package_store: Optional[IPackageStore] = None,
+        verify: bool = True,
+        api_url: str = GITHUB_API_URL,
+        chunk_size: int = 1024 * 1024,
+        run_metrics: Optional[IRunMetrics] = None,
+        download_transaction: Optional[IDownloadTransaction] = None,
+        stream_writer: Optional[IStreamWriter] = None,
+        probe_timeout: float = 5.0,
+        local_package_index: Optional[ILocalPackageIndex] = None,
+        transfer_shaper: Optional[ITransferShaper] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+    ) -> None:
+        self._session_provider = session_provider
+        self._download_location = download_location
+        self._package_store = package_store
+        self._verify = verify
+        self._api_url = api_url.rstrip('/')
+        self._chunk_size = chunk_size
+        self._run_metrics = run_metrics
+        self._download_transaction = download_transaction
+        self._stream_writer = stream_writer or StreamWriter()
+        self._probe_timeout = probe_timeout
+        self._local_package_index = local_package_index
+        self._transfer_shaper = transfer_shaper
+        self._request_scheduler = request_scheduler
+        self._checksums: dict[int, dict[str, str]] = {}
+
+    async def download(self, config: PackageConfig) -> Optional[str]:
+        with transfer_options(TransferOptions.create(config.priority, config.rate_limit)):
+            return await self._download_package(config)
+
+    async def close(self) -> None:
+        await self._session_provider.close()
+
+    async def _download_package(self, config: PackageConfig) -> str:
+        constraint = config.version_constraint
+
+        if constraint and self._local_package_index:
+            index = self._local_package_index
+            if local_file := await asyncio.to_thread(index.find, config.package, constraint, config.asset_matcher):
+                log.info('Package version already present, skipping download',
+                         package=config.package, version=config.version, file=local_file)
+                increment(self._run_metrics, 'local_version_hits')
+                return local_file
+
+        package_file = await self._download(config, constraint)
+
+        if constraint and self._local_package_index:
+            await asyncio.to_thread(self._check_version, self._local_package_index, config, constraint, package_file)
+
+        return package_file
+
+    async def _download(self, config: PackageConfig, constraint: Optional[VersionConstraint]) -> str:
+        package_file = None
+
+        if config.file_url:
+            log.info('Downloading package file from file URL', package=config.package, url=config.file_url)
+            package_file = await self._download_file(config.file_url, config.digest, config.mirrors)
+
+        if not package_file and (release_config := config.release):
+            log.info('Downloading package file from release', package=config.package, release=release_config)
+            release = await self._get_release(release_config, constraint if not release_config.tag else None)
+            package_file = await self._download_release_asset(release_config, release, config.digest)
+
+        if not package_file:
+            log.error('No download source configured', config=config)
+            raise ValueError('No download source configured')
+
+        return package_file
+
+    def _check_version(
+        self, index: ILocalPackageIndex, config: PackageConfig, constraint: VersionConstraint, package_file: str
+    ) -> None:
+        if not (local := index.inspect(package_file)):
+            log.warning('Cannot read downloaded package version', package=config.package, file=package_file)
+            return
+
+        if not constraint.matches(local.version):
+            log.error('Downloaded package version does not match', package=config.package,
+                      expected=config.version, actual=str(local.version), file=package_file)
+            raise ValueError('Package version mismatch')
+
+    async def _download_file(self, url: str, digest: Optional[FileDigest], mirrors: list[str]) -> str:
+        if os.path.isfile(url):
+            log.info('Local file path provided, skipping download', file=url)
+            return url
+
+        file_name = os.path.basename(urlparse(url).path)
+        sources = [url, *(mirror for mirror in mirrors if mirror != url)]
+        key = await self._get_url_key(sources) if self._package_store else None
+
+        if key and self._package_store:
+            if file_path := await asyncio.to_thread(self._package_store.get, key, file_name):
+                log.info('Package file unchanged, skipping download', url=url, file=file_path)
+                return file_path
+
+        for source in sources:
+            try:
+                return await self._fetch(source, file_name, {}, digest, key)
+            except Exception as error:
+                if source == sources[-1]:
+                    raise
+                log.warning('Download source failed, switching mirror', url=source, error=error)
+                increment(self._run_metrics, 'mirror_failovers')
+
+        raise ValueError('No download source configured')
+
+    async def _get_url_key(self, sources: list[str]) -> Optional[str]:
+        for source in sources:
+            if key := await self._get_source_key(source):
+                return key
+
+        return None
+
+    async def _get_source_key(self, url: str) -> Optional[str]:
+        from aiohttp import ClientTimeout
+
+        try:
+            async with self._session_provider.get_session().head(
+                url, allow_redirects=True, timeout=ClientTimeout(total=self._probe_timeout)
+            ) as response:
+                response.raise_for_status()
+                etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except Exception as error:
+            log.warning('Failed to get file validators', url=url, error=error)
+            return None
+
+        return self._package_store.create_url_key(url, etag, last_modified) if self._package_store else None
+
+    async def _get_release(self, config: ReleaseConfig, constraint: Optional[VersionConstraint]) -> dict[str, Any]:
+        if config.source != SOURCE_GITHUB:
+            log.error('Release source not supported by the async engine', release=config)
+            raise ValueError(f'{config.source} releases are not supported by the async engine')
+
+        releases_url = f'{self._api_url}/repos/{config.full_name}/releases'
+
+        log.debug('Getting release from repository', repo=config.full_name, tag=config.tag)
+
+        if constraint:
+            release = await self._find_release(config, releases_url, constraint)
+        elif config.tag:
+            release = await self._get_json(f'{releases_url}/tags/{quote(config.tag, safe="")}', config)
+        else:
+            release = await self._get_json(f'{releases_url}/latest', config)
+
+        if not release:
+            log.error('Release not found for tag', repo=config.full_name, tag=config.tag,
+                      version=str(constraint) if constraint else None)
+            raise ValueError('Release not found')
+
+        log.info('Found release for tag', repo=config.full_name, tag=release['tag_name'])
+
+        return release
+
+    async def _find_release(
+        self, config: ReleaseConfig, releases_url: str, constraint: VersionConstraint
+    ) -> Optional[dict[str, Any]]:
+        releases: list[tuple[DebianVersion, dict[str, Any]]] = []
+        page = 1
+
+        while True:
+            items = await self._get_json(f'{releases_url}?per_page={ASYNC_ASSETS_PER_PAGE}&page={page}', config) or []
+
+            for item in items:
+                if item.get('draft') or item.get('prerelease'):
+                    continue
+                if version := parse_tag_version(item['tag_name']):
+                    releases.append((version, item))
+
+            if len(items) < ASYNC_ASSETS_PER_PAGE:
+                break
+
+            page += 1
+
+        for version, release in sorted(releases, key=lambda item: item[0], reverse=True):
+            if constraint.matches(version):
+                log.debug('Found release matching version', repo=config.full_name, tag=release['tag_name'],
+                          constraint=str(constraint))
+                return release
+
+        log.debug('No release matching version', repo=config.full_name, constraint=str(constraint))
+
+        return None
+
+    async def _get_assets(self, config: ReleaseConfig, release: dict[str, Any]) -> list[dict[str, Any]]:
+        assets: list[dict[str, Any]] = []
+        page = 1
+
+        while True:
+            url = f'{release["assets_url"]}?per_page={ASYNC_ASSETS_PER_PAGE}&page={page}'
+            items = await self._get_json(url, config)
+            assets.extend(items)
+
+            if len(items) < ASYNC_ASSETS_PER_PAGE:
+                return assets
+
+            page += 1
+
+    async def _download_release_asset(
+        self, config: ReleaseConfig, release: dict[str, Any], digest: Optional[FileDigest]
+    ) -> str:
+        assets = await self._get_assets(config, release)
+
+        log.debug('Retrieved asset list', release=config, assets=len(assets))
+
+        if not (selected := config.asset_matcher.select(assets, lambda item: item['name'], first_match_only=True)):
+            log.error('No matching asset found', release=config, assets=[asset['name'] for asset in assets])
+            raise ValueError('No matching asset found')
+
+        asset = selected[0]
+
+        log.info('Found matching asset', release=config, asset=asset['name'])
+
+        if not digest and self._verify:
+            digest = await self._resolve_digest(config, asset, assets)
+
+        key = None
+
+        if self._package_store:
+            updated_at = datetime.fromisoformat(asset['updated_at'].replace('Z', '+00:00'))
+            key = self._package_store.create_asset_key(asset['id'], asset['size'], updated_at)
+
+            if file_path := await asyncio.to_thread(self._package_store.get, key, asset['name']):
+                log.info('Asset unchanged, skipping download', asset=asset['name'], file=file_path)
+                return file_path
+
+        headers = self._get_headers(config.raw_token, 'application/octet-stream')
+
+        return await self._fetch(asset['url'], asset['name'], headers, digest, key)
+
+    async def _resolve_digest(
+        self, config: ReleaseConfig, asset: dict[str, Any], assets: list[dict[str, Any]]
+    ) -> FileDigest:
+        sha256 = parse_asset_digest(asset.get('digest'))
+
+        for sibling in assets:
+            if not sha256 and is_checksum_asset(sibling['name'], asset['name']):
+                sha256 = (await self._get_checksums(config, sibling, asset['name'])).get(asset['name'])
+
+        return FileDigest(sha256, asset['size'])
+
+    async def _get_checksums(self, config: ReleaseConfig, sibling: dict[str, Any], asset_name: str) -> dict[str, str]:
+        if (checksums := self._checksums.get(sibling['id'])) is None:
+            headers = self._get_headers(config.raw_token, 'application/octet-stream')
+
+            try:
+                async with self._session_provider.get_session().get(sibling['url'], headers=headers) as response:
+                    response.raise_for_status()
+                    checksums = parse_checksums(await response.text(), asset_name)
+            except Exception as error:
+                log.warning('Failed to get checksum file', asset=sibling['name'], error=error)
+                checksums = {}
+
+            self._checksums[sibling['id']] = checksums
+
+        return checksums
+
+    async def _get_json(self, url: str, config: ReleaseConfig) -> Any:
+        headers = self._get_headers(config.raw_token, 'application/vnd.github+json')
+
+        if not self._request_scheduler:
+            increment(self._run_metrics, 'api_calls')
+
+        response = await execute_scheduled_async(
+            self._request_scheduler, config.raw_token, lambda: self._request_json(url, headers)
+        )
+
+        return response.data
+
+    async def _request_json(self, url: str, headers: dict[str, str]) -> _JsonResponse:
+        async with self._session_provider.get_session().get(url, headers=headers) as response:
+            if response.status == 404:
+                return _JsonResponse(None, response.headers)
+
+            response.raise_for_status()
+
+            return _JsonResponse(await response.json(), response.headers)
+
+    async def _fetch(
+        self, url: str, file_name: str, headers: dict[str, str], digest: Optional[FileDigest], key: Optional[str]
+    ) -> str:
+        file_path = os.path.join(self._download_location, file_name)
+        part_path = f'{get_staging_path(self._download_transaction, file_path)}{PART_SUFFIX}'
+        hasher = StreamHasher()
+
+        log.info('Downloading file', url=url, file_name=file_name, headers=list(headers.keys()))
+
+        await asyncio.to_thread(os.makedirs, self._download_location, exist_ok=True)
+
+        session = self._session_provider.get_session()
+
+        async with shaped_transfer_async(self._transfer_shaper, url) as throttle, session.get(
+            url, headers=headers
+        ) as response:
+            response.raise_for_status()
+
+            chunks = _iter_chunks(asyncio.get_running_loop(), _shape_chunks(response, self._chunk_size, throttle))
+            await asyncio.to_thread(
+                self._stream_writer.write, chunks, part_path, size=response.content_length, hasher=hasher
+            )
+
+        if self._run_metrics:
+            self._run_metrics.add_bytes(hasher.position)
+
+        return await asyncio.to_thread(self._complete, part_path, file_path, hasher, digest, key)
+
+    def _complete(
+        self, part_path: str, file_path: str, hasher: StreamHasher, digest: Optional[FileDigest], key: Optional[str]
+    ) -> str:
+        if digest:
+            try:
+                digest.verify(hasher.position, hasher.hexdigest())
+            except IntegrityError as error:
+                log.error('Downloaded file failed verification', file=part_path, error=error)
+                os.remove(part_path)
+                raise error
+
+        promote_staged(self._download_transaction, part_path, file_path)
+
+        log.info('Downloaded file', file=file_path)
+
+        if key and self._package_store:
+            return self._package_store.put(key, file_path, hasher.hexdigest())
+
+        return file_path
+
+    def _get_headers(self, token: Optional[str], accept: str) -> dict[str, str]:
+        headers = {'Accept': accept}
+
+        if token:
+            headers['Authorization'] = f'token {token}'
+
+        return headers
+
+
+async def _shape_chunks(
+    response: ClientResponse, chunk_size: int, throttle: Optional[AsyncThrottle]
+) -> AsyncIterator[bytes]:
+    async for chunk in response.content.iter_chunked(chunk_size):
+        yield chunk
+        if throttle:
+            await throttle(len(chunk))
+
+
+def _iter_chunks(loop: asyncio.AbstractEventLoop, chunks: AsyncIterator[bytes]) -> Iterator[bytes]:
+    while (chunk := asyncio.run_coroutine_threadsafe(_next_chunk(chunks), loop).result()) is not None:
+        yield chunk
+
+
+async def _next_chunk(chunks: AsyncIterator[bytes]) -> Optional[bytes]:
+    return await anext(chunks, None)
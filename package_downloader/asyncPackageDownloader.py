@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import asyncio
+from typing import Optional
+
+from common_utility.jsonLoader import IJsonLoader
+from context_logger import get_logger
+
+from package_downloader import (
+    IAsyncDebDownloader,
+    PackageConfig,
+    IRunMetrics,
+    measure,
+    increment,
+    IPackageDownloader,
+    IPackageConfigReader,
+    IDownloadTransaction,
+)
+
+log = get_logger('AsyncPackageDownloader')
+
+
+class AsyncPackageDownloader(IPackageDownloader):
+
+    def __init__(
+        self,
+        config_path: str,
+        json_loader: IJsonLoader,
+        deb_downloader: IAsyncDebDownloader,
+        max_workers: int = 50,
+        run_metrics: Optional[IRunMetrics] = None,
+        config_reader: Optional[IPackageConfigReader] = None,
+        download_transaction: Optional[IDownloadTransaction] = None,
+    ) -> None:
+        self._config_path = config_path
+        self._json_loader = json_loader
+        self._deb_downloader = deb_downloader
+        self._max_workers = max(1, max_workers)
+        self._run_metrics = run_metrics
+        self._config_reader = config_reader
+        self._download_transaction = download_transaction
+
+    def download_packages(self) -> list[Optional[str]]:
+        return asyncio.run(self.download_packages_async())
+
+    async def download_packages_async(self) -> list[Optional[str]]:
+        if not self._download_transaction:
+            return await self._download_packages()
+
+        self._download_transaction.begin()
+
+        try:
+            results = await self._download_packages()
+        except BaseException:
+            self._download_transaction.rollback()
+            raise
+
+        return self._download_transaction.finish(results)
+
+    async def _download_packages(self) -> list[Optional[str]]:
+        if self._config_reader:
+            try:
+                return await self._download_stream(self._config_reader)
+            finally:
+                await self._deb_downloader.close()
+
+        with measure(self._run_metrics, 'config_load'):
+            config_list = self._json_loader.load_list(self._config_path, PackageConfig)
+
+        log.info(
+            'Downloading packages', packages=[config.package for config in config_list], workers=self._max_workers
+        )
+
+        semaphore = asyncio.Semaphore(self._max_workers)
+
+        try:
+            return list(await asyncio.gather(*[self._download_package(semaphore, config) for config in config_list]))
+        finally:
+            await self._deb_downloader.close()
+
+    async def _download_stream(self, config_reader: IPackageConfigReader) -> list[Optional[str]]:
+        log.info('Streaming packages', config=self._config_path, workers=self._max_workers)
+
+        results: list[Optional[str]] = []
+        pending = asyncio.Semaphore(self._max_workers * 2)
+        semaphore = asyncio.Semaphore(self._max_workers)
+        tasks: set[asyncio.Task[None]] = set()
+
+        async def download(index: int, config: PackageConfig) -> None:
+            try:
+                results[index] = await self._download_package(semaphore, config)
+            finally:
+                pending.release()
+
+        for config in config_reader.read(self._config_path):
+            await pending.acquire()
+            results.append(None)
+            task = asyncio.create_task(download(len(results) - 1, config))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        log.info('Streamed packages', config=self._config_path, packages=len(results))
+
+        return results
+
+    async def _download_package(self, semaphore: asyncio.Semaphore, config: PackageConfig) -> Optional[str]:
+        async with semaphore:
+            try:
+                log.debug('Downloading package', package=config.package)
+                with measure(self._run_metrics, 'package'):
+                    file_path = await self._deb_downloader.download(config)
+                log.debug('Downloaded package', package=config.package, file=file_path)
+                increment(self._run_metrics, 'packages_downloaded')
+                return file_path
+            except Exception as error:
+                log.error('Failed to download package', package=config.package, error=error)
+                increment(self._run_metrics, 'packages_failed')
+                return None
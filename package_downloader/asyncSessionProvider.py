@@ -0,0 +1,52 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional
+
+from context_logger import get_logger
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
+log = get_logger('AsyncSessionProvider')
+
+
+class IAsyncSessionProvider(object):
+
+    def get_session(self) -> ClientSession:
+        raise NotImplementedError()
+
+    async def close(self) -> None:
+        raise NotImplementedError()
+
+
+class AsyncSessionProvider(IAsyncSessionProvider):
+
+    def __init__(self, max_connections: int = 100, max_connections_per_host: int = 6, timeout: float = 30.0) -> None:
+        self._max_connections = max_connections
+        self._max_connections_per_host = max_connections_per_host
+        self._timeout = timeout
+        self._session: Optional[ClientSession] = None
+
+    def get_session(self) -> ClientSession:
+        from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+        if not self._session or self._session.closed:
+            log.debug(
+                'Creating HTTP session',
+                max_connections=self._max_connections,
+                max_connections_per_host=self._max_connections_per_host,
+            )
+            connector = TCPConnector(limit=self._max_connections, limit_per_host=self._max_connections_per_host)
+            timeout = ClientTimeout(sock_connect=self._timeout, sock_read=self._timeout)
+            self._session = ClientSession(connector=connector, timeout=timeout)
+
+        return self._session
+
+    async def close(self) -> None:
+        if self._session:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,140 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from common_utility import ISessionProvider
+from context_logger import get_logger
+from requests import Response
+
+from package_downloader import FileDigest, parse_asset_digest, IRequestScheduler, execute_scheduled, ResolvedAsset
+
+if TYPE_CHECKING:
+    from github.GitReleaseAsset import GitReleaseAsset
+
+log = get_logger('ChecksumResolver')
+
+SUMS_FILE_NAMES = ['sha256sums', 'sha256sums.txt']
+
+
+class IChecksumResolver(object):
+
+    def resolve(
+        self, asset: GitReleaseAsset, assets: list[GitReleaseAsset], token: Optional[str] = None
+    ) -> FileDigest:
+        raise NotImplementedError()
+
+    def resolve_resolved(
+        self, asset: ResolvedAsset, assets: list[ResolvedAsset], headers: Optional[dict[str, str]] = None
+    ) -> FileDigest:
+        raise NotImplementedError()
+
+
+class ChecksumResolver(IChecksumResolver):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        timeout: float = 30.0,
+    ) -> None:
+        self._session_provider = session_provider
+        self._request_scheduler = request_scheduler
+        self._timeout = timeout
+        self._checksums: dict[str, dict[str, str]] = {}
+        self._lock = Lock()
+
+    def resolve(
+        self, asset: GitReleaseAsset, assets: list[GitReleaseAsset], token: Optional[str] = None
+    ) -> FileDigest:
+        headers = {'Accept': 'application/octet-stream'}
+
+        if token:
+            headers['Authorization'] = f'token {token}'
+
+        siblings = [(sibling.name, sibling.url) for sibling in assets]
+        sha256 = parse_asset_digest(getattr(asset, 'digest', None)) or self._get_sibling_digest(
+            asset.name, siblings, headers, self._request_scheduler, token
+        )
+
+        log.debug('Resolved asset digest', asset=asset.name, sha256=sha256, size=asset.size)
+
+        return FileDigest(sha256, asset.size)
+
+    def resolve_resolved(
+        self, asset: ResolvedAsset, assets: list[ResolvedAsset], headers: Optional[dict[str, str]] = None
+    ) -> FileDigest:
+        siblings = [(sibling.name, sibling.download_url) for sibling in assets]
+        sha256 = asset.sha256 or self._get_sibling_digest(asset.name, siblings, headers or {}, None, None)
+
+        log.debug('Resolved asset digest', asset=asset.name, sha256=sha256, size=asset.size)
+
+        return FileDigest(sha256, asset.size or None)
+
+    def _get_sibling_digest(
+        self,
+        asset_name: str,
+        siblings: list[tuple[str, str]],
+        headers: dict[str, str],
+        request_scheduler: Optional[IRequestScheduler],
+        token: Optional[str],
+    ) -> Optional[str]:
+        for name, url in siblings:
+            if is_checksum_asset(name, asset_name):
+                checksums = self._get_checksums(name, url, asset_name, headers, request_scheduler, token)
+                if sha256 := checksums.get(asset_name):
+                    return sha256
+
+        return None
+
+    def _get_checksums(
+        self,
+        name: str,
+        url: str,
+        asset_name: str,
+        headers: dict[str, str],
+        request_scheduler: Optional[IRequestScheduler],
+        token: Optional[str],
+    ) -> dict[str, str]:
+        with self._lock:
+            if (checksums := self._checksums.get(url)) is not None:
+                return checksums
+
+        try:
+            response = execute_scheduled(request_scheduler, token, lambda: self._get_checksum_file(url, headers))
+            checksums = parse_checksums(response.text, asset_name)
+        except Exception as error:
+            log.warning('Failed to get checksum file', asset=name, error=error)
+            checksums = {}
+
+        with self._lock:
+            self._checksums[url] = checksums
+
+        return checksums
+
+    def _get_checksum_file(self, url: str, headers: dict[str, str]) -> Response:
+        response = self._session_provider.get_session().get(url, headers=headers, timeout=self._timeout)
+        response.raise_for_status()
+        return response
+
+
+def is_checksum_asset(name: str, asset_name: str) -> bool:
+    return name in [f'{asset_name}.sha256', f'{asset_name}.sha256sum'] or name.lower() in SUMS_FILE_NAMES
+
+
+def parse_checksums(content: str, asset_name: str) -> dict[str, str]:
+    checksums = {}
+
+    for line in content.splitlines():
+        fields = line.split()
+
+        if len(fields) == 1:
+            checksums[asset_name] = fields[0].lower()
+        elif len(fields) >= 2:
+            checksums[fields[-1].lstrip('*')] = fields[0].lower()
+
+    return checksums
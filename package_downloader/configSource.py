@@ -0,0 +1,90 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import os
+from typing import Optional
+from urllib.parse import urlparse
+
+from common_utility import ISessionProvider
+from context_logger import get_logger
+
+log = get_logger('ConfigSource')
+
+DEFAULT_CONFIG_FILE_NAME = 'package-config.json'
+
+
+class IConfigSource(object):
+
+    def fetch(self) -> tuple[str, bool]:
+        raise NotImplementedError()
+
+
+class ConfigSource(IConfigSource):
+
+    def __init__(
+        self, session_provider: ISessionProvider, location: str, download_dir: str, timeout: float = 30.0
+    ) -> None:
+        self._session_provider = session_provider
+        self._location = location
+        self._download_dir = download_dir
+        self._timeout = timeout
+        self._config_path: Optional[str] = None
+        self._mtime: Optional[int] = None
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+
+    def fetch(self) -> tuple[str, bool]:
+        if os.path.isfile(self._location):
+            return self._check_local_file(os.path.abspath(self._location))
+
+        try:
+            return self._download()
+        except Exception as error:
+            if not self._config_path:
+                raise
+            log.warning('Failed to fetch package config, using previous version', url=self._location, error=error)
+            return self._config_path, False
+
+    def _check_local_file(self, config_path: str) -> tuple[str, bool]:
+        mtime = os.stat(config_path).st_mtime_ns
+        changed = mtime != self._mtime
+        self._config_path, self._mtime = config_path, mtime
+
+        return config_path, changed
+
+    def _download(self) -> tuple[str, bool]:
+        headers = {}
+
+        if self._config_path and os.path.isfile(self._config_path):
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+
+        response = self._session_provider.get_session().get(self._location, headers=headers, timeout=self._timeout)
+
+        if response.status_code == 304 and self._config_path:
+            log.debug('Package config not modified', url=self._location)
+            return self._config_path, False
+
+        response.raise_for_status()
+
+        file_name = os.path.basename(urlparse(self._location).path) or DEFAULT_CONFIG_FILE_NAME
+        config_path = os.path.join(self._download_dir, file_name)
+        temp_path = f'{config_path}.tmp'
+
+        os.makedirs(self._download_dir, exist_ok=True)
+
+        with open(temp_path, 'wb') as file:
+            file.write(response.content)
+
+        os.replace(temp_path, config_path)
+
+        self._config_path = config_path
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
+
+        log.info('Package config downloaded', url=self._location, file=config_path)
+
+        return config_path, True
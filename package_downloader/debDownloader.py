@@ -2,13 +2,54 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
-from typing import Optional
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import quote, urlparse
 
 from common_utility import IFileDownloader
 from context_logger import get_logger
-from github.GitRelease import GitRelease
 
-from package_downloader import PackageConfig, IAssetDownloader, ReleaseConfig, IRepositoryProvider
+from package_downloader import (
+    PackageConfig,
+    IAssetDownloader,
+    ReleaseConfig,
+    IRepositoryProvider,
+    IMetadataCache,
+    IPackageStore,
+    FileDigest,
+    download_verified,
+    get_streamed_digest,
+    IReleaseResolver,
+    IRequestScheduler,
+    execute_scheduled,
+    IRunMetrics,
+    measure,
+    increment,
+    VersionConstraint,
+    IReleaseIndex,
+    ILocalPackageIndex,
+    TransferOptions,
+    transfer_options,
+    download_mirrored,
+    ILanCache,
+    fetch_cached,
+    PlannedPackage,
+    PlannedFile,
+    PLAN_LOCAL,
+    PLAN_CACHED,
+    PLAN_DOWNLOAD,
+    is_stored,
+    SOURCE_GITHUB,
+    ResolvedRelease,
+    IArtifactSource,
+    find_release,
+)
+
+if TYPE_CHECKING:
+    from github.GitRelease import GitRelease
+    from github.Repository import Repository
 
 log = get_logger('DebDownloader')
 
@@ -18,6 +59,9 @@ class IDebDownloader(object):
     def download(self, package: PackageConfig) -> Optional[str]:
         raise NotImplementedError()
 
+    def plan(self, package: PackageConfig) -> PlannedPackage:
+        raise NotImplementedError()
+
 
 class DebDownloader(IDebDownloader):
 
@@ -26,43 +70,260 @@ class DebDownloader(IDebDownloader):
         repository_provider: IRepositoryProvider,
         asset_downloader: IAssetDownloader,
         file_downloader: IFileDownloader,
+        metadata_cache: Optional[IMetadataCache] = None,
+        package_store: Optional[IPackageStore] = None,
+        release_resolver: Optional[IReleaseResolver] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+        release_index: Optional[IReleaseIndex] = None,
+        local_package_index: Optional[ILocalPackageIndex] = None,
+        lan_cache: Optional[ILanCache] = None,
+        artifact_source: Optional[IArtifactSource] = None,
     ):
         self._repository_provider = repository_provider
         self._asset_downloader = asset_downloader
         self._file_downloader = file_downloader
+        self._metadata_cache = metadata_cache
+        self._package_store = package_store
+        self._release_resolver = release_resolver
+        self._request_scheduler = request_scheduler
+        self._run_metrics = run_metrics
+        self._release_index = release_index
+        self._local_package_index = local_package_index
+        self._lan_cache = lan_cache
+        self._artifact_source = artifact_source
 
     def download(self, config: PackageConfig) -> Optional[str]:
+        with transfer_options(TransferOptions.create(config.priority, config.rate_limit)):
+            return self._download(config)
+
+    def plan(self, config: PackageConfig) -> PlannedPackage:
+        constraint = config.version_constraint
+
+        if constraint and self._local_package_index:
+            if local_file := self._local_package_index.find(config.package, constraint, config.asset_matcher):
+                return PlannedPackage(config.package, [_plan_local_file(local_file)])
+
+        if config.file_url:
+            return PlannedPackage(config.package, [self._plan_file_url(config.file_url, config.digest, config.mirrors)])
+
+        if release_config := config.release:
+            return PlannedPackage(config.package, self._plan_release(release_config, constraint))
+
+        raise ValueError('No download source configured')
+
+    def _download(self, config: PackageConfig) -> Optional[str]:
+        constraint = config.version_constraint
+
+        if constraint and self._local_package_index:
+            if local_file := self._local_package_index.find(config.package, constraint, config.asset_matcher):
+                log.info('Package version already present, skipping download',
+                         package=config.package, version=config.version, file=local_file)
+                increment(self._run_metrics, 'local_version_hits')
+                return local_file
+
         package_file = None
 
         if config.file_url:
-            log.info('Downloading package file from file URL', package=config.package, url=config.file_url)
-            package_file = self._file_downloader.download(config.file_url)
+            log.info('Downloading package file from file URL', package=config.package, url=config.file_url,
+                     mirrors=len(config.mirrors))
+            package_file = self._download_file_url(config)
 
         if not package_file and (release_config := config.release):
             log.info('Downloading package file from release', package=config.package, release=release_config)
-            release = self._get_release(release_config)
-            package_file = self._asset_downloader.download(release_config, release, first_match_only=True)[0]
+            package_file = self._download_release(config, release_config, constraint)
 
         if not package_file:
             log.error('No download source configured', config=config)
             raise ValueError('No download source configured')
 
+        if constraint and self._local_package_index:
+            self._check_version(self._local_package_index, config, constraint, package_file)
+
         return package_file
 
-    def _get_release(self, config: ReleaseConfig) -> GitRelease:
+    def _download_release(
+        self, config: PackageConfig, release_config: ReleaseConfig, constraint: Optional[VersionConstraint]
+    ) -> Optional[str]:
+        version_constraint = constraint if not release_config.tag else None
+        resolver = self._release_resolver if not version_constraint else None
+
+        if resolver and (resolved := resolver.get(release_config)):
+            log.debug('Using resolved release', repo=resolved.full_name, tag=resolved.tag)
+            return self._asset_downloader.download_resolved(
+                release_config, resolved, first_match_only=True, digest=config.digest
+            )[0]
+
+        if source := self._get_source(release_config):
+            resolved = self._get_source_release(source, release_config, version_constraint)
+            return self._asset_downloader.download_resolved(
+                release_config,
+                resolved,
+                first_match_only=True,
+                digest=config.digest,
+                headers=source.get_headers(release_config),
+            )[0]
+
+        release = self._get_release(release_config, version_constraint)
+
+        return self._asset_downloader.download(release_config, release, first_match_only=True, digest=config.digest)[0]
+
+    def _download_file_url(self, config: PackageConfig) -> Optional[str]:
+        url = config.file_url or ''
+
+        try:
+            with measure(self._run_metrics, 'file_download'):
+                return self._download_file(url, config.digest, config.mirrors)
+        except Exception as error:
+            if not config.release:
+                raise
+            log.warning('Failed to download package file, falling back to release',
+                        package=config.package, url=url, error=error)
+            increment(self._run_metrics, 'release_fallbacks')
+            return None
+
+    def _download_file(self, url: str, digest: Optional[FileDigest] = None, mirrors: Optional[list[str]] = None) -> str:
+        if not self._package_store or not (key := self._get_url_key(url, mirrors or [])):
+            if mirrors:
+                return download_mirrored(self._file_downloader, url, mirrors, digest=digest)
+            if digest:
+                return download_verified(self._file_downloader, digest, url)
+            return self._file_downloader.download(url)
+
+        file_name = os.path.basename(urlparse(url).path)
+
+        if file_path := self._package_store.get(key, file_name):
+            log.info('Package file unchanged, skipping download', url=url, file=file_path)
+            return file_path
+
+        if file_path := fetch_cached(self._lan_cache, file_name, digest):
+            return self._package_store.put(key, file_path, digest.sha256 if digest else None)
+
+        if mirrors:
+            file_path = download_mirrored(self._file_downloader, url, mirrors, file_name, False, digest)
+        elif digest:
+            file_path = download_verified(self._file_downloader, digest, url, file_name, skip_if_exists=False)
+        else:
+            file_path = self._file_downloader.download(url, file_name, skip_if_exists=False)
+
+        return self._package_store.put(key, file_path, get_streamed_digest(self._file_downloader, file_path, digest))
+
+    def _get_url_key(self, url: str, mirrors: list[str]) -> Optional[str]:
+        if not self._package_store:
+            return None
+
+        for source in [url, *(mirror for mirror in mirrors if mirror != url)]:
+            if key := self._package_store.get_url_key(source):
+                return key
+
+        return None
+
+    def _plan_file_url(self, url: str, digest: Optional[FileDigest], mirrors: list[str]) -> PlannedFile:
+        if os.path.isfile(url):
+            return _plan_local_file(url)
+
+        key = self._get_url_key(url, mirrors)
+        action = PLAN_CACHED if is_stored(self._package_store, key) else PLAN_DOWNLOAD
+
+        return PlannedFile(os.path.basename(urlparse(url).path), url, action, digest.size if digest else None)
+
+    def _plan_release(self, config: ReleaseConfig, constraint: Optional[VersionConstraint]) -> list[PlannedFile]:
+        version_constraint = constraint if not config.tag else None
+        resolver = self._release_resolver if not version_constraint else None
+
+        if resolver and (resolved := resolver.get(config)):
+            return self._asset_downloader.plan_resolved(config, resolved, first_match_only=True)
+
+        if source := self._get_source(config):
+            resolved = self._get_source_release(source, config, version_constraint)
+            return self._asset_downloader.plan_resolved(config, resolved, first_match_only=True)
+
+        release = self._get_release(config, version_constraint)
+
+        return self._asset_downloader.plan(config, release, first_match_only=True)
+
+    def _get_source(self, config: ReleaseConfig) -> Optional[IArtifactSource]:
+        if self._artifact_source and self._artifact_source.supports(config):
+            return self._artifact_source
+
+        if config.source != SOURCE_GITHUB:
+            log.error('No artifact source configured for release', release=config)
+            raise ValueError(f'No artifact source configured for {config.source} releases')
+
+        return None
+
+    def _get_source_release(
+        self, source: IArtifactSource, config: ReleaseConfig, constraint: Optional[VersionConstraint]
+    ) -> ResolvedRelease:
+        log.debug('Getting release from artifact source', repo=config.full_name, source=config.source, tag=config.tag)
+
+        with measure(self._run_metrics, 'release_lookup'):
+            if constraint:
+                release = find_release(source, config, constraint)
+            else:
+                release = source.get_release(config, config.tag)
+
+            if release:
+                release = ResolvedRelease(release.full_name, release.tag, source.list_assets(config, release))
+
+        if not release:
+            log.error('Release not found for tag', repo=config.full_name, tag=config.tag,
+                      version=str(constraint) if constraint else None)
+            raise ValueError('Release not found')
+
+        log.info('Found release for tag', repo=config.full_name, tag=release.tag)
+
+        return release
+
+    def _get_release(self, config: ReleaseConfig, constraint: Optional[VersionConstraint] = None) -> GitRelease:
         repository = self._repository_provider.get_repository(config)
 
         log.debug('Getting release from repository', repo=repository.full_name, tag=config.tag)
 
-        if config.tag:
-            release = repository.get_release(config.tag)
-        else:
-            release = repository.get_latest_release()
+        with measure(self._run_metrics, 'release_lookup'):
+            if constraint and self._release_index:
+                release = self._release_index.find(repository, constraint, config.raw_token)
+            else:
+                release = execute_scheduled(
+                    self._request_scheduler, config.raw_token, lambda: self._fetch_release(repository, config.tag)
+                )
 
         if not release:
-            log.error('Release not found for tag', repo=repository.full_name, tag=config.tag)
+            log.error('Release not found for tag', repo=repository.full_name, tag=config.tag,
+                      version=str(constraint) if constraint else None)
             raise ValueError('Release not found')
 
         log.info('Found release for tag', repo=repository.full_name, tag=release.tag_name)
 
         return release
+
+    def _check_version(
+        self, index: ILocalPackageIndex, config: PackageConfig, constraint: VersionConstraint, package_file: str
+    ) -> None:
+        if not (local := index.inspect(package_file)):
+            log.warning('Cannot read downloaded package version', package=config.package, file=package_file)
+            return
+
+        if not constraint.matches(local.version):
+            log.error('Downloaded package version does not match', package=config.package,
+                      expected=config.version, actual=str(local.version), file=package_file)
+            raise ValueError('Package version mismatch')
+
+    def _fetch_release(self, repository: Repository, tag: Optional[str]) -> GitRelease:
+        if self._metadata_cache:
+            return self._get_cached_release(self._metadata_cache, repository, tag)
+
+        if tag:
+            return repository.get_release(tag)
+
+        return repository.get_latest_release()
+
+    def _get_cached_release(self, cache: IMetadataCache, repository: Repository, tag: Optional[str]) -> GitRelease:
+        from github.GitRelease import GitRelease
+
+        url = f'{repository.url}/releases/tags/{quote(tag, safe="")}' if tag else f'{repository.url}/releases/latest'
+        return cache.get_object(repository.requester, GitRelease, url)
+
+
+def _plan_local_file(file_path: str) -> PlannedFile:
+    return PlannedFile(os.path.basename(file_path), file_path, PLAN_LOCAL, os.path.getsize(file_path))
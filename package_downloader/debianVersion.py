@@ -0,0 +1,145 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import operator
+import re
+from dataclasses import dataclass
+from functools import total_ordering
+from typing import Any, Callable, Optional
+
+CONSTRAINT_PATTERN = re.compile(r'^(?P<operator>>=|<=|>>|<<|==|!=|>|<|=)?\s*(?P<version>\S+)$')
+
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>>': operator.gt,
+    '<<': operator.lt,
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+    '=': operator.eq,
+    '!=': operator.ne,
+}
+
+
+@total_ordering
+@dataclass(frozen=True, eq=False)
+class DebianVersion:
+    epoch: int
+    upstream: str
+    revision: str = ''
+
+    @classmethod
+    def parse(cls, value: str) -> 'DebianVersion':
+        epoch, upstream, revision = 0, value.strip(), ''
+
+        if ':' in upstream:
+            epoch_value, upstream = upstream.split(':', 1)
+            if not epoch_value.isdigit():
+                raise ValueError(f'Invalid version epoch: {value}')
+            epoch = int(epoch_value)
+
+        if '-' in upstream:
+            upstream, revision = upstream.rsplit('-', 1)
+
+        if not upstream or not upstream[0].isdigit():
+            raise ValueError(f'Invalid version: {value}')
+
+        return cls(epoch, upstream, revision)
+
+    def without_revision(self) -> 'DebianVersion':
+        return DebianVersion(self.epoch, self.upstream)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, DebianVersion) and self._compare(other) == 0
+
+    def __lt__(self, other: 'DebianVersion') -> bool:
+        return self._compare(other) < 0
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __str__(self) -> str:
+        epoch = f'{self.epoch}:' if self.epoch else ''
+        revision = f'-{self.revision}' if self.revision else ''
+        return f'{epoch}{self.upstream}{revision}'
+
+    def _compare(self, other: 'DebianVersion') -> int:
+        if self.epoch != other.epoch:
+            return self.epoch - other.epoch
+
+        return _compare_part(self.upstream, other.upstream) or _compare_part(self.revision, other.revision)
+
+
+@dataclass(frozen=True)
+class VersionConstraint:
+    clauses: tuple[tuple[str, DebianVersion], ...]
+
+    @classmethod
+    def parse(cls, value: str) -> 'VersionConstraint':
+        clauses = []
+
+        for clause in value.split(','):
+            if not (match := CONSTRAINT_PATTERN.match(clause.strip())):
+                raise ValueError(f'Invalid version constraint: {value}')
+            clauses.append((match['operator'] or '=', DebianVersion.parse(match['version'])))
+
+        return cls(tuple(clauses))
+
+    def matches(self, version: DebianVersion) -> bool:
+        for operator_name, expected in self.clauses:
+            actual = version if expected.revision else version.without_revision()
+            if not OPERATORS[operator_name](actual, expected):
+                return False
+
+        return True
+
+    def __str__(self) -> str:
+        return ','.join(f'{operator_name}{version}' for operator_name, version in self.clauses)
+
+
+def parse_tag_version(tag: str) -> Optional[DebianVersion]:
+    if not (match := re.search(r'\d', tag)):
+        return None
+
+    try:
+        return DebianVersion.parse(tag[match.start():])
+    except ValueError:
+        return None
+
+
+def _order(character: str) -> int:
+    if character.isdigit():
+        return 0
+    if character.isascii() and character.isalpha():
+        return ord(character)
+    if character == '~':
+        return -1
+    return ord(character) + 256 if character else 0
+
+
+def _compare_part(first: str, second: str) -> int:
+    i, j = 0, 0
+
+    while i < len(first) or j < len(second):
+        while (i < len(first) and not first[i].isdigit()) or (j < len(second) and not second[j].isdigit()):
+            first_order = _order(first[i]) if i < len(first) else 0
+            second_order = _order(second[j]) if j < len(second) else 0
+            if first_order != second_order:
+                return first_order - second_order
+            i, j = i + 1, j + 1
+
+        first_end, second_end = i, j
+
+        while first_end < len(first) and first[first_end].isdigit():
+            first_end += 1
+        while second_end < len(second) and second[second_end].isdigit():
+            second_end += 1
+
+        if difference := int(first[i:first_end] or 0) - int(second[j:second_end] or 0):
+            return difference
+
+        i, j = first_end, second_end
+
+    return 0
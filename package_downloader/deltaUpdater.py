@@ -0,0 +1,282 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import bz2
+import os
+import re
+from contextlib import suppress
+from functools import lru_cache
+from io import BufferedIOBase
+from typing import Iterator, Optional
+from urllib.parse import quote
+
+from common_utility import IFileDownloader, ISessionProvider
+from context_logger import get_logger
+
+from package_downloader import (
+    FileDigest,
+    StreamHasher,
+    IRunMetrics,
+    increment,
+    IDownloadTransaction,
+    get_staging_path,
+    promote_staged,
+    DebianVersion,
+    VersionConstraint,
+    ILocalPackageIndex,
+    get_asset_matcher,
+)
+
+log = get_logger('DeltaUpdater')
+
+DELTA_SUFFIX = '.bsdiff'
+REBUILD_SUFFIX = '.rebuild'
+BSDIFF_MAGIC = b'BSDIFF40'
+BSDIFF_HEADER_SIZE = 32
+DELTA_CHUNK_SIZE = 1024 * 1024
+DEB_FILE_NAME_PATTERN = re.compile(r'^(?P<package>[^_/]+)_(?P<version>[^_/]+)_(?P<architecture>[^_/]+)\.deb$')
+
+
+class IDeltaUpdater(object):
+
+    def update(
+        self,
+        file_name: str,
+        digest: Optional[FileDigest],
+        deltas: dict[str, str],
+        headers: Optional[dict[str, str]] = None,
+        skip_if_exists: bool = True,
+    ) -> Optional[str]:
+        raise NotImplementedError()
+
+
+class DeltaUpdater(IDeltaUpdater):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        file_downloader: IFileDownloader,
+        download_dir: str,
+        local_package_index: ILocalPackageIndex,
+        delta_url: Optional[str] = None,
+        timeout: float = 5.0,
+        run_metrics: Optional[IRunMetrics] = None,
+        download_transaction: Optional[IDownloadTransaction] = None,
+    ) -> None:
+        self._session_provider = session_provider
+        self._file_downloader = file_downloader
+        self._download_dir = download_dir
+        self._local_package_index = local_package_index
+        self._delta_url = delta_url.rstrip('/') if delta_url else None
+        self._timeout = timeout
+        self._run_metrics = run_metrics
+        self._download_transaction = download_transaction
+
+    def update(
+        self,
+        file_name: str,
+        digest: Optional[FileDigest],
+        deltas: dict[str, str],
+        headers: Optional[dict[str, str]] = None,
+        skip_if_exists: bool = True,
+    ) -> Optional[str]:
+        file_path = os.path.join(self._download_dir, file_name)
+
+        if not digest or not digest.sha256 or (skip_if_exists and os.path.exists(file_path)):
+            return None
+
+        if not (target := DEB_FILE_NAME_PATTERN.match(file_name)) or not (base := self._find_base(target)):
+            return None
+
+        base_path, base_version = base
+        delta_name = f'{target["package"]}_{base_version}_{target["version"]}_{target["architecture"]}{DELTA_SUFFIX}'
+
+        for url, delta_headers in self._get_sources(delta_name, deltas, headers):
+            if self._apply(url, delta_headers, delta_name, base_path, file_path, digest):
+                return file_path
+
+        return None
+
+    def _find_base(self, target: re.Match[str]) -> Optional[tuple[str, str]]:
+        try:
+            constraint = VersionConstraint((('<<', DebianVersion.parse(target['version'])),))
+        except ValueError:
+            return None
+
+        matcher = get_asset_matcher(('*.deb',), (target['architecture'],))
+
+        if not (base_path := self._local_package_index.find(target['package'], constraint, matcher)):
+            return None
+
+        base = DEB_FILE_NAME_PATTERN.match(os.path.basename(base_path))
+
+        if not base or base['architecture'] != target['architecture']:
+            return None
+
+        return base_path, base['version']
+
+    def _get_sources(
+        self, delta_name: str, deltas: dict[str, str], headers: Optional[dict[str, str]]
+    ) -> Iterator[tuple[str, Optional[dict[str, str]]]]:
+        if url := deltas.get(delta_name):
+            yield url, headers
+
+        if self._delta_url and self._is_available(server_url := f'{self._delta_url}/{quote(delta_name)}'):
+            yield server_url, None
+
+    def _is_available(self, url: str) -> bool:
+        try:
+            response = self._session_provider.get_session().head(url, timeout=self._timeout, allow_redirects=True)
+        except Exception as error:
+            log.debug('Delta server unavailable', url=url, error=error)
+            return False
+
+        return bool(response.status_code == 200)
+
+    def _apply(
+        self,
+        url: str,
+        headers: Optional[dict[str, str]],
+        delta_name: str,
+        base_path: str,
+        file_path: str,
+        digest: FileDigest,
+    ) -> bool:
+        try:
+            delta_path = self._file_downloader.download(url, delta_name, headers, skip_if_exists=False)
+        except Exception as error:
+            log.warning('Failed to download delta', url=url, error=error)
+            return False
+
+        rebuild_path = f'{get_staging_path(self._download_transaction, file_path)}{REBUILD_SUFFIX}'
+        hasher = StreamHasher()
+
+        try:
+            apply_bsdiff(base_path, delta_path, rebuild_path, hasher)
+            digest.verify(hasher.position, hasher.hexdigest())
+            delta_size = os.path.getsize(delta_path)
+        except Exception as error:
+            log.warning('Failed to rebuild file from delta, downloading full file', delta=delta_name, error=error)
+            increment(self._run_metrics, 'delta_failures')
+            with suppress(FileNotFoundError):
+                os.remove(rebuild_path)
+            return False
+        finally:
+            with suppress(FileNotFoundError):
+                os.remove(delta_path)
+
+        promote_staged(self._download_transaction, rebuild_path, file_path)
+
+        log.info('Rebuilt file from delta', file=file_path, base=base_path, delta_size=delta_size,
+                 size=hasher.position)
+        increment(self._run_metrics, 'delta_updates')
+        increment(self._run_metrics, 'delta_bytes_saved', max(0, hasher.position - delta_size))
+
+        return True
+
+
+def update_delta(
+    delta_updater: Optional[IDeltaUpdater],
+    file_name: str,
+    digest: Optional[FileDigest],
+    deltas: dict[str, str],
+    headers: Optional[dict[str, str]] = None,
+    skip_if_exists: bool = True,
+) -> Optional[str]:
+    return delta_updater.update(file_name, digest, deltas, headers, skip_if_exists) if delta_updater else None
+
+
+def apply_bsdiff(base_path: str, delta_path: str, target_path: str, hasher: Optional[StreamHasher] = None) -> int:
+    with open(delta_path, 'rb') as delta:
+        header = delta.read(BSDIFF_HEADER_SIZE)
+
+        if len(header) != BSDIFF_HEADER_SIZE or not header.startswith(BSDIFF_MAGIC):
+            raise ValueError('Not a BSDIFF40 delta')
+
+        control_size, diff_size, target_size = (_read_offset(header, offset) for offset in (8, 16, 24))
+
+        if min(control_size, diff_size, target_size) < 0:
+            raise ValueError('Corrupt delta header')
+
+        control = bz2.decompress(_read_exact(delta, control_size))
+
+    with open(delta_path, 'rb') as diff_file, open(delta_path, 'rb') as extra_file, open(base_path, 'rb') as base, \
+            open(target_path, 'wb') as target:
+        diff_file.seek(BSDIFF_HEADER_SIZE + control_size)
+        extra_file.seek(BSDIFF_HEADER_SIZE + control_size + diff_size)
+        diff, extra = bz2.BZ2File(diff_file), bz2.BZ2File(extra_file)
+        target_position, base_position = 0, 0
+
+        for offset in range(0, len(control) - len(control) % 24, 24):
+            add_size, copy_size, seek = (_read_offset(control, offset + field) for field in (0, 8, 16))
+
+            if add_size < 0 or copy_size < 0 or target_position + add_size + copy_size > target_size:
+                raise ValueError('Corrupt delta control block')
+
+            _add_block(diff, base, base_position, add_size, target, hasher)
+            _copy_block(extra, copy_size, target, hasher)
+            target_position += add_size + copy_size
+            base_position += add_size + seek
+
+        if target_position != target_size:
+            raise ValueError(f'Delta produced {target_position} of {target_size} bytes')
+
+    return target_size
+
+
+def _add_block(
+    diff: BufferedIOBase,
+    base: BufferedIOBase,
+    position: int,
+    size: int,
+    target: BufferedIOBase,
+    hasher: Optional[StreamHasher],
+) -> None:
+    base_size = os.fstat(base.fileno()).st_size
+
+    for start in range(0, size, DELTA_CHUNK_SIZE):
+        length = min(DELTA_CHUNK_SIZE, size - start)
+        first, last = position + start, position + start + length
+        base.seek(max(0, min(first, base_size)))
+        padding = max(0, min(last, 0) - first)
+        data = bytes(padding) + base.read(max(0, min(last, base_size) - max(first, 0)))
+        chunk = _add_bytes(_read_exact(diff, length), data.ljust(length, b'\0'))
+        _write(target, chunk, hasher)
+
+
+def _copy_block(extra: BufferedIOBase, size: int, target: BufferedIOBase, hasher: Optional[StreamHasher]) -> None:
+    for start in range(0, size, DELTA_CHUNK_SIZE):
+        _write(target, _read_exact(extra, min(DELTA_CHUNK_SIZE, size - start)), hasher)
+
+
+def _write(target: BufferedIOBase, chunk: bytes, hasher: Optional[StreamHasher]) -> None:
+    target.write(chunk)
+
+    if hasher:
+        hasher.update(chunk)
+
+
+def _add_bytes(first: bytes, second: bytes) -> bytes:
+    even, odd = _get_lane_masks(len(first))
+    first_value, second_value = int.from_bytes(first, 'little'), int.from_bytes(second, 'little')
+    result = ((first_value & even) + (second_value & even)) & even | ((first_value & odd) + (second_value & odd)) & odd
+    return result.to_bytes(len(first), 'little')
+
+
+@lru_cache(maxsize=4)
+def _get_lane_masks(size: int) -> tuple[int, int]:
+    even = int.from_bytes(b'\xff\x00' * (size // 2 + 1), 'little') & ((1 << size * 8) - 1)
+    return even, (even << 8) & ((1 << size * 8) - 1)
+
+
+def _read_exact(stream: BufferedIOBase, size: int) -> bytes:
+    if len(data := stream.read(size)) != size:
+        raise ValueError('Truncated delta')
+
+    return data
+
+
+def _read_offset(data: bytes, offset: int) -> int:
+    value = int.from_bytes(data[offset:offset + 8], 'little')
+    return -(value & ~(1 << 63)) if value & (1 << 63) else value
@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass, field, asdict
+from typing import Any, Optional
+
+from package_downloader import IPackageStore
+
+PLAN_DOWNLOAD = 'download'
+PLAN_CACHED = 'cached'
+PLAN_LOCAL = 'local'
+PLAN_FAILED = 'failed'
+
+
+@dataclass
+class PlannedFile:
+    file_name: str
+    url: str
+    action: str
+    size: Optional[int] = None
+
+
+@dataclass
+class PlannedPackage:
+    package: str
+    files: list[PlannedFile] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def action(self) -> str:
+        if self.error:
+            return PLAN_FAILED
+
+        actions = {planned.action for planned in self.files}
+
+        if PLAN_DOWNLOAD in actions:
+            return PLAN_DOWNLOAD
+
+        return PLAN_CACHED if PLAN_CACHED in actions else PLAN_LOCAL
+
+    def get_downloads(self) -> list[PlannedFile]:
+        return [planned for planned in self.files if planned.action == PLAN_DOWNLOAD]
+
+
+@dataclass
+class DownloadPlan:
+    packages: list[PlannedPackage]
+    api_calls: Optional[int] = None
+    duration: float = 0.0
+
+    def get_summary(self) -> dict[str, Any]:
+        downloads = [planned for package in self.packages for planned in package.get_downloads()]
+        actions = [package.action for package in self.packages]
+
+        return {
+            'packages': len(self.packages),
+            **{action: actions.count(action) for action in (PLAN_DOWNLOAD, PLAN_CACHED, PLAN_LOCAL, PLAN_FAILED)},
+            'download_files': len(downloads),
+            'download_bytes': sum(planned.size or 0 for planned in downloads),
+            'unknown_sizes': len([planned for planned in downloads if planned.size is None]),
+            'api_calls': self.api_calls,
+            'duration': self.duration,
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'summary': self.get_summary(),
+            'packages': [dict(asdict(package), action=package.action) for package in self.packages],
+        }
+
+
+def is_stored(package_store: Optional[IPackageStore], key: Optional[str]) -> bool:
+    if not package_store or not key or not (digest := package_store.get_digest(key)):
+        return False
+
+    return package_store.get_blob(digest) is not None
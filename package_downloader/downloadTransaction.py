@@ -0,0 +1,313 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import shutil
+from contextlib import suppress
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Any, Callable, Optional
+from uuid import uuid4
+
+from context_logger import get_logger
+
+from package_downloader import IRunMetrics, increment, copy_file
+
+log = get_logger('DownloadTransaction')
+
+STAGING_DIR_NAME = '.staging'
+BACKUP_DIR_NAME = 'backup'
+JOURNAL_FILE_NAME = 'journal.json'
+MANIFEST_FILE_NAME = '.manifest.json'
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    size: int
+    mtime_ns: int
+
+    @staticmethod
+    def create(file_path: str) -> 'ManifestEntry':
+        stat = os.stat(file_path)
+        return ManifestEntry(stat.st_size, stat.st_mtime_ns)
+
+    def matches(self, file_path: str) -> bool:
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return False
+
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+
+class IDownloadTransaction(object):
+
+    def begin(self) -> None:
+        raise NotImplementedError()
+
+    def get_staging_path(self, file_path: str) -> str:
+        raise NotImplementedError()
+
+    def promote(self, staged_path: str, file_path: str) -> None:
+        raise NotImplementedError()
+
+    def is_complete(self, file_path: str) -> bool:
+        raise NotImplementedError()
+
+    def finish(self, results: list[Optional[str]]) -> list[Optional[str]]:
+        raise NotImplementedError()
+
+    def commit(self, file_paths: list[str]) -> None:
+        raise NotImplementedError()
+
+    def rollback(self) -> list[str]:
+        raise NotImplementedError()
+
+    def is_rolled_back(self) -> bool:
+        raise NotImplementedError()
+
+
+class DownloadTransaction(IDownloadTransaction):
+
+    def __init__(
+        self, download_dir: str, atomic: bool = False, run_metrics: Optional[IRunMetrics] = None
+    ) -> None:
+        self._download_dir = os.path.abspath(download_dir)
+        self._atomic = atomic
+        self._run_metrics = run_metrics
+        self._staging_dir = os.path.join(self._download_dir, STAGING_DIR_NAME)
+        self._backup_dir = os.path.join(self._staging_dir, BACKUP_DIR_NAME)
+        self._journal_path = os.path.join(self._staging_dir, JOURNAL_FILE_NAME)
+        self._manifest_path = os.path.join(self._download_dir, MANIFEST_FILE_NAME)
+        self._lock = Lock()
+        self._transaction_id: Optional[str] = None
+        self._journal: Optional[dict[str, bool]] = None
+        self._rolled_back = False
+        self._manifest = self._recover()
+
+    def begin(self) -> None:
+        with self._lock:
+            self._transaction_id = uuid4().hex
+            self._journal = {}
+            self._rolled_back = False
+
+        log.debug('Started download transaction', id=self._transaction_id)
+
+    def get_staging_path(self, file_path: str) -> str:
+        os.makedirs(self._staging_dir, exist_ok=True)
+        return os.path.join(self._staging_dir, os.path.basename(file_path))
+
+    def promote(self, staged_path: str, file_path: str) -> None:
+        _sync(staged_path)
+        name = self._get_name(file_path)
+
+        with self._lock:
+            if name and self._journal is not None and name not in self._journal:
+                self._journal[name] = self._back_up(name)
+                self._save_journal()
+
+            os.replace(staged_path, file_path)
+
+        _sync(os.path.dirname(os.path.abspath(file_path)))
+
+    def is_complete(self, file_path: str) -> bool:
+        if not (name := self._get_name(file_path)):
+            return os.path.exists(file_path)
+
+        with self._lock:
+            if self._journal and name in self._journal:
+                return os.path.isfile(file_path)
+
+            entry = self._manifest.get(name)
+
+        return bool(entry and entry.matches(file_path))
+
+    def finish(self, results: list[Optional[str]]) -> list[Optional[str]]:
+        failed = len([result for result in results if not result])
+
+        if failed and self._atomic:
+            log.error('Package downloads failed, rolling back download transaction', failed=failed)
+            rolled_back = set(self.rollback())
+            return [None if result and os.path.abspath(result) in rolled_back else result for result in results]
+
+        self.commit([result for result in results if result])
+
+        return results
+
+    def commit(self, file_paths: list[str]) -> None:
+        manifest = {}
+
+        for file_path in file_paths:
+            if (name := self._get_name(file_path)) and os.path.isfile(file_path):
+                manifest[name] = ManifestEntry.create(file_path)
+
+        with self._lock:
+            _write_json(self._manifest_path, {
+                'transaction': self._transaction_id,
+                'files': {name: asdict(entry) for name, entry in manifest.items()},
+            })
+            self._manifest = manifest
+            self._journal = None
+            self._clear_journal()
+
+        log.info('Committed download transaction', id=self._transaction_id, files=len(manifest))
+        increment(self._run_metrics, 'transactions_committed')
+
+    def rollback(self) -> list[str]:
+        with self._lock:
+            journal, self._journal = self._journal or {}, None
+            self._restore(journal)
+            self._clear_journal()
+            self._rolled_back = True
+
+        log.warning('Rolled back download transaction', id=self._transaction_id, files=list(journal))
+        increment(self._run_metrics, 'transactions_rolled_back')
+
+        return [os.path.join(self._download_dir, name) for name in journal]
+
+    def is_rolled_back(self) -> bool:
+        return self._rolled_back
+
+    def _recover(self) -> dict[str, ManifestEntry]:
+        transaction_id, manifest = self._load_manifest()
+
+        if journal := _read_json(self._journal_path):
+            if journal.get('id') == transaction_id:
+                log.info('Completing committed download transaction', id=transaction_id)
+            else:
+                log.warning('Rolling back interrupted download transaction', id=journal.get('id'),
+                            files=list(journal.get('files', {})))
+                self._restore(journal.get('files', {}))
+
+            self._clear_journal()
+            increment(self._run_metrics, 'transactions_recovered')
+
+        valid = {name: entry for name, entry in manifest.items() if entry.matches(self._get_path(name))}
+
+        if len(valid) < len(manifest):
+            log.warning('Files changed since last commit', files=sorted(set(manifest) - set(valid)))
+
+        return valid
+
+    def _load_manifest(self) -> tuple[Optional[str], dict[str, ManifestEntry]]:
+        try:
+            data = _read_json(self._manifest_path) or {}
+            files = {name: ManifestEntry(**entry) for name, entry in data.get('files', {}).items()}
+            return data.get('transaction'), files
+        except Exception as error:
+            log.warning('Failed to load download manifest, starting with empty manifest', error=error)
+            return None, {}
+
+    def _save_journal(self) -> None:
+        _write_json(self._journal_path, {'id': self._transaction_id, 'files': self._journal})
+
+    def _clear_journal(self) -> None:
+        with suppress(FileNotFoundError):
+            os.remove(self._journal_path)
+
+        shutil.rmtree(self._backup_dir, ignore_errors=True)
+
+    def _back_up(self, name: str) -> bool:
+        if not os.path.isfile(file_path := self._get_path(name)):
+            return False
+
+        os.makedirs(self._backup_dir, exist_ok=True)
+        backup_path = os.path.join(self._backup_dir, name)
+
+        with suppress(FileNotFoundError):
+            os.remove(backup_path)
+
+        try:
+            os.link(file_path, backup_path)
+        except OSError:
+            copy_file(file_path, backup_path)
+
+        return True
+
+    def _restore(self, files: dict[str, bool]) -> None:
+        for name, backed_up in files.items():
+            file_path = self._get_path(name)
+
+            if backed_up and os.path.isfile(backup_path := os.path.join(self._backup_dir, name)):
+                os.replace(backup_path, file_path)
+            else:
+                with suppress(FileNotFoundError):
+                    os.remove(file_path)
+
+        _sync(self._download_dir)
+
+    def _get_name(self, file_path: str) -> Optional[str]:
+        directory, name = os.path.split(os.path.abspath(file_path))
+        return name if directory == self._download_dir else None
+
+    def _get_path(self, name: str) -> str:
+        return os.path.join(self._download_dir, name)
+
+
+def run_atomically(
+    download_transaction: Optional[IDownloadTransaction], download: Callable[[], list[Optional[str]]]
+) -> list[Optional[str]]:
+    if not download_transaction:
+        return download()
+
+    download_transaction.begin()
+
+    try:
+        results = download()
+    except BaseException:
+        download_transaction.rollback()
+        raise
+
+    return download_transaction.finish(results)
+
+
+def get_staging_path(download_transaction: Optional[IDownloadTransaction], file_path: str) -> str:
+    return download_transaction.get_staging_path(file_path) if download_transaction else file_path
+
+
+def promote_staged(download_transaction: Optional[IDownloadTransaction], staged_path: str, file_path: str) -> None:
+    if download_transaction:
+        download_transaction.promote(staged_path, file_path)
+    else:
+        os.replace(staged_path, file_path)
+
+
+def is_downloaded(download_transaction: Optional[IDownloadTransaction], file_path: str) -> bool:
+    return download_transaction.is_complete(file_path) if download_transaction else os.path.exists(file_path)
+
+
+def _read_json(path: str) -> Any:
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path: str, data: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.tmp'
+
+    with open(temp_path, 'w') as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temp_path, path)
+    _sync(os.path.dirname(path))
+
+
+def _sync(path: str) -> None:
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
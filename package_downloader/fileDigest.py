@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Optional, Union
+
+from common_utility import IFileDownloader
+from context_logger import get_logger
+
+log = get_logger('FileDigest')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+SHA256_DIGEST_PREFIX = 'sha256:'
+
+
+class IntegrityError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class FileDigest:
+    sha256: Optional[str] = None
+    size: Optional[int] = None
+
+    def verify(self, size: int, sha256: Optional[str] = None) -> None:
+        if self.size is not None and size != self.size:
+            raise IntegrityError(f'Size mismatch, expected {self.size} bytes, got {size} bytes')
+
+        if self.sha256 and sha256 and sha256.lower() != self.sha256.lower():
+            raise IntegrityError(f'SHA256 mismatch, expected {self.sha256}, got {sha256}')
+
+
+class StreamHasher(object):
+
+    def __init__(self) -> None:
+        self._sha256 = hashlib.sha256()
+        self._position = 0
+
+    @property
+    def position(self) -> int:
+        return self._position
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+    def update(self, chunk: Union[bytes, memoryview]) -> None:
+        self._sha256.update(chunk)
+        self._position += len(chunk)
+
+    def reset(self) -> None:
+        self._sha256 = hashlib.sha256()
+        self._position = 0
+
+    def catch_up(self, file_path: str) -> None:
+        if not os.path.exists(file_path) or os.path.getsize(file_path) <= self._position:
+            return
+
+        with open(file_path, 'rb') as file:
+            file.seek(self._position)
+            while chunk := file.read(HASH_CHUNK_SIZE):
+                self.update(chunk)
+
+
+class IVerifyingFileDownloader(IFileDownloader):
+
+    def download(
+        self,
+        url: str,
+        file_name: Optional[str] = None,
+        headers: Optional[dict[str, str]] = None,
+        skip_if_exists: bool = True,
+        chunk_size: int = 1024 * 1024,
+        digest: Optional[FileDigest] = None,
+        mirrors: Optional[list[str]] = None,
+    ) -> str:
+        raise NotImplementedError()
+
+    def get_digest(self, file_path: str) -> Optional[str]:
+        raise NotImplementedError()
+
+
+def parse_asset_digest(digest: Any) -> Optional[str]:
+    if isinstance(digest, str) and digest.startswith(SHA256_DIGEST_PREFIX):
+        return digest[len(SHA256_DIGEST_PREFIX):].lower()
+
+    return None
+
+
+def hash_file(file_path: str) -> str:
+    hasher = StreamHasher()
+    hasher.catch_up(file_path)
+    return hasher.hexdigest()
+
+
+def get_streamed_digest(
+    file_downloader: IFileDownloader, file_path: str, digest: Optional[FileDigest] = None
+) -> Optional[str]:
+    if digest and digest.sha256:
+        return digest.sha256
+
+    if isinstance(file_downloader, IVerifyingFileDownloader):
+        return file_downloader.get_digest(file_path)
+
+    return None
+
+
+def download_verified(
+    file_downloader: IFileDownloader,
+    digest: FileDigest,
+    url: str,
+    file_name: Optional[str] = None,
+    headers: Optional[dict[str, str]] = None,
+    skip_if_exists: bool = True,
+) -> str:
+    if isinstance(file_downloader, IVerifyingFileDownloader):
+        return file_downloader.download(url, file_name, headers, skip_if_exists=skip_if_exists, digest=digest)
+
+    file_path = file_downloader.download(url, file_name, headers, skip_if_exists=skip_if_exists)
+
+    log.debug('File downloader does not verify while streaming, verifying downloaded file', file=file_path)
+
+    try:
+        digest.verify(os.path.getsize(file_path), hash_file(file_path) if digest.sha256 else None)
+    except IntegrityError as error:
+        log.error('Downloaded file failed verification', file=file_path, error=error)
+        os.remove(file_path)
+        raise error
+
+    return file_path
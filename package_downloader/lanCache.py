@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import time
+from threading import Lock
+from typing import Optional
+
+from common_utility import IFileDownloader, ISessionProvider
+from context_logger import get_logger
+
+from package_downloader import FileDigest, download_verified, IRunMetrics, increment
+
+log = get_logger('LanCache')
+
+SHA256_PATH = '/sha256/'
+SHA256_HEADER = 'X-Content-SHA256'
+
+
+class ILanCache(object):
+
+    def fetch(self, file_name: str, digest: Optional[FileDigest] = None) -> Optional[str]:
+        raise NotImplementedError()
+
+
+class LanCache(ILanCache):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        file_downloader: IFileDownloader,
+        peer_url: str,
+        timeout: float = 2.0,
+        retry_interval: float = 60.0,
+        run_metrics: Optional[IRunMetrics] = None,
+    ) -> None:
+        self._session_provider = session_provider
+        self._file_downloader = file_downloader
+        self._peer_url = peer_url.rstrip('/')
+        self._timeout = timeout
+        self._retry_interval = retry_interval
+        self._run_metrics = run_metrics
+        self._unavailable_until = 0.0
+        self._lock = Lock()
+
+    def fetch(self, file_name: str, digest: Optional[FileDigest] = None) -> Optional[str]:
+        if not (digest and digest.sha256):
+            log.debug('No trusted digest available, skipping LAN cache', file=file_name)
+            return None
+
+        if time.monotonic() < self._unavailable_until:
+            return None
+
+        trusted = FileDigest(digest.sha256.lower(), digest.size)
+        url = f'{self._peer_url}{SHA256_PATH}{trusted.sha256}'
+
+        if not self._lookup(url):
+            increment(self._run_metrics, 'lan_cache_misses')
+            return None
+
+        try:
+            file_path = download_verified(self._file_downloader, trusted, url, file_name, skip_if_exists=False)
+        except Exception as error:
+            log.warning('Failed to download from LAN cache, using upstream', url=url, error=error)
+            increment(self._run_metrics, 'lan_cache_misses')
+            return None
+
+        log.info('Downloaded from LAN cache', file=file_path, peer=self._peer_url)
+        increment(self._run_metrics, 'lan_cache_hits')
+
+        return file_path
+
+    def _lookup(self, url: str) -> bool:
+        try:
+            response = self._session_provider.get_session().head(url, timeout=self._timeout)
+        except Exception as error:
+            log.warning('LAN cache unavailable, using upstream', peer=self._peer_url, error=error,
+                        retry_in=self._retry_interval)
+            with self._lock:
+                self._unavailable_until = time.monotonic() + self._retry_interval
+            return False
+
+        if response.status_code != 200:
+            log.debug('Artifact not in LAN cache', url=url, status=response.status_code)
+            return False
+
+        return True
+
+
+def fetch_cached(
+    lan_cache: Optional[ILanCache], file_name: str, digest: Optional[FileDigest] = None
+) -> Optional[str]:
+    return lan_cache.fetch(file_name, digest) if lan_cache else None
@@ -0,0 +1,95 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import os
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Any, Optional
+
+from context_logger import get_logger
+
+from package_downloader import IPackageStore, IRunMetrics, increment, SHA256_PATH, SHA256_HEADER
+
+log = get_logger('LanCacheServer')
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class LanCacheServer(object):
+
+    def __init__(
+        self,
+        package_store: IPackageStore,
+        host: str = '0.0.0.0',
+        port: int = 8081,
+        run_metrics: Optional[IRunMetrics] = None,
+    ) -> None:
+        self._server = LanCacheHTTPServer((host, port), package_store, run_metrics)
+        self._thread = Thread(target=self._server.serve_forever, name='LanCacheServer', daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host!s}:{port}'
+
+    def start(self) -> None:
+        self._thread.start()
+        log.info('LAN cache server started', url=self.url)
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class LanCacheRequestHandler(BaseHTTPRequestHandler):
+    server: 'LanCacheHTTPServer'
+
+    def do_HEAD(self) -> None:
+        self._send_blob(send_body=False)
+
+    def do_GET(self) -> None:
+        self._send_blob(send_body=True)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        log.debug('LAN cache request', request=format % args)
+
+    def _send_blob(self, send_body: bool) -> None:
+        digest = self._get_digest(self.path.split('?', 1)[0])
+        blob_path = self.server.package_store.get_blob(digest) if digest else None
+
+        if not digest or not blob_path:
+            increment(self.server.run_metrics, 'lan_cache_served_misses')
+            self.send_error(404)
+            return
+
+        with open(blob_path, 'rb') as file:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(os.fstat(file.fileno()).st_size))
+            self.send_header(SHA256_HEADER, digest)
+            self.end_headers()
+
+            if send_body:
+                self.connection.sendfile(file)
+                increment(self.server.run_metrics, 'lan_cache_served')
+
+    def _get_digest(self, path: str) -> Optional[str]:
+        if not path.startswith(SHA256_PATH):
+            return None
+
+        digest = path[len(SHA256_PATH):].lower()
+
+        return digest if SHA256_PATTERN.match(digest) else None
+
+
+class LanCacheHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, address: tuple[str, int], package_store: IPackageStore, run_metrics: Optional[IRunMetrics]
+    ) -> None:
+        super().__init__(address, LanCacheRequestHandler)
+        self.package_store = package_store
+        self.run_metrics = run_metrics
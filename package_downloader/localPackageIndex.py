@@ -0,0 +1,163 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import io
+import os
+import re
+import tarfile
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional
+
+from context_logger import get_logger
+
+from package_downloader import DebianVersion, VersionConstraint, AssetMatcher
+
+log = get_logger('LocalPackageIndex')
+
+AR_MAGIC = b'!<arch>\n'
+AR_HEADER_SIZE = 60
+CONTROL_MEMBERS = ['./control', 'control']
+ARCHITECTURE_ALL = 'all'
+
+
+@dataclass(frozen=True)
+class LocalPackage:
+    path: str
+    package: str
+    version: DebianVersion
+    architecture: str = ''
+
+    @property
+    def file_name(self) -> str:
+        version = DebianVersion(0, self.version.upstream, self.version.revision)
+        return f'{self.package}_{version}_{self.architecture}.deb'
+
+
+class ILocalPackageIndex(object):
+
+    def find(
+        self, package: str, constraint: VersionConstraint, matcher: Optional[AssetMatcher] = None
+    ) -> Optional[str]:
+        raise NotImplementedError()
+
+    def inspect(self, file_path: str) -> Optional[LocalPackage]:
+        raise NotImplementedError()
+
+
+class LocalPackageIndex(ILocalPackageIndex):
+
+    def __init__(self, download_dir: str) -> None:
+        self._download_dir = download_dir
+        self._entries: dict[str, tuple[int, int, Optional[LocalPackage]]] = {}
+        self._lock = Lock()
+
+    def find(
+        self, package: str, constraint: VersionConstraint, matcher: Optional[AssetMatcher] = None
+    ) -> Optional[str]:
+        if not os.path.isdir(self._download_dir):
+            return None
+
+        best: Optional[LocalPackage] = None
+
+        with os.scandir(self._download_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.deb') or not entry.is_file():
+                    continue
+                local = self.inspect(entry.path)
+                if local and local.package == package and constraint.matches(local.version):
+                    if not _matches_architecture(local, matcher):
+                        log.debug('Skipping package built for another architecture', file=entry.path,
+                                  architecture=local.architecture, matcher=matcher)
+                        continue
+                    if not best or local.version > best.version:
+                        best = local
+
+        return best.path if best else None
+
+    def inspect(self, file_path: str) -> Optional[LocalPackage]:
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            if (cached := self._entries.get(file_path)) and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                return cached[2]
+
+        local = self._read_package(file_path)
+
+        with self._lock:
+            self._entries[file_path] = (stat.st_mtime_ns, stat.st_size, local)
+
+        return local
+
+    def _read_package(self, file_path: str) -> Optional[LocalPackage]:
+        try:
+            control = read_deb_control(file_path)
+            return LocalPackage(
+                file_path, control['Package'], DebianVersion.parse(control['Version']), control.get('Architecture', '')
+            )
+        except Exception as error:
+            log.debug('Failed to read package control metadata', file=file_path, error=error)
+            return None
+
+
+def _matches_architecture(local: LocalPackage, matcher: Optional[AssetMatcher]) -> bool:
+    if not matcher or local.architecture == ARCHITECTURE_ALL or matcher.matches(local.file_name):
+        return True
+
+    file_name = os.path.basename(local.path)
+
+    return matcher.matches(file_name) and local.architecture in re.split(r'[_.-]', file_name)
+
+
+def read_deb_control(file_path: str) -> dict[str, str]:
+    return parse_control(read_deb_control_text(file_path))
+
+
+def read_deb_control_text(file_path: str) -> str:
+    with open(file_path, 'rb') as file:
+        if file.read(len(AR_MAGIC)) != AR_MAGIC:
+            raise ValueError('Not a Debian package archive')
+
+        while len(header := file.read(AR_HEADER_SIZE)) == AR_HEADER_SIZE:
+            name = header[:16].decode().strip().rstrip('/')
+            size = int(header[48:58].decode().strip())
+
+            if name.startswith('control.tar'):
+                return _extract_control(name, file.read(size))
+
+            file.seek(size + size % 2, os.SEEK_CUR)
+
+    raise ValueError('Control archive not found')
+
+
+def _extract_control(name: str, data: bytes) -> str:
+    if name.endswith('.zst'):
+        raise ValueError(f'Unsupported control archive compression: {name}')
+
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:*') as archive:
+        for member in CONTROL_MEMBERS:
+            try:
+                if control := archive.extractfile(member):
+                    return control.read().decode()
+            except KeyError:
+                continue
+
+    raise ValueError('Control file not found')
+
+
+def parse_control(content: str) -> dict[str, str]:
+    fields: dict[str, str] = {}
+    field = None
+
+    for line in content.splitlines():
+        if line[:1] in (' ', '\t') and field:
+            fields[field] += f'\n{line.strip()}'
+        elif ':' in line:
+            field, value = line.split(':', 1)
+            fields[field] = value.strip()
+
+    return fields
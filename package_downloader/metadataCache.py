@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from contextlib import suppress
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, Mapping, Optional, TypeVar
+
+from context_logger import get_logger
+
+from package_downloader import IRunMetrics, increment
+
+if TYPE_CHECKING:
+    from github.GithubObject import CompletableGithubObject
+    from github.Requester import Requester
+
+log = get_logger('MetadataCache')
+
+T = TypeVar('T', bound='CompletableGithubObject')
+EVICTION_RATIO = 0.1
+JsonRequest = Callable[[dict[str, str]], tuple[Mapping[str, Any], Any]]
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    data: Any
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    validated_at: float = 0.0
+
+
+class IMetadataCache(object):
+
+    def get_json(self, requester: Requester, url: str) -> Any:
+        raise NotImplementedError()
+
+    def get_object(self, requester: Requester, object_type: type[T], url: str) -> T:
+        raise NotImplementedError()
+
+    def fetch_json(self, url: str, request: JsonRequest, identity: Optional[str] = None) -> Any:
+        raise NotImplementedError()
+
+
+class MetadataCache(IMetadataCache):
+
+    def __init__(
+        self, cache_dir: str, ttl: float = 300, max_entries: int = 1000, run_metrics: Optional[IRunMetrics] = None
+    ) -> None:
+        self._cache_dir = cache_dir
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._run_metrics = run_metrics
+        self._lock = Lock()
+        os.makedirs(self._cache_dir, exist_ok=True)
+        self._entries = len(self._list_entries())
+
+    def get_json(self, requester: Requester, url: str) -> Any:
+        return self.fetch_json(
+            url, lambda headers: requester.requestJsonAndCheck('GET', url, headers=headers), _get_identity(requester)
+        )
+
+    def get_object(self, requester: Requester, object_type: type[T], url: str) -> T:
+        return object_type(requester, {}, self.get_json(requester, url), completed=True)
+
+    def fetch_json(self, url: str, request: JsonRequest, identity: Optional[str] = None) -> Any:
+        key = _get_key(url, identity)
+        entry = self._load(key)
+
+        if entry and time.time() - entry.validated_at < self._ttl:
+            log.debug('Metadata cache hit', url=url)
+            increment(self._run_metrics, 'metadata_cache_hits')
+            return entry.data
+
+        headers = {}
+
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+        response_headers, data = request(headers)
+
+        if entry and data is None:
+            log.debug('Metadata not modified', url=url)
+            increment(self._run_metrics, 'metadata_cache_revalidations')
+            entry.validated_at = time.time()
+            self._store(entry)
+            return entry.data
+
+        log.debug('Metadata retrieved', url=url, revalidated=entry is not None)
+
+        increment(self._run_metrics, 'metadata_cache_misses')
+
+        self._store(
+            CacheEntry(key, data, response_headers.get('etag'), response_headers.get('last-modified'), time.time())
+        )
+
+        return data
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        file_path = self._get_file_path(key)
+
+        try:
+            with open(file_path, 'r') as file:
+                entry = CacheEntry(**json.load(file))
+            os.utime(file_path)
+            return entry if entry.key == key else None
+        except FileNotFoundError:
+            return None
+        except Exception as error:
+            log.warning('Failed to load metadata cache entry', key=key, error=error)
+            return None
+
+    def _store(self, entry: CacheEntry) -> None:
+        file_path = self._get_file_path(entry.key)
+        temp_path = f'{file_path}.{os.getpid()}.tmp'
+
+        with self._lock:
+            added = not os.path.exists(file_path)
+
+            with open(temp_path, 'w') as file:
+                json.dump(asdict(entry), file)
+            os.replace(temp_path, file_path)
+
+            if added:
+                self._entries += 1
+
+            if self._entries > self._max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(self._list_entries(), key=lambda entry: entry.stat().st_mtime)
+        keep = max(0, self._max_entries - int(self._max_entries * EVICTION_RATIO))
+
+        for entry in entries[: max(0, len(entries) - keep)]:
+            log.debug('Evicting metadata cache entry', file=entry.name)
+            with suppress(FileNotFoundError):
+                os.remove(entry.path)
+
+        self._entries = min(len(entries), keep)
+
+    def _list_entries(self) -> list[os.DirEntry[str]]:
+        return [entry for entry in os.scandir(self._cache_dir) if entry.name.endswith('.json')]
+
+    def _get_file_path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f'{hashlib.sha256(key.encode()).hexdigest()}.json')
+
+
+def _get_key(url: str, identity: Optional[str]) -> str:
+    return f'{hashlib.sha256(identity.encode()).hexdigest()}:{url}' if identity else url
+
+
+def _get_identity(requester: Requester) -> Optional[str]:
+    return f'{auth.token_type} {auth.token}' if (auth := requester.auth) else None
@@ -0,0 +1,189 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Optional
+from urllib.parse import urlparse
+
+from common_utility import IFileDownloader, ISessionProvider
+from context_logger import get_logger
+
+from package_downloader import FileDigest, IVerifyingFileDownloader, download_verified, IRunMetrics, increment
+
+log = get_logger('MirrorSelector')
+
+MIRROR_STATS_FILE_NAME = '.mirror-stats.json'
+REFERENCE_SIZE = 1024 * 1024
+
+
+@dataclass
+class MirrorStats:
+    latency: Optional[float] = None
+    throughput: Optional[float] = None
+    failures: int = 0
+    probed_at: float = 0.0
+
+    def get_cost(self) -> tuple[int, float]:
+        if self.latency is None and self.throughput is None:
+            return self.failures, float('inf')
+
+        transfer_time = REFERENCE_SIZE / self.throughput if self.throughput else 0.0
+
+        return self.failures, (self.latency or 0.0) + transfer_time
+
+
+class IMirrorSelector(object):
+
+    def rank(self, urls: list[str]) -> list[str]:
+        raise NotImplementedError()
+
+    def record_transfer(self, url: str, duration: float, size: int) -> None:
+        raise NotImplementedError()
+
+    def record_failure(self, url: str) -> None:
+        raise NotImplementedError()
+
+
+class MirrorSelector(IMirrorSelector):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        state_file: Optional[str] = None,
+        probe_timeout: float = 5.0,
+        probe_ttl: float = 3600,
+        smoothing: float = 0.3,
+        run_metrics: Optional[IRunMetrics] = None,
+    ) -> None:
+        self._session_provider = session_provider
+        self._state_file = state_file
+        self._probe_timeout = probe_timeout
+        self._probe_ttl = probe_ttl
+        self._smoothing = smoothing
+        self._run_metrics = run_metrics
+        self._lock = Lock()
+        self._stats = self._load()
+
+    def rank(self, urls: list[str]) -> list[str]:
+        if len(urls) < 2:
+            return list(urls)
+
+        now = time.time()
+
+        with self._lock:
+            stale = [url for url in urls if now - self._get_stats(url).probed_at >= self._probe_ttl]
+
+        if stale:
+            with ThreadPoolExecutor(len(stale), thread_name_prefix='MirrorSelector') as executor:
+                list(executor.map(self._probe, stale))
+            self._save()
+
+        with self._lock:
+            ranked = sorted(urls, key=lambda url: self._get_stats(url).get_cost())
+
+        log.debug('Ranked mirrors', mirrors=ranked, probed=len(stale))
+
+        return ranked
+
+    def record_transfer(self, url: str, duration: float, size: int) -> None:
+        if size and duration > 0:
+            with self._lock:
+                stats = self._get_stats(url)
+                stats.throughput = self._smooth(stats.throughput, size / duration)
+                stats.failures = 0
+            self._save()
+
+    def record_failure(self, url: str) -> None:
+        with self._lock:
+            self._get_stats(url).failures += 1
+        self._save()
+
+    def _probe(self, url: str) -> None:
+        started = time.monotonic()
+
+        try:
+            response = self._session_provider.get_session().head(
+                url, allow_redirects=True, timeout=self._probe_timeout
+            )
+            response.raise_for_status()
+        except Exception as error:
+            log.warning('Mirror probe failed', url=url, error=error)
+            latency = None
+        else:
+            latency = time.monotonic() - started
+
+        increment(self._run_metrics, 'mirror_probes')
+
+        with self._lock:
+            stats = self._get_stats(url)
+            stats.probed_at = time.time()
+
+            if latency is None:
+                stats.failures += 1
+            else:
+                stats.latency = self._smooth(stats.latency, latency)
+                stats.failures = 0
+
+    def _smooth(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else current + self._smoothing * (sample - current)
+
+    def _get_stats(self, url: str) -> MirrorStats:
+        return self._stats.setdefault(urlparse(url).netloc, MirrorStats())
+
+    def _load(self) -> dict[str, MirrorStats]:
+        if not self._state_file or not os.path.exists(self._state_file):
+            return {}
+
+        try:
+            with open(self._state_file) as file:
+                return {host: MirrorStats(**stats) for host, stats in json.load(file).items()}
+        except Exception as error:
+            log.warning('Failed to load mirror statistics', file=self._state_file, error=error)
+            return {}
+
+    def _save(self) -> None:
+        if not self._state_file:
+            return
+
+        with self._lock:
+            data = json.dumps({host: asdict(stats) for host, stats in self._stats.items()})
+            temp_path = f'{self._state_file}.tmp'
+
+            with open(temp_path, 'w') as file:
+                file.write(data)
+
+            os.replace(temp_path, self._state_file)
+
+
+def download_mirrored(
+    file_downloader: IFileDownloader,
+    url: str,
+    mirrors: list[str],
+    file_name: Optional[str] = None,
+    skip_if_exists: bool = True,
+    digest: Optional[FileDigest] = None,
+) -> str:
+    file_name = file_name or os.path.basename(urlparse(url).path)
+
+    if isinstance(file_downloader, IVerifyingFileDownloader):
+        return file_downloader.download(url, file_name, skip_if_exists=skip_if_exists, digest=digest, mirrors=mirrors)
+
+    sources = [url, *mirrors]
+
+    for source in sources:
+        try:
+            if digest:
+                return download_verified(file_downloader, digest, source, file_name, skip_if_exists=skip_if_exists)
+            return file_downloader.download(source, file_name, skip_if_exists=skip_if_exists)
+        except Exception as error:
+            if source == sources[-1]:
+                raise
+            log.warning('Download from mirror failed, trying next mirror', url=source, error=error)
+
+    raise ValueError('No download source configured')
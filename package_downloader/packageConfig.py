@@ -2,19 +2,51 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
-from typing import Optional
+import glob
+import os
+from typing import Optional, Union
+from urllib.parse import urlparse
 
 from pydantic import BaseModel
 
-from package_downloader import ReleaseConfig
+from package_downloader import ReleaseConfig, FileDigest, VersionConstraint, parse_rate, AssetMatcher, get_asset_matcher
 
 
 class PackageConfig(BaseModel):
     package: str
     version: Optional[str] = None
     file_url: Optional[str] = None
+    mirrors: list[str] = []
     release: Optional[ReleaseConfig] = None
+    sha256: Optional[str] = None
+    size: Optional[int] = None
+    priority: int = 0
+    max_rate: Optional[Union[int, str]] = None
 
     def __repr__(self) -> str:
-        return (f'PackageConfig(package={self.package}, version={self.version}, '
-                f'file_url={self.file_url}, release={self.release})')
+        return (f'PackageConfig(package={self.package}, version={self.version}, file_url={self.file_url}, '
+                f'mirrors={self.mirrors}, release={self.release}, sha256={self.sha256}, size={self.size})')
+
+    @property
+    def digest(self) -> Optional[FileDigest]:
+        if self.sha256 or self.size is not None:
+            return FileDigest(self.sha256, self.size)
+        return None
+
+    @property
+    def rate_limit(self) -> Optional[int]:
+        return parse_rate(self.max_rate)
+
+    @property
+    def version_constraint(self) -> Optional[VersionConstraint]:
+        if self.version:
+            return VersionConstraint.parse(self.version)
+        return None
+
+    @property
+    def asset_matcher(self) -> Optional[AssetMatcher]:
+        if self.file_url:
+            return get_asset_matcher((glob.escape(os.path.basename(urlparse(self.file_url).path)),))
+        if self.release:
+            return self.release.asset_matcher
+        return None
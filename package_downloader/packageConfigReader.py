@@ -0,0 +1,90 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+import re
+from typing import Any, Iterator, Optional, TextIO
+
+from context_logger import get_logger
+
+from package_downloader import PackageConfig
+
+log = get_logger('PackageConfigReader')
+
+JSON_LINES_SUFFIXES = ('.jsonl', '.ndjson')
+WHITESPACE_PATTERN = re.compile(r'[\s,]*')
+
+
+class IPackageConfigReader(object):
+
+    def read(self, config_path: str) -> Iterator[PackageConfig]:
+        raise NotImplementedError()
+
+
+class PackageConfigReader(IPackageConfigReader):
+
+    def __init__(self, chunk_size: int = 64 * 1024, max_entry_size: int = 1024 * 1024) -> None:
+        self._chunk_size = chunk_size
+        self._max_entry_size = max_entry_size
+        self._decoder = json.JSONDecoder()
+
+    def read(self, config_path: str) -> Iterator[PackageConfig]:
+        with open(config_path, 'r', encoding='utf-8') as file:
+            for index, item in enumerate(self._read_values(file)):
+                try:
+                    yield PackageConfig.model_validate(item)
+                except ValueError as error:
+                    log.error('Invalid package config entry', file=config_path, index=index, error=str(error))
+                    raise error
+
+    def _read_values(self, file: TextIO) -> Iterator[Any]:
+        buffer, position, eof = '', 0, False
+        in_array: Optional[bool] = None
+
+        while True:
+            position = _skip_separators(buffer, position)
+
+            if position == len(buffer):
+                if _is_finished(eof, in_array):
+                    return
+                buffer, position, eof = self._read_chunk(file, buffer, position)
+                continue
+
+            if in_array is None:
+                in_array = buffer[position] == '['
+                position += int(in_array)
+                continue
+
+            if in_array and buffer[position] == ']':
+                return
+
+            try:
+                value, position = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof or len(buffer) - position > self._max_entry_size:
+                    raise
+                buffer, position, eof = self._read_chunk(file, buffer, position)
+                continue
+
+            yield value
+
+    def _read_chunk(self, file: TextIO, buffer: str, position: int) -> tuple[str, int, bool]:
+        chunk = file.read(self._chunk_size)
+        return buffer[position:] + chunk, 0, not chunk
+
+
+def is_json_lines(config_path: str) -> bool:
+    return config_path.lower().endswith(JSON_LINES_SUFFIXES)
+
+
+def _skip_separators(buffer: str, position: int) -> int:
+    separators = WHITESPACE_PATTERN.match(buffer, position)
+    return separators.end() if separators else position
+
+
+def _is_finished(eof: bool, in_array: Optional[bool]) -> bool:
+    if eof and in_array:
+        raise ValueError('Unterminated JSON array')
+
+    return eof
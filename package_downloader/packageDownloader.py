@@ -2,33 +2,138 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from threading import BoundedSemaphore
+from typing import Iterator, Optional
+
 from common_utility.jsonLoader import IJsonLoader
 from context_logger import get_logger
 
-from package_downloader import IDebDownloader, PackageConfig
+from package_downloader import (
+    IDebDownloader,
+    PackageConfig,
+    IReleaseResolver,
+    IRunMetrics,
+    measure,
+    increment,
+    IPackageConfigReader,
+    IDownloadTransaction,
+    run_atomically,
+)
 
 log = get_logger('PackageDownloader')
 
+STREAM_BATCH_SIZE = 100
+
+
+class IPackageDownloader(object):
 
-class PackageDownloader(object):
+    def download_packages(self) -> list[Optional[str]]:
+        raise NotImplementedError()
 
-    def __init__(self, config_path: str, json_loader: IJsonLoader, deb_downloader: IDebDownloader) -> None:
+
+class PackageDownloader(IPackageDownloader):
+
+    def __init__(
+        self,
+        config_path: str,
+        json_loader: IJsonLoader,
+        deb_downloader: IDebDownloader,
+        max_workers: int = 1,
+        release_resolver: Optional[IReleaseResolver] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+        config_reader: Optional[IPackageConfigReader] = None,
+        download_transaction: Optional[IDownloadTransaction] = None,
+    ) -> None:
         self._config_path = config_path
         self._json_loader = json_loader
         self._deb_downloader = deb_downloader
+        self._max_workers = max(1, max_workers)
+        self._release_resolver = release_resolver
+        self._run_metrics = run_metrics
+        self._config_reader = config_reader
+        self._download_transaction = download_transaction
+
+    def download_packages(self) -> list[Optional[str]]:
+        return run_atomically(self._download_transaction, self._download_packages)
+
+    def _download_packages(self) -> list[Optional[str]]:
+        if self._config_reader:
+            return self._download_stream(self._config_reader)
+
+        with measure(self._run_metrics, 'config_load'):
+            config_list = self._json_loader.load_list(self._config_path, PackageConfig)
+
+        log.info(
+            'Downloading packages', packages=[config.package for config in config_list], workers=self._max_workers
+        )
+
+        self._resolve_releases(config_list)
+
+        results: list[Optional[str]] = [None] * len(config_list)
+        order = sorted(range(len(config_list)), key=lambda index: -config_list[index].priority)
 
-    def download_packages(self) -> None:
-        config_list = self._json_loader.load_list(self._config_path, PackageConfig)
+        if self._max_workers > 1 and len(config_list) > 1:
+            workers = min(self._max_workers, len(config_list))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='PackageDownloader') as executor:
+                futures = {index: executor.submit(self._download_package, config_list[index]) for index in order}
+                for index, future in futures.items():
+                    results[index] = future.result()
+                return results
 
-        log.info('Downloading packages', packages=[config.package for config in config_list])
+        for index in order:
+            results[index] = self._download_package(config_list[index])
 
-        for config in config_list:
-            self._download_package(config)
+        return results
 
-    def _download_package(self, config: PackageConfig) -> None:
+    def _download_stream(self, config_reader: IPackageConfigReader) -> list[Optional[str]]:
+        log.info('Streaming packages', config=self._config_path, workers=self._max_workers)
+
+        results: list[Optional[str]] = []
+        pending = BoundedSemaphore(self._max_workers * 2)
+
+        def complete(index: int, future: 'Future[Optional[str]]') -> None:
+            try:
+                results[index] = future.result()
+            finally:
+                pending.release()
+
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='PackageDownloader') as executor:
+            for batch in _get_batches(config_reader.read(self._config_path), STREAM_BATCH_SIZE):
+                self._resolve_releases(batch)
+                offset = len(results)
+                results.extend([None] * len(batch))
+
+                for index in sorted(range(len(batch)), key=lambda item: -batch[item].priority):
+                    pending.acquire()
+                    future = executor.submit(self._download_package, batch[index])
+                    future.add_done_callback(partial(complete, offset + index))
+
+        log.info('Streamed packages', config=self._config_path, packages=len(results))
+
+        return results
+
+    def _resolve_releases(self, config_list: list[PackageConfig]) -> None:
+        if self._release_resolver:
+            with measure(self._run_metrics, 'release_resolution'):
+                self._release_resolver.resolve([config.release for config in config_list if config.release])
+
+    def _download_package(self, config: PackageConfig) -> Optional[str]:
         try:
             log.debug('Downloading package', package=config.package)
-            file_path = self._deb_downloader.download(config)
+            with measure(self._run_metrics, 'package'):
+                file_path = self._deb_downloader.download(config)
             log.debug('Downloaded package', package=config.package, file=file_path)
+            increment(self._run_metrics, 'packages_downloaded')
+            return file_path
         except Exception as error:
             log.error('Failed to download package', package=config.package, error=error)
+            increment(self._run_metrics, 'packages_failed')
+            return None
+
+
+def _get_batches(configs: Iterator[PackageConfig], size: int) -> Iterator[list[PackageConfig]]:
+    while batch := list(islice(configs, size)):
+        yield batch
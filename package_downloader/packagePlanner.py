@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Optional
+
+from common_utility import ISessionProvider
+from common_utility.jsonLoader import IJsonLoader
+from context_logger import get_logger
+
+from package_downloader import (
+    IDebDownloader,
+    PackageConfig,
+    IReleaseResolver,
+    IRunMetrics,
+    measure,
+    DownloadPlan,
+    PlannedPackage,
+    PlannedFile,
+)
+
+log = get_logger('PackagePlanner')
+
+
+class IPackagePlanner(object):
+
+    def plan(self) -> DownloadPlan:
+        raise NotImplementedError()
+
+
+class PackagePlanner(IPackagePlanner):
+
+    def __init__(
+        self,
+        config_path: str,
+        json_loader: IJsonLoader,
+        deb_downloader: IDebDownloader,
+        max_workers: int = 16,
+        release_resolver: Optional[IReleaseResolver] = None,
+        session_provider: Optional[ISessionProvider] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+        timeout: float = 30.0,
+    ) -> None:
+        self._config_path = config_path
+        self._json_loader = json_loader
+        self._deb_downloader = deb_downloader
+        self._max_workers = max(1, max_workers)
+        self._release_resolver = release_resolver
+        self._session_provider = session_provider
+        self._run_metrics = run_metrics
+        self._timeout = timeout
+
+    def plan(self) -> DownloadPlan:
+        started = time.perf_counter()
+        api_calls = self._get_api_calls()
+
+        with measure(self._run_metrics, 'config_load'):
+            config_list = self._json_loader.load_list(self._config_path, PackageConfig)
+
+        log.info('Planning packages', packages=len(config_list), workers=self._max_workers)
+
+        if self._release_resolver:
+            with measure(self._run_metrics, 'release_resolution'):
+                self._release_resolver.resolve([config.release for config in config_list if config.release])
+
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='PackagePlanner') as executor:
+            packages = list(executor.map(lambda config: copy_context().run(self._plan_package, config), config_list))
+            unknown = [planned for package in packages for planned in package.get_downloads() if planned.size is None]
+            list(executor.map(lambda planned: copy_context().run(self._probe_size, planned), unknown))
+
+        plan = DownloadPlan(packages, _subtract(self._get_api_calls(), api_calls), time.perf_counter() - started)
+
+        log.info('Planned packages', **plan.get_summary())
+
+        return plan
+
+    def _plan_package(self, config: PackageConfig) -> PlannedPackage:
+        try:
+            with measure(self._run_metrics, 'package_plan'):
+                return self._deb_downloader.plan(config)
+        except Exception as error:
+            log.error('Failed to plan package', package=config.package, error=error)
+            return PlannedPackage(config.package, error=str(error))
+
+    def _probe_size(self, planned: PlannedFile) -> None:
+        if not self._session_provider or not planned.url.startswith(('http://', 'https://')):
+            return
+
+        try:
+            response = self._session_provider.get_session().head(
+                planned.url, allow_redirects=True, timeout=self._timeout
+            )
+            response.raise_for_status()
+            planned.size = int(response.headers['Content-Length'])
+        except Exception as error:
+            log.debug('Failed to get file size', url=planned.url, error=error)
+
+    def _get_api_calls(self) -> Optional[int]:
+        if not self._run_metrics:
+            return None
+
+        calls: int = self._run_metrics.get_report()['counters'].get('api_calls', 0)
+
+        return calls
+
+
+def _subtract(after: Optional[int], before: Optional[int]) -> Optional[int]:
+    return after - before if after is not None and before is not None else None
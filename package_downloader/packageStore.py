@@ -0,0 +1,198 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import json
+import os
+from contextlib import suppress
+from datetime import datetime
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from common_utility import ISessionProvider
+from context_logger import get_logger
+
+from package_downloader import (
+    hash_file,
+    IRunMetrics,
+    increment,
+    copy_file,
+    IDownloadTransaction,
+    get_staging_path,
+    promote_staged,
+)
+
+if TYPE_CHECKING:
+    from github.GitReleaseAsset import GitReleaseAsset
+
+log = get_logger('PackageStore')
+
+STORE_DIR_NAME = '.store'
+LINK_SUFFIX = '.link'
+
+
+class IPackageStore(object):
+
+    def get_asset_key(self, asset: GitReleaseAsset) -> str:
+        raise NotImplementedError()
+
+    def get_url_key(self, url: str) -> Optional[str]:
+        raise NotImplementedError()
+
+    def create_asset_key(self, asset_id: int, size: int, updated_at: datetime) -> str:
+        raise NotImplementedError()
+
+    def create_url_key(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> Optional[str]:
+        raise NotImplementedError()
+
+    def get(self, key: str, file_name: str) -> Optional[str]:
+        raise NotImplementedError()
+
+    def put(self, key: str, file_path: str, sha256: Optional[str] = None) -> str:
+        raise NotImplementedError()
+
+    def get_digest(self, key: str) -> Optional[str]:
+        raise NotImplementedError()
+
+    def get_blob(self, digest: str) -> Optional[str]:
+        raise NotImplementedError()
+
+
+class PackageStore(IPackageStore):
+
+    def __init__(
+        self,
+        download_dir: str,
+        session_provider: ISessionProvider,
+        run_metrics: Optional[IRunMetrics] = None,
+        download_transaction: Optional[IDownloadTransaction] = None,
+        timeout: float = 5.0,
+    ) -> None:
+        self._download_dir = download_dir
+        self._session_provider = session_provider
+        self._run_metrics = run_metrics
+        self._download_transaction = download_transaction
+        self._timeout = timeout
+        self._store_dir = os.path.join(download_dir, STORE_DIR_NAME)
+        self._index_path = os.path.join(self._store_dir, 'index.json')
+        self._lock = Lock()
+        self._index = self._load_index()
+
+    def get_asset_key(self, asset: GitReleaseAsset) -> str:
+        return self.create_asset_key(asset.id, asset.size, asset.updated_at)
+
+    def get_url_key(self, url: str) -> Optional[str]:
+        if os.path.isfile(url):
+            return None
+
+        try:
+            response = self._session_provider.get_session().head(url, allow_redirects=True, timeout=self._timeout)
+            response.raise_for_status()
+        except Exception as error:
+            log.warning('Failed to get file validators', url=url, error=error)
+            return None
+
+        return self.create_url_key(url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    def create_asset_key(self, asset_id: int, size: int, updated_at: datetime) -> str:
+        return f'asset:{asset_id}:{size}:{updated_at.isoformat()}'
+
+    def create_url_key(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> Optional[str]:
+        if not etag and not last_modified:
+            log.debug('No file validators available', url=url)
+            return None
+
+        return f'url:{url}:{etag or ""}:{last_modified or ""}'
+
+    def get(self, key: str, file_name: str) -> Optional[str]:
+        file_path = os.path.join(self._download_dir, file_name)
+
+        with self._lock:
+            digest = self._index.get(key)
+
+            if not digest or not os.path.isfile(blob_path := self._get_blob_path(digest)):
+                self._detach(file_path)
+                increment(self._run_metrics, 'store_misses')
+                return None
+
+            if not os.path.exists(file_path) or not os.path.samefile(blob_path, file_path):
+                self._place(blob_path, file_path)
+
+        log.info('Using stored file', file=file_path, sha256=digest)
+
+        increment(self._run_metrics, 'store_hits')
+
+        return file_path
+
+    def put(self, key: str, file_path: str, sha256: Optional[str] = None) -> str:
+        digest = sha256.lower() if sha256 else hash_file(file_path)
+        blob_path = self._get_blob_path(digest)
+
+        with self._lock:
+            if not os.path.isfile(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                self._link(file_path, blob_path)
+            elif not os.path.samefile(blob_path, file_path):
+                self._place(blob_path, file_path)
+
+            self._index[key] = digest
+            self._save_index()
+
+        log.debug('Stored file', file=file_path, sha256=digest)
+
+        return file_path
+
+    def get_digest(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._index.get(key)
+
+    def get_blob(self, digest: str) -> Optional[str]:
+        blob_path = self._get_blob_path(digest.lower())
+        return blob_path if os.path.isfile(blob_path) else None
+
+    def _load_index(self) -> dict[str, str]:
+        try:
+            with open(self._index_path, 'r') as file:
+                index: dict[str, str] = json.load(file)
+                return index
+        except FileNotFoundError:
+            return {}
+        except Exception as error:
+            log.warning('Failed to load store index, starting with empty index', error=error)
+            return {}
+
+    def _save_index(self) -> None:
+        os.makedirs(self._store_dir, exist_ok=True)
+        temp_path = f'{self._index_path}.tmp'
+
+        with open(temp_path, 'w') as file:
+            json.dump(self._index, file)
+
+        os.replace(temp_path, self._index_path)
+
+    def _get_blob_path(self, digest: str) -> str:
+        return os.path.join(self._store_dir, 'sha256', digest[:2], digest)
+
+    def _detach(self, file_path: str) -> None:
+        if self._download_transaction:
+            return
+
+        if os.path.isfile(file_path) and os.stat(file_path).st_nlink > 1:
+            os.remove(file_path)
+
+    def _place(self, blob_path: str, file_path: str) -> None:
+        staged_path = f'{get_staging_path(self._download_transaction, file_path)}{LINK_SUFFIX}'
+
+        with suppress(FileNotFoundError):
+            os.remove(staged_path)
+
+        self._link(blob_path, staged_path)
+        promote_staged(self._download_transaction, staged_path, file_path)
+
+    def _link(self, source: str, target: str) -> None:
+        try:
+            os.link(source, target)
+        except OSError:
+            copy_file(source, target)
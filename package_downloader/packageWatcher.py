@@ -0,0 +1,134 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import random
+import time
+from dataclasses import dataclass, asdict
+from threading import Event, Lock
+from typing import Any, Callable, Optional
+
+from context_logger import get_logger
+
+from package_downloader import IConfigSource, IPackageDownloader, IRunMetrics
+
+log = get_logger('PackageWatcher')
+
+
+@dataclass
+class WatchStatus:
+    state: str = 'starting'
+    cycles: int = 0
+    config_changes: int = 0
+    packages_ok: int = 0
+    packages_failed: int = 0
+    last_sync_started: Optional[float] = None
+    last_sync_finished: Optional[float] = None
+    last_sync_duration: Optional[float] = None
+    last_error: Optional[str] = None
+    next_sync_at: Optional[float] = None
+
+
+class IPackageWatcher(object):
+
+    def run(self) -> None:
+        raise NotImplementedError()
+
+    def stop(self) -> None:
+        raise NotImplementedError()
+
+    def get_status(self) -> dict[str, Any]:
+        raise NotImplementedError()
+
+
+class PackageWatcher(IPackageWatcher):
+
+    def __init__(
+        self,
+        config_source: IConfigSource,
+        downloader_factory: Callable[[str], IPackageDownloader],
+        interval: float = 60.0,
+        post_sync: Optional[Callable[[], Any]] = None,
+        jitter: float = 0.1,
+        run_metrics: Optional[IRunMetrics] = None,
+    ) -> None:
+        self._config_source = config_source
+        self._downloader_factory = downloader_factory
+        self._interval = interval
+        self._post_sync = post_sync
+        self._jitter = jitter
+        self._run_metrics = run_metrics
+        self._status = WatchStatus()
+        self._lock = Lock()
+        self._stop_event = Event()
+
+    def run(self) -> None:
+        log.info('Watching package config', interval=self._interval)
+
+        while not self._stop_event.is_set():
+            self.sync()
+
+            delay = self._interval * (1 + random.uniform(-self._jitter, self._jitter))
+
+            with self._lock:
+                self._status.next_sync_at = time.time() + delay
+
+            self._stop_event.wait(delay)
+
+        log.info('Stopped watching package config')
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def sync(self) -> None:
+        started = time.time()
+
+        with self._lock:
+            self._status.state = 'syncing'
+            self._status.last_sync_started = started
+            self._status.next_sync_at = None
+
+        try:
+            config_path, changed = self._config_source.fetch()
+
+            if changed:
+                log.info('Package config changed', file=config_path)
+
+            results = self._downloader_factory(config_path).download_packages()
+
+            if self._post_sync:
+                self._post_sync()
+
+            self._finish(started, changed, results, None)
+        except Exception as error:
+            log.error('Package sync failed', error=error)
+            self._finish(started, False, None, error)
+
+    def get_status(self) -> dict[str, Any]:
+        with self._lock:
+            status = asdict(self._status)
+
+        if self._run_metrics:
+            status['report'] = self._run_metrics.get_report()
+
+        return status
+
+    def _finish(
+        self, started: float, changed: bool, results: Optional[list[Optional[str]]], error: Optional[Exception]
+    ) -> None:
+        finished = time.time()
+
+        with self._lock:
+            self._status.state = 'idle' if not error else 'error'
+            self._status.cycles += 1
+            self._status.config_changes += int(changed)
+            self._status.last_sync_finished = finished
+            self._status.last_sync_duration = finished - started
+            self._status.last_error = str(error) if error else None
+
+            if results is not None:
+                self._status.packages_ok = len([result for result in results if result])
+                self._status.packages_failed = len(results) - self._status.packages_ok
+
+        log.info('Package sync finished', duration=finished - started, packages_ok=self._status.packages_ok,
+                 packages_failed=self._status.packages_failed, error=str(error) if error else None)
@@ -3,22 +3,46 @@
 # SPDX-License-Identifier: MIT
 
 import os
-from typing import Optional
+from typing import Literal, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+
+from package_downloader import AssetMatcher, get_asset_matcher
+
+SOURCE_GITHUB = 'github'
+SOURCE_GITEA = 'gitea'
+SOURCE_GITLAB = 'gitlab'
+SOURCE_HTTP = 'http'
 
 
 class ReleaseConfig(BaseModel):
-    owner: str
-    repo: str
-    matcher: str = '*.deb'
+    owner: str = ''
+    repo: str = ''
+    matcher: Union[str, list[str]] = '*.deb'
+    architectures: Optional[list[str]] = None
     tag: Optional[str] = None
     token: Optional[str] = None
+    source: Literal['github', 'gitea', 'gitlab', 'http'] = 'github'
+    url: Optional[str] = None
 
     def __repr__(self) -> str:
         tag = f'@{self.tag}' if self.tag else ''
         has_token = self.raw_token is not None
-        return f'ReleaseConfig({self.full_name}.git{tag}, matcher={self.matcher}, has_token={has_token})'
+        architectures = f', architectures={self.architectures}' if self.architectures else ''
+        source = f', source={self.source}' if self.source != SOURCE_GITHUB else ''
+        location = self.full_name if self.source == SOURCE_HTTP else f'{self.full_name}.git'
+        return (f'ReleaseConfig({location}{tag}, matcher={self.matcher}{architectures}{source}, '
+                f'has_token={has_token})')
+
+    @model_validator(mode='after')
+    def _check_location(self) -> 'ReleaseConfig':
+        if self.source != SOURCE_HTTP and not (self.owner and self.repo):
+            raise ValueError(f'owner and repo are required for {self.source} releases')
+
+        if self.source != SOURCE_GITHUB and not self.url:
+            raise ValueError(f'url is required for {self.source} releases')
+
+        return self
 
     @property
     def raw_token(self) -> Optional[str]:
@@ -28,4 +52,11 @@ class ReleaseConfig(BaseModel):
 
     @property
     def full_name(self) -> str:
+        if self.source == SOURCE_HTTP:
+            return (self.url or '').rstrip('/')
         return f'{self.owner}/{self.repo}'
+
+    @property
+    def asset_matcher(self) -> AssetMatcher:
+        patterns = (self.matcher,) if isinstance(self.matcher, str) else tuple(self.matcher)
+        return get_asset_matcher(patterns, tuple(self.architectures or ()))
@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from context_logger import get_logger
+
+from package_downloader import (
+    DebianVersion,
+    VersionConstraint,
+    parse_tag_version,
+    IMetadataCache,
+    IRequestScheduler,
+    execute_scheduled,
+)
+
+if TYPE_CHECKING:
+    from github.GitRelease import GitRelease
+    from github.Repository import Repository
+
+log = get_logger('ReleaseIndex')
+
+RELEASES_PER_PAGE = 100
+
+
+class IReleaseIndex(object):
+
+    def find(
+        self, repository: Repository, constraint: VersionConstraint, token: Optional[str] = None
+    ) -> Optional[GitRelease]:
+        raise NotImplementedError()
+
+
+class ReleaseIndex(IReleaseIndex):
+
+    def __init__(
+        self, metadata_cache: Optional[IMetadataCache] = None, request_scheduler: Optional[IRequestScheduler] = None
+    ) -> None:
+        self._metadata_cache = metadata_cache
+        self._request_scheduler = request_scheduler
+        self._releases: dict[str, list[tuple[DebianVersion, GitRelease]]] = {}
+        self._locks: dict[str, Lock] = {}
+        self._lock = Lock()
+
+    def find(
+        self, repository: Repository, constraint: VersionConstraint, token: Optional[str] = None
+    ) -> Optional[GitRelease]:
+        for version, release in self._get_releases(repository, token):
+            if constraint.matches(version):
+                log.debug('Found release matching version', repo=repository.full_name, tag=release.tag_name,
+                          constraint=str(constraint))
+                return release
+
+        log.debug('No release matching version', repo=repository.full_name, constraint=str(constraint))
+
+        return None
+
+    def _get_releases(self, repository: Repository, token: Optional[str]) -> list[tuple[DebianVersion, GitRelease]]:
+        key = repository.full_name.lower()
+
+        with self._lock:
+            lock = self._locks.setdefault(key, Lock())
+
+        with lock:
+            if (releases := self._releases.get(key)) is None:
+                releases = self._releases[key] = self._load_releases(repository, token)
+
+        return releases
+
+    def _load_releases(self, repository: Repository, token: Optional[str]) -> list[tuple[DebianVersion, GitRelease]]:
+        releases = []
+
+        for release in self._list_releases(repository, token):
+            if release.draft or release.prerelease:
+                continue
+            if version := parse_tag_version(release.tag_name):
+                releases.append((version, release))
+
+        releases.sort(key=lambda item: item[0], reverse=True)
+
+        log.info('Indexed repository releases', repo=repository.full_name, releases=len(releases))
+
+        return releases
+
+    def _list_releases(self, repository: Repository, token: Optional[str]) -> list[GitRelease]:
+        from github.GitRelease import GitRelease
+
+        cache = self._metadata_cache
+
+        if not cache:
+            return execute_scheduled(self._request_scheduler, token, lambda: list(repository.get_releases()))
+
+        releases: list[GitRelease] = []
+        page = 1
+
+        while True:
+            url = f'{repository.url}/releases?per_page={RELEASES_PER_PAGE}&page={page}'
+            items = execute_scheduled(
+                self._request_scheduler, token, lambda: cache.get_json(repository.requester, url)
+            )
+            releases.extend(GitRelease(repository.requester, {}, item, completed=True) for item in items)
+
+            if len(items) < RELEASES_PER_PAGE:
+                return releases
+
+            page += 1
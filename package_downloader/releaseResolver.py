@@ -0,0 +1,177 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Optional
+
+from common_utility import ISessionProvider
+from context_logger import get_logger
+
+from package_downloader import ReleaseConfig, SOURCE_GITHUB, IRequestScheduler, execute_scheduled, parse_asset_digest
+
+log = get_logger('ReleaseResolver')
+
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+RELEASE_FIELDS = (
+    'tagName releaseAssets(first: 100) { pageInfo { hasNextPage } nodes { name size downloadUrl updatedAt digest } }'
+)
+
+
+@dataclass(frozen=True)
+class ResolvedAsset:
+    name: str
+    size: int
+    download_url: str
+    updated_at: str
+    sha256: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ResolvedRelease:
+    full_name: str
+    tag: str
+    assets: list[ResolvedAsset] = field(default_factory=list)
+
+
+class IGraphQLTransport(object):
+
+    def execute(self, query: str, variables: dict[str, Any], token: str) -> dict[str, Any]:
+        raise NotImplementedError()
+
+
+class GraphQLTransport(IGraphQLTransport):
+
+    def __init__(self, session_provider: ISessionProvider, url: str = GITHUB_GRAPHQL_URL, timeout: float = 30.0):
+        self._session_provider = session_provider
+        self._url = url
+        self._timeout = timeout
+
+    def execute(self, query: str, variables: dict[str, Any], token: str) -> dict[str, Any]:
+        response = self._session_provider.get_session().post(
+            self._url,
+            json={'query': query, 'variables': variables},
+            headers={'Authorization': f'bearer {token}'},
+            timeout=self._timeout,
+        )
+        response.raise_for_status()
+        result: dict[str, Any] = response.json()
+
+        if errors := result.get('errors'):
+            log.warning('GraphQL query returned errors', errors=[error.get('message') for error in errors])
+
+        data: dict[str, Any] = result.get('data') or {}
+
+        return data
+
+
+class IReleaseResolver(object):
+
+    def resolve(self, configs: list[ReleaseConfig]) -> None:
+        raise NotImplementedError()
+
+    def get(self, config: ReleaseConfig) -> Optional[ResolvedRelease]:
+        raise NotImplementedError()
+
+
+class ReleaseResolver(IReleaseResolver):
+
+    def __init__(
+        self,
+        transport: IGraphQLTransport,
+        default_token: Optional[str] = None,
+        batch_size: int = 50,
+        request_scheduler: Optional[IRequestScheduler] = None,
+    ):
+        self._transport = transport
+        self._default_token = default_token
+        self._batch_size = max(1, batch_size)
+        self._request_scheduler = request_scheduler
+        self._releases: dict[tuple[str, Optional[str]], ResolvedRelease] = {}
+        self._lock = Lock()
+
+    def resolve(self, configs: list[ReleaseConfig]) -> None:
+        groups: dict[str, dict[tuple[str, Optional[str]], ReleaseConfig]] = {}
+
+        for config in configs:
+            if config.source != SOURCE_GITHUB:
+                continue
+            if token := config.raw_token or self._default_token:
+                groups.setdefault(token, {})[self._get_key(config)] = config
+
+        for token, group in groups.items():
+            batch_list = list(group.values())
+            for index in range(0, len(batch_list), self._batch_size):
+                self._resolve_batch(batch_list[index:index + self._batch_size], token)
+
+        log.info('Resolved releases', requested=len(configs), resolved=len(self._releases))
+
+    def get(self, config: ReleaseConfig) -> Optional[ResolvedRelease]:
+        if config.source != SOURCE_GITHUB:
+            return None
+
+        with self._lock:
+            return self._releases.get(self._get_key(config))
+
+    def _resolve_batch(self, batch: list[ReleaseConfig], token: str) -> None:
+        query, variables = self._create_query(batch)
+
+        try:
+            data = execute_scheduled(
+                self._request_scheduler, token, lambda: self._transport.execute(query, variables, token)
+            )
+        except Exception as error:
+            log.warning('Failed to resolve releases', repositories=[config.full_name for config in batch], error=error)
+            return
+
+        for index, config in enumerate(batch):
+            if release := self._parse_release(config, data.get(f'r{index}')):
+                with self._lock:
+                    self._releases[self._get_key(config)] = release
+
+    def _create_query(self, batch: list[ReleaseConfig]) -> tuple[str, dict[str, Any]]:
+        declarations = []
+        selections = []
+        variables: dict[str, Any] = {}
+
+        for index, config in enumerate(batch):
+            declarations.extend([f'$owner{index}: String!', f'$name{index}: String!'])
+            variables.update({f'owner{index}': config.owner, f'name{index}': config.repo})
+
+            if config.tag:
+                declarations.append(f'$tag{index}: String!')
+                variables[f'tag{index}'] = config.tag
+                release = f'release: release(tagName: $tag{index})'
+            else:
+                release = 'release: latestRelease'
+
+            selections.append(
+                f'r{index}: repository(owner: $owner{index}, name: $name{index}) '
+                f'{{ isPrivate {release} {{ {RELEASE_FIELDS} }} }}'
+            )
+
+        return f'query({", ".join(declarations)}) {{ {" ".join(selections)} }}', variables
+
+    def _parse_release(self, config: ReleaseConfig, repository: Optional[dict[str, Any]]) -> Optional[ResolvedRelease]:
+        if not repository or repository.get('isPrivate'):
+            return None
+
+        if not (release := repository.get('release')) or release['releaseAssets']['pageInfo']['hasNextPage']:
+            return None
+
+        assets = [
+            ResolvedAsset(
+                node['name'],
+                node['size'],
+                node['downloadUrl'],
+                node['updatedAt'],
+                parse_asset_digest(node.get('digest')),
+            )
+            for node in release['releaseAssets']['nodes']
+        ]
+
+        return ResolvedRelease(config.full_name, release['tagName'], assets)
+
+    def _get_key(self, config: ReleaseConfig) -> tuple[str, Optional[str]]:
+        return config.full_name.lower(), config.tag
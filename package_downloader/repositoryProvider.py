@@ -2,15 +2,23 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
+from __future__ import annotations
+
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
 from context_logger import get_logger
-from github import Github
-from github.Auth import Token
-from github.Repository import Repository
 
-from package_downloader import ReleaseConfig
+from package_downloader import ReleaseConfig, IMetadataCache, IRequestScheduler, execute_scheduled, IRunMetrics, measure
+
+if TYPE_CHECKING:
+    from github import Github
+    from github.Repository import Repository
 
 log = get_logger('RepositoryProvider')
 
+GITHUB_API_URL = 'https://api.github.com'
+
 
 class IRepositoryProvider(object):
 
@@ -20,10 +28,72 @@ class IRepositoryProvider(object):
 
 class RepositoryProvider(IRepositoryProvider):
 
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        metadata_cache: Optional[IMetadataCache] = None,
+        request_scheduler: Optional[IRequestScheduler] = None,
+        run_metrics: Optional[IRunMetrics] = None,
+        base_url: str = GITHUB_API_URL,
+    ) -> None:
+        self._pool_size = pool_size
+        self._metadata_cache = metadata_cache
+        self._request_scheduler = request_scheduler
+        self._run_metrics = run_metrics
+        self._base_url = base_url
+        self._clients: dict[Optional[str], Github] = {}
+        self._lock = Lock()
+
     def get_repository(self, config: ReleaseConfig) -> Repository:
         try:
-            auth = Token(config.raw_token) if config.raw_token else None
-            return Github(auth=auth).get_repo(config.full_name)
+            with measure(self._run_metrics, 'repository_lookup'):
+                return execute_scheduled(
+                    self._request_scheduler, config.raw_token, lambda: self._get_repository(config)
+                )
         except Exception as error:
             log.error('Error while getting repository', error=error, repository=config.full_name)
             raise error
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def _get_repository(self, config: ReleaseConfig) -> Repository:
+        from github.Repository import Repository
+
+        client = self._get_client(config.raw_token)
+
+        if self._metadata_cache:
+            return self._metadata_cache.get_object(client.requester, Repository, f'/repos/{config.full_name}')
+
+        return client.get_repo(config.full_name)
+
+    def _get_client(self, token: Optional[str]) -> Github:
+        from github import Github
+        from github.Auth import Token
+        from github.Consts import DEFAULT_SECONDS_BETWEEN_REQUESTS
+
+        with self._lock:
+            if not (client := self._clients.get(token)):
+                log.debug('Creating GitHub client', has_token=token is not None, pool_size=self._pool_size)
+                auth = Token(token) if token else None
+                if self._request_scheduler:
+                    client = Github(
+                        base_url=self._base_url,
+                        auth=auth,
+                        pool_size=self._pool_size,
+                        seconds_between_requests=None,
+                        retry=None,
+                    )
+                else:
+                    client = Github(
+                        base_url=self._base_url,
+                        auth=auth,
+                        pool_size=self._pool_size,
+                        seconds_between_requests=DEFAULT_SECONDS_BETWEEN_REQUESTS,
+                    )
+                self._clients[token] = client
+
+            return client
@@ -0,0 +1,263 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import asyncio
+import random
+import sys
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, TypeGuard, TypeVar
+
+from context_logger import get_logger
+from requests import ConnectionError, HTTPError, Timeout
+
+from package_downloader import IRunMetrics, increment
+
+if TYPE_CHECKING:
+    from aiohttp import ClientResponseError
+    from github import GithubException
+
+log = get_logger('RequestScheduler')
+
+R = TypeVar('R')
+
+SECONDARY_RATE_LIMIT_MESSAGE = 'secondary rate limit'
+
+
+class RateLimitWaitError(Exception):
+    pass
+
+
+@dataclass
+class RateLimitBudget:
+    remaining: int = -1
+    limit: int = -1
+    reset_at: float = 0.0
+    not_before: float = 0.0
+
+
+class IRequestScheduler(object):
+
+    def execute(self, token: Optional[str], function: Callable[[], R]) -> R:
+        raise NotImplementedError()
+
+    async def execute_async(self, token: Optional[str], function: Callable[[], Awaitable[R]]) -> R:
+        raise NotImplementedError()
+
+
+class RequestScheduler(IRequestScheduler):
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        max_wait: float = 900.0,
+        spacing_threshold: float = 0.1,
+        run_metrics: Optional[IRunMetrics] = None,
+    ) -> None:
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._max_wait = max_wait
+        self._spacing_threshold = spacing_threshold
+        self._run_metrics = run_metrics
+        self._budgets: dict[Optional[str], RateLimitBudget] = {}
+        self._lock = Lock()
+
+    def execute(self, token: Optional[str], function: Callable[[], R]) -> R:
+        attempt = 0
+
+        while True:
+            if (delay := self._reserve(token)) > 0:
+                time.sleep(delay)
+
+            increment(self._run_metrics, 'api_calls')
+
+            try:
+                result = function()
+            except Exception as error:
+                self._retry(token, error, attempt)
+                attempt += 1
+                continue
+
+            self._update(token, _get_result_headers(result))
+
+            return result
+
+    async def execute_async(self, token: Optional[str], function: Callable[[], Awaitable[R]]) -> R:
+        attempt = 0
+
+        while True:
+            if (delay := self._reserve(token)) > 0:
+                await asyncio.sleep(delay)
+
+            increment(self._run_metrics, 'api_calls')
+
+            try:
+                result = await function()
+            except Exception as error:
+                self._retry(token, error, attempt)
+                attempt += 1
+                continue
+
+            self._update(token, _get_result_headers(result))
+
+            return result
+
+    def _retry(self, token: Optional[str], error: Exception, attempt: int) -> None:
+        status, headers = _get_error_response(error)
+        self._update(token, headers)
+
+        delay = self._get_retry_delay(error, status, headers, attempt)
+
+        if attempt >= self._max_retries or delay is None:
+            raise error
+
+        increment(self._run_metrics, 'api_retries')
+        log.warning('GitHub request failed, retrying', status=status, attempt=attempt + 1, delay=delay, error=error)
+        self._defer(token, delay)
+
+    def _reserve(self, token: Optional[str]) -> float:
+        with self._lock:
+            budget = self._budgets.setdefault(token, RateLimitBudget())
+            now = time.time()
+            start = max(now, budget.not_before)
+
+            if budget.remaining == 0 and budget.reset_at > start:
+                start = budget.reset_at
+            elif 0 < budget.remaining < budget.limit * self._spacing_threshold and budget.reset_at > start:
+                budget.not_before = start + (budget.reset_at - start) / budget.remaining
+
+            if budget.remaining > 0:
+                budget.remaining -= 1
+
+        if (delay := start - now) > self._max_wait:
+            log.error('Rate limit wait exceeds maximum', delay=delay, max_wait=self._max_wait)
+            raise RateLimitWaitError(f'Rate limit resets in {delay:.0f} seconds')
+
+        if delay > 0:
+            log.info('Waiting for rate limit budget', delay=delay, remaining=budget.remaining)
+
+        return delay
+
+    def _defer(self, token: Optional[str], delay: float) -> None:
+        with self._lock:
+            budget = self._budgets.setdefault(token, RateLimitBudget())
+            budget.not_before = max(budget.not_before, time.time() + delay)
+
+    def _update(self, token: Optional[str], headers: Mapping[str, Any]) -> None:
+        headers = {str(key).lower(): value for key, value in headers.items()}
+
+        if 'x-ratelimit-remaining' not in headers:
+            return
+
+        with self._lock:
+            budget = self._budgets.setdefault(token, RateLimitBudget())
+            budget.remaining = int(headers['x-ratelimit-remaining'])
+            budget.limit = int(headers.get('x-ratelimit-limit', budget.limit))
+            budget.reset_at = float(headers.get('x-ratelimit-reset', budget.reset_at))
+
+    def _get_retry_delay(
+        self, error: Exception, status: Optional[int], headers: Mapping[str, Any], attempt: int
+    ) -> Optional[float]:
+        headers = {str(key).lower(): value for key, value in headers.items()}
+
+        if status in (403, 429):
+            if (retry_after := _parse_retry_after(headers.get('retry-after'))) is not None:
+                return retry_after
+
+            if str(headers.get('x-ratelimit-remaining')) == '0':
+                return max(0.0, float(headers.get('x-ratelimit-reset', 0)) - time.time())
+
+            if status == 429 or SECONDARY_RATE_LIMIT_MESSAGE in str(error).lower():
+                return self._get_backoff(attempt)
+
+            return None
+
+        if (status is not None and status >= 500) or _is_connection_error(error):
+            return self._get_backoff(attempt)
+
+        return None
+
+    def _get_backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self._max_delay, self._base_delay * 2 ** attempt))
+
+
+def execute_scheduled(scheduler: Optional[IRequestScheduler], token: Optional[str], function: Callable[[], R]) -> R:
+    if scheduler:
+        return scheduler.execute(token, function)
+
+    return function()
+
+
+async def execute_scheduled_async(
+    scheduler: Optional[IRequestScheduler], token: Optional[str], function: Callable[[], Awaitable[R]]
+) -> R:
+    if scheduler:
+        return await scheduler.execute_async(token, function)
+
+    return await function()
+
+
+def _get_error_response(error: Exception) -> tuple[Optional[int], Mapping[str, Any]]:
+    if _is_github_error(error):
+        return error.status, error.headers or {}
+
+    if _is_client_response_error(error):
+        return error.status, error.headers or {}
+
+    if isinstance(error, HTTPError) and error.response is not None:
+        return error.response.status_code, error.response.headers
+
+    return None, {}
+
+
+def _is_github_error(error: Exception) -> TypeGuard[GithubException]:
+    github = sys.modules.get('github')
+
+    return github is not None and isinstance(error, github.GithubException)
+
+
+def _is_client_response_error(error: Exception) -> TypeGuard[ClientResponseError]:
+    aiohttp = sys.modules.get('aiohttp')
+
+    return aiohttp is not None and isinstance(error, aiohttp.ClientResponseError)
+
+
+def _is_connection_error(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, Timeout, asyncio.TimeoutError)):
+        return True
+
+    aiohttp = sys.modules.get('aiohttp')
+
+    return aiohttp is not None and isinstance(error, aiohttp.ClientConnectionError)
+
+
+def _get_result_headers(result: Any) -> Mapping[str, Any]:
+    for name in ['raw_headers', 'headers']:
+        if isinstance(headers := getattr(result, name, None), Mapping):
+            return headers
+
+    return {}
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,504 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import time
+from contextlib import suppress
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Iterable, Iterator, Optional
+from urllib.parse import urlparse
+
+from common_utility import ISessionProvider
+from context_logger import get_logger
+from requests import ConnectionError, HTTPError, RequestException, Response, Timeout
+from requests.exceptions import ChunkedEncodingError
+
+from package_downloader import (
+    IVerifyingFileDownloader,
+    FileDigest,
+    StreamHasher,
+    IntegrityError,
+    IRunMetrics,
+    ITransferShaper,
+    Throttle,
+    shaped_transfer,
+    IMirrorSelector,
+    increment,
+    IDownloadTransaction,
+    get_staging_path,
+    promote_staged,
+    is_downloaded,
+    IStreamWriter,
+    StreamWriter,
+    append_file,
+)
+
+log = get_logger('ResumableDownloader')
+
+PART_SUFFIX = '.part'
+VALIDATOR_SUFFIX = '.validator'
+LAYOUT_SUFFIX = '.ranges'
+THROTTLED_CHUNK_SIZE = 64 * 1024
+
+
+class IncompleteDownloadError(RequestException):
+    pass
+
+
+class StalledTransferError(IncompleteDownloadError):
+    pass
+
+
+class RemoteFileChangedError(Exception):
+    pass
+
+
+class RangeNotSupportedError(RequestException):
+    pass
+
+
+class StallDetector(object):
+
+    def __init__(self, min_rate: int, window: float) -> None:
+        self._min_rate = min_rate
+        self._window = window
+        self._reset()
+
+    def update(self, size: int, paused: float = 0.0) -> None:
+        self._size += size
+        self._paused += paused
+        elapsed = time.monotonic() - self._started - self._paused
+
+        if elapsed < self._window:
+            return
+
+        if self._size < self._min_rate * elapsed:
+            raise StalledTransferError(f'Transfer rate {self._size / elapsed:.0f} B/s below {self._min_rate} B/s')
+
+        self._reset()
+
+    def _reset(self) -> None:
+        self._started = time.monotonic()
+        self._size = 0
+        self._paused = 0.0
+
+
+class ResumableDownloader(IVerifyingFileDownloader):
+
+    def __init__(
+        self,
+        session_provider: ISessionProvider,
+        download_location: str,
+        max_retries: int = 5,
+        parallel_ranges: int = 1,
+        min_range_size: int = 8 * 1024 * 1024,
+        retry_delay: float = 1.0,
+        timeout: float = 30.0,
+        run_metrics: Optional[IRunMetrics] = None,
+        transfer_shaper: Optional[ITransferShaper] = None,
+        mirror_selector: Optional[IMirrorSelector] = None,
+        min_rate: int = 0,
+        stall_timeout: float = 10.0,
+        download_transaction: Optional[IDownloadTransaction] = None,
+        stream_writer: Optional[IStreamWriter] = None,
+    ) -> None:
+        self._session_provider = session_provider
+        self._download_location = download_location
+        self._max_retries = max_retries
+        self._parallel_ranges = max(1, parallel_ranges)
+        self._min_range_size = min_range_size
+        self._retry_delay = retry_delay
+        self._timeout = timeout
+        self._run_metrics = run_metrics
+        self._transfer_shaper = transfer_shaper
+        self._mirror_selector = mirror_selector
+        self._min_rate = min_rate
+        self._stall_timeout = stall_timeout
+        self._download_transaction = download_transaction
+        self._stream_writer = stream_writer or StreamWriter()
+        self._digests: dict[str, str] = {}
+        self._lock = Lock()
+
+    def download(
+        self,
+        url: str,
+        file_name: Optional[str] = None,
+        headers: Optional[dict[str, str]] = None,
+        skip_if_exists: bool = True,
+        chunk_size: int = 1024 * 1024,
+        digest: Optional[FileDigest] = None,
+        mirrors: Optional[list[str]] = None,
+    ) -> str:
+        if os.path.isfile(url):
+            log.info('Local file path provided, skipping download', file=url)
+            return url
+
+        file_path = os.path.join(self._download_location, file_name or os.path.basename(urlparse(url).path))
+
+        with self._lock:
+            self._digests.pop(file_path, None)
+
+        if skip_if_exists and is_downloaded(self._download_transaction, file_path):
+            log.info('File already exists, skipping download', file=file_path)
+            return file_path
+
+        log.info('Downloading file', url=url, file_name=file_name, headers=list((headers or {}).keys()))
+
+        os.makedirs(self._download_location, exist_ok=True)
+        part_path = f'{get_staging_path(self._download_transaction, file_path)}{PART_SUFFIX}'
+        headers = headers or {}
+        hasher = StreamHasher()
+        sources = self._get_sources(url, mirrors)
+        pinned = bool(digest and digest.sha256)
+
+        if self._parallel_ranges > 1 and (probe := self._probe_ranges(sources[0], headers)):
+            self._download_ranges(sources, headers, part_path, *probe, chunk_size, hasher, pinned)
+        else:
+            self._download_range(sources, headers, part_path, chunk_size, hasher=hasher, pinned=pinned)
+
+        if digest:
+            self._verify(part_path, hasher, digest)
+
+        promote_staged(self._download_transaction, part_path, file_path)
+        self._remove_validator(part_path)
+
+        with self._lock:
+            self._digests[file_path] = hasher.hexdigest()
+
+        log.info('Downloaded file', file=file_path)
+
+        return file_path
+
+    def get_digest(self, file_path: str) -> Optional[str]:
+        with self._lock:
+            return self._digests.get(file_path)
+
+    def _get_sources(self, url: str, mirrors: Optional[list[str]]) -> list[str]:
+        sources = [url, *(mirror for mirror in mirrors or [] if mirror != url)]
+
+        if len(sources) > 1 and self._mirror_selector:
+            sources = self._mirror_selector.rank(sources)
+            log.debug('Selected download source', url=sources[0], mirrors=len(sources) - 1)
+
+        return sources
+
+    def _download_range(
+        self,
+        sources: list[str],
+        headers: dict[str, str],
+        part_path: str,
+        chunk_size: int,
+        start: int = 0,
+        end: int = -1,
+        hasher: Optional[StreamHasher] = None,
+        pinned: bool = False,
+    ) -> None:
+        attempt = 0
+        source = 0
+
+        while True:
+            url = sources[source]
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+            if end >= 0 and start + offset > end:
+                return
+
+            if hasher:
+                hasher.catch_up(part_path)
+
+            try:
+                started = time.monotonic()
+                written = self._transfer(url, headers, part_path, chunk_size, offset, start, end, hasher)
+                self._record_transfer(sources, url, time.monotonic() - started, written)
+                return
+            except RequestException as error:
+                if not _is_retryable(error):
+                    sources, source = self._drop_source(sources, source, part_path, pinned, error)
+                    continue
+
+                progressed = os.path.exists(part_path) and os.path.getsize(part_path) > offset
+                attempt = 0 if progressed else attempt + 1
+
+                if attempt > self._max_retries:
+                    log.error('Download failed, giving up', url=url, attempts=attempt, error=error)
+                    raise error
+
+                if len(sources) > 1:
+                    source = (source + 1) % len(sources)
+                    self._fail_over(url, sources[source], part_path, pinned, error)
+                    if source:
+                        continue
+
+                log.warning('Download interrupted, resuming', url=url, offset=offset, attempt=attempt, error=error)
+                time.sleep(self._retry_delay * attempt)
+
+    def _record_transfer(self, sources: list[str], url: str, duration: float, size: int) -> None:
+        if len(sources) > 1 and self._mirror_selector:
+            self._mirror_selector.record_transfer(url, duration, size)
+
+    def _drop_source(
+        self, sources: list[str], source: int, part_path: str, pinned: bool, error: RequestException
+    ) -> tuple[list[str], int]:
+        url = sources[source]
+
+        if len(sources) == 1:
+            log.error('Download failed with permanent error', url=url, error=error)
+            raise error
+
+        remaining = [other for other in sources if other != url]
+        source %= len(remaining)
+        self._fail_over(url, remaining[source], part_path, pinned, error)
+
+        return remaining, source
+
+    def _fail_over(self, url: str, mirror: str, part_path: str, pinned: bool, error: Exception) -> None:
+        log.warning('Download source failed, switching mirror', url=url, mirror=mirror, error=error)
+        increment(self._run_metrics, 'mirror_failovers')
+
+        if self._mirror_selector:
+            self._mirror_selector.record_failure(url)
+
+        self._remove_validator(part_path)
+
+        if not pinned:
+            with suppress(FileNotFoundError):
+                os.remove(part_path)
+
+    def _transfer(
+        self,
+        url: str,
+        headers: dict[str, str],
+        part_path: str,
+        chunk_size: int,
+        offset: int,
+        start: int,
+        end: int,
+        hasher: Optional[StreamHasher],
+    ) -> int:
+        request_headers = dict(headers)
+        ranged = end >= 0
+
+        if offset or ranged:
+            request_headers['Range'] = f'bytes={start + offset}-{end if ranged else ""}'
+
+        if offset and (validator := self._read_validator(part_path)):
+            request_headers['If-Range'] = validator
+
+        session = self._session_provider.get_session()
+
+        with shaped_transfer(self._transfer_shaper, url) as throttle, session.get(
+            url, headers=request_headers, stream=True, timeout=self._timeout
+        ) as response:
+            if response.status_code == 416 and offset and not ranged:
+                log.debug('Requested range not satisfiable, part file already complete', file=part_path)
+                return 0
+
+            response.raise_for_status()
+
+            resumed = response.status_code == 206
+
+            if ranged and not resumed:
+                if 'If-Range' in request_headers:
+                    raise RemoteFileChangedError(f'Validator {request_headers["If-Range"]} no longer matches {url}')
+                raise RangeNotSupportedError(f'Server ignored range request for {url}')
+
+            if offset and not resumed:
+                log.warning('Server does not support range requests, restarting download', url=url)
+
+            if not resumed or not offset:
+                self._write_validator(part_path, _get_validator(response))
+
+            if not resumed and hasher:
+                hasher.reset()
+
+            expected = int(response.headers.get('Content-Length', -1))
+            written = self._write_chunks(response, part_path, resumed, expected, chunk_size, hasher, throttle)
+
+        if 0 <= written < expected:
+            raise IncompleteDownloadError(f'Received {written} of {expected} bytes')
+
+        return written
+
+    def _write_chunks(
+        self,
+        response: Response,
+        part_path: str,
+        append: bool,
+        size: int,
+        chunk_size: int,
+        hasher: Optional[StreamHasher],
+        throttle: Optional[Throttle] = None,
+    ) -> int:
+        stall_detector = StallDetector(self._min_rate, self._stall_timeout) if self._min_rate else None
+        chunk_size = min(chunk_size, self._stream_writer.get_chunk_size())
+
+        if throttle:
+            chunk_size = min(chunk_size, THROTTLED_CHUNK_SIZE)
+
+        chunks = _shape_chunks(response.iter_content(chunk_size=chunk_size), throttle, stall_detector)
+        written = self._stream_writer.write(chunks, part_path, append, size, hasher)
+
+        if self._run_metrics:
+            self._run_metrics.add_bytes(written)
+
+        return written
+
+    def _verify(self, part_path: str, hasher: StreamHasher, digest: FileDigest) -> None:
+        try:
+            digest.verify(os.path.getsize(part_path), hasher.hexdigest())
+        except IntegrityError as error:
+            log.error('Downloaded file failed verification', file=part_path, error=error)
+            os.remove(part_path)
+            self._remove_validator(part_path)
+            raise error
+
+        log.debug('Downloaded file verified', file=part_path, sha256=hasher.hexdigest())
+
+    def _read_validator(self, part_path: str) -> Optional[str]:
+        try:
+            with open(f'{part_path}{VALIDATOR_SUFFIX}', 'r') as file:
+                return file.read() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_validator(self, part_path: str, validator: Optional[str]) -> None:
+        with open(f'{part_path}{VALIDATOR_SUFFIX}', 'w') as file:
+            file.write(validator or '')
+
+    def _remove_validator(self, part_path: str) -> None:
+        with suppress(FileNotFoundError):
+            os.remove(f'{part_path}{VALIDATOR_SUFFIX}')
+
+    def _probe_ranges(self, url: str, headers: dict[str, str]) -> Optional[tuple[int, Optional[str]]]:
+        session = self._session_provider.get_session()
+
+        try:
+            request_headers = dict(headers, Range='bytes=0-0')
+            with session.get(url, headers=request_headers, stream=True, timeout=self._timeout) as response:
+                content_range = response.headers.get('Content-Range', '')
+                if response.status_code != 206 or '/' not in content_range:
+                    return None
+                size = int(content_range.rsplit('/', 1)[1])
+                validator = _get_validator(response)
+        except Exception as error:
+            log.warning('Failed to probe range support', url=url, error=error)
+            return None
+
+        return (size, validator) if size >= self._min_range_size else None
+
+    def _download_ranges(
+        self,
+        sources: list[str],
+        headers: dict[str, str],
+        part_path: str,
+        size: int,
+        validator: Optional[str],
+        chunk_size: int,
+        hasher: StreamHasher,
+        pinned: bool,
+    ) -> None:
+        range_size = -(-size // self._parallel_ranges)
+        ranges = [[start, min(start + range_size, size) - 1] for start in range(0, size, range_size)]
+        range_paths = [f'{part_path}.{index}' for index in range(len(ranges))]
+        layout = {'size': size, 'validator': validator, 'ranges': ranges}
+        layout_path = f'{part_path}{LAYOUT_SUFFIX}'
+
+        if _read_layout(layout_path) != layout or not (validator or pinned):
+            self._discard_ranges(part_path, range_paths)
+            _write_layout(layout_path, layout)
+
+        log.debug('Downloading file in parallel ranges', url=sources[0], size=size, ranges=len(ranges))
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix='ResumableDownloader') as executor:
+                futures = [
+                    executor.submit(
+                        copy_context().run,
+                        self._download_range,
+                        sources,
+                        headers,
+                        range_path,
+                        chunk_size,
+                        start,
+                        end,
+                        None,
+                        pinned,
+                    )
+                    for range_path, (start, end) in zip(range_paths, ranges)
+                ]
+                for future in futures:
+                    future.result()
+        except (RemoteFileChangedError, RangeNotSupportedError) as error:
+            log.warning('Range download not possible, restarting as single stream', url=sources[0], error=error)
+            self._discard_ranges(part_path, range_paths)
+            self._download_range(sources, headers, part_path, chunk_size, hasher=hasher, pinned=pinned)
+            return
+
+        with open(part_path, 'wb'):
+            pass
+
+        for range_path in range_paths:
+            append_file(range_path, part_path)
+
+        self._discard_ranges(part_path, range_paths)
+        hasher.reset()
+        hasher.catch_up(part_path)
+
+    def _discard_ranges(self, part_path: str, range_paths: list[str]) -> None:
+        for range_path in range_paths:
+            with suppress(FileNotFoundError):
+                os.remove(range_path)
+            self._remove_validator(range_path)
+
+        with suppress(FileNotFoundError):
+            os.remove(f'{part_path}{LAYOUT_SUFFIX}')
+
+
+def _get_validator(response: Response) -> Optional[str]:
+    validator: Optional[str] = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    return validator
+
+
+def _read_layout(layout_path: str) -> Any:
+    try:
+        with open(layout_path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_layout(layout_path: str, layout: dict[str, Any]) -> None:
+    with open(layout_path, 'w') as file:
+        json.dump(layout, file)
+
+
+def _is_retryable(error: RequestException) -> bool:
+    if isinstance(error, HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is None or status >= 500 or status == 429
+
+    return isinstance(error, (ConnectionError, Timeout, ChunkedEncodingError, IncompleteDownloadError))
+
+
+def _shape_chunks(
+    chunks: Iterable[bytes], throttle: Optional[Throttle], stall_detector: Optional[StallDetector]
+) -> Iterator[bytes]:
+    for chunk in chunks:
+        paused = _apply_throttle(throttle, len(chunk))
+        if stall_detector:
+            stall_detector.update(len(chunk), paused)
+        yield chunk
+
+
+def _apply_throttle(throttle: Optional[Throttle], size: int) -> float:
+    if not throttle:
+        return 0.0
+
+    started = time.monotonic()
+    throttle(size)
+
+    return time.monotonic() - started
@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, ContextManager, Iterator, Optional
+
+from context_logger import get_logger
+
+log = get_logger('RunMetrics')
+
+
+@dataclass
+class PhaseTiming:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+
+class IRunMetrics(object):
+
+    def measure(self, phase: str) -> ContextManager[None]:
+        raise NotImplementedError()
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        raise NotImplementedError()
+
+    def add_bytes(self, size: int) -> None:
+        raise NotImplementedError()
+
+    def get_report(self) -> dict[str, Any]:
+        raise NotImplementedError()
+
+
+class RunMetrics(IRunMetrics):
+
+    def __init__(self) -> None:
+        self._started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._phases: dict[str, PhaseTiming] = {}
+        self._counters: dict[str, int] = {}
+        self._bytes = 0
+        self._lock = Lock()
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                timing = self._phases.setdefault(phase, PhaseTiming())
+                timing.count += 1
+                timing.total += elapsed
+                timing.max = max(timing.max, elapsed)
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def add_bytes(self, size: int) -> None:
+        with self._lock:
+            self._bytes += size
+
+    def get_report(self) -> dict[str, Any]:
+        duration = time.perf_counter() - self._start
+
+        with self._lock:
+            return {
+                'started_at': self._started_at.isoformat(),
+                'duration': duration,
+                'bytes_transferred': self._bytes,
+                'throughput': self._bytes / duration if duration > 0 else 0.0,
+                'phases': {
+                    phase: {'count': timing.count, 'total': timing.total, 'max': timing.max}
+                    for phase, timing in sorted(self._phases.items())
+                },
+                'counters': dict(sorted(self._counters.items())),
+            }
+
+
+def measure(metrics: Optional[IRunMetrics], phase: str) -> ContextManager[None]:
+    return metrics.measure(phase) if metrics else nullcontext()
+
+
+def increment(metrics: Optional[IRunMetrics], counter: str, value: int = 1) -> None:
+    if metrics:
+        metrics.increment(counter, value)
+
+
+def write_report(metrics: IRunMetrics, report_path: str) -> None:
+    report = metrics.get_report()
+    temp_path = f'{report_path}.tmp'
+
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+
+    with open(temp_path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    os.replace(temp_path, report_path)
+
+    log.info('Run report written', file=report_path, duration=report['duration'], bytes=report['bytes_transferred'])
@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Any
+
+from context_logger import get_logger
+
+from package_downloader import IPackageWatcher
+
+log = get_logger('StatusServer')
+
+STATUS_PATHS = ['/', '/status']
+
+
+class StatusServer(object):
+
+    def __init__(self, watcher: IPackageWatcher, host: str = '127.0.0.1', port: int = 8080) -> None:
+        self._server = StatusHTTPServer((host, port), watcher)
+        self._thread = Thread(target=self._server.serve_forever, name='StatusServer', daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host!s}:{port}'
+
+    def start(self) -> None:
+        self._thread.start()
+        log.info('Status endpoint started', url=f'{self.url}/status')
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class StatusRequestHandler(BaseHTTPRequestHandler):
+    server: 'StatusHTTPServer'
+
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] in STATUS_PATHS:
+            self._send_json(200, self.server.watcher.get_status())
+        else:
+            self._send_json(404, {'message': 'Not Found'})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        log.debug('Status request', request=format % args)
+
+    def _send_json(self, status: int, data: Any) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StatusHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], watcher: IPackageWatcher) -> None:
+        super().__init__(address, StatusRequestHandler)
+        self.watcher = watcher
@@ -0,0 +1,234 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import errno
+import os
+import shutil
+from contextlib import contextmanager
+from ctypes import CDLL, c_int, c_int64, get_errno
+from functools import lru_cache
+from threading import Lock
+from typing import Any, ContextManager, Iterable, Iterator, Optional, Union
+
+from context_logger import get_logger
+
+from package_downloader import StreamHasher
+
+log = get_logger('StreamWriter')
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+MIN_CHUNK_SIZE = 4 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024 * 1024
+FALLOC_FL_KEEP_SIZE = 1
+UNSUPPORTED_COPY_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTSOCK}
+
+
+class StreamFile(object):
+
+    def __init__(self, descriptor: int, buffer: bytearray, hasher: Optional[StreamHasher] = None) -> None:
+        self._descriptor = descriptor
+        self._buffer = memoryview(buffer)
+        self._hasher = hasher
+        self._buffered = 0
+        self._written = 0
+
+    @property
+    def written(self) -> int:
+        return self._written + self._buffered
+
+    def write(self, chunk: Union[bytes, memoryview]) -> None:
+        view = memoryview(chunk)
+
+        if self._buffered + len(view) > len(self._buffer):
+            self.flush()
+
+        if len(view) >= len(self._buffer):
+            self._write(view)
+        else:
+            self._buffer[self._buffered:self._buffered + len(view)] = view
+            self._buffered += len(view)
+
+    def flush(self) -> None:
+        if self._buffered:
+            self._write(self._buffer[:self._buffered])
+            self._buffered = 0
+
+    def _write(self, view: memoryview) -> None:
+        _write_all(self._descriptor, view)
+        self._written += len(view)
+
+        if self._hasher:
+            self._hasher.update(view)
+
+
+class IStreamWriter(object):
+
+    def get_chunk_size(self) -> int:
+        raise NotImplementedError()
+
+    def open(
+        self, file_path: str, append: bool = False, size: Optional[int] = None, hasher: Optional[StreamHasher] = None
+    ) -> ContextManager[StreamFile]:
+        raise NotImplementedError()
+
+    def write(
+        self,
+        chunks: Iterable[bytes],
+        file_path: str,
+        append: bool = False,
+        size: Optional[int] = None,
+        hasher: Optional[StreamHasher] = None,
+    ) -> int:
+        raise NotImplementedError()
+
+
+class StreamWriter(IStreamWriter):
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, preallocate: bool = True) -> None:
+        self._chunk_size = max(MIN_CHUNK_SIZE, chunk_size)
+        self._preallocate = preallocate
+        self._lock = Lock()
+        self._buffers: list[bytearray] = []
+
+    def get_chunk_size(self) -> int:
+        return self._chunk_size
+
+    @contextmanager
+    def open(
+        self, file_path: str, append: bool = False, size: Optional[int] = None, hasher: Optional[StreamHasher] = None
+    ) -> Iterator[StreamFile]:
+        descriptor = os.open(file_path, os.O_WRONLY | os.O_CREAT | (os.O_APPEND if append else os.O_TRUNC), 0o666)
+        buffer = self._acquire_buffer()
+
+        try:
+            if size and self._preallocate:
+                reserve_space(descriptor, os.lseek(descriptor, 0, os.SEEK_END), size)
+
+            stream_file = StreamFile(descriptor, buffer, hasher)
+
+            try:
+                yield stream_file
+            finally:
+                stream_file.flush()
+        finally:
+            self._release_buffer(buffer)
+            os.close(descriptor)
+
+    def write(
+        self,
+        chunks: Iterable[bytes],
+        file_path: str,
+        append: bool = False,
+        size: Optional[int] = None,
+        hasher: Optional[StreamHasher] = None,
+    ) -> int:
+        with self.open(file_path, append, size, hasher) as stream_file:
+            for chunk in chunks:
+                stream_file.write(chunk)
+
+        return stream_file.written
+
+    def _acquire_buffer(self) -> bytearray:
+        with self._lock:
+            return self._buffers.pop() if self._buffers else bytearray(self._chunk_size)
+
+    def _release_buffer(self, buffer: bytearray) -> None:
+        with self._lock:
+            self._buffers.append(buffer)
+
+
+def reserve_space(descriptor: int, offset: int, size: int) -> bool:
+    if size <= 0 or not (fallocate := _get_fallocate()):
+        return False
+
+    if fallocate(descriptor, FALLOC_FL_KEEP_SIZE, offset, size) == 0:
+        return True
+
+    if (error := get_errno()) == errno.ENOSPC:
+        raise OSError(error, os.strerror(error))
+
+    log.debug('Failed to preallocate file space', size=size, error=os.strerror(error))
+
+    return False
+
+
+def copy_file(source_path: str, target_path: str) -> int:
+    with open(source_path, 'rb', buffering=0) as source, open(target_path, 'wb', buffering=0) as target:
+        copied = _transfer(source.fileno(), target.fileno(), os.fstat(source.fileno()).st_size)
+
+    shutil.copystat(source_path, target_path)
+
+    return copied
+
+
+def append_file(source_path: str, target_path: str) -> int:
+    target = os.open(target_path, os.O_WRONLY | os.O_CREAT, 0o666)
+
+    try:
+        with open(source_path, 'rb', buffering=0) as source:
+            return _transfer(source.fileno(), target, os.fstat(source.fileno()).st_size)
+    finally:
+        os.close(target)
+
+
+def _transfer(source: int, target: int, size: int) -> int:
+    reserve_space(target, os.lseek(target, 0, os.SEEK_END), size)
+    copied = 0
+
+    for copy_chunk in (_copy_range, _send_file):
+        try:
+            while copied < size and (count := copy_chunk(source, target, min(size - copied, COPY_CHUNK_SIZE))):
+                copied += count
+            return copied
+        except OSError as error:
+            if error.errno not in UNSUPPORTED_COPY_ERRORS:
+                raise
+            log.debug('Zero-copy transfer not supported, falling back', error=error)
+
+    return copied + _copy_buffered(source, target, size - copied)
+
+
+def _copy_range(source: int, target: int, count: int) -> int:
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, 'copy_file_range not available')
+
+    return os.copy_file_range(source, target, count)
+
+
+def _send_file(source: int, target: int, count: int) -> int:
+    return os.sendfile(target, source, None, count)
+
+
+def _copy_buffered(source: int, target: int, size: int) -> int:
+    buffer = memoryview(bytearray(min(size, DEFAULT_CHUNK_SIZE)))
+    copied = 0
+
+    while copied < size and (count := os.readv(source, [buffer[:min(len(buffer), size - copied)]])):
+        _write_all(target, buffer[:count])
+        copied += count
+
+    return copied
+
+
+def _write_all(descriptor: int, view: memoryview) -> None:
+    position = 0
+
+    while position < len(view):
+        position += os.write(descriptor, view[position:])
+
+
+@lru_cache(maxsize=None)
+def _get_fallocate() -> Optional[Any]:
+    try:
+        libc = CDLL(None, use_errno=True)
+    except OSError:
+        return None
+
+    for name in ('fallocate64', 'fallocate'):
+        if fallocate := getattr(libc, name, None):
+            fallocate.argtypes = [c_int, c_int, c_int64, c_int64]
+            fallocate.restype = c_int
+            return fallocate
+
+    return None
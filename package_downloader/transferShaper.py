@@ -0,0 +1,256 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from threading import Condition, Lock
+from typing import (
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Iterator,
+    Optional,
+    Union,
+)
+from urllib.parse import urlparse
+
+from context_logger import get_logger
+
+log = get_logger('TransferShaper')
+
+RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3}
+RATE_PATTERN = re.compile(r'^(?P<value>\d+(\.\d+)?)\s*(?P<unit>[KMG]?)(I?B)?(/S)?$', re.IGNORECASE)
+
+Throttle = Callable[[int], None]
+AsyncThrottle = Callable[[int], Awaitable[None]]
+
+
+class TokenBucket(object):
+
+    def __init__(self, rate: int, burst: Optional[int] = None) -> None:
+        if rate <= 0:
+            raise ValueError(f'Invalid rate: {rate}')
+        self._rate = rate
+        self._burst = burst if burst is not None else rate
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def consume(self, size: int) -> None:
+        if (delay := self.reserve(size)) > 0:
+            time.sleep(delay)
+
+    def reserve(self, size: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self._burst), self._tokens + (now - self._updated) * self._rate) - size
+            self._updated = now
+            return -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+
+@dataclass
+class TransferOptions:
+    priority: int = 0
+    bucket: Optional[TokenBucket] = None
+
+    @classmethod
+    def create(cls, priority: int = 0, rate_limit: Optional[int] = None) -> 'TransferOptions':
+        return cls(priority, TokenBucket(rate_limit) if rate_limit else None)
+
+
+_transfer_options: ContextVar[TransferOptions] = ContextVar('transfer_options', default=TransferOptions())
+
+
+class PrioritySlots(object):
+
+    def __init__(self, limit: int) -> None:
+        self._limit = max(1, limit)
+        self._active = 0
+        self._waiters: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition = Condition()
+
+    def acquire(self, priority: int = 0) -> None:
+        with self._condition:
+            entry = (-priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+
+            try:
+                while self._active >= self._limit or self._waiters[0] != entry:
+                    self._condition.wait()
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+            self._active += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+
+class AsyncPrioritySlots(object):
+
+    def __init__(self, limit: int) -> None:
+        self._limit = max(1, limit)
+        self._active = 0
+        self._waiters: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, priority: int = 0) -> None:
+        async with self._condition:
+            entry = (-priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+
+            try:
+                while self._active >= self._limit or self._waiters[0] != entry:
+                    await self._condition.wait()
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+            self._active += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+
+class ITransferShaper(object):
+
+    def transfer(self, url: str) -> ContextManager[Optional[Throttle]]:
+        raise NotImplementedError()
+
+    def transfer_async(self, url: str) -> AsyncContextManager[Optional[AsyncThrottle]]:
+        raise NotImplementedError()
+
+
+class TransferShaper(ITransferShaper):
+
+    def __init__(
+        self, max_rate: Optional[int] = None, host_rate: Optional[int] = None, host_connections: Optional[int] = None
+    ) -> None:
+        self._bucket = TokenBucket(max_rate) if max_rate else None
+        self._host_rate = host_rate
+        self._host_connections = host_connections
+        self._host_buckets: dict[str, TokenBucket] = {}
+        self._host_slots: dict[str, PrioritySlots] = {}
+        self._host_async_slots: dict[str, AsyncPrioritySlots] = {}
+        self._lock = Lock()
+
+        if max_rate or host_rate or host_connections:
+            log.info(
+                'Transfer shaping enabled', max_rate=max_rate, host_rate=host_rate, host_connections=host_connections
+            )
+
+    @contextmanager
+    def transfer(self, url: str) -> Iterator[Optional[Throttle]]:
+        options = get_transfer_options()
+        host = urlparse(url).netloc
+        slots = self._get_slots(host)
+
+        if slots:
+            slots.acquire(options.priority)
+
+        try:
+            buckets = [bucket for bucket in [self._bucket, self._get_bucket(host), options.bucket] if bucket]
+            yield (lambda size: _consume(buckets, size)) if buckets else None
+        finally:
+            if slots:
+                slots.release()
+
+    @asynccontextmanager
+    async def transfer_async(self, url: str) -> AsyncIterator[Optional[AsyncThrottle]]:
+        options = get_transfer_options()
+        host = urlparse(url).netloc
+        slots = self._get_async_slots(host)
+
+        if slots:
+            await slots.acquire(options.priority)
+
+        try:
+            buckets = [bucket for bucket in [self._bucket, self._get_bucket(host), options.bucket] if bucket]
+            yield (lambda size: _consume_async(buckets, size)) if buckets else None
+        finally:
+            if slots:
+                await slots.release()
+
+    def _get_slots(self, host: str) -> Optional[PrioritySlots]:
+        if not self._host_connections:
+            return None
+
+        with self._lock:
+            return self._host_slots.setdefault(host, PrioritySlots(self._host_connections))
+
+    def _get_async_slots(self, host: str) -> Optional[AsyncPrioritySlots]:
+        if not self._host_connections:
+            return None
+
+        with self._lock:
+            return self._host_async_slots.setdefault(host, AsyncPrioritySlots(self._host_connections))
+
+    def _get_bucket(self, host: str) -> Optional[TokenBucket]:
+        if not self._host_rate:
+            return None
+
+        with self._lock:
+            if not (bucket := self._host_buckets.get(host)):
+                bucket = self._host_buckets[host] = TokenBucket(self._host_rate)
+            return bucket
+
+
+@contextmanager
+def transfer_options(options: TransferOptions) -> Iterator[None]:
+    token = _transfer_options.set(options)
+
+    try:
+        yield
+    finally:
+        _transfer_options.reset(token)
+
+
+def get_transfer_options() -> TransferOptions:
+    return _transfer_options.get()
+
+
+def shaped_transfer(shaper: Optional[ITransferShaper], url: str) -> ContextManager[Optional[Throttle]]:
+    return shaper.transfer(url) if shaper else nullcontext(None)
+
+
+def shaped_transfer_async(shaper: Optional[ITransferShaper], url: str) -> AsyncContextManager[Optional[AsyncThrottle]]:
+    return shaper.transfer_async(url) if shaper else nullcontext(None)
+
+
+def parse_rate(value: Union[int, str, None]) -> Optional[int]:
+    if value is None or isinstance(value, int):
+        return value
+
+    if not (match := RATE_PATTERN.match(value.strip())):
+        raise ValueError(f'Invalid rate: {value}')
+
+    return int(float(match['value']) * RATE_UNITS[match['unit'].upper()])
+
+
+def _consume(buckets: list[TokenBucket], size: int) -> None:
+    for bucket in buckets:
+        bucket.consume(size)
+
+
+async def _consume_async(buckets: list[TokenBucket], size: int) -> None:
+    for bucket in buckets:
+        if (delay := bucket.reserve(size)) > 0:
+            await asyncio.sleep(delay)
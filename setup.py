@@ -9,11 +9,12 @@ setup(
     author_email='info@effective-range.com',
     packages=['package_downloader'],
     scripts=['bin/debian-package-downloader.py'],
-    package_data={'package_downloader': ['py.typed']},
+    package_data={'package_downloader': ['py.typed', '__init__.pyi']},
     install_requires=[
         'PyGithub',
         'requests',
         'pydantic',
+        'aiohttp',
         'python-context-logger@git+https://github.com/EffectiveRange/python-context-logger.git@latest',
         'python-common-utility@git+https://github.com/EffectiveRange/python-common-utility.git@latest',
     ],
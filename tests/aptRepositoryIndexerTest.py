@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import io
+import os
+import tarfile
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from package_downloader import AptRepositoryIndexer, RunMetrics, parse_control
+
+
+class AptRepositoryIndexerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_generates_packages_and_release_files(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            file_path = create_deb(temp_dir, 'package2', '1.0.0', 'arm64')
+            create_deb(temp_dir, 'package1', '2.0.0', 'all')
+            indexer = AptRepositoryIndexer(temp_dir)
+
+            # When
+            result = indexer.index()
+
+            # Then
+            self.assertEqual(os.path.join(temp_dir, 'Packages'), result)
+            with open(result, 'rb') as file:
+                content = file.read()
+            stanzas = [parse_control(stanza) for stanza in content.decode().strip().split('\n\n')]
+            self.assertEqual(['package1', 'package2'], [stanza['Package'] for stanza in stanzas])
+            self.assertEqual('./package2_1.0.0_arm64.deb', stanzas[1]['Filename'])
+            self.assertEqual(str(os.path.getsize(file_path)), stanzas[1]['Size'])
+            with open(file_path, 'rb') as file:
+                self.assertEqual(hashlib.sha256(file.read()).hexdigest(), stanzas[1]['SHA256'])
+            with gzip.open(f'{result}.gz') as file:
+                self.assertEqual(content, file.read())
+            with open(os.path.join(temp_dir, 'Release')) as file:
+                release = file.read()
+            self.assertIn('Architectures: all arm64', release)
+            self.assertIn(f' {hashlib.sha256(content).hexdigest()} {len(content):>16} Packages\n', release)
+
+    def test_rescans_only_new_and_changed_packages(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            create_deb(temp_dir, 'package1', '1.0.0')
+            file_path = create_deb(temp_dir, 'package2', '1.0.0')
+            AptRepositoryIndexer(temp_dir).index()
+            create_deb(temp_dir, 'package2', '1.1.0', file_name=os.path.basename(file_path))
+            os.utime(file_path, ns=(0, 0))
+            create_deb(temp_dir, 'package3', '1.0.0')
+            run_metrics = RunMetrics()
+            indexer = AptRepositoryIndexer(temp_dir, run_metrics=run_metrics)
+
+            # When
+            result = indexer.index()
+
+            # Then
+            self.assertEqual({'apt_index_reused': 1, 'apt_index_scanned': 2}, run_metrics.get_report()['counters'])
+            with open(result) as file:
+                stanzas = [parse_control(stanza) for stanza in file.read().strip().split('\n\n')]
+            self.assertEqual(['1.0.0', '1.1.0', '1.0.0'], [stanza['Version'] for stanza in stanzas])
+
+    def test_drops_removed_packages_from_index(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            create_deb(temp_dir, 'package1', '1.0.0')
+            file_path = create_deb(temp_dir, 'package2', '1.0.0')
+            indexer = AptRepositoryIndexer(temp_dir)
+            indexer.index()
+            os.remove(file_path)
+
+            # When
+            result = indexer.index()
+
+            # Then
+            with open(result) as file:
+                self.assertNotIn('package2', file.read())
+
+    def test_skips_unreadable_packages(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            create_deb(temp_dir, 'package1', '1.0.0')
+            with open(os.path.join(temp_dir, 'broken.deb'), 'wb') as file:
+                file.write(b'not a package')
+            indexer = AptRepositoryIndexer(temp_dir)
+
+            # When
+            result = indexer.index()
+
+            # Then
+            with open(result) as file:
+                self.assertEqual(1, file.read().count('Package: '))
+
+
+def create_deb(directory: str, package: str, version: str, architecture: str = 'arm64', file_name: str = None) -> str:
+    control = f'Package: {package}\nVersion: {version}\nArchitecture: {architecture}\nDescription: Test\n'.encode()
+    control_tar = io.BytesIO()
+
+    with tarfile.open(fileobj=control_tar, mode='w:gz') as archive:
+        info = tarfile.TarInfo('./control')
+        info.size = len(control)
+        archive.addfile(info, io.BytesIO(control))
+
+    members = [('debian-binary', b'2.0\n'), ('control.tar.gz', control_tar.getvalue())]
+    file_path = os.path.join(directory, file_name or f'{package}_{version}_{architecture}.deb')
+
+    with open(file_path, 'wb') as file:
+        file.write(b'!<arch>\n')
+        for name, data in members:
+            file.write(f'{name:<16}{0:<12}{0:<6}{0:<6}{100644:<8}{len(data):<10}`\n'.encode())
+            file.write(data + (b'\n' if len(data) % 2 else b''))
+
+    return file_path
+
+
+if __name__ == '__main__':
+    unittest.main()
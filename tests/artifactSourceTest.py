@@ -0,0 +1,226 @@
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+from requests import HTTPError
+
+from package_downloader import (
+    ReleaseConfig,
+    GitHubSource,
+    GiteaSource,
+    GitLabSource,
+    HttpIndexSource,
+    ArtifactSourceRouter,
+    MetadataCache,
+    ResolvedAsset,
+    ResolvedRelease,
+    VersionConstraint,
+    find_release,
+)
+
+
+class ArtifactSourceTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_gets_latest_gitea_release_as_plain_record(self):
+        # Given
+        session_provider, session = create_components([create_response({
+            'tag_name': 'v1.2.0',
+            'assets': [{
+                'name': 'package1_1.2.0_arm64.deb',
+                'size': 1024,
+                'browser_download_url': 'https://gitea.example.com/owner1/repo1/releases/download/v1.2.0/p.deb',
+                'created_at': '2024-01-01T00:00:00Z',
+            }],
+        })])
+        source = GiteaSource(session_provider)
+        config = ReleaseConfig(source='gitea', url='https://gitea.example.com/', owner='owner1', repo='repo1',
+                               token='token1')
+
+        # When
+        result = source.get_release(config)
+
+        # Then
+        self.assertEqual(ResolvedRelease('owner1/repo1', 'v1.2.0', [ResolvedAsset(
+            'package1_1.2.0_arm64.deb',
+            1024,
+            'https://gitea.example.com/owner1/repo1/releases/download/v1.2.0/p.deb',
+            '2024-01-01T00:00:00Z',
+        )]), result)
+        session.get.assert_called_once_with(
+            'https://gitea.example.com/api/v1/repos/owner1/repo1/releases/latest',
+            headers={'Accept': 'application/json', 'Authorization': 'token token1'},
+            timeout=30.0,
+        )
+        self.assertEqual(
+            {'Accept': 'application/octet-stream', 'Authorization': 'token token1'}, source.get_headers(config)
+        )
+
+    def test_gets_github_release_by_tag_with_api_asset_urls(self):
+        # Given
+        session_provider, session = create_components([create_response({
+            'tag_name': 'v1.0.0',
+            'assets': [{'name': 'package1.deb', 'size': 10, 'url': 'https://api.github.com/assets/1',
+                        'browser_download_url': 'https://github.com/download/package1.deb',
+                        'updated_at': '2024-01-01T00:00:00Z', 'digest': 'sha256:ABCD'}],
+        })])
+        source = GitHubSource(session_provider)
+        config = ReleaseConfig(owner='owner1', repo='repo1')
+
+        # When
+        result = source.get_release(config, 'v1.0.0')
+
+        # Then
+        self.assertEqual('https://api.github.com/assets/1', result.assets[0].download_url)
+        self.assertEqual('abcd', result.assets[0].sha256)
+        self.assertEqual(
+            'https://api.github.com/repos/owner1/repo1/releases/tags/v1.0.0', session.get.call_args.args[0]
+        )
+
+    def test_lists_published_gitlab_releases_across_pages(self):
+        # Given
+        first_page = [{'tag_name': f'v1.{index}.0', 'assets': {'links': []}} for index in range(50)]
+        second_page = [
+            {'tag_name': 'v2.0.0', 'released_at': '2024-02-01', 'assets': {'links': [
+                {'name': 'package1.deb', 'url': 'https://gitlab.example.com/p.deb',
+                 'direct_asset_url': 'https://gitlab.example.com/direct/p.deb'},
+            ]}},
+            {'tag_name': 'v3.0.0', 'upcoming_release': True, 'assets': {'links': []}},
+        ]
+        session_provider, session = create_components([create_response(first_page), create_response(second_page)])
+        source = GitLabSource(session_provider)
+        config = ReleaseConfig(source='gitlab', url='https://gitlab.example.com', owner='group1', repo='project1',
+                               token='token1')
+
+        # When
+        result = source.list_releases(config)
+        source.list_releases(config)
+
+        # Then
+        self.assertEqual(51, len(result))
+        self.assertEqual(
+            ResolvedRelease('group1/project1', 'v2.0.0', [
+                ResolvedAsset('package1.deb', 0, 'https://gitlab.example.com/direct/p.deb', '2024-02-01'),
+            ]),
+            result[-1],
+        )
+        self.assertEqual(2, session.get.call_count)
+        session.get.assert_called_with(
+            'https://gitlab.example.com/api/v4/projects/group1%2Fproject1/releases?per_page=50&page=2',
+            headers={'Accept': 'application/json', 'PRIVATE-TOKEN': 'token1'},
+            timeout=30.0,
+        )
+
+    def test_returns_none_when_release_not_found(self):
+        # Given
+        response = create_response(None, status_code=404)
+        response.raise_for_status.side_effect = HTTPError('404 Not Found', response=response)
+        session_provider, session = create_components([response])
+        source = GiteaSource(session_provider)
+        config = ReleaseConfig(source='gitea', url='https://gitea.example.com', owner='owner1', repo='repo1')
+
+        # When
+        result = source.get_release(config, 'v9.9.9')
+
+        # Then
+        self.assertIsNone(result)
+
+    def test_gets_latest_version_directory_from_http_index(self):
+        # Given
+        root = ('<a href="../">../</a><a href="?C=N;O=D">Name</a><a href="1.2.0/">1.2.0/</a>'
+                '<a href="1.10.0/">1.10.0/</a><a href="https://other.example.com/x.deb">x</a>')
+        release = '<a href="package1_1.10.0_arm64.deb">package1</a><a href="/debs/1.10.0/sub/">sub/</a>'
+        session_provider, session = create_components([
+            create_response(text=root, url='https://example.com/debs/'),
+            create_response(text=release, url='https://example.com/debs/1.10.0/'),
+        ])
+        source = HttpIndexSource(session_provider)
+        config = ReleaseConfig(source='http', url='https://example.com/debs')
+
+        # When
+        result = source.get_release(config)
+
+        # Then
+        self.assertEqual(ResolvedRelease('https://example.com/debs', '1.10.0', [
+            ResolvedAsset('package1_1.10.0_arm64.deb', 0, 'https://example.com/debs/1.10.0/package1_1.10.0_arm64.deb',
+                          ''),
+        ]), result)
+        self.assertEqual({}, source.get_headers(config))
+
+    def test_lists_http_index_directories_as_releases_and_assets_on_demand(self):
+        # Given
+        session_provider, session = create_components([
+            create_response(text='<a href="1.0.0/">1.0.0/</a><a href="2.0.0/">2.0.0/</a>',
+                            url='https://example.com/debs/'),
+            create_response(text='<a href="package1_1.0.0_all.deb">p</a>', url='https://example.com/debs/1.0.0/'),
+        ])
+        source = HttpIndexSource(session_provider)
+        config = ReleaseConfig(source='http', url='https://example.com/debs/')
+
+        # When
+        release = find_release(source, config, VersionConstraint.parse('<<2.0'))
+        result = source.list_assets(config, release)
+
+        # Then
+        self.assertEqual('1.0.0', release.tag)
+        self.assertEqual(['package1_1.0.0_all.deb'], [asset.name for asset in result])
+        session.get.assert_called_with('https://example.com/debs/1.0.0/', headers=mock.ANY, timeout=30.0)
+
+    def test_serves_repeated_lookups_from_shared_metadata_cache(self):
+        # Given
+        session_provider, session = create_components([create_response({'tag_name': 'v1.0.0', 'assets': []})])
+        config = ReleaseConfig(source='gitea', url='https://gitea.example.com', owner='owner1', repo='repo1')
+
+        with TemporaryDirectory() as cache_dir:
+            source = GiteaSource(session_provider, MetadataCache(cache_dir))
+
+            # When
+            first = source.get_release(config)
+            second = source.get_release(config)
+
+        # Then
+        self.assertEqual(first, second)
+        session.get.assert_called_once()
+
+    def test_raises_error_when_no_source_supports_release(self):
+        # Given
+        session_provider, _ = create_components([])
+        router = ArtifactSourceRouter([GiteaSource(session_provider)])
+        config = ReleaseConfig(source='gitlab', url='https://gitlab.example.com', owner='group1', repo='project1')
+
+        # When
+        with self.assertRaises(ValueError):
+            router.get_release(config)
+
+        # Then
+        self.assertFalse(router.supports(config))
+
+
+def create_components(responses):
+    session_provider = MagicMock(spec=ISessionProvider)
+    session = session_provider.get_session.return_value
+    session.get.side_effect = responses
+    return session_provider, session
+
+
+def create_response(data=None, status_code=200, text='', url=''):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = {}
+    response.json.return_value = data
+    response.text = text
+    response.url = url
+    return response
+
+
+if __name__ == '__main__':
+    unittest.main()
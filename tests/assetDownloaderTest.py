@@ -1,4 +1,6 @@
+import os
 import unittest
+from threading import Barrier
 from unittest import TestCase, mock
 from unittest.mock import MagicMock
 
@@ -7,7 +9,21 @@ from context_logger import setup_logging
 from github.GitRelease import GitRelease
 from github.GitReleaseAsset import GitReleaseAsset
 
-from package_downloader import AssetDownloader, ReleaseConfig
+from package_downloader import (
+    AssetDownloader,
+    ReleaseConfig,
+    IMetadataCache,
+    IPackageStore,
+    IVerifyingFileDownloader,
+    IChecksumResolver,
+    FileDigest,
+    ResolvedRelease,
+    ResolvedAsset,
+    IDeltaUpdater,
+    PlannedFile,
+    PLAN_CACHED,
+    PLAN_DOWNLOAD,
+)
 
 
 class AssetDownloaderTest(TestCase):
@@ -40,7 +56,8 @@ class AssetDownloaderTest(TestCase):
                 mock.call(
                     'url3', 'package2.deb', {'Accept': 'application/octet-stream', 'Authorization': 'token token1'}
                 ),
-            ]
+            ],
+            any_order=True,
         )
 
     def test_returns_downloaded_file_path_when_assets_founds_and_no_token_specified(self):
@@ -60,7 +77,8 @@ class AssetDownloaderTest(TestCase):
             [
                 mock.call('url2', 'package1.deb', {'Accept': 'application/octet-stream'}),
                 mock.call('url3', 'package2.deb', {'Accept': 'application/octet-stream'}),
-            ]
+            ],
+            any_order=True,
         )
 
     def test_downloads_all_files_when_star_matcher_is_specified(self):
@@ -90,7 +108,8 @@ class AssetDownloaderTest(TestCase):
                 mock.call(
                     'url3', 'package2.deb', {'Accept': 'application/octet-stream', 'Authorization': 'token token1'}
                 ),
-            ]
+            ],
+            any_order=True,
         )
 
     def test_returns_downloaded_file_path_when_asset_found_and_first_match_only(self):
@@ -108,6 +127,241 @@ class AssetDownloaderTest(TestCase):
             'url2', 'package1.deb', {'Accept': 'application/octet-stream', 'Authorization': 'token token1'}
         )
 
+    def test_lists_assets_through_metadata_cache_when_configured(self):
+        # Given
+        file_downloader, release = create_components(['/opt/debs/package1.deb'])
+        release.url = 'https://api.github.com/repos/owner1/repo1/releases/1'
+        metadata_cache = MagicMock(spec=IMetadataCache)
+        metadata_cache.get_json.return_value = [
+            {'id': 1, 'name': 'package1.whl', 'url': 'url1'},
+            {'id': 2, 'name': 'package1.deb', 'url': 'url2'},
+        ]
+        asset_downloader = AssetDownloader(file_downloader, metadata_cache)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+
+        # When
+        result = asset_downloader.download(config, release, first_match_only=True)
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb'], result)
+        metadata_cache.get_json.assert_called_once_with(
+            release.requester, 'https://api.github.com/repos/owner1/repo1/releases/1/assets?per_page=100&page=1'
+        )
+        release.get_assets.assert_not_called()
+        file_downloader.download.assert_called_once_with('url2', 'package1.deb', {'Accept': 'application/octet-stream'})
+
+    def test_uses_stored_file_when_asset_unchanged(self):
+        # Given
+        file_downloader, release = create_components()
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_asset_key.return_value = 'key2'
+        package_store.get.return_value = '/opt/debs/package1.deb'
+        asset_downloader = AssetDownloader(file_downloader, package_store=package_store)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+
+        # When
+        result = asset_downloader.download(config, release, first_match_only=True)
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb'], result)
+        package_store.get.assert_called_once_with('key2', 'package1.deb')
+        file_downloader.download.assert_not_called()
+
+    def test_downloads_and_stores_asset_when_asset_changed(self):
+        # Given
+        file_downloader, release = create_components(['/opt/debs/package1.deb'])
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_asset_key.return_value = 'key2'
+        package_store.get.return_value = None
+        package_store.put.return_value = '/opt/debs/package1.deb'
+        asset_downloader = AssetDownloader(file_downloader, package_store=package_store)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+
+        # When
+        result = asset_downloader.download(config, release, first_match_only=True)
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb'], result)
+        file_downloader.download.assert_called_once_with(
+            'url2', 'package1.deb', {'Accept': 'application/octet-stream'}, skip_if_exists=False
+        )
+        package_store.put.assert_called_once_with('key2', '/opt/debs/package1.deb', None)
+
+    def test_plans_stored_and_missing_assets_without_downloading(self):
+        # Given
+        file_downloader, release = create_components()
+        for asset, size in zip(release.get_assets.return_value, (100, 200, 300)):
+            asset.size = size
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_asset_key.side_effect = lambda asset: f'key-{asset.name}'
+        package_store.get_digest.side_effect = lambda key: 'digest1' if key == 'key-package1.deb' else None
+        package_store.get_blob.return_value = '/opt/store/digest1'
+        asset_downloader = AssetDownloader(file_downloader, package_store=package_store)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher='*.deb')
+
+        # When
+        result = asset_downloader.plan(config, release)
+
+        # Then
+        self.assertEqual([
+            PlannedFile('package1.deb', 'url2', PLAN_CACHED, 200),
+            PlannedFile('package2.deb', 'url3', PLAN_DOWNLOAD, 300),
+        ], result)
+        package_store.get.assert_not_called()
+        file_downloader.download.assert_not_called()
+
+    def test_verifies_asset_against_resolved_digest_when_checksum_resolver_configured(self):
+        # Given
+        _, release = create_components()
+        file_downloader = MagicMock(spec=IVerifyingFileDownloader)
+        file_downloader.download.return_value = '/opt/debs/package1.deb'
+        checksum_resolver = MagicMock(spec=IChecksumResolver)
+        checksum_resolver.resolve.return_value = FileDigest('abcd', 1024)
+        asset_downloader = AssetDownloader(file_downloader, checksum_resolver=checksum_resolver)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+
+        # When
+        result = asset_downloader.download(config, release, first_match_only=True)
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb'], result)
+        file_downloader.download.assert_called_once_with(
+            'url2',
+            'package1.deb',
+            {'Accept': 'application/octet-stream'},
+            skip_if_exists=True,
+            digest=FileDigest('abcd', 1024),
+        )
+
+    def test_stores_verified_asset_with_expected_digest(self):
+        # Given
+        _, release = create_components()
+        file_downloader = MagicMock(spec=IVerifyingFileDownloader)
+        file_downloader.download.return_value = '/opt/debs/package1.deb'
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_asset_key.return_value = 'key2'
+        package_store.get.return_value = None
+        package_store.put.return_value = '/opt/debs/package1.deb'
+        asset_downloader = AssetDownloader(file_downloader, package_store=package_store)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+
+        # When
+        asset_downloader.download(config, release, first_match_only=True, digest=FileDigest('abcd'))
+
+        # Then
+        package_store.put.assert_called_once_with('key2', '/opt/debs/package1.deb', 'abcd')
+
+    def test_downloads_resolved_asset_from_download_url(self):
+        # Given
+        file_downloader = MagicMock(spec=IVerifyingFileDownloader)
+        file_downloader.download.return_value = '/opt/debs/package1.deb'
+        file_downloader.get_digest.return_value = 'ef01'
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.create_url_key.return_value = 'key2'
+        package_store.get.return_value = None
+        package_store.put.return_value = '/opt/debs/package1.deb'
+        checksum_resolver = MagicMock(spec=IChecksumResolver)
+        checksum_resolver.resolve_resolved.return_value = FileDigest(None, 1024)
+        asset_downloader = AssetDownloader(
+            file_downloader, package_store=package_store, checksum_resolver=checksum_resolver
+        )
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+        release = ResolvedRelease('owner1/repo1', 'v1.0.0', [
+            ResolvedAsset('package1.whl', 512, 'https://github.com/package1.whl', '2024-01-01T00:00:00Z'),
+            ResolvedAsset('package1.deb', 1024, 'https://github.com/package1.deb', '2024-01-01T00:00:00Z'),
+        ])
+
+        # When
+        result = asset_downloader.download_resolved(config, release, first_match_only=True)
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb'], result)
+        package_store.create_url_key.assert_called_once_with(
+            'https://github.com/package1.deb', None, '2024-01-01T00:00:00Z'
+        )
+        file_downloader.download.assert_called_once_with(
+            'https://github.com/package1.deb',
+            'package1.deb',
+            {'Accept': 'application/octet-stream'},
+            skip_if_exists=False,
+            digest=FileDigest(None, 1024),
+        )
+        package_store.put.assert_called_once_with('key2', '/opt/debs/package1.deb', 'ef01')
+        file_downloader.get_digest.assert_called_once_with('/opt/debs/package1.deb')
+        checksum_resolver.resolve.assert_not_called()
+        checksum_resolver.resolve_resolved.assert_called_once_with(
+            release.assets[1], release.assets, {'Accept': 'application/octet-stream'}
+        )
+
+    def test_verifies_resolved_asset_with_resolved_checksum(self):
+        # Given
+        file_downloader = MagicMock(spec=IVerifyingFileDownloader)
+        file_downloader.download.return_value = '/opt/debs/package1.deb'
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.create_url_key.return_value = 'key2'
+        package_store.get.return_value = None
+        package_store.put.return_value = '/opt/debs/package1.deb'
+        checksum_resolver = MagicMock(spec=IChecksumResolver)
+        checksum_resolver.resolve_resolved.return_value = FileDigest('abcd', 1024)
+        asset_downloader = AssetDownloader(
+            file_downloader, package_store=package_store, checksum_resolver=checksum_resolver
+        )
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+        release = ResolvedRelease('owner1/repo1', 'v1.0.0', [
+            ResolvedAsset('package1.deb', 1024, 'https://github.com/package1.deb', '2024-01-01T00:00:00Z'),
+            ResolvedAsset('SHA256SUMS', 64, 'https://github.com/SHA256SUMS', '2024-01-01T00:00:00Z'),
+        ])
+
+        # When
+        result = asset_downloader.download_resolved(config, release, first_match_only=True, headers={'A': 'b'})
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb'], result)
+        checksum_resolver.resolve_resolved.assert_called_once_with(release.assets[0], release.assets, {'A': 'b'})
+        file_downloader.download.assert_called_once_with(
+            'https://github.com/package1.deb',
+            'package1.deb',
+            {'A': 'b'},
+            skip_if_exists=False,
+            digest=FileDigest('abcd', 1024),
+        )
+        package_store.put.assert_called_once_with('key2', '/opt/debs/package1.deb', 'abcd')
+
+    def test_lists_assets_once_per_release(self):
+        # Given
+        file_downloader, release = create_components(['/opt/debs/package1.deb', '/opt/debs/package2.deb'])
+        asset_downloader = AssetDownloader(file_downloader)
+        config1 = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher='package1*.deb')
+        config2 = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher=['package2*.deb'])
+
+        # When
+        result1 = asset_downloader.download(config1, release, first_match_only=True)
+        result2 = asset_downloader.download(config2, release, first_match_only=True)
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb'], result1)
+        self.assertEqual(['/opt/debs/package2.deb'], result2)
+        release.get_assets.assert_called_once()
+
+    def test_downloads_matching_assets_concurrently(self):
+        # Given
+        file_downloader, release = create_components()
+        barrier = Barrier(2, timeout=5)
+
+        def download(url, file_name, *args):
+            barrier.wait()
+            return f'/opt/debs/{file_name}'
+
+        file_downloader.download.side_effect = download
+        asset_downloader = AssetDownloader(file_downloader, max_workers=2)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+
+        # When
+        result = asset_downloader.download(config, release)
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb', '/opt/debs/package2.deb'], result)
+
     def test_raises_error_when_asset_not_found(self):
         # Given
         file_downloader, release = create_components()
@@ -120,13 +374,42 @@ class AssetDownloaderTest(TestCase):
         # Then
         # Error raised
 
+    def test_rebuilds_asset_from_delta_asset_instead_of_downloading(self):
+        # Given
+        file_downloader, release = create_components()
+        delta_asset = MagicMock(spec=GitReleaseAsset)
+        delta_asset.name = 'package1_1.0_1.1_arm64.bsdiff'
+        delta_asset.url = 'url4'
+        release.get_assets.return_value.append(delta_asset)
+        delta_updater = MagicMock(spec=IDeltaUpdater)
+        delta_updater.update.return_value = '/opt/debs/package1.deb'
+        asset_downloader = AssetDownloader(file_downloader, delta_updater=delta_updater)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher='package1.deb', token='token1')
+        digest = FileDigest('a' * 64, 1024)
+
+        # When
+        result = asset_downloader.download(config, release, first_match_only=True, digest=digest)
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb'], result)
+        delta_updater.update.assert_called_once_with(
+            'package1.deb',
+            digest,
+            {'package1_1.0_1.1_arm64.bsdiff': 'url4'},
+            {'Accept': 'application/octet-stream', 'Authorization': 'token token1'},
+            True,
+        )
+        file_downloader.download.assert_not_called()
+
 
 def create_components(downloaded_files=None):
     if downloaded_files is None:
         downloaded_files = []
+    downloaded_paths = {os.path.basename(path): path for path in downloaded_files}
     file_downloader = MagicMock(spec=IFileDownloader)
-    file_downloader.download.side_effect = downloaded_files
+    file_downloader.download.side_effect = lambda url, file_name, *args, **kwargs: downloaded_paths[file_name]
     release = MagicMock(spec=GitRelease)
+    release.url = 'https://api.github.com/repos/owner1/repo1/releases/1'
     asset1 = MagicMock(spec=GitReleaseAsset)
     asset1.name = 'package1.whl'
     asset1.url = 'url1'
@@ -0,0 +1,80 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from package_downloader import AssetMatcher, ReleaseConfig
+
+ASSETS = [
+    'package1_1.0.0_amd64.deb',
+    'package1_1.0.0_arm64.deb',
+    'package1_1.0.0_all.deb',
+    'package1_1.0.0_arm64.tar.gz',
+    'package1-dbgsym_1.0.0_arm64.ddeb',
+]
+
+
+class AssetMatcherTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_selects_assets_matching_any_pattern(self):
+        # Given
+        asset_matcher = AssetMatcher(('*.deb', '*.tar.gz'))
+
+        # When
+        result = asset_matcher.select(ASSETS, str)
+
+        # Then
+        self.assertEqual(ASSETS[:4], result)
+
+    def test_selects_assets_matching_architecture(self):
+        # Given
+        asset_matcher = AssetMatcher(('*.deb',), ('arm64', 'all'))
+
+        # When
+        result = asset_matcher.select(ASSETS, str)
+
+        # Then
+        self.assertEqual(['package1_1.0.0_arm64.deb', 'package1_1.0.0_all.deb'], result)
+
+    def test_selects_asset_by_pattern_order_when_first_match_only(self):
+        # Given
+        asset_matcher = AssetMatcher(('*_all.deb', '*_arm64.deb'))
+
+        # When
+        result = asset_matcher.select(ASSETS, str, first_match_only=True)
+
+        # Then
+        self.assertEqual(['package1_1.0.0_all.deb'], result)
+
+    def test_returns_empty_list_when_no_asset_matches(self):
+        # Given
+        asset_matcher = AssetMatcher(('*.deb',), ('armhf',))
+
+        # When
+        result = asset_matcher.select(ASSETS, str, first_match_only=True)
+
+        # Then
+        self.assertEqual([], result)
+
+    def test_release_configs_share_compiled_matcher(self):
+        # Given
+        config1 = ReleaseConfig(owner='owner1', repo='repo1', matcher=['*.deb'], architectures=['arm64'])
+        config2 = ReleaseConfig(owner='owner2', repo='repo2', matcher='*.deb', architectures=['arm64'])
+
+        # When
+        result = config1.asset_matcher
+
+        # Then
+        self.assertIs(config2.asset_matcher, result)
+        self.assertTrue(result.matches('package1_1.0.0_arm64.deb'))
+
+
+if __name__ == '__main__':
+    unittest.main()
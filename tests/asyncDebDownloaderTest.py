@@ -0,0 +1,344 @@
+import hashlib
+import os
+import threading
+import unittest
+from contextlib import asynccontextmanager
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+
+from package_downloader import (
+    AsyncDebDownloader,
+    AsyncSessionProvider,
+    PackageConfig,
+    ReleaseConfig,
+    PackageStore,
+    IntegrityError,
+    ILocalPackageIndex,
+    LocalPackage,
+    DebianVersion,
+    VersionConstraint,
+    ITransferShaper,
+    get_transfer_options,
+    IRequestScheduler,
+    IStreamWriter,
+    StreamWriter,
+)
+
+CONTENT = b'package content'
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+class AsyncDebDownloaderTest(IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    async def asyncSetUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.download_dir = self.temp_dir.name
+        self.requests = []
+        self.server = TestServer(self._create_app())
+        await self.server.start_server()
+        self.session_provider = AsyncSessionProvider()
+
+    async def asyncTearDown(self):
+        await self.session_provider.close()
+        await self.server.close()
+        self.temp_dir.cleanup()
+
+    async def test_downloads_package_from_file_url(self):
+        # Given
+        deb_downloader = AsyncDebDownloader(self.session_provider, self.download_dir)
+        config = PackageConfig(package='package1', file_url=str(self.server.make_url('/files/package1.deb')))
+
+        # When
+        result = await deb_downloader.download(config)
+
+        # Then
+        self.assertEqual(os.path.join(self.download_dir, 'package1.deb'), result)
+        self.assertEqual(CONTENT, read_file(result))
+
+    async def test_downloads_package_from_next_mirror_when_source_fails(self):
+        # Given
+        deb_downloader = AsyncDebDownloader(self.session_provider, self.download_dir)
+        file_url = str(self.server.make_url('/broken/package1.deb'))
+        mirror_url = str(self.server.make_url('/files/package1.deb'))
+        config = PackageConfig(package='package1', file_url=file_url, mirrors=[mirror_url], sha256=SHA256)
+
+        # When
+        result = await deb_downloader.download(config)
+
+        # Then
+        self.assertEqual(os.path.join(self.download_dir, 'package1.deb'), result)
+        self.assertEqual(CONTENT, read_file(result))
+        self.assertEqual(
+            ['/broken/package1.deb', '/files/package1.deb'],
+            [request[0] for request in self.requests],
+        )
+
+    async def test_downloads_package_from_release(self):
+        # Given
+        deb_downloader = AsyncDebDownloader(self.session_provider, self.download_dir, api_url=self._api_url())
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher='*armhf.deb', token='token1')
+        config = PackageConfig(package='package1', release=release_config)
+
+        # When
+        result = await deb_downloader.download(config)
+
+        # Then
+        self.assertEqual(os.path.join(self.download_dir, 'package1_1.0.0_armhf.deb'), result)
+        self.assertEqual(CONTENT, read_file(result))
+        self.assertIn(('/assets/2', 'token token1', 'application/octet-stream'), self.requests)
+
+    async def test_schedules_api_requests_with_request_scheduler(self):
+        # Given
+        async def execute_async(token, function):
+            return await function()
+
+        request_scheduler = MagicMock(spec=IRequestScheduler)
+        request_scheduler.execute_async.side_effect = execute_async
+        deb_downloader = AsyncDebDownloader(
+            self.session_provider, self.download_dir, api_url=self._api_url(), request_scheduler=request_scheduler
+        )
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher='*armhf.deb', token='token1')
+        config = PackageConfig(package='package1', release=release_config)
+
+        # When
+        await deb_downloader.download(config)
+
+        # Then
+        self.assertEqual(2, request_scheduler.execute_async.call_count)
+        for call in request_scheduler.execute_async.call_args_list:
+            self.assertEqual('token1', call.args[0])
+
+    async def test_raises_error_when_release_asset_fails_verification(self):
+        # Given
+        deb_downloader = AsyncDebDownloader(self.session_provider, self.download_dir, api_url=self._api_url())
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', matcher='*arm64.deb')
+        config = PackageConfig(package='package1', release=release_config)
+
+        # When
+        with self.assertRaises(IntegrityError):
+            await deb_downloader.download(config)
+
+        # Then
+        self.assertEqual([], os.listdir(self.download_dir))
+
+    async def test_raises_error_when_release_not_found(self):
+        # Given
+        deb_downloader = AsyncDebDownloader(self.session_provider, self.download_dir, api_url=self._api_url())
+        config = PackageConfig(package='package1', release=ReleaseConfig(owner='owner1', repo='repo1', tag='v9.9.9'))
+
+        # When
+        with self.assertRaises(ValueError):
+            await deb_downloader.download(config)
+
+        # Then
+        # Error raised
+
+    async def test_skips_download_when_stored_package_unchanged(self):
+        # Given
+        package_store = PackageStore(self.download_dir, MagicMock(spec=ISessionProvider))
+        deb_downloader = AsyncDebDownloader(
+            self.session_provider, self.download_dir, package_store, api_url=self._api_url()
+        )
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher='*armhf.deb')
+        config = PackageConfig(package='package1', release=release_config)
+        await deb_downloader.download(config)
+
+        # When
+        result = await deb_downloader.download(config)
+
+        # Then
+        self.assertEqual(CONTENT, read_file(result))
+        self.assertEqual(1, len([request for request in self.requests if request[0] == '/assets/2']))
+
+    async def test_downloads_release_matching_version_constraint(self):
+        # Given
+        deb_downloader = AsyncDebDownloader(self.session_provider, self.download_dir, api_url=self._api_url())
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', matcher='*armhf.deb')
+        config = PackageConfig(package='package1', version='<<2.0', release=release_config)
+
+        # When
+        result = await deb_downloader.download(config)
+
+        # Then
+        paths = [request[0] for request in self.requests]
+        self.assertEqual(os.path.join(self.download_dir, 'package1_1.0.0_armhf.deb'), result)
+        self.assertIn('/api/repos/owner1/repo1/releases/1/assets', paths)
+        self.assertNotIn('/api/repos/owner1/repo1/releases/latest', paths)
+
+    async def test_skips_download_when_matching_version_present_locally(self):
+        # Given
+        local_package_index = MagicMock(spec=ILocalPackageIndex)
+        local_package_index.find.return_value = '/opt/debs/package1_1.0.0_armhf.deb'
+        deb_downloader = AsyncDebDownloader(
+            self.session_provider, self.download_dir, api_url=self._api_url(), local_package_index=local_package_index
+        )
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', matcher='*armhf.deb')
+        config = PackageConfig(package='package1', version='<<2.0', release=release_config)
+
+        # When
+        result = await deb_downloader.download(config)
+
+        # Then
+        self.assertEqual('/opt/debs/package1_1.0.0_armhf.deb', result)
+        local_package_index.find.assert_called_once_with(
+            'package1', VersionConstraint.parse('<<2.0'), config.asset_matcher
+        )
+        self.assertEqual([], self.requests)
+
+    async def test_raises_error_when_downloaded_version_does_not_match(self):
+        # Given
+        local_package_index = MagicMock(spec=ILocalPackageIndex)
+        local_package_index.find.return_value = None
+        local_package_index.inspect.return_value = LocalPackage(
+            'package1_1.0.0_armhf.deb', 'package1', DebianVersion.parse('1.0.0'), 'armhf'
+        )
+        deb_downloader = AsyncDebDownloader(
+            self.session_provider, self.download_dir, api_url=self._api_url(), local_package_index=local_package_index
+        )
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher='*armhf.deb')
+        config = PackageConfig(package='package1', version='>=2.0', release=release_config)
+
+        # When
+        with self.assertRaises(ValueError):
+            await deb_downloader.download(config)
+
+        # Then
+        local_package_index.inspect.assert_called_once_with(os.path.join(self.download_dir, 'package1_1.0.0_armhf.deb'))
+
+    async def test_shapes_transfer_with_package_priority_and_rate_limit(self):
+        # Given
+        throttle = AsyncMock()
+        options = []
+
+        @asynccontextmanager
+        async def transfer_async(url):
+            options.append(get_transfer_options())
+            yield throttle
+
+        transfer_shaper = MagicMock(spec=ITransferShaper)
+        transfer_shaper.transfer_async.side_effect = transfer_async
+        deb_downloader = AsyncDebDownloader(self.session_provider, self.download_dir, transfer_shaper=transfer_shaper)
+        file_url = str(self.server.make_url('/files/package1.deb'))
+        config = PackageConfig(package='package1', file_url=file_url, priority=5, max_rate='1KB')
+
+        # When
+        await deb_downloader.download(config)
+
+        # Then
+        transfer_shaper.transfer_async.assert_called_once_with(file_url)
+        throttle.assert_awaited_once_with(len(CONTENT))
+        self.assertEqual(5, options[0].priority)
+        self.assertIsNotNone(options[0].bucket)
+
+    async def test_writes_and_verifies_file_off_the_event_loop(self):
+        # Given
+        writer = StreamWriter()
+        threads = []
+
+        def write(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return writer.write(*args, **kwargs)
+
+        stream_writer = MagicMock(spec=IStreamWriter)
+        stream_writer.write.side_effect = write
+        deb_downloader = AsyncDebDownloader(self.session_provider, self.download_dir, stream_writer=stream_writer)
+        file_url = str(self.server.make_url('/files/package1.deb'))
+        config = PackageConfig(package='package1', file_url=file_url, sha256=SHA256)
+
+        # When
+        result = await deb_downloader.download(config)
+
+        # Then
+        self.assertEqual(CONTENT, read_file(result))
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+
+    def _api_url(self):
+        return str(self.server.make_url('/api'))
+
+    def _create_app(self):
+        api_url = '/api/repos/owner1/repo1/releases'
+
+        async def release(request):
+            self._record(request)
+            if request.match_info.get('tag') == 'v9.9.9':
+                raise web.HTTPNotFound()
+            assets_url = str(self.server.make_url(f'{api_url}/1/assets'))
+            return web.json_response({'id': 1, 'tag_name': 'v1.0.0', 'assets_url': assets_url})
+
+        async def releases(request):
+            self._record(request)
+            return web.json_response(
+                [
+                    create_release(self.server, 3, 'v3.0.0', draft=True),
+                    create_release(self.server, 2, 'v2.0.0'),
+                    create_release(self.server, 1, 'v1.0.0'),
+                ]
+            )
+
+        async def assets(request):
+            self._record(request)
+            return web.json_response(
+                [
+                    create_asset(self.server, 1, 'package1_1.0.0_amd64.deb'),
+                    create_asset(self.server, 2, 'package1_1.0.0_armhf.deb', SHA256),
+                    create_asset(self.server, 3, 'package1_1.0.0_arm64.deb', '0' * 64),
+                ]
+            )
+
+        async def content(request):
+            self._record(request)
+            return web.Response(body=CONTENT, headers={'ETag': '"etag1"'})
+
+        async def broken(request):
+            self._record(request)
+            raise web.HTTPBadGateway()
+
+        app = web.Application()
+        app.router.add_get(api_url, releases)
+        app.router.add_get(api_url + '/tags/{tag}', release)
+        app.router.add_get(api_url + '/latest', release)
+        app.router.add_get(api_url + '/{id}/assets', assets)
+        app.router.add_get('/assets/{id}', content)
+        app.router.add_get('/files/{name}', content)
+        app.router.add_get('/broken/{name}', broken)
+        return app
+
+    def _record(self, request):
+        self.requests.append((request.path, request.headers.get('Authorization'), request.headers.get('Accept')))
+
+
+def create_release(server, release_id, tag, draft=False):
+    assets_url = str(server.make_url(f'/api/repos/owner1/repo1/releases/{release_id}/assets'))
+    return {'id': release_id, 'tag_name': tag, 'assets_url': assets_url, 'draft': draft, 'prerelease': False}
+
+
+def create_asset(server, asset_id, name, sha256=None):
+    return {
+        'id': asset_id,
+        'name': name,
+        'size': len(CONTENT),
+        'updated_at': '2024-01-01T00:00:00Z',
+        'url': str(server.make_url(f'/assets/{asset_id}')),
+        'digest': f'sha256:{sha256}' if sha256 else None,
+    }
+
+
+def read_file(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
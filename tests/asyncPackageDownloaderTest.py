@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock, AsyncMock
+
+from common_utility.jsonLoader import IJsonLoader
+from context_logger import setup_logging
+
+from package_downloader import AsyncPackageDownloader, IAsyncDebDownloader, PackageConfig, IPackageConfigReader
+
+
+class AsyncPackageDownloaderTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_returns_downloaded_files_in_config_order(self):
+        # Given
+        configs = [PackageConfig(package=f'package{index}') for index in range(3)]
+        json_loader, deb_downloader = create_components(configs)
+
+        async def download(config):
+            await asyncio.sleep(0.01 * (3 - int(config.package[-1])))
+            if config.package == 'package1':
+                raise Exception('Failed to download package')
+            return f'/opt/debs/{config.package}.deb'
+
+        deb_downloader.download.side_effect = download
+        package_downloader = AsyncPackageDownloader('path/to/config', json_loader, deb_downloader)
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        self.assertEqual(['/opt/debs/package0.deb', None, '/opt/debs/package2.deb'], result)
+        deb_downloader.close.assert_awaited_once()
+
+    def test_limits_concurrent_downloads(self):
+        # Given
+        configs = [PackageConfig(package=f'package{index}') for index in range(10)]
+        json_loader, deb_downloader = create_components(configs)
+        running = []
+        peak = []
+
+        async def download(config):
+            running.append(config)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(config)
+            return config.package
+
+        deb_downloader.download.side_effect = download
+        package_downloader = AsyncPackageDownloader('path/to/config', json_loader, deb_downloader, max_workers=3)
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        self.assertEqual([config.package for config in configs], result)
+        self.assertEqual(3, max(peak))
+
+    def test_streams_configs_from_reader_with_bounded_pending_downloads(self):
+        # Given
+        json_loader, deb_downloader = create_components([])
+        pending = []
+        peak = []
+
+        async def download(config):
+            pending.append(config)
+            peak.append(len(pending))
+            await asyncio.sleep(0.001)
+            pending.remove(config)
+            return config.package
+
+        deb_downloader.download.side_effect = download
+        config_reader = MagicMock(spec=IPackageConfigReader)
+        config_reader.read.return_value = iter(PackageConfig(package=f'package{index}') for index in range(20))
+        package_downloader = AsyncPackageDownloader(
+            'path/to/config', json_loader, deb_downloader, max_workers=2, config_reader=config_reader
+        )
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        self.assertEqual([f'package{index}' for index in range(20)], result)
+        self.assertLessEqual(max(peak), 2)
+        json_loader.load_list.assert_not_called()
+        deb_downloader.close.assert_awaited_once()
+
+
+def create_components(packages):
+    config_loader = MagicMock(spec=IJsonLoader)
+    config_loader.load_list.return_value = packages
+    deb_downloader = MagicMock(spec=IAsyncDebDownloader)
+    deb_downloader.download = AsyncMock()
+    deb_downloader.close = AsyncMock()
+    return config_loader, deb_downloader
+
+
+if __name__ == '__main__':
+    unittest.main()
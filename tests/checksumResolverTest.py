@@ -0,0 +1,127 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+from github.GitReleaseAsset import GitReleaseAsset
+
+from package_downloader import ChecksumResolver, FileDigest, ResolvedAsset
+
+
+class ChecksumResolverTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_resolves_digest_from_asset_digest_field(self):
+        # Given
+        session_provider, session = create_components()
+        asset = create_asset(1, 'package1.deb', 1024, 'sha256:abcd')
+        checksum_resolver = ChecksumResolver(session_provider)
+
+        # When
+        result = checksum_resolver.resolve(asset, [asset])
+
+        # Then
+        self.assertEqual(FileDigest('abcd', 1024), result)
+        session.get.assert_not_called()
+
+    def test_resolves_digest_from_sibling_checksum_asset(self):
+        # Given
+        session_provider, session = create_components('ABCD\n')
+        asset = create_asset(1, 'package1.deb', 1024)
+        sibling = create_asset(2, 'package1.deb.sha256', 64)
+        checksum_resolver = ChecksumResolver(session_provider, timeout=10.0)
+
+        # When
+        result = checksum_resolver.resolve(asset, [asset, sibling], 'token1')
+
+        # Then
+        self.assertEqual(FileDigest('abcd', 1024), result)
+        session.get.assert_called_once_with(
+            'url2', headers={'Accept': 'application/octet-stream', 'Authorization': 'token token1'}, timeout=10.0
+        )
+
+    def test_resolves_digests_from_sums_asset_once_per_release(self):
+        # Given
+        session_provider, session = create_components('abcd  package1.deb\nef01 *package2.deb\n')
+        asset1 = create_asset(1, 'package1.deb', 1024)
+        asset2 = create_asset(2, 'package2.deb', 2048)
+        sums = create_asset(3, 'SHA256SUMS', 128)
+        checksum_resolver = ChecksumResolver(session_provider)
+
+        # When
+        result1 = checksum_resolver.resolve(asset1, [asset1, asset2, sums])
+        result2 = checksum_resolver.resolve(asset2, [asset1, asset2, sums])
+
+        # Then
+        self.assertEqual(FileDigest('abcd', 1024), result1)
+        self.assertEqual(FileDigest('ef01', 2048), result2)
+        session.get.assert_called_once()
+
+    def test_resolves_size_only_when_no_checksum_available(self):
+        # Given
+        session_provider, session = create_components()
+        asset = create_asset(1, 'package1.deb', 1024)
+        checksum_resolver = ChecksumResolver(session_provider)
+
+        # When
+        result = checksum_resolver.resolve(asset, [asset])
+
+        # Then
+        self.assertEqual(FileDigest(None, 1024), result)
+
+    def test_resolves_resolved_asset_digest_from_digest_field(self):
+        # Given
+        session_provider, session = create_components()
+        asset = ResolvedAsset('package1.deb', 1024, 'https://github.com/package1.deb', '2024-01-01', 'abcd')
+        checksum_resolver = ChecksumResolver(session_provider)
+
+        # When
+        result = checksum_resolver.resolve_resolved(asset, [asset])
+
+        # Then
+        self.assertEqual(FileDigest('abcd', 1024), result)
+        session.get.assert_not_called()
+
+    def test_resolves_resolved_asset_digest_from_sums_asset(self):
+        # Given
+        session_provider, session = create_components('ABCD  package1.deb\n')
+        asset = ResolvedAsset('package1.deb', 0, 'https://example.com/package1.deb', '')
+        sums = ResolvedAsset('SHA256SUMS', 0, 'https://example.com/SHA256SUMS', '')
+        checksum_resolver = ChecksumResolver(session_provider, timeout=10.0)
+
+        # When
+        result = checksum_resolver.resolve_resolved(asset, [asset, sums], {'PRIVATE-TOKEN': 'token1'})
+
+        # Then
+        self.assertEqual(FileDigest('abcd', None), result)
+        session.get.assert_called_once_with(
+            'https://example.com/SHA256SUMS', headers={'PRIVATE-TOKEN': 'token1'}, timeout=10.0
+        )
+
+
+def create_components(content=''):
+    session_provider = MagicMock(spec=ISessionProvider)
+    session = session_provider.get_session.return_value
+    session.get.return_value.text = content
+    return session_provider, session
+
+
+def create_asset(asset_id, name, size, digest=None):
+    asset = MagicMock(spec=GitReleaseAsset)
+    asset.id = asset_id
+    asset.name = name
+    asset.url = f'url{asset_id}'
+    asset.size = size
+    asset.digest = digest
+    return asset
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+from requests import Response, Session
+
+from package_downloader import ConfigSource
+
+CONFIG_URL = 'https://example.com/config/package-config.json'
+
+
+class ConfigSourceTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_reports_local_config_change_by_modification_time(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            config_path = os.path.join(temp_dir, 'package-config.json')
+            with open(config_path, 'w') as file:
+                file.write('[]')
+            config_source = ConfigSource(MagicMock(spec=ISessionProvider), config_path, temp_dir)
+            config_source.fetch()
+
+            # When
+            unchanged = config_source.fetch()
+            os.utime(config_path, ns=(0, 0))
+            changed = config_source.fetch()
+
+            # Then
+            self.assertEqual((config_path, False), unchanged)
+            self.assertEqual((config_path, True), changed)
+
+    def test_downloads_config_and_revalidates_with_validators(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            session_provider, session = create_session_provider()
+            session.get.side_effect = [create_response(200, b'[]', {'ETag': '"abc"'}), create_response(304)]
+            config_source = ConfigSource(session_provider, CONFIG_URL, temp_dir)
+
+            # When
+            first = config_source.fetch()
+            second = config_source.fetch()
+
+            # Then
+            config_path = os.path.join(temp_dir, 'package-config.json')
+            self.assertEqual((config_path, True), first)
+            self.assertEqual((config_path, False), second)
+            session.get.assert_called_with(CONFIG_URL, headers={'If-None-Match': '"abc"'}, timeout=30.0)
+            with open(config_path) as file:
+                self.assertEqual('[]', file.read())
+
+    def test_uses_previous_config_when_fetch_fails(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            session_provider, session = create_session_provider()
+            session.get.side_effect = [create_response(200, b'[]'), ConnectionError('Connection refused')]
+            config_source = ConfigSource(session_provider, CONFIG_URL, temp_dir)
+            config_source.fetch()
+
+            # When
+            result = config_source.fetch()
+
+            # Then
+            self.assertEqual((os.path.join(temp_dir, 'package-config.json'), False), result)
+
+    def test_raises_error_when_first_fetch_fails(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            session_provider, session = create_session_provider()
+            session.get.side_effect = ConnectionError('Connection refused')
+            config_source = ConfigSource(session_provider, CONFIG_URL, temp_dir)
+
+            # Then
+            self.assertRaises(ConnectionError, config_source.fetch)
+
+
+def create_session_provider():
+    session = MagicMock(spec=Session)
+    session_provider = MagicMock(spec=ISessionProvider)
+    session_provider.get_session.return_value = session
+    return session_provider, session
+
+
+def create_response(status_code: int, content: bytes = b'', headers: dict = None) -> Response:
+    response = Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+if __name__ == '__main__':
+    unittest.main()
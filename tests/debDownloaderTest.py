@@ -1,14 +1,37 @@
 import unittest
 from typing import Optional
 from unittest import TestCase
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call
 
 from common_utility import IFileDownloader
 from context_logger import setup_logging
 from github.GitRelease import GitRelease
 from github.Repository import Repository
 
-from package_downloader import IAssetDownloader, DebDownloader, PackageConfig, ReleaseConfig, IRepositoryProvider
+from package_downloader import (
+    IAssetDownloader,
+    DebDownloader,
+    PackageConfig,
+    ReleaseConfig,
+    IRepositoryProvider,
+    IMetadataCache,
+    IPackageStore,
+    IVerifyingFileDownloader,
+    FileDigest,
+    IReleaseResolver,
+    ResolvedRelease,
+    IReleaseIndex,
+    ILocalPackageIndex,
+    LocalPackage,
+    DebianVersion,
+    VersionConstraint,
+    get_transfer_options,
+    ILanCache,
+    PlannedFile,
+    PLAN_CACHED,
+    IArtifactSource,
+    ResolvedAsset,
+)
 
 
 class DebDownloaderTest(TestCase):
@@ -35,6 +58,115 @@ class DebDownloaderTest(TestCase):
         repository_provider.get_repository.assert_not_called()
         release_downloader.download.assert_not_called()
 
+    def test_verifies_file_from_file_url_when_digest_configured(self):
+        # Given
+        repository_provider, release_downloader, _ = create_components()
+        file_downloader = MagicMock(spec=IVerifyingFileDownloader)
+        file_downloader.download.return_value = '/opt/debs/package1.deb'
+        deb_downloader = DebDownloader(repository_provider, release_downloader, file_downloader)
+        package_config = PackageConfig(
+            package='package1', file_url='https://example.com/package1.deb', sha256='abcd', size=1024
+        )
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package1.deb', result)
+        file_downloader.download.assert_called_once_with(
+            'https://example.com/package1.deb', None, None, skip_if_exists=True, digest=FileDigest('abcd', 1024)
+        )
+
+    def test_uses_stored_file_when_file_url_unchanged(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_url_key.return_value = 'key1'
+        package_store.get.return_value = '/opt/debs/package1.deb'
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, package_store=package_store
+        )
+        package_config = PackageConfig(package='package1', file_url='https://example.com/debs/package1.deb?raw=1')
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package1.deb', result)
+        package_store.get.assert_called_once_with('key1', 'package1.deb')
+        file_downloader.download.assert_not_called()
+
+    def test_downloads_and_stores_file_when_file_url_changed(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_url_key.return_value = 'key1'
+        package_store.get.return_value = None
+        package_store.put.return_value = '/opt/debs/package1.deb'
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, package_store=package_store
+        )
+        package_config = PackageConfig(package='package1', file_url='https://example.com/package1.deb')
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package1.deb', result)
+        file_downloader.download.assert_called_once_with(
+            'https://example.com/package1.deb', 'package1.deb', skip_if_exists=False
+        )
+        package_store.put.assert_called_once_with('key1', '/opt/debs/package1.deb', None)
+
+    def test_derives_store_key_from_first_responding_mirror(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_url_key.side_effect = [None, 'key2']
+        package_store.get.return_value = '/opt/debs/package1.deb'
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, package_store=package_store
+        )
+        package_config = PackageConfig(
+            package='package1',
+            file_url='https://example.com/package1.deb',
+            mirrors=['https://mirror1.example.com/package1.deb', 'https://mirror2.example.com/package1.deb'],
+        )
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package1.deb', result)
+        self.assertEqual(
+            [call('https://example.com/package1.deb'), call('https://mirror1.example.com/package1.deb')],
+            package_store.get_url_key.call_args_list,
+        )
+        package_store.get.assert_called_once_with('key2', 'package1.deb')
+
+    def test_uses_lan_cache_before_upstream_when_file_not_stored(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_url_key.return_value = 'key1'
+        package_store.get.return_value = None
+        package_store.put.return_value = '/opt/debs/package1.deb'
+        lan_cache = MagicMock(spec=ILanCache)
+        lan_cache.fetch.return_value = '/opt/debs/package1.deb'
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, package_store=package_store, lan_cache=lan_cache
+        )
+        package_config = PackageConfig(package='package1', file_url='https://example.com/package1.deb', sha256='abcd')
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package1.deb', result)
+        lan_cache.fetch.assert_called_once_with('package1.deb', FileDigest('abcd'))
+        package_store.put.assert_called_once_with('key1', '/opt/debs/package1.deb', 'abcd')
+        file_downloader.download.assert_not_called()
+
     def test_returns_downloaded_file_path_when_download_from_release(self):
         # Given
         repository = MagicMock(spec=Repository)
@@ -52,7 +184,32 @@ class DebDownloaderTest(TestCase):
         file_downloader.download.assert_not_called()
         repository_provider.get_repository.assert_called_once_with(release_config)
         repository.get_release.assert_called_once_with('v1.0.0')
-        release_downloader.download.assert_called_once_with(release_config, release, first_match_only=True)
+        release_downloader.download.assert_called_once_with(
+            release_config, release, first_match_only=True, digest=None
+        )
+
+    def test_uses_resolved_release_when_release_resolver_configured(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        release_downloader.download_resolved.return_value = ['/opt/debs/package2.deb']
+        resolved = ResolvedRelease('owner1/repo1', 'v1.0.0')
+        release_resolver = MagicMock(spec=IReleaseResolver)
+        release_resolver.get.return_value = resolved
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, release_resolver=release_resolver
+        )
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+        package_config = PackageConfig(package='package2', release=release_config)
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package2.deb', result)
+        repository_provider.get_repository.assert_not_called()
+        release_downloader.download_resolved.assert_called_once_with(
+            release_config, resolved, first_match_only=True, digest=None
+        )
 
     def test_downloads_latest_when_download_from_release_and_not_tag_is_specified(self):
         # Given
@@ -71,7 +228,34 @@ class DebDownloaderTest(TestCase):
         file_downloader.download.assert_not_called()
         repository_provider.get_repository.assert_called_once_with(release_config)
         repository.get_latest_release.assert_called_once()
-        release_downloader.download.assert_called_once_with(release_config, release, first_match_only=True)
+        release_downloader.download.assert_called_once_with(
+            release_config, release, first_match_only=True, digest=None
+        )
+
+    def test_gets_release_through_metadata_cache_when_configured(self):
+        # Given
+        repository = MagicMock(spec=Repository)
+        repository.url = 'https://api.github.com/repos/owner1/repo1'
+        release = MagicMock(spec=GitRelease)
+        repository_provider, release_downloader, file_downloader = create_components(repository, release)
+        metadata_cache = MagicMock(spec=IMetadataCache)
+        metadata_cache.get_object.return_value = release
+        deb_downloader = DebDownloader(repository_provider, release_downloader, file_downloader, metadata_cache)
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0/rc1')
+        package_config = PackageConfig(package='package2', release=release_config)
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package2.deb', result)
+        metadata_cache.get_object.assert_called_once_with(
+            repository.requester, GitRelease, 'https://api.github.com/repos/owner1/repo1/releases/tags/v1.0%2Frc1'
+        )
+        repository.get_release.assert_not_called()
+        release_downloader.download.assert_called_once_with(
+            release_config, release, first_match_only=True, digest=None
+        )
 
     def test_raises_error_when_no_download_source_configured(self):
         # Given
@@ -102,6 +286,234 @@ class DebDownloaderTest(TestCase):
         repository_provider.get_repository.assert_called_once_with(release_config)
         repository.get_release.assert_called_once_with('v1.0.0')
 
+    def test_selects_release_by_version_when_no_tag_is_specified(self):
+        # Given
+        repository = MagicMock(spec=Repository)
+        release = MagicMock(spec=GitRelease)
+        repository_provider, release_downloader, file_downloader = create_components(repository, release)
+        release_index = MagicMock(spec=IReleaseIndex)
+        release_index.find.return_value = release
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, release_index=release_index
+        )
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', token='token1')
+        package_config = PackageConfig(package='package2', version='>=1.2,<2', release=release_config)
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package2.deb', result)
+        release_index.find.assert_called_once_with(repository, VersionConstraint.parse('>=1.2,<2'), 'token1')
+        repository.get_latest_release.assert_not_called()
+        release_downloader.download.assert_called_once_with(
+            release_config, release, first_match_only=True, digest=None
+        )
+
+    def test_skips_download_when_matching_version_present_locally(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        local_package_index = MagicMock(spec=ILocalPackageIndex)
+        local_package_index.find.return_value = '/opt/debs/package2_1.2.0_arm64.deb'
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, local_package_index=local_package_index
+        )
+        release_config = ReleaseConfig(owner='owner1', repo='repo1')
+        package_config = PackageConfig(package='package2', version='>=1.2', release=release_config)
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package2_1.2.0_arm64.deb', result)
+        local_package_index.find.assert_called_once_with(
+            'package2', VersionConstraint.parse('>=1.2'), package_config.asset_matcher
+        )
+        repository_provider.get_repository.assert_not_called()
+        release_downloader.download.assert_not_called()
+
+    def test_raises_error_when_downloaded_version_does_not_match(self):
+        # Given
+        repository = MagicMock(spec=Repository)
+        release = MagicMock(spec=GitRelease)
+        repository_provider, release_downloader, file_downloader = create_components(repository, release)
+        local_package_index = MagicMock(spec=ILocalPackageIndex)
+        local_package_index.find.return_value = None
+        local_package_index.inspect.return_value = LocalPackage(
+            '/opt/debs/package2.deb', 'package2', DebianVersion.parse('1.1.0-1')
+        )
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, local_package_index=local_package_index
+        )
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.1.0')
+        package_config = PackageConfig(package='package2', version='1.2.0', release=release_config)
+
+        # When
+        self.assertRaises(ValueError, deb_downloader.download, package_config)
+
+        # Then
+        repository.get_release.assert_called_once_with('v1.1.0')
+        local_package_index.inspect.assert_called_once_with('/opt/debs/package2.deb')
+
+    def test_applies_package_priority_and_rate_limit_to_transfers(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        options = []
+        file_downloader.download.side_effect = lambda url: options.append(get_transfer_options()) or '/opt/debs/p1.deb'
+        deb_downloader = DebDownloader(repository_provider, release_downloader, file_downloader)
+        package_config = PackageConfig(
+            package='package1', file_url='https://example.com/package1.deb', priority=10, max_rate='1MB'
+        )
+
+        # When
+        deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual(10, options[0].priority)
+        self.assertIsNotNone(options[0].bucket)
+        self.assertEqual(0, get_transfer_options().priority)
+
+    def test_passes_mirrors_to_verifying_file_downloader(self):
+        # Given
+        repository_provider, release_downloader, _ = create_components()
+        file_downloader = MagicMock(spec=IVerifyingFileDownloader)
+        file_downloader.download.return_value = '/opt/debs/package1.deb'
+        deb_downloader = DebDownloader(repository_provider, release_downloader, file_downloader)
+        package_config = PackageConfig(
+            package='package1',
+            file_url='https://example.com/package1.deb',
+            mirrors=['https://mirror.example.com/package1.deb'],
+            sha256='abcd',
+        )
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package1.deb', result)
+        file_downloader.download.assert_called_once_with(
+            'https://example.com/package1.deb',
+            'package1.deb',
+            skip_if_exists=True,
+            digest=FileDigest('abcd'),
+            mirrors=['https://mirror.example.com/package1.deb'],
+        )
+
+    def test_falls_back_to_release_when_file_download_fails(self):
+        # Given
+        repository = MagicMock(spec=Repository)
+        release = MagicMock(spec=GitRelease)
+        repository_provider, release_downloader, file_downloader = create_components(repository, release)
+        file_downloader.download.side_effect = ConnectionError('Connection refused')
+        deb_downloader = DebDownloader(repository_provider, release_downloader, file_downloader)
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', matcher='*.deb')
+        package_config = PackageConfig(
+            package='package1',
+            file_url='https://example.com/package1.deb',
+            mirrors=['https://mirror.example.com/package1.deb'],
+            release=release_config,
+        )
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package2.deb', result)
+        self.assertEqual(2, file_downloader.download.call_count)
+        release_downloader.download.assert_called_once_with(
+            release_config, release, first_match_only=True, digest=None
+        )
+
+    def test_plans_cached_file_when_file_url_stored(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        package_store = MagicMock(spec=IPackageStore)
+        package_store.get_url_key.return_value = 'key1'
+        package_store.get_digest.return_value = 'digest1'
+        package_store.get_blob.return_value = '/opt/store/digest1'
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, package_store=package_store
+        )
+        package_config = PackageConfig(
+            package='package1', file_url='https://example.com/debs/package1.deb', sha256='abcd', size=1024
+        )
+
+        # When
+        result = deb_downloader.plan(package_config)
+
+        # Then
+        self.assertEqual(PLAN_CACHED, result.action)
+        self.assertEqual(
+            [PlannedFile('package1.deb', 'https://example.com/debs/package1.deb', PLAN_CACHED, 1024)], result.files
+        )
+        package_store.get.assert_not_called()
+        file_downloader.download.assert_not_called()
+
+    def test_plans_release_assets_without_downloading(self):
+        # Given
+        repository = MagicMock(spec=Repository)
+        release = MagicMock(spec=GitRelease)
+        repository_provider, release_downloader, file_downloader = create_components(repository, release)
+        planned = PlannedFile('package2.deb', 'https://example.com/package2.deb', 'download', 2048)
+        release_downloader.plan.return_value = [planned]
+        deb_downloader = DebDownloader(repository_provider, release_downloader, file_downloader)
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0')
+        package_config = PackageConfig(package='package2', release=release_config)
+
+        # When
+        result = deb_downloader.plan(package_config)
+
+        # Then
+        self.assertEqual([planned], result.files)
+        release_downloader.plan.assert_called_once_with(release_config, release, first_match_only=True)
+        release_downloader.download.assert_not_called()
+
+    def test_downloads_release_from_artifact_source(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        asset = ResolvedAsset('package1_1.2.0_arm64.deb', 1024, 'https://gitea.example.com/p.deb', '2024-01-01')
+        artifact_source = MagicMock(spec=IArtifactSource)
+        artifact_source.supports.return_value = True
+        artifact_source.list_releases.return_value = [
+            ResolvedRelease('owner1/repo1', 'v2.0.0'), ResolvedRelease('owner1/repo1', 'v1.2.0'),
+        ]
+        artifact_source.list_assets.return_value = [asset]
+        artifact_source.get_headers.return_value = {'Authorization': 'token token1'}
+        release_downloader.download_resolved.return_value = ['/opt/debs/package1_1.2.0_arm64.deb']
+        deb_downloader = DebDownloader(
+            repository_provider, release_downloader, file_downloader, artifact_source=artifact_source
+        )
+        release_config = ReleaseConfig(source='gitea', url='https://gitea.example.com', owner='owner1', repo='repo1')
+        package_config = PackageConfig(package='package1', version='<<2.0', release=release_config)
+
+        # When
+        result = deb_downloader.download(package_config)
+
+        # Then
+        self.assertEqual('/opt/debs/package1_1.2.0_arm64.deb', result)
+        release_downloader.download_resolved.assert_called_once_with(
+            release_config,
+            ResolvedRelease('owner1/repo1', 'v1.2.0', [asset]),
+            first_match_only=True,
+            digest=None,
+            headers={'Authorization': 'token token1'},
+        )
+        repository_provider.get_repository.assert_not_called()
+
+    def test_raises_error_when_no_artifact_source_supports_release(self):
+        # Given
+        repository_provider, release_downloader, file_downloader = create_components()
+        deb_downloader = DebDownloader(repository_provider, release_downloader, file_downloader)
+        release_config = ReleaseConfig(source='http', url='https://example.com/debs/')
+        package_config = PackageConfig(package='package1', release=release_config)
+
+        # When
+        with self.assertRaises(ValueError):
+            deb_downloader.download(package_config)
+
+        # Then
+        repository_provider.get_repository.assert_not_called()
+
 
 def create_components(repository: Optional[Repository] = None, release: Optional[GitRelease] = None):
     if repository:
@@ -0,0 +1,75 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from package_downloader import DebianVersion, VersionConstraint, parse_tag_version
+
+
+class DebianVersionTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_parses_epoch_upstream_and_revision(self):
+        # When
+        version = DebianVersion.parse('1:2.0.1-3-1')
+
+        # Then
+        self.assertEqual(DebianVersion(1, '2.0.1-3', '1'), version)
+        self.assertEqual('1:2.0.1-3-1', str(version))
+
+    def test_raises_error_when_version_is_invalid(self):
+        # Then
+        self.assertRaises(ValueError, DebianVersion.parse, 'latest')
+        self.assertRaises(ValueError, DebianVersion.parse, 'a:1.0')
+
+    def test_orders_versions_like_dpkg(self):
+        # Given
+        versions = ['1.0', '1.0~rc1', '1:0.1', '1.10', '1.9', '1.0-1', '1.0+b1', '1.0a']
+
+        # When
+        result = sorted(DebianVersion.parse(version) for version in versions)
+
+        # Then
+        self.assertEqual(['1.0~rc1', '1.0', '1.0-1', '1.0a', '1.0+b1', '1.9', '1.10', '1:0.1'],
+                         [str(version) for version in result])
+        self.assertEqual(DebianVersion.parse('1.002'), DebianVersion.parse('1.2'))
+
+    def test_matches_range_constraint(self):
+        # Given
+        constraint = VersionConstraint.parse('>=1.2, <2')
+
+        # When
+        result = [constraint.matches(DebianVersion.parse(version)) for version in ['1.1', '1.2', '1.10-3', '2.0-1']]
+
+        # Then
+        self.assertEqual([False, True, True, False], result)
+
+    def test_matches_bare_version_ignoring_revision(self):
+        # Given
+        constraint = VersionConstraint.parse('1.2.0')
+
+        # Then
+        self.assertTrue(constraint.matches(DebianVersion.parse('1.2.0-1')))
+        self.assertFalse(constraint.matches(DebianVersion.parse('1.2.1')))
+        self.assertFalse(VersionConstraint.parse('=1.2.0-2').matches(DebianVersion.parse('1.2.0-1')))
+
+    def test_raises_error_when_constraint_is_invalid(self):
+        # Then
+        self.assertRaises(ValueError, VersionConstraint.parse, '>=1.2,')
+        self.assertRaises(ValueError, VersionConstraint.parse, '~>1.2')
+
+    def test_parses_version_from_tag(self):
+        # Then
+        self.assertEqual(DebianVersion.parse('1.2.3'), parse_tag_version('v1.2.3'))
+        self.assertEqual(DebianVersion.parse('2.0'), parse_tag_version('release-2.0'))
+        self.assertIsNone(parse_tag_version('nightly'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import bz2
+import hashlib
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+
+from common_utility import IFileDownloader, ISessionProvider
+from context_logger import setup_logging
+
+from package_downloader import (
+    DeltaUpdater,
+    ILocalPackageIndex,
+    FileDigest,
+    StreamHasher,
+    apply_bsdiff,
+    BSDIFF_MAGIC,
+    RunMetrics,
+)
+
+BASE = b'Package: package1\nVersion: 1.0\n' * 100
+TARGET = BASE[:1500] + b'Version: 1.1\n' + BASE[1500:] + b'trailer'
+
+
+class DeltaUpdaterTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.download_dir = self.temp_dir.name
+        self.base_path = self.write_file('package1_1.0_arm64.deb', BASE)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_applies_bsdiff_delta_across_chunks(self):
+        # Given
+        delta_path = self.write_file('delta.bsdiff', create_simple_delta(BASE, TARGET))
+        target_path = os.path.join(self.download_dir, 'target.deb')
+        hasher = StreamHasher()
+
+        # When
+        with mock.patch('package_downloader.deltaUpdater.DELTA_CHUNK_SIZE', 100):
+            result = apply_bsdiff(self.base_path, delta_path, target_path, hasher)
+
+        # Then
+        self.assertEqual(len(TARGET), result)
+        self.assertEqual(TARGET, read_file(target_path))
+        self.assertEqual(hashlib.sha256(TARGET).hexdigest(), hasher.hexdigest())
+
+    def test_applies_bsdiff_delta_with_backward_seek_and_reads_outside_base_as_zero(self):
+        # Given
+        base_path = self.write_file('base.deb', b'abcd')
+        diff = b'\x01\x01\x01\x01' + b'\x00\x00\x00\x00' + b'\x05\x05'
+        delta = create_delta([(4, 0, -4), (4, 1, 2), (2, 0, 0)], diff, b'!', 11)
+        delta_path = self.write_file('delta.bsdiff', delta)
+        target_path = os.path.join(self.download_dir, 'target.deb')
+
+        # When
+        apply_bsdiff(base_path, delta_path, target_path)
+
+        # Then
+        self.assertEqual(b'bcdeabcd!\x05\x05', read_file(target_path))
+
+    def test_raises_error_when_delta_is_not_bsdiff(self):
+        # Given
+        delta_path = self.write_file('delta.bsdiff', b'VCD\xc4' + bytes(40))
+
+        # When
+        self.assertRaises(
+            ValueError, apply_bsdiff, self.base_path, delta_path, os.path.join(self.download_dir, 'target.deb')
+        )
+
+    def test_rebuilds_package_from_release_delta_asset(self):
+        # Given
+        delta = create_simple_delta(BASE, TARGET)
+        session_provider, file_downloader, local_package_index = self.create_components(delta)
+        run_metrics = RunMetrics()
+        delta_updater = DeltaUpdater(
+            session_provider, file_downloader, self.download_dir, local_package_index, run_metrics=run_metrics
+        )
+        deltas = {'package1_1.0_1.1_arm64.bsdiff': 'url4'}
+
+        # When
+        result = delta_updater.update('package1_1.1_arm64.deb', create_digest(TARGET), deltas, {'Accept': 'binary'})
+
+        # Then
+        self.assertEqual(os.path.join(self.download_dir, 'package1_1.1_arm64.deb'), result)
+        self.assertEqual(TARGET, read_file(result))
+        file_downloader.download.assert_called_once_with(
+            'url4', 'package1_1.0_1.1_arm64.bsdiff', {'Accept': 'binary'}, skip_if_exists=False
+        )
+        self.assertEqual(['package1_1.0_arm64.deb', 'package1_1.1_arm64.deb'], sorted(os.listdir(self.download_dir)))
+        self.assertEqual(1, run_metrics.get_report()['counters']['delta_updates'])
+        session_provider.get_session.assert_not_called()
+
+    def test_rebuilds_package_from_delta_server_without_release_headers(self):
+        # Given
+        delta = create_simple_delta(BASE, TARGET)
+        session_provider, file_downloader, local_package_index = self.create_components(delta)
+        session_provider.get_session.return_value.head.return_value.status_code = 200
+        delta_updater = DeltaUpdater(
+            session_provider, file_downloader, self.download_dir, local_package_index, 'http://deltas.local/'
+        )
+
+        # When
+        result = delta_updater.update('package1_1.1_arm64.deb', create_digest(TARGET), {}, {'Authorization': 'token'})
+
+        # Then
+        self.assertEqual(TARGET, read_file(result))
+        file_downloader.download.assert_called_once_with(
+            'http://deltas.local/package1_1.0_1.1_arm64.bsdiff', 'package1_1.0_1.1_arm64.bsdiff', None,
+            skip_if_exists=False
+        )
+
+    def test_returns_none_and_cleans_up_when_rebuilt_file_fails_verification(self):
+        # Given
+        session_provider, file_downloader, local_package_index = self.create_components(create_simple_delta(BASE, BASE))
+        delta_updater = DeltaUpdater(session_provider, file_downloader, self.download_dir, local_package_index)
+        deltas = {'package1_1.0_1.1_arm64.bsdiff': 'url4'}
+
+        # When
+        result = delta_updater.update('package1_1.1_arm64.deb', create_digest(TARGET), deltas)
+
+        # Then
+        self.assertIsNone(result)
+        self.assertEqual(['package1_1.0_arm64.deb'], os.listdir(self.download_dir))
+
+    def test_returns_none_without_pinned_digest(self):
+        # Given
+        session_provider, file_downloader, local_package_index = self.create_components(b'')
+        delta_updater = DeltaUpdater(session_provider, file_downloader, self.download_dir, local_package_index)
+        deltas = {'package1_1.0_1.1_arm64.bsdiff': 'url4'}
+
+        # When
+        result = delta_updater.update('package1_1.1_arm64.deb', FileDigest(None, len(TARGET)), deltas)
+
+        # Then
+        self.assertIsNone(result)
+        file_downloader.download.assert_not_called()
+
+    def test_returns_none_when_local_base_has_other_architecture(self):
+        # Given
+        session_provider, file_downloader, local_package_index = self.create_components(b'')
+        delta_updater = DeltaUpdater(session_provider, file_downloader, self.download_dir, local_package_index)
+        deltas = {'package1_1.0_1.1_amd64.bsdiff': 'url4'}
+
+        # When
+        result = delta_updater.update('package1_1.1_amd64.deb', create_digest(TARGET), deltas)
+
+        # Then
+        self.assertIsNone(result)
+        self.assertEqual('<<1.1', str(local_package_index.find.call_args.args[1]))
+        file_downloader.download.assert_not_called()
+
+    def create_components(self, delta):
+        session_provider = MagicMock(spec=ISessionProvider)
+        file_downloader = MagicMock(spec=IFileDownloader)
+        file_downloader.download.side_effect = lambda url, file_name, *args, **kwargs: self.write_file(file_name, delta)
+        local_package_index = MagicMock(spec=ILocalPackageIndex)
+        local_package_index.find.return_value = self.base_path
+        return session_provider, file_downloader, local_package_index
+
+    def write_file(self, file_name, content):
+        file_path = os.path.join(self.download_dir, file_name)
+        with open(file_path, 'wb') as file:
+            file.write(content)
+        return file_path
+
+
+def create_digest(content):
+    return FileDigest(hashlib.sha256(content).hexdigest(), len(content))
+
+
+def create_simple_delta(base, target):
+    common = min(len(base), len(target))
+    diff = bytes((new - old) % 256 for new, old in zip(target, base))
+    return create_delta([(common, len(target) - common, 0)], diff, target[common:], len(target))
+
+
+def create_delta(controls, diff, extra, target_size):
+    control = b''.join(encode_offset(value) for triple in controls for value in triple)
+    blocks = [bz2.compress(control), bz2.compress(diff), bz2.compress(extra)]
+    header = BSDIFF_MAGIC + encode_offset(len(blocks[0])) + encode_offset(len(blocks[1])) + encode_offset(target_size)
+    return header + b''.join(blocks)
+
+
+def encode_offset(value):
+    return (abs(value) | (1 << 63 if value < 0 else 0)).to_bytes(8, 'little')
+
+
+def read_file(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
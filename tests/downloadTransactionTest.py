@@ -0,0 +1,172 @@
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+
+from package_downloader import (
+    DownloadTransaction,
+    IDownloadTransaction,
+    run_atomically,
+    STAGING_DIR_NAME,
+    MANIFEST_FILE_NAME,
+    JOURNAL_FILE_NAME,
+    BACKUP_DIR_NAME,
+)
+
+
+class DownloadTransactionTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.download_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_promotes_staged_file_and_records_committed_set_in_manifest(self):
+        # Given
+        transaction = DownloadTransaction(self.download_dir)
+        transaction.begin()
+        file_path = self.stage_and_promote(transaction, 'package1.deb', b'new')
+
+        # When
+        results = transaction.finish([file_path])
+
+        # Then
+        self.assertEqual([file_path], results)
+        self.assertEqual(b'new', read_file(file_path))
+        self.assertEqual([], os.listdir(os.path.join(self.download_dir, STAGING_DIR_NAME)))
+        with open(os.path.join(self.download_dir, MANIFEST_FILE_NAME)) as file:
+            self.assertEqual(['package1.deb'], list(json.load(file)['files']))
+        self.assertTrue(DownloadTransaction(self.download_dir).is_complete(file_path))
+
+    def test_rolls_back_promoted_files_when_package_fails_in_atomic_mode(self):
+        # Given
+        old_path = self.write_file('package1.deb', b'old')
+        transaction = DownloadTransaction(self.download_dir, atomic=True)
+        transaction.begin()
+        self.stage_and_promote(transaction, 'package1.deb', b'new')
+        new_path = self.stage_and_promote(transaction, 'package2.deb', b'new')
+
+        # When
+        results = transaction.finish([old_path, new_path, None])
+
+        # Then
+        self.assertEqual([None, None, None], results)
+        self.assertEqual(b'old', read_file(old_path))
+        self.assertFalse(os.path.exists(new_path))
+        self.assertFalse(os.path.exists(os.path.join(self.download_dir, MANIFEST_FILE_NAME)))
+        self.assertTrue(transaction.is_rolled_back())
+
+    def test_commits_successful_packages_when_others_fail(self):
+        # Given
+        transaction = DownloadTransaction(self.download_dir)
+        transaction.begin()
+        file_path = self.stage_and_promote(transaction, 'package1.deb', b'new')
+
+        # When
+        results = transaction.finish([file_path, None])
+
+        # Then
+        self.assertEqual([file_path, None], results)
+        self.assertTrue(transaction.is_complete(file_path))
+        self.assertFalse(transaction.is_rolled_back())
+
+    def test_rolls_back_interrupted_transaction_on_startup(self):
+        # Given
+        old_path = self.write_file('package1.deb', b'old')
+        transaction = DownloadTransaction(self.download_dir)
+        transaction.begin()
+        self.stage_and_promote(transaction, 'package1.deb', b'new')
+        new_path = self.stage_and_promote(transaction, 'package2.deb', b'new')
+
+        # When
+        DownloadTransaction(self.download_dir)
+
+        # Then
+        self.assertEqual(b'old', read_file(old_path))
+        self.assertFalse(os.path.exists(new_path))
+        self.assertEqual([], os.listdir(os.path.join(self.download_dir, STAGING_DIR_NAME)))
+
+    def test_completes_transaction_committed_before_interruption_on_startup(self):
+        # Given
+        transaction = DownloadTransaction(self.download_dir)
+        transaction.begin()
+        file_path = self.stage_and_promote(transaction, 'package1.deb', b'new')
+        transaction.commit([file_path])
+        with open(os.path.join(self.download_dir, MANIFEST_FILE_NAME)) as file:
+            transaction_id = json.load(file)['transaction']
+        staging_dir = os.path.join(self.download_dir, STAGING_DIR_NAME)
+        os.makedirs(os.path.join(staging_dir, BACKUP_DIR_NAME))
+        self.write_file(os.path.join(STAGING_DIR_NAME, BACKUP_DIR_NAME, 'package1.deb'), b'old')
+        with open(os.path.join(staging_dir, JOURNAL_FILE_NAME), 'w') as file:
+            json.dump({'id': transaction_id, 'files': {'package1.deb': True}}, file)
+
+        # When
+        recovered = DownloadTransaction(self.download_dir)
+
+        # Then
+        self.assertEqual(b'new', read_file(file_path))
+        self.assertTrue(recovered.is_complete(file_path))
+        self.assertEqual([], os.listdir(staging_dir))
+
+    def test_does_not_trust_files_changed_since_commit(self):
+        # Given
+        transaction = DownloadTransaction(self.download_dir)
+        transaction.begin()
+        file_path = self.stage_and_promote(transaction, 'package1.deb', b'new')
+        transaction.commit([file_path])
+        self.write_file('package1.deb', b'truncated')
+        unknown_path = self.write_file('package2.deb', b'unknown')
+
+        # When
+        recovered = DownloadTransaction(self.download_dir)
+
+        # Then
+        self.assertFalse(recovered.is_complete(file_path))
+        self.assertFalse(recovered.is_complete(unknown_path))
+
+    def test_run_atomically_rolls_back_and_reraises_error(self):
+        # Given
+        transaction = MagicMock(spec=IDownloadTransaction)
+        download = MagicMock(side_effect=KeyboardInterrupt())
+
+        # When
+        self.assertRaises(KeyboardInterrupt, run_atomically, transaction, download)
+
+        # Then
+        transaction.begin.assert_called_once()
+        transaction.rollback.assert_called_once()
+        transaction.finish.assert_not_called()
+
+    def stage_and_promote(self, transaction, file_name, content):
+        file_path = os.path.join(self.download_dir, file_name)
+        staged_path = f'{transaction.get_staging_path(file_path)}.part'
+        with open(staged_path, 'wb') as file:
+            file.write(content)
+        transaction.promote(staged_path, file_path)
+        return file_path
+
+    def write_file(self, file_name, content):
+        file_path = os.path.join(self.download_dir, file_name)
+        with open(file_path, 'wb') as file:
+            file.write(content)
+        return file_path
+
+
+def read_file(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from common_utility import IFileDownloader
+from context_logger import setup_logging
+
+from package_downloader import FileDigest, IntegrityError, StreamHasher, download_verified, IVerifyingFileDownloader
+
+CONTENT = b'package content'
+CONTENT_SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+class FileDigestTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'package1.deb')
+        with open(self.file_path, 'wb') as file:
+            file.write(CONTENT)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_verify_passes_when_size_and_hash_match(self):
+        # Given
+        digest = FileDigest(CONTENT_SHA256.upper(), len(CONTENT))
+
+        # When
+        digest.verify(len(CONTENT), CONTENT_SHA256)
+
+        # Then
+        # No error raised
+
+    def test_verify_raises_error_when_size_mismatch(self):
+        # Given
+        digest = FileDigest(size=len(CONTENT) + 1)
+
+        # When
+        self.assertRaises(IntegrityError, digest.verify, len(CONTENT), CONTENT_SHA256)
+
+        # Then
+        # Error raised
+
+    def test_verify_raises_error_when_hash_mismatch(self):
+        # Given
+        digest = FileDigest('0' * 64)
+
+        # When
+        self.assertRaises(IntegrityError, digest.verify, len(CONTENT), CONTENT_SHA256)
+
+        # Then
+        # Error raised
+
+    def test_stream_hasher_hashes_only_new_part_of_file(self):
+        # Given
+        hasher = StreamHasher()
+        hasher.update(CONTENT[:7])
+
+        # When
+        hasher.catch_up(self.file_path)
+
+        # Then
+        self.assertEqual(CONTENT_SHA256, hasher.hexdigest())
+        self.assertEqual(len(CONTENT), hasher.position)
+
+    def test_download_verified_passes_digest_to_verifying_downloader(self):
+        # Given
+        file_downloader = MagicMock(spec=IVerifyingFileDownloader)
+        file_downloader.download.return_value = self.file_path
+        digest = FileDigest(CONTENT_SHA256)
+
+        # When
+        result = download_verified(file_downloader, digest, 'url1', 'package1.deb', {'Accept': 'application/json'})
+
+        # Then
+        self.assertEqual(self.file_path, result)
+        file_downloader.download.assert_called_once_with(
+            'url1', 'package1.deb', {'Accept': 'application/json'}, skip_if_exists=True, digest=digest
+        )
+
+    def test_download_verified_verifies_file_after_download_when_downloader_not_verifying(self):
+        # Given
+        file_downloader = MagicMock(spec=IFileDownloader)
+        file_downloader.download.return_value = self.file_path
+
+        # When
+        result = download_verified(file_downloader, FileDigest(CONTENT_SHA256, len(CONTENT)), 'url1')
+
+        # Then
+        self.assertEqual(self.file_path, result)
+
+    def test_download_verified_removes_file_when_verification_fails(self):
+        # Given
+        file_downloader = MagicMock(spec=IFileDownloader)
+        file_downloader.download.return_value = self.file_path
+
+        # When
+        self.assertRaises(IntegrityError, download_verified, file_downloader, FileDigest('0' * 64), 'url1')
+
+        # Then
+        self.assertFalse(os.path.exists(self.file_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
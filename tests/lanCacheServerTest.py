@@ -0,0 +1,72 @@
+import hashlib
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import urlopen, Request
+
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+
+from package_downloader import LanCacheServer, PackageStore
+
+
+class LanCacheServerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.package_store = PackageStore(self.temp_dir.name, MagicMock(spec=ISessionProvider))
+        file_path = os.path.join(self.temp_dir.name, 'package1.deb')
+        with open(file_path, 'wb') as file:
+            file.write(b'package1')
+        self.package_store.put('asset:1:8:2024-01-01T00:00:00', file_path)
+        self.sha256 = hashlib.sha256(b'package1').hexdigest()
+        self.server = LanCacheServer(self.package_store, '127.0.0.1', 0)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def test_serves_stored_blob_by_digest(self):
+        # When
+        with urlopen(f'{self.server.url}/sha256/{self.sha256}', timeout=5) as response:
+            result = response.read()
+            headers = response.headers
+
+        # Then
+        self.assertEqual(b'package1', result)
+        self.assertEqual(self.sha256, headers['X-Content-SHA256'])
+        self.assertEqual('8', headers['Content-Length'])
+
+    def test_does_not_serve_stored_blob_by_key(self):
+        # Given
+        url = f'{self.server.url}/keys/{quote("asset:1:8:2024-01-01T00:00:00", safe="")}'
+
+        # When
+        with self.assertRaises(HTTPError) as context:
+            urlopen(Request(url, method='HEAD'), timeout=5)
+
+        # Then
+        self.assertEqual(404, context.exception.code)
+
+    def test_returns_not_found_for_unknown_and_invalid_digests(self):
+        for path in [f'/sha256/{"0" * 64}', '/sha256/../../index.json', '/packages']:
+            # When
+            with self.assertRaises(HTTPError) as context:
+                urlopen(f'{self.server.url}{path}', timeout=5)
+
+            # Then
+            self.assertEqual(404, context.exception.code)
+
+
+if __name__ == '__main__':
+    unittest.main()
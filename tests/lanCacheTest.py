@@ -0,0 +1,94 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+from requests.exceptions import ConnectionError
+
+from package_downloader import LanCache, IVerifyingFileDownloader, FileDigest
+
+PEER_URL = 'http://10.0.0.1:8081/'
+SHA256 = 'a' * 64
+
+
+class LanCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_skips_lan_cache_without_trusted_digest(self):
+        # Given
+        session_provider, session, file_downloader = create_components(200, {'X-Content-SHA256': SHA256})
+        lan_cache = LanCache(session_provider, file_downloader, PEER_URL)
+
+        # When
+        result = lan_cache.fetch('package1.deb', FileDigest(size=1024))
+
+        # Then
+        self.assertIsNone(result)
+        session.head.assert_not_called()
+        file_downloader.download.assert_not_called()
+
+    def test_looks_up_artifact_by_pinned_digest(self):
+        # Given
+        session_provider, session, file_downloader = create_components(200, {'X-Content-SHA256': SHA256})
+        lan_cache = LanCache(session_provider, file_downloader, PEER_URL)
+
+        # When
+        result = lan_cache.fetch('package1.deb', FileDigest(SHA256.upper(), 1024))
+
+        # Then
+        self.assertEqual('/opt/debs/package1.deb', result)
+        session.head.assert_called_once_with(f'http://10.0.0.1:8081/sha256/{SHA256}', timeout=2.0)
+        file_downloader.download.assert_called_once_with(
+            f'http://10.0.0.1:8081/sha256/{SHA256}',
+            'package1.deb',
+            None,
+            skip_if_exists=False,
+            digest=FileDigest(SHA256, 1024),
+        )
+
+    def test_returns_none_when_artifact_not_cached(self):
+        # Given
+        session_provider, session, file_downloader = create_components(404)
+        lan_cache = LanCache(session_provider, file_downloader, PEER_URL)
+
+        # When
+        result = lan_cache.fetch('package1.deb', FileDigest(SHA256))
+
+        # Then
+        self.assertIsNone(result)
+        file_downloader.download.assert_not_called()
+
+    def test_skips_lookups_while_peer_unavailable(self):
+        # Given
+        session_provider, session, file_downloader = create_components(200)
+        session.head.side_effect = ConnectionError('Connection refused')
+        lan_cache = LanCache(session_provider, file_downloader, PEER_URL)
+
+        # When
+        first = lan_cache.fetch('package1.deb', FileDigest(SHA256))
+        second = lan_cache.fetch('package2.deb', FileDigest(SHA256))
+
+        # Then
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        session.head.assert_called_once()
+
+
+def create_components(status_code, headers=None):
+    session_provider = MagicMock(spec=ISessionProvider)
+    session = session_provider.get_session.return_value
+    session.head.return_value = MagicMock(status_code=status_code, headers=headers or {})
+    file_downloader = MagicMock(spec=IVerifyingFileDownloader)
+    file_downloader.download.return_value = '/opt/debs/package1.deb'
+    return session_provider, session, file_downloader
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import io
+import os
+import tarfile
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from package_downloader import (
+    LocalPackageIndex,
+    VersionConstraint,
+    DebianVersion,
+    read_deb_control,
+    get_asset_matcher,
+)
+
+
+class LocalPackageIndexTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_reads_control_fields_from_package(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            file_path = create_deb(temp_dir, 'package1', '1.2.0-1', 'xz')
+
+            # When
+            result = read_deb_control(file_path)
+
+            # Then
+            self.assertEqual('package1', result['Package'])
+            self.assertEqual('1.2.0-1', result['Version'])
+            self.assertEqual('Test package\nwith a long description', result['Description'])
+
+    def test_raises_error_when_file_is_not_a_package(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            file_path = os.path.join(temp_dir, 'package1.deb')
+            with open(file_path, 'wb') as file:
+                file.write(b'not a package')
+
+            # Then
+            self.assertRaises(ValueError, read_deb_control, file_path)
+
+    def test_finds_highest_matching_package_version(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            create_deb(temp_dir, 'package1', '1.1.0')
+            expected = create_deb(temp_dir, 'package1', '1.3.0')
+            create_deb(temp_dir, 'package1', '2.0.0')
+            create_deb(temp_dir, 'package2', '1.5.0')
+            local_package_index = LocalPackageIndex(temp_dir)
+
+            # When
+            result = local_package_index.find('package1', VersionConstraint.parse('>=1.2,<2'))
+
+            # Then
+            self.assertEqual(expected, result)
+
+    def test_returns_none_when_no_matching_package_version(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            create_deb(temp_dir, 'package1', '1.1.0')
+            local_package_index = LocalPackageIndex(temp_dir)
+
+            # When
+            result = local_package_index.find('package1', VersionConstraint.parse('>=1.2'))
+
+            # Then
+            self.assertIsNone(result)
+
+    def test_skips_package_built_for_another_architecture(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            create_deb(temp_dir, 'package1', '1.2.0', architecture='amd64')
+            expected = create_deb(temp_dir, 'package1', '1.1.0', architecture='armhf')
+            local_package_index = LocalPackageIndex(temp_dir)
+
+            # When
+            result = local_package_index.find(
+                'package1', VersionConstraint.parse('>=1.0'), get_asset_matcher(('*armhf.deb',))
+            )
+
+            # Then
+            self.assertEqual(expected, result)
+
+    def test_skips_package_named_for_another_architecture(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            create_deb(temp_dir, 'package1', '1.2.0', architecture='amd64', file_name='package1-armhf.deb')
+            local_package_index = LocalPackageIndex(temp_dir)
+
+            # When
+            result = local_package_index.find(
+                'package1', VersionConstraint.parse('>=1.0'), get_asset_matcher(('*.deb',), ('armhf',))
+            )
+
+            # Then
+            self.assertIsNone(result)
+
+    def test_finds_architecture_independent_package(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            expected = create_deb(temp_dir, 'package1', '1:1.2.0-1', architecture='all')
+            local_package_index = LocalPackageIndex(temp_dir)
+
+            # When
+            result = local_package_index.find(
+                'package1', VersionConstraint.parse('>=1.0'), get_asset_matcher(('*.deb',), ('armhf',))
+            )
+
+            # Then
+            self.assertEqual(expected, result)
+
+    def test_inspects_package_again_when_file_changed(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            file_path = create_deb(temp_dir, 'package1', '1.1.0')
+            local_package_index = LocalPackageIndex(temp_dir)
+            local_package_index.inspect(file_path)
+            create_deb(temp_dir, 'package1', '1.2.0-10', file_name=os.path.basename(file_path))
+            os.utime(file_path, ns=(0, 0))
+
+            # When
+            result = local_package_index.inspect(file_path)
+
+            # Then
+            self.assertEqual(DebianVersion.parse('1.2.0-10'), result.version)
+
+
+def create_deb(
+    directory: str,
+    package: str,
+    version: str,
+    compression: str = 'gz',
+    file_name: str = None,
+    architecture: str = 'arm64',
+) -> str:
+    control = (f'Package: {package}\nVersion: {version}\nArchitecture: {architecture}\n'
+               f'Description: Test package\n with a long description\n').encode()
+    control_tar = io.BytesIO()
+
+    with tarfile.open(fileobj=control_tar, mode=f'w:{compression}') as archive:
+        info = tarfile.TarInfo('./control')
+        info.size = len(control)
+        archive.addfile(info, io.BytesIO(control))
+
+    members = [('debian-binary', b'2.0\n'), (f'control.tar.{compression}', control_tar.getvalue())]
+    file_path = os.path.join(directory, file_name or f'{package}_{version}_{architecture}.deb')
+
+    with open(file_path, 'wb') as file:
+        file.write(b'!<arch>\n')
+        for name, data in members:
+            file.write(f'{name:<16}{0:<12}{0:<6}{0:<6}{100644:<8}{len(data):<10}`\n'.encode())
+            file.write(data + (b'\n' if len(data) % 2 else b''))
+
+    return file_path
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+from github.Auth import Token
+from github.GitRelease import GitRelease
+from github.Requester import Requester
+
+from package_downloader import MetadataCache
+
+
+class MetadataCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, 'cache')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_returns_response_and_stores_etag_when_not_cached(self):
+        # Given
+        requester = create_requester([({'etag': '"etag1"'}, {'tag_name': 'v1.0.0'})])
+        metadata_cache = MetadataCache(self.cache_dir)
+
+        # When
+        result = metadata_cache.get_json(requester, '/repos/owner1/repo1/releases/tags/v1.0.0')
+
+        # Then
+        self.assertEqual({'tag_name': 'v1.0.0'}, result)
+        requester.requestJsonAndCheck.assert_called_once_with(
+            'GET', '/repos/owner1/repo1/releases/tags/v1.0.0', headers={}
+        )
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+    def test_returns_cached_response_without_request_when_within_ttl(self):
+        # Given
+        requester = create_requester([({'etag': '"etag1"'}, {'tag_name': 'v1.0.0'})])
+        MetadataCache(self.cache_dir).get_json(requester, '/repos/owner1/repo1/releases/latest')
+        metadata_cache = MetadataCache(self.cache_dir)
+
+        # When
+        result = metadata_cache.get_json(requester, '/repos/owner1/repo1/releases/latest')
+
+        # Then
+        self.assertEqual({'tag_name': 'v1.0.0'}, result)
+        requester.requestJsonAndCheck.assert_called_once()
+
+    def test_revalidates_with_etag_and_returns_cached_response_when_not_modified(self):
+        # Given
+        requester = create_requester(
+            [({'etag': '"etag1"', 'last-modified': 'Mon, 01 Jul 2024'}, {'tag_name': 'v1.0.0'}), ({}, None)]
+        )
+        metadata_cache = MetadataCache(self.cache_dir, ttl=0)
+        metadata_cache.get_json(requester, '/repos/owner1/repo1/releases/latest')
+
+        # When
+        result = metadata_cache.get_json(requester, '/repos/owner1/repo1/releases/latest')
+
+        # Then
+        self.assertEqual({'tag_name': 'v1.0.0'}, result)
+        requester.requestJsonAndCheck.assert_called_with(
+            'GET',
+            '/repos/owner1/repo1/releases/latest',
+            headers={'If-None-Match': '"etag1"', 'If-Modified-Since': 'Mon, 01 Jul 2024'},
+        )
+
+    def test_replaces_cached_response_when_modified(self):
+        # Given
+        requester = create_requester(
+            [({'etag': '"etag1"'}, {'tag_name': 'v1.0.0'}), ({'etag': '"etag2"'}, {'tag_name': 'v2.0.0'})]
+        )
+        metadata_cache = MetadataCache(self.cache_dir, ttl=0)
+        metadata_cache.get_json(requester, '/repos/owner1/repo1/releases/latest')
+
+        # When
+        result = metadata_cache.get_json(requester, '/repos/owner1/repo1/releases/latest')
+
+        # Then
+        self.assertEqual({'tag_name': 'v2.0.0'}, result)
+
+    def test_evicts_least_recently_used_entries_when_size_limit_reached(self):
+        # Given
+        requester = create_requester([({}, {'id': index}) for index in range(3)])
+        metadata_cache = MetadataCache(self.cache_dir, max_entries=2)
+
+        # When
+        for index in range(3):
+            metadata_cache.get_json(requester, f'/repos/owner1/repo{index}')
+            os.utime(metadata_cache._get_file_path(f'/repos/owner1/repo{index}'), (index, index))
+
+        # Then
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+        self.assertFalse(os.path.exists(metadata_cache._get_file_path('/repos/owner1/repo0')))
+
+    def test_keeps_separate_entries_per_token(self):
+        # Given
+        private_requester = create_requester([({}, {'private': True})], Token('token1'))
+        public_requester = create_requester([({}, {'private': False})])
+        metadata_cache = MetadataCache(self.cache_dir)
+        metadata_cache.get_json(private_requester, '/repos/owner1/repo1')
+
+        # When
+        result = metadata_cache.get_json(public_requester, '/repos/owner1/repo1')
+
+        # Then
+        self.assertEqual({'private': False}, result)
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+        for file_name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, file_name)) as file:
+                self.assertNotIn('token1', file.read())
+
+    def test_returns_completed_github_object(self):
+        # Given
+        requester = create_requester([({}, {'tag_name': 'v1.0.0'})])
+        metadata_cache = MetadataCache(self.cache_dir)
+
+        # When
+        result = metadata_cache.get_object(requester, GitRelease, '/repos/owner1/repo1/releases/latest')
+
+        # Then
+        self.assertIsInstance(result, GitRelease)
+        self.assertEqual('v1.0.0', result.tag_name)
+
+
+def create_requester(responses, auth=None):
+    requester = MagicMock(spec=Requester)
+    requester.auth = auth
+    requester.requestJsonAndCheck.side_effect = responses
+    requester.is_not_lazy = True
+    requester.check_me = mock.Mock()
+    return requester
+
+
+if __name__ == '__main__':
+    unittest.main()
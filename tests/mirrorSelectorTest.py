@@ -0,0 +1,106 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from common_utility import ISessionProvider, IFileDownloader
+from context_logger import setup_logging
+from requests.exceptions import ConnectionError
+
+from package_downloader import MirrorSelector, MIRROR_STATS_FILE_NAME, download_mirrored
+
+PRIMARY_URL = 'https://example.com/debs/package1.deb'
+MIRROR_URL = 'https://mirror.example.com/debs/package1.deb'
+
+
+class MirrorSelectorTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_returns_single_source_without_probing(self):
+        # Given
+        session_provider, session = create_components()
+        mirror_selector = MirrorSelector(session_provider)
+
+        # When
+        result = mirror_selector.rank([PRIMARY_URL])
+
+        # Then
+        self.assertEqual([PRIMARY_URL], result)
+        session.head.assert_not_called()
+
+    def test_ranks_unreachable_source_last(self):
+        # Given
+        session_provider, session = create_components(failing_hosts=['example.com'])
+        mirror_selector = MirrorSelector(session_provider)
+
+        # When
+        result = mirror_selector.rank([PRIMARY_URL, MIRROR_URL])
+
+        # Then
+        self.assertEqual([MIRROR_URL, PRIMARY_URL], result)
+        self.assertEqual(2, session.head.call_count)
+
+    def test_ranks_by_throughput_remembered_across_runs(self):
+        with TemporaryDirectory() as temp_dir:
+            # Given
+            state_file = os.path.join(temp_dir, MIRROR_STATS_FILE_NAME)
+            session_provider, session = create_components()
+            mirror_selector = MirrorSelector(session_provider, state_file)
+            mirror_selector.rank([PRIMARY_URL, MIRROR_URL])
+            mirror_selector.record_transfer(PRIMARY_URL, 10.0, 1024 * 1024)
+            mirror_selector.record_transfer(MIRROR_URL, 0.1, 1024 * 1024)
+            session.head.reset_mock()
+
+            # When
+            result = MirrorSelector(session_provider, state_file).rank([PRIMARY_URL, MIRROR_URL])
+
+            # Then
+            self.assertEqual([MIRROR_URL, PRIMARY_URL], result)
+            session.head.assert_not_called()
+
+    def test_downloads_from_next_mirror_when_file_downloader_fails(self):
+        # Given
+        file_downloader = MagicMock(spec=IFileDownloader)
+        file_downloader.download.side_effect = [ConnectionError('Connection refused'), '/opt/debs/package1.deb']
+
+        # When
+        result = download_mirrored(file_downloader, PRIMARY_URL, [MIRROR_URL])
+
+        # Then
+        self.assertEqual('/opt/debs/package1.deb', result)
+        file_downloader.download.assert_called_with(MIRROR_URL, 'package1.deb', skip_if_exists=True)
+
+    def test_raises_error_when_all_mirrors_fail(self):
+        # Given
+        file_downloader = MagicMock(spec=IFileDownloader)
+        file_downloader.download.side_effect = ConnectionError('Connection refused')
+
+        # When
+        self.assertRaises(ConnectionError, download_mirrored, file_downloader, PRIMARY_URL, [MIRROR_URL])
+
+        # Then
+        self.assertEqual(2, file_downloader.download.call_count)
+
+
+def create_components(failing_hosts=None):
+    session_provider = MagicMock(spec=ISessionProvider)
+    session = session_provider.get_session.return_value
+
+    def head(url, **kwargs):
+        if any(f'//{host}/' in url for host in failing_hosts or []):
+            raise ConnectionError('Connection refused')
+        return MagicMock(status_code=200)
+
+    session.head.side_effect = head
+    return session_provider, session
+
+
+if __name__ == '__main__':
+    unittest.main()
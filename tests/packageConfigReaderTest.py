@@ -0,0 +1,113 @@
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from context_logger import setup_logging
+from pydantic import ValidationError
+
+from package_downloader import PackageConfigReader, PackageConfig, ReleaseConfig, is_json_lines
+
+
+class PackageConfigReaderTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_reads_json_array_entry_by_entry_across_chunks(self):
+        # Given
+        entries = [
+            {'package': 'package1', 'file_url': 'https://example.com/package1.deb'},
+            {'package': 'package2', 'release': {'owner': 'owner1', 'repo': 'repo1', 'matcher': '*.deb'}},
+        ]
+        config_path = self.write_config('package-config.json', json.dumps(entries, indent=2))
+        config_reader = PackageConfigReader(chunk_size=7)
+
+        # When
+        result = list(config_reader.read(config_path))
+
+        # Then
+        self.assertEqual(
+            [
+                PackageConfig(package='package1', file_url='https://example.com/package1.deb'),
+                PackageConfig(package='package2', release=ReleaseConfig(owner='owner1', repo='repo1', matcher='*.deb')),
+            ],
+            result,
+        )
+
+    def test_reads_json_lines(self):
+        # Given
+        content = '{"package": "package1"}\n\n{"package": "package2", "priority": 5}\n'
+        config_path = self.write_config('package-config.jsonl', content)
+        config_reader = PackageConfigReader(chunk_size=10)
+
+        # When
+        result = list(config_reader.read(config_path))
+
+        # Then
+        self.assertEqual([PackageConfig(package='package1'), PackageConfig(package='package2', priority=5)], result)
+
+    def test_reads_empty_array(self):
+        # Given
+        config_path = self.write_config('package-config.json', ' [ ] ')
+
+        # When
+        result = list(PackageConfigReader().read(config_path))
+
+        # Then
+        self.assertEqual([], result)
+
+    def test_yields_entries_before_reading_invalid_entry(self):
+        # Given
+        config_path = self.write_config('package-config.json', '[{"package": "package1"}, {"name": "package2"}]')
+        entries = PackageConfigReader().read(config_path)
+
+        # When
+        first = next(entries)
+
+        # Then
+        self.assertEqual(PackageConfig(package='package1'), first)
+        self.assertRaises(ValidationError, next, entries)
+
+    def test_raises_error_when_array_is_not_terminated(self):
+        # Given
+        config_path = self.write_config('package-config.json', '[{"package": "package1"}')
+
+        # When
+        entries = PackageConfigReader(chunk_size=4).read(config_path)
+
+        # Then
+        self.assertEqual(PackageConfig(package='package1'), next(entries))
+        self.assertRaises(ValueError, next, entries)
+
+    def test_raises_error_when_entry_exceeds_maximum_size(self):
+        # Given
+        config_path = self.write_config('package-config.json', '[{"package": "' + 'x' * 100)
+        config_reader = PackageConfigReader(chunk_size=8, max_entry_size=32)
+
+        # When
+        self.assertRaises(ValueError, list, config_reader.read(config_path))
+
+    def test_detects_json_lines_by_file_extension(self):
+        self.assertTrue(is_json_lines('/opt/config/packages.JSONL'))
+        self.assertTrue(is_json_lines('/opt/config/packages.ndjson'))
+        self.assertFalse(is_json_lines('/opt/config/packages.json'))
+
+    def write_config(self, file_name, content):
+        config_path = os.path.join(self.temp_dir.name, file_name)
+        with open(config_path, 'w') as file:
+            file.write(content)
+        return config_path
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,21 @@
 import unittest
+from threading import Barrier
 from unittest import TestCase, mock
 from unittest.mock import MagicMock
 
 from common_utility.jsonLoader import IJsonLoader
 from context_logger import setup_logging
 
-from package_downloader import PackageDownloader, IDebDownloader, PackageConfig
+from package_downloader import (
+    PackageDownloader,
+    IDebDownloader,
+    PackageConfig,
+    IReleaseResolver,
+    ReleaseConfig,
+    RunMetrics,
+    IPackageConfigReader,
+    IDownloadTransaction,
+)
 
 
 class PackageDownloaderTest(TestCase):
@@ -44,6 +54,160 @@ class PackageDownloaderTest(TestCase):
         # Then
         deb_downloader.download.assert_has_calls([mock.call(config1), mock.call(config2)])
 
+    def test_returns_downloaded_files_in_config_order(self):
+        # Given
+        config1 = PackageConfig(package='package1', version='1.0.0')
+        config2 = PackageConfig(package='package2', version='2.0.0')
+        json_loader, deb_downloader = create_components([config1, config2])
+        deb_downloader.download.side_effect = ['/opt/debs/package1', Exception('Failed to download package')]
+        package_downloader = PackageDownloader('path/to/config', json_loader, deb_downloader)
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        self.assertEqual(['/opt/debs/package1', None], result)
+
+    def test_downloads_packages_concurrently_when_multiple_workers_configured(self):
+        # Given
+        configs = [PackageConfig(package=f'package{index}', version='1.0.0') for index in range(4)]
+        json_loader, deb_downloader = create_components(configs)
+        barrier = Barrier(len(configs), timeout=5)
+
+        def download(config):
+            barrier.wait()
+            if config.package == 'package2':
+                raise Exception('Failed to download package')
+            return f'/opt/debs/{config.package}.deb'
+
+        deb_downloader.download.side_effect = download
+        package_downloader = PackageDownloader('path/to/config', json_loader, deb_downloader, max_workers=4)
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        self.assertEqual(['/opt/debs/package0.deb', '/opt/debs/package1.deb', None, '/opt/debs/package3.deb'], result)
+        deb_downloader.download.assert_has_calls([mock.call(config) for config in configs], any_order=True)
+
+    def test_resolves_releases_before_downloading_when_release_resolver_configured(self):
+        # Given
+        release_config = ReleaseConfig(owner='owner1', repo='repo1')
+        config1 = PackageConfig(package='package1', file_url='https://example.com/package1.deb')
+        config2 = PackageConfig(package='package2', release=release_config)
+        json_loader, deb_downloader = create_components([config1, config2])
+        release_resolver = MagicMock(spec=IReleaseResolver)
+        package_downloader = PackageDownloader(
+            'path/to/config', json_loader, deb_downloader, release_resolver=release_resolver
+        )
+
+        # When
+        package_downloader.download_packages()
+
+        # Then
+        release_resolver.resolve.assert_called_once_with([release_config])
+        deb_downloader.download.assert_has_calls([mock.call(config1), mock.call(config2)])
+
+    def test_records_package_timings_and_outcomes_when_run_metrics_configured(self):
+        # Given
+        config1 = PackageConfig(package='package1', version='1.0.0')
+        config2 = PackageConfig(package='package2', version='2.0.0')
+        json_loader, deb_downloader = create_components([config1, config2])
+        deb_downloader.download.side_effect = ['/opt/debs/package1', Exception('Failed to download package')]
+        run_metrics = RunMetrics()
+        package_downloader = PackageDownloader(
+            'path/to/config', json_loader, deb_downloader, run_metrics=run_metrics
+        )
+
+        # When
+        package_downloader.download_packages()
+
+        # Then
+        report = run_metrics.get_report()
+        self.assertEqual({'packages_downloaded': 1, 'packages_failed': 1}, report['counters'])
+        self.assertEqual(1, report['phases']['config_load']['count'])
+        self.assertEqual(2, report['phases']['package']['count'])
+
+    def test_downloads_higher_priority_packages_first(self):
+        # Given
+        config1 = PackageConfig(package='package1')
+        config2 = PackageConfig(package='package2', priority=10)
+        config3 = PackageConfig(package='package3', priority=5)
+        json_loader, deb_downloader = create_components([config1, config2, config3])
+        deb_downloader.download.side_effect = lambda config: f'/opt/debs/{config.package}'
+        package_downloader = PackageDownloader('path/to/config', json_loader, deb_downloader)
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        deb_downloader.download.assert_has_calls([mock.call(config2), mock.call(config3), mock.call(config1)])
+        self.assertEqual(['/opt/debs/package1', '/opt/debs/package2', '/opt/debs/package3'], result)
+
+    def test_streams_configs_from_reader_and_resolves_releases_per_batch(self):
+        # Given
+        release_config = ReleaseConfig(owner='owner1', repo='repo1', matcher='*.deb')
+        configs = [PackageConfig(package='package1', release=release_config), PackageConfig(package='package2')]
+        json_loader, deb_downloader = create_components([])
+        deb_downloader.download.side_effect = lambda config: f'/opt/debs/{config.package}.deb'
+        config_reader = MagicMock(spec=IPackageConfigReader)
+        config_reader.read.return_value = iter(configs)
+        release_resolver = MagicMock(spec=IReleaseResolver)
+        package_downloader = PackageDownloader(
+            'path/to/config', json_loader, deb_downloader, 2, release_resolver, config_reader=config_reader
+        )
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        self.assertEqual(['/opt/debs/package1.deb', '/opt/debs/package2.deb'], result)
+        config_reader.read.assert_called_once_with('path/to/config')
+        json_loader.load_list.assert_not_called()
+        release_resolver.resolve.assert_called_once_with([release_config])
+
+    def test_limits_pending_downloads_while_streaming(self):
+        # Given
+        json_loader, deb_downloader = create_components([])
+        deb_downloader.download.side_effect = lambda config: config.package
+        read = []
+
+        def read_configs(config_path):
+            for index in range(20):
+                read.append(index)
+                yield PackageConfig(package=f'package{index}')
+
+        config_reader = MagicMock(spec=IPackageConfigReader)
+        config_reader.read.side_effect = read_configs
+        package_downloader = PackageDownloader(
+            'path/to/config', json_loader, deb_downloader, 1, config_reader=config_reader
+        )
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        self.assertEqual([f'package{index}' for index in range(20)], result)
+        self.assertEqual(list(range(20)), read)
+
+    def test_commits_downloaded_packages_through_download_transaction(self):
+        # Given
+        json_loader, deb_downloader = create_components([PackageConfig(package='package1')])
+        deb_downloader.download.return_value = '/opt/debs/package1.deb'
+        download_transaction = MagicMock(spec=IDownloadTransaction)
+        download_transaction.finish.return_value = [None]
+        package_downloader = PackageDownloader(
+            'path/to/config', json_loader, deb_downloader, download_transaction=download_transaction
+        )
+
+        # When
+        result = package_downloader.download_packages()
+
+        # Then
+        self.assertEqual([None], result)
+        download_transaction.begin.assert_called_once()
+        download_transaction.finish.assert_called_once_with(['/opt/debs/package1.deb'])
+
 
 def create_components(packages):
     config_loader = MagicMock(spec=IJsonLoader)
@@ -0,0 +1,79 @@
+import ast
+import os
+import subprocess
+import sys
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+import package_downloader
+
+PACKAGE_DIR = os.path.dirname(package_downloader.__file__)
+
+
+class PackageImportTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_exports_every_public_name_of_every_module(self):
+        # Given
+        modules = sorted(file[:-3] for file in os.listdir(PACKAGE_DIR) if file.endswith('.py') and file[0] != '_')
+
+        # When
+        exported = {module: get_public_names(module) for module in modules}
+
+        # Then
+        self.assertEqual(modules, sorted(package_downloader._EXPORTS))
+        for module, names in exported.items():
+            self.assertEqual(names, package_downloader._EXPORTS[module], module)
+
+    def test_raises_attribute_error_for_unknown_name(self):
+        # When
+        with self.assertRaises(AttributeError):
+            getattr(package_downloader, 'UnknownDownloader')
+
+    def test_does_not_load_github_and_aiohttp_until_used(self):
+        # Given
+        script = (
+            'import sys\n'
+            'from package_downloader import PackageConfig, ResumableDownloader, DebDownloader, RepositoryProvider\n'
+            'from package_downloader import AssetDownloader, MetadataCache, AsyncSessionProvider\n'
+            'print(sorted({name.split(".")[0] for name in sys.modules} & {"github", "aiohttp"}))\n'
+        )
+        environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+        # When
+        result = subprocess.run([sys.executable, '-c', script], env=environment, capture_output=True, text=True)
+
+        # Then
+        self.assertEqual('[]', result.stdout.strip(), result.stderr)
+
+
+def get_public_names(module):
+    with open(os.path.join(PACKAGE_DIR, f'{module}.py')) as file:
+        tree = ast.parse(file.read())
+
+    names = []
+
+    for node in tree.body:
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            names.append(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)) and not is_type_var(node.value):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names.extend(target.id for target in targets if isinstance(target, ast.Name))
+
+    return [name for name in names if not name.startswith('_') and name != 'log']
+
+
+def is_type_var(value):
+    return isinstance(value, ast.Call) and getattr(value.func, 'id', None) == 'TypeVar'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from common_utility import ISessionProvider
+from common_utility.jsonLoader import IJsonLoader
+from context_logger import setup_logging
+
+from package_downloader import (
+    PackagePlanner,
+    IDebDownloader,
+    PackageConfig,
+    IReleaseResolver,
+    ReleaseConfig,
+    RunMetrics,
+    PlannedPackage,
+    PlannedFile,
+    PLAN_DOWNLOAD,
+    PLAN_CACHED,
+    PLAN_LOCAL,
+    PLAN_FAILED,
+)
+
+
+class PackagePlannerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_summarizes_planned_packages(self):
+        # Given
+        config1 = PackageConfig(package='package1', file_url='https://example.com/package1.deb')
+        config2 = PackageConfig(package='package2', file_url='https://example.com/package2.deb')
+        config3 = PackageConfig(package='package3', version='>=1.0')
+        json_loader, deb_downloader = create_components([config1, config2, config3])
+        deb_downloader.plan.side_effect = [
+            PlannedPackage('package1', [PlannedFile('package1.deb', 'url1', PLAN_DOWNLOAD, 1024)]),
+            PlannedPackage('package2', [PlannedFile('package2.deb', 'url2', PLAN_CACHED, 2048)]),
+            PlannedPackage('package3', [PlannedFile('package3.deb', '/opt/debs/package3.deb', PLAN_LOCAL, 512)]),
+        ]
+        package_planner = PackagePlanner('path/to/config', json_loader, deb_downloader, max_workers=1)
+
+        # When
+        plan = package_planner.plan()
+
+        # Then
+        summary = plan.get_summary()
+        self.assertEqual(3, summary['packages'])
+        self.assertEqual(1, summary[PLAN_DOWNLOAD])
+        self.assertEqual(1, summary[PLAN_CACHED])
+        self.assertEqual(1, summary[PLAN_LOCAL])
+        self.assertEqual(0, summary[PLAN_FAILED])
+        self.assertEqual(1024, summary['download_bytes'])
+        self.assertIsNone(summary['api_calls'])
+
+    def test_records_error_when_package_cannot_be_planned(self):
+        # Given
+        config1 = PackageConfig(package='package1', file_url='https://example.com/package1.deb')
+        config2 = PackageConfig(package='package2', version='>=1.0')
+        json_loader, deb_downloader = create_components([config1, config2])
+        deb_downloader.plan.side_effect = [
+            PlannedPackage('package1', [PlannedFile('package1.deb', 'url1', PLAN_DOWNLOAD, 1024)]),
+            ValueError('No download source configured'),
+        ]
+        package_planner = PackagePlanner('path/to/config', json_loader, deb_downloader, max_workers=1)
+
+        # When
+        plan = package_planner.plan()
+
+        # Then
+        self.assertEqual(PLAN_FAILED, plan.packages[1].action)
+        self.assertEqual('No download source configured', plan.packages[1].error)
+        self.assertEqual(1, plan.get_summary()[PLAN_FAILED])
+
+    def test_probes_size_when_not_known_from_metadata(self):
+        # Given
+        config = PackageConfig(package='package1', file_url='https://example.com/package1.deb')
+        json_loader, deb_downloader = create_components([config])
+        deb_downloader.plan.return_value = PlannedPackage(
+            'package1', [PlannedFile('package1.deb', 'https://example.com/package1.deb', PLAN_DOWNLOAD)]
+        )
+        session_provider = MagicMock(spec=ISessionProvider)
+        session_provider.get_session.return_value.head.return_value.headers = {'Content-Length': '4096'}
+        package_planner = PackagePlanner(
+            'path/to/config', json_loader, deb_downloader, session_provider=session_provider
+        )
+
+        # When
+        plan = package_planner.plan()
+
+        # Then
+        self.assertEqual(4096, plan.get_summary()['download_bytes'])
+        self.assertEqual(0, plan.get_summary()['unknown_sizes'])
+        session_provider.get_session.return_value.head.assert_called_once_with(
+            'https://example.com/package1.deb', allow_redirects=True, timeout=30.0
+        )
+
+    def test_counts_api_calls_made_while_planning(self):
+        # Given
+        release_config = ReleaseConfig(owner='owner1', repo='repo1')
+        config = PackageConfig(package='package1', release=release_config)
+        json_loader, deb_downloader = create_components([config])
+        run_metrics = RunMetrics()
+        run_metrics.increment('api_calls', 5)
+        release_resolver = MagicMock(spec=IReleaseResolver)
+        release_resolver.resolve.side_effect = lambda configs: run_metrics.increment('api_calls')
+
+        def plan_package(package_config):
+            run_metrics.increment('api_calls', 2)
+            return PlannedPackage(package_config.package, [PlannedFile('package1.deb', 'url1', PLAN_DOWNLOAD, 1)])
+
+        deb_downloader.plan.side_effect = plan_package
+        package_planner = PackagePlanner(
+            'path/to/config', json_loader, deb_downloader, release_resolver=release_resolver, run_metrics=run_metrics
+        )
+
+        # When
+        plan = package_planner.plan()
+
+        # Then
+        self.assertEqual(3, plan.api_calls)
+        release_resolver.resolve.assert_called_once_with([release_config])
+
+    def test_serializes_plan_to_dict(self):
+        # Given
+        config = PackageConfig(package='package1', file_url='https://example.com/package1.deb')
+        json_loader, deb_downloader = create_components([config])
+        deb_downloader.plan.return_value = PlannedPackage(
+            'package1', [PlannedFile('package1.deb', 'url1', PLAN_CACHED, 1024)]
+        )
+        package_planner = PackagePlanner('path/to/config', json_loader, deb_downloader)
+
+        # When
+        result = package_planner.plan().to_dict()
+
+        # Then
+        self.assertEqual({
+            'package': 'package1',
+            'files': [{'file_name': 'package1.deb', 'url': 'url1', 'action': PLAN_CACHED, 'size': 1024}],
+            'error': None,
+            'action': PLAN_CACHED,
+        }, result['packages'][0])
+        self.assertEqual(1, result['summary'][PLAN_CACHED])
+
+
+def create_components(packages):
+    json_loader = MagicMock(spec=IJsonLoader)
+    json_loader.load_list.return_value = packages
+    deb_downloader = MagicMock(spec=IDebDownloader)
+    return json_loader, deb_downloader
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import unittest
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+from github.GitReleaseAsset import GitReleaseAsset
+
+from package_downloader import PackageStore, DownloadTransaction
+
+
+class PackageStoreTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.download_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_returns_none_when_key_not_stored(self):
+        # Given
+        package_store = PackageStore(self.download_dir, MagicMock(spec=ISessionProvider))
+
+        # When
+        result = package_store.get('asset:1:3:2024-01-01T00:00:00', 'package1.deb')
+
+        # Then
+        self.assertIsNone(result)
+
+    def test_links_stored_file_into_place_when_key_stored(self):
+        # Given
+        package_store = PackageStore(self.download_dir, MagicMock(spec=ISessionProvider))
+        file_path = self._create_file('package1.deb', b'content')
+        package_store.put('asset:1:7:2024-01-01T00:00:00', file_path)
+        os.remove(file_path)
+
+        # When
+        result = PackageStore(self.download_dir, MagicMock(spec=ISessionProvider)).get(
+            'asset:1:7:2024-01-01T00:00:00', 'package1.deb'
+        )
+
+        # Then
+        self.assertEqual(file_path, result)
+        with open(result, 'rb') as file:
+            self.assertEqual(b'content', file.read())
+        self.assertEqual(2, os.stat(result).st_nlink)
+
+    def test_deduplicates_files_with_same_content(self):
+        # Given
+        package_store = PackageStore(self.download_dir, MagicMock(spec=ISessionProvider))
+        file_path1 = self._create_file('package1.deb', b'content')
+        file_path2 = self._create_file('package2.deb', b'content')
+
+        # When
+        package_store.put('key1', file_path1)
+        package_store.put('key2', file_path2)
+
+        # Then
+        self.assertTrue(os.path.samefile(file_path1, file_path2))
+        self.assertEqual(3, os.stat(file_path1).st_nlink)
+
+    def test_detaches_linked_file_when_key_changed(self):
+        # Given
+        package_store = PackageStore(self.download_dir, MagicMock(spec=ISessionProvider))
+        file_path = self._create_file('package1.deb', b'content')
+        package_store.put('key1', file_path)
+
+        # When
+        result = package_store.get('key2', 'package1.deb')
+
+        # Then
+        self.assertIsNone(result)
+        self.assertFalse(os.path.exists(file_path))
+        self.assertEqual(b'content', open(package_store.get('key1', 'package1.deb'), 'rb').read())
+
+    def test_restores_previous_file_when_transaction_rolled_back(self):
+        # Given
+        download_transaction = DownloadTransaction(self.download_dir, atomic=True)
+        package_store = PackageStore(
+            self.download_dir, MagicMock(spec=ISessionProvider), download_transaction=download_transaction
+        )
+        download_transaction.begin()
+        file_path = package_store.put('key1', self._create_file('package1.deb', b'old'))
+        package_store.put('key2', self._create_file('package2.deb', b'new'))
+        download_transaction.finish([file_path])
+        download_transaction.begin()
+
+        # When
+        missed = package_store.get('key3', 'package1.deb')
+        result = package_store.get('key2', 'package1.deb')
+        download_transaction.finish([result, None])
+
+        # Then
+        self.assertIsNone(missed)
+        self.assertTrue(download_transaction.is_rolled_back())
+        with open(file_path, 'rb') as file:
+            self.assertEqual(b'old', file.read())
+        self.assertTrue(download_transaction.is_complete(file_path))
+
+    def test_returns_asset_key_from_id_size_and_update_time(self):
+        # Given
+        package_store = PackageStore(self.download_dir, MagicMock(spec=ISessionProvider))
+        asset = MagicMock(spec=GitReleaseAsset)
+        asset.id = 1
+        asset.size = 1024
+        asset.updated_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+        # When
+        result = package_store.get_asset_key(asset)
+
+        # Then
+        self.assertEqual('asset:1:1024:2024-01-01T00:00:00+00:00', result)
+
+    def test_returns_url_key_from_validators(self):
+        # Given
+        session_provider = MagicMock(spec=ISessionProvider)
+        response = session_provider.get_session.return_value.head.return_value
+        response.headers = {'ETag': '"etag1"', 'Last-Modified': 'Mon, 01 Jul 2024'}
+        package_store = PackageStore(self.download_dir, session_provider)
+
+        # When
+        result = package_store.get_url_key('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual('url:https://example.com/package1.deb:"etag1":Mon, 01 Jul 2024', result)
+        session_provider.get_session.return_value.head.assert_called_once_with(
+            'https://example.com/package1.deb', allow_redirects=True, timeout=5.0
+        )
+
+    def test_returns_no_url_key_when_no_validators_available(self):
+        # Given
+        session_provider = MagicMock(spec=ISessionProvider)
+        session_provider.get_session.return_value.head.return_value.headers = {}
+        package_store = PackageStore(self.download_dir, session_provider)
+
+        # When
+        result = package_store.get_url_key('https://example.com/package1.deb')
+
+        # Then
+        self.assertIsNone(result)
+
+    def _create_file(self, file_name, content):
+        file_path = os.path.join(self.download_dir, file_name)
+        with open(file_path, 'wb') as file:
+            file.write(content)
+        return file_path
+
+
+if __name__ == '__main__':
+    unittest.main()
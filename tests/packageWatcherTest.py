@@ -0,0 +1,92 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+
+from package_downloader import PackageWatcher, IConfigSource, IPackageDownloader, RunMetrics
+
+
+class PackageWatcherTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_syncs_packages_and_updates_status(self):
+        # Given
+        config_source, package_downloader, downloader_factory = create_components()
+        post_sync = MagicMock()
+        watcher = PackageWatcher(config_source, downloader_factory, post_sync=post_sync)
+
+        # When
+        watcher.sync()
+
+        # Then
+        downloader_factory.assert_called_once_with('/tmp/packages/package-config.json')
+        package_downloader.download_packages.assert_called_once()
+        post_sync.assert_called_once()
+        status = watcher.get_status()
+        self.assertEqual('idle', status['state'])
+        self.assertEqual(1, status['cycles'])
+        self.assertEqual(1, status['config_changes'])
+        self.assertEqual(1, status['packages_ok'])
+        self.assertEqual(1, status['packages_failed'])
+        self.assertIsNone(status['last_error'])
+
+    def test_reports_error_when_sync_fails(self):
+        # Given
+        config_source, _, downloader_factory = create_components()
+        config_source.fetch.side_effect = ConnectionError('Connection refused')
+        watcher = PackageWatcher(config_source, downloader_factory)
+
+        # When
+        watcher.sync()
+
+        # Then
+        downloader_factory.assert_not_called()
+        status = watcher.get_status()
+        self.assertEqual('error', status['state'])
+        self.assertEqual('Connection refused', status['last_error'])
+
+    def test_runs_until_stopped(self):
+        # Given
+        config_source, package_downloader, downloader_factory = create_components()
+        watcher = PackageWatcher(config_source, downloader_factory, interval=0.01)
+        package_downloader.download_packages.side_effect = lambda: watcher.stop() or []
+
+        # When
+        watcher.run()
+
+        # Then
+        package_downloader.download_packages.assert_called_once()
+        self.assertIsNotNone(watcher.get_status()['next_sync_at'])
+
+    def test_includes_run_report_in_status(self):
+        # Given
+        config_source, _, downloader_factory = create_components()
+        run_metrics = RunMetrics()
+        run_metrics.increment('store_hits')
+        watcher = PackageWatcher(config_source, downloader_factory, run_metrics=run_metrics)
+
+        # When
+        status = watcher.get_status()
+
+        # Then
+        self.assertEqual({'store_hits': 1}, status['report']['counters'])
+
+
+def create_components():
+    config_source = MagicMock(spec=IConfigSource)
+    config_source.fetch.return_value = ('/tmp/packages/package-config.json', True)
+    package_downloader = MagicMock(spec=IPackageDownloader)
+    package_downloader.download_packages.return_value = ['/tmp/packages/package1.deb', None]
+    downloader_factory = MagicMock(return_value=package_downloader)
+    return config_source, package_downloader, downloader_factory
+
+
+if __name__ == '__main__':
+    unittest.main()
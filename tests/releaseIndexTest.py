@@ -0,0 +1,102 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+from github.GitRelease import GitRelease
+from github.Repository import Repository
+
+from package_downloader import ReleaseIndex, IMetadataCache, VersionConstraint
+
+
+class ReleaseIndexTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_finds_highest_release_matching_constraint(self):
+        # Given
+        repository = create_repository()
+        repository.get_releases.return_value = [
+            create_release('v1.1.0'), create_release('v1.10.0'), create_release('v1.9.0'), create_release('v2.0.0')
+        ]
+        release_index = ReleaseIndex()
+
+        # When
+        result = release_index.find(repository, VersionConstraint.parse('>=1.2,<2'))
+
+        # Then
+        self.assertEqual('v1.10.0', result.tag_name)
+
+    def test_skips_drafts_prereleases_and_unversioned_tags(self):
+        # Given
+        repository = create_repository()
+        repository.get_releases.return_value = [
+            create_release('v1.0.0'),
+            create_release('v1.1.0', draft=True),
+            create_release('v1.2.0', prerelease=True),
+            create_release('nightly'),
+        ]
+        release_index = ReleaseIndex()
+
+        # When
+        result = release_index.find(repository, VersionConstraint.parse('>=1.0'))
+
+        # Then
+        self.assertEqual('v1.0.0', result.tag_name)
+
+    def test_lists_releases_once_per_repository(self):
+        # Given
+        repository = create_repository()
+        repository.get_releases.return_value = [create_release('v1.0.0')]
+        release_index = ReleaseIndex()
+
+        # When
+        release_index.find(repository, VersionConstraint.parse('>=1.0'))
+        result = release_index.find(repository, VersionConstraint.parse('>=2.0'))
+
+        # Then
+        self.assertIsNone(result)
+        repository.get_releases.assert_called_once()
+
+    def test_lists_release_pages_through_metadata_cache(self):
+        # Given
+        repository = create_repository()
+        metadata_cache = MagicMock(spec=IMetadataCache)
+        first_page = [{'tag_name': f'v1.{index}.0', 'draft': False, 'prerelease': False} for index in range(100)]
+        metadata_cache.get_json.side_effect = [first_page, [{'tag_name': 'v2.0.0', 'draft': False}]]
+        release_index = ReleaseIndex(metadata_cache)
+
+        # When
+        result = release_index.find(repository, VersionConstraint.parse('<2'))
+
+        # Then
+        self.assertEqual('v1.99.0', result.tag_name)
+        repository.get_releases.assert_not_called()
+        self.assertEqual(2, metadata_cache.get_json.call_count)
+        metadata_cache.get_json.assert_called_with(
+            repository.requester, 'https://api.github.com/repos/owner1/repo1/releases?per_page=100&page=2'
+        )
+
+
+def create_repository() -> Repository:
+    repository = MagicMock(spec=Repository)
+    repository.full_name = 'owner1/repo1'
+    repository.url = 'https://api.github.com/repos/owner1/repo1'
+    return repository
+
+
+def create_release(tag: str, draft: bool = False, prerelease: bool = False) -> GitRelease:
+    release = MagicMock(spec=GitRelease)
+    release.tag_name = tag
+    release.draft = draft
+    release.prerelease = prerelease
+    return release
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+
+from package_downloader import (
+    ReleaseResolver,
+    GraphQLTransport,
+    IGraphQLTransport,
+    ReleaseConfig,
+    ResolvedRelease,
+    ResolvedAsset,
+)
+
+
+class ReleaseResolverTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_resolves_releases_in_single_query(self):
+        # Given
+        transport = MagicMock(spec=IGraphQLTransport)
+        transport.execute.return_value = {
+            'r0': create_repository('v1.0.0', [('package1.deb', 1024)]),
+            'r1': create_repository('v2.0.0', [('package2.deb', 2048)]),
+        }
+        release_resolver = ReleaseResolver(transport)
+        config1 = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', token='token1')
+        config2 = ReleaseConfig(owner='owner2', repo='repo2', token='token1')
+
+        # When
+        release_resolver.resolve([config1, config2])
+
+        # Then
+        transport.execute.assert_called_once()
+        query, variables, token = transport.execute.call_args.args
+        self.assertIn('r0: repository(owner: $owner0, name: $name0)', query)
+        self.assertIn('release: release(tagName: $tag0)', query)
+        self.assertIn('release: latestRelease', query)
+        self.assertEqual({'owner0': 'owner1', 'name0': 'repo1', 'tag0': 'v1.0.0', 'owner1': 'owner2', 'name1': 'repo2'},
+                         variables)
+        self.assertEqual('token1', token)
+        self.assertEqual(
+            ResolvedRelease('owner1/repo1', 'v1.0.0', [create_asset('package1.deb', 1024)]),
+            release_resolver.get(config1),
+        )
+        self.assertEqual('v2.0.0', release_resolver.get(config2).tag)
+
+    def test_resolves_asset_sha256_digest(self):
+        # Given
+        repository = create_repository('v1.0.0', [('package1.deb', 1024)])
+        repository['release']['releaseAssets']['nodes'][0]['digest'] = 'sha256:ABCD'
+        transport = MagicMock(spec=IGraphQLTransport)
+        transport.execute.return_value = {'r0': repository}
+        release_resolver = ReleaseResolver(transport)
+        config = ReleaseConfig(owner='owner1', repo='repo1', tag='v1.0.0', token='token1')
+
+        # When
+        release_resolver.resolve([config])
+
+        # Then
+        self.assertIn('digest', transport.execute.call_args.args[0])
+        self.assertEqual('abcd', release_resolver.get(config).assets[0].sha256)
+
+    def test_splits_queries_by_token_and_batch_size(self):
+        # Given
+        transport = MagicMock(spec=IGraphQLTransport)
+        transport.execute.return_value = {}
+        release_resolver = ReleaseResolver(transport, default_token='default', batch_size=2)
+        configs = [ReleaseConfig(owner='owner1', repo=f'repo{index}') for index in range(3)]
+        configs.append(ReleaseConfig(owner='owner1', repo='repo4', token='token1'))
+
+        # When
+        release_resolver.resolve(configs)
+
+        # Then
+        self.assertEqual(['default', 'default', 'token1'],
+                         [call.args[2] for call in transport.execute.call_args_list])
+
+    def test_skips_releases_without_token(self):
+        # Given
+        transport = MagicMock(spec=IGraphQLTransport)
+        release_resolver = ReleaseResolver(transport)
+        config = ReleaseConfig(owner='owner1', repo='repo1')
+
+        # When
+        release_resolver.resolve([config])
+
+        # Then
+        transport.execute.assert_not_called()
+        self.assertIsNone(release_resolver.get(config))
+
+    def test_skips_releases_from_other_sources(self):
+        # Given
+        transport = MagicMock(spec=IGraphQLTransport)
+        release_resolver = ReleaseResolver(transport, default_token='default')
+        config = ReleaseConfig(source='gitea', url='https://gitea.example.com', owner='owner1', repo='repo1')
+
+        # When
+        release_resolver.resolve([config])
+
+        # Then
+        transport.execute.assert_not_called()
+        self.assertIsNone(release_resolver.get(config))
+
+    def test_leaves_private_missing_and_partial_releases_unresolved(self):
+        # Given
+        private = create_repository('v1.0.0', [('package1.deb', 1024)])
+        private['isPrivate'] = True
+        partial = create_repository('v1.0.0', [('package3.deb', 1024)])
+        partial['release']['releaseAssets']['pageInfo']['hasNextPage'] = True
+        transport = MagicMock(spec=IGraphQLTransport)
+        transport.execute.return_value = {'r0': private, 'r1': {'isPrivate': False, 'release': None}, 'r2': partial}
+        release_resolver = ReleaseResolver(transport, default_token='default')
+        configs = [ReleaseConfig(owner='owner1', repo=f'repo{index}', tag='v1.0.0') for index in range(3)]
+
+        # When
+        release_resolver.resolve(configs)
+
+        # Then
+        self.assertEqual([None, None, None], [release_resolver.get(config) for config in configs])
+
+    def test_leaves_releases_unresolved_when_query_fails(self):
+        # Given
+        transport = MagicMock(spec=IGraphQLTransport)
+        transport.execute.side_effect = Exception('Query failed')
+        release_resolver = ReleaseResolver(transport, default_token='default')
+        config = ReleaseConfig(owner='owner1', repo='repo1')
+
+        # When
+        release_resolver.resolve([config])
+
+        # Then
+        self.assertIsNone(release_resolver.get(config))
+
+    def test_transport_posts_query_with_token(self):
+        # Given
+        session_provider = MagicMock(spec=ISessionProvider)
+        session = session_provider.get_session.return_value
+        session.post.return_value.json.return_value = {'data': {'r0': None}, 'errors': [{'message': 'Not found'}]}
+        transport = GraphQLTransport(session_provider, 'http://localhost/graphql')
+
+        # When
+        result = transport.execute('query', {'owner0': 'owner1'}, 'token1')
+
+        # Then
+        self.assertEqual({'r0': None}, result)
+        session.post.assert_called_once_with(
+            'http://localhost/graphql',
+            json={'query': 'query', 'variables': {'owner0': 'owner1'}},
+            headers={'Authorization': 'bearer token1'},
+            timeout=30.0,
+        )
+
+
+def create_asset(name, size):
+    return ResolvedAsset(name, size, f'https://github.com/download/{name}', '2024-01-01T00:00:00Z')
+
+
+def create_repository(tag, assets):
+    nodes = [
+        {'name': name, 'size': size, 'downloadUrl': f'https://github.com/download/{name}',
+         'updatedAt': '2024-01-01T00:00:00Z'}
+        for name, size in assets
+    ]
+    return {
+        'isPrivate': False,
+        'release': {'tagName': tag, 'releaseAssets': {'pageInfo': {'hasNextPage': False}, 'nodes': nodes}},
+    }
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+from github.Repository import Repository
+
+from package_downloader import RepositoryProvider, ReleaseConfig, IRequestScheduler
+
+
+class RepositoryProviderTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    @mock.patch('github.Github')
+    def test_reuses_client_when_token_is_the_same(self, github_class):
+        # Given
+        repository = MagicMock(spec=Repository)
+        github_class.return_value.get_repo.return_value = repository
+        repository_provider = RepositoryProvider(pool_size=4)
+        config1 = ReleaseConfig(owner='owner1', repo='repo1', token='token1')
+        config2 = ReleaseConfig(owner='owner1', repo='repo2', token='token1')
+
+        # When
+        result1 = repository_provider.get_repository(config1)
+        result2 = repository_provider.get_repository(config2)
+
+        # Then
+        self.assertEqual(repository, result1)
+        self.assertEqual(repository, result2)
+        github_class.assert_called_once_with(
+            base_url='https://api.github.com', auth=mock.ANY, pool_size=4, seconds_between_requests=0.25
+        )
+        github_class.return_value.get_repo.assert_has_calls([mock.call('owner1/repo1'), mock.call('owner1/repo2')])
+
+    @mock.patch('github.Github')
+    def test_creates_separate_client_per_token(self, github_class):
+        # Given
+        repository_provider = RepositoryProvider()
+        config1 = ReleaseConfig(owner='owner1', repo='repo1', token='token1')
+        config2 = ReleaseConfig(owner='owner1', repo='repo2', token='token2')
+        config3 = ReleaseConfig(owner='owner1', repo='repo3')
+
+        # When
+        repository_provider.get_repository(config1)
+        repository_provider.get_repository(config2)
+        repository_provider.get_repository(config3)
+
+        # Then
+        self.assertEqual(3, github_class.call_count)
+        github_class.assert_called_with(
+            base_url='https://api.github.com', auth=None, pool_size=None, seconds_between_requests=0.25
+        )
+
+    @mock.patch('github.Github')
+    def test_closes_clients(self, github_class):
+        # Given
+        repository_provider = RepositoryProvider()
+        repository_provider.get_repository(ReleaseConfig(owner='owner1', repo='repo1'))
+
+        # When
+        repository_provider.close()
+        repository_provider.get_repository(ReleaseConfig(owner='owner1', repo='repo1'))
+
+        # Then
+        github_class.return_value.close.assert_called_once()
+        self.assertEqual(2, github_class.call_count)
+
+    @mock.patch('github.Github')
+    def test_gets_repository_through_request_scheduler_when_configured(self, github_class):
+        # Given
+        repository = MagicMock(spec=Repository)
+        github_class.return_value.get_repo.return_value = repository
+        request_scheduler = MagicMock(spec=IRequestScheduler)
+        request_scheduler.execute.side_effect = lambda token, function: function()
+        repository_provider = RepositoryProvider(request_scheduler=request_scheduler)
+        config = ReleaseConfig(owner='owner1', repo='repo1', token='token1')
+
+        # When
+        result = repository_provider.get_repository(config)
+
+        # Then
+        self.assertEqual(repository, result)
+        request_scheduler.execute.assert_called_once_with('token1', mock.ANY)
+        github_class.assert_called_once_with(
+            base_url='https://api.github.com', auth=mock.ANY, pool_size=None, seconds_between_requests=None, retry=None
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
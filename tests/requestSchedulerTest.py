@@ -0,0 +1,241 @@
+import unittest
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
+from unittest.mock import AsyncMock, MagicMock
+
+from aiohttp import ClientResponseError
+from context_logger import setup_logging
+from github import GithubException
+from requests import ConnectionError, HTTPError, Response
+
+from package_downloader import RequestScheduler, RateLimitWaitError
+
+
+class RequestSchedulerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_retries_server_errors_with_backoff(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        function = MagicMock(side_effect=[GithubException(502, 'Bad gateway'), ConnectionError(), 'result'])
+        request_scheduler = RequestScheduler(base_delay=1.0)
+
+        # When
+        result = request_scheduler.execute('token1', function)
+
+        # Then
+        self.assertEqual('result', result)
+        self.assertEqual(3, function.call_count)
+        self.assertEqual(2, time_module.sleep.call_count)
+        for call in time_module.sleep.call_args_list:
+            self.assertLessEqual(call.args[0], 2.0)
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_raises_error_when_retries_exhausted(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        function = MagicMock(side_effect=GithubException(500, 'Server error'))
+        request_scheduler = RequestScheduler(max_retries=2)
+
+        # When
+        self.assertRaises(GithubException, request_scheduler.execute, 'token1', function)
+
+        # Then
+        self.assertEqual(3, function.call_count)
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_does_not_retry_client_errors(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        function = MagicMock(side_effect=GithubException(404, 'Not found'))
+        request_scheduler = RequestScheduler()
+
+        # When
+        self.assertRaises(GithubException, request_scheduler.execute, 'token1', function)
+
+        # Then
+        function.assert_called_once()
+        time_module.sleep.assert_not_called()
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_waits_for_retry_after_on_secondary_rate_limit(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        error = create_http_error(403, {'Retry-After': '30'})
+        function = MagicMock(side_effect=[error, 'result'])
+        request_scheduler = RequestScheduler()
+
+        # When
+        result = request_scheduler.execute('token1', function)
+
+        # Then
+        self.assertEqual('result', result)
+        time_module.sleep.assert_called_once_with(30.0)
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_ignores_retry_after_on_client_errors(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        error = create_http_error(404, {'Retry-After': '30'})
+        function = MagicMock(side_effect=[error, 'result'])
+        request_scheduler = RequestScheduler()
+
+        # When
+        self.assertRaises(HTTPError, request_scheduler.execute, 'token1', function)
+
+        # Then
+        function.assert_called_once()
+        time_module.sleep.assert_not_called()
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_does_not_retry_forbidden_without_rate_limit(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        function = MagicMock(side_effect=[GithubException(403, 'Resource not accessible'), 'result'])
+        request_scheduler = RequestScheduler()
+
+        # When
+        self.assertRaises(GithubException, request_scheduler.execute, 'token1', function)
+
+        # Then
+        function.assert_called_once()
+        time_module.sleep.assert_not_called()
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_waits_for_reset_when_budget_exhausted(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        response = MagicMock(spec=Response)
+        response.headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Limit': '5000', 'X-RateLimit-Reset': '1060'}
+        request_scheduler = RequestScheduler()
+        request_scheduler.execute('token1', lambda: response)
+
+        # When
+        request_scheduler.execute('token1', lambda: 'result')
+
+        # Then
+        time_module.sleep.assert_called_once_with(60.0)
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_spaces_requests_when_budget_low(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        response = MagicMock(spec=Response)
+        response.headers = {'X-RateLimit-Remaining': '10', 'X-RateLimit-Limit': '5000', 'X-RateLimit-Reset': '1100'}
+        request_scheduler = RequestScheduler()
+        request_scheduler.execute('token1', lambda: response)
+
+        # When
+        request_scheduler.execute('token1', lambda: 'result1')
+        request_scheduler.execute('token1', lambda: 'result2')
+
+        # Then
+        time_module.sleep.assert_called_once_with(10.0)
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_keeps_separate_budget_per_token(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        response = MagicMock(spec=Response)
+        response.headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Limit': '5000', 'X-RateLimit-Reset': '1060'}
+        request_scheduler = RequestScheduler()
+        request_scheduler.execute('token1', lambda: response)
+
+        # When
+        result = request_scheduler.execute('token2', lambda: 'result')
+
+        # Then
+        self.assertEqual('result', result)
+        time_module.sleep.assert_not_called()
+
+    @mock.patch('package_downloader.requestScheduler.time')
+    def test_raises_error_when_reset_exceeds_maximum_wait(self, time_module):
+        # Given
+        time_module.time.return_value = 1000.0
+        response = MagicMock(spec=Response)
+        response.headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Limit': '60', 'X-RateLimit-Reset': '4600'}
+        request_scheduler = RequestScheduler(max_wait=900)
+        request_scheduler.execute(None, lambda: response)
+
+        # When
+        self.assertRaises(RateLimitWaitError, request_scheduler.execute, None, lambda: 'result')
+
+        # Then
+        time_module.sleep.assert_not_called()
+
+
+class AsyncRequestSchedulerTest(IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    @mock.patch('package_downloader.requestScheduler.asyncio.sleep', new_callable=AsyncMock)
+    @mock.patch('package_downloader.requestScheduler.time')
+    async def test_waits_for_retry_after_on_rate_limited_response(self, time_module, sleep):
+        # Given
+        time_module.time.return_value = 1000.0
+        error = ClientResponseError(MagicMock(), (), status=429, headers={'Retry-After': '30'})
+        function = AsyncMock(side_effect=[error, 'result'])
+        request_scheduler = RequestScheduler()
+
+        # When
+        result = await request_scheduler.execute_async('token1', function)
+
+        # Then
+        self.assertEqual('result', result)
+        self.assertEqual(2, function.await_count)
+        sleep.assert_awaited_once_with(30.0)
+        time_module.sleep.assert_not_called()
+
+    @mock.patch('package_downloader.requestScheduler.asyncio.sleep', new_callable=AsyncMock)
+    @mock.patch('package_downloader.requestScheduler.time')
+    async def test_waits_for_reset_when_budget_exhausted(self, time_module, sleep):
+        # Given
+        time_module.time.return_value = 1000.0
+        response = MagicMock()
+        response.headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Limit': '5000', 'X-RateLimit-Reset': '1060'}
+        request_scheduler = RequestScheduler()
+        await request_scheduler.execute_async('token1', AsyncMock(return_value=response))
+
+        # When
+        await request_scheduler.execute_async('token1', AsyncMock(return_value='result'))
+
+        # Then
+        sleep.assert_awaited_once_with(60.0)
+
+    @mock.patch('package_downloader.requestScheduler.asyncio.sleep', new_callable=AsyncMock)
+    @mock.patch('package_downloader.requestScheduler.time')
+    async def test_does_not_retry_client_errors(self, time_module, sleep):
+        # Given
+        time_module.time.return_value = 1000.0
+        function = AsyncMock(side_effect=ClientResponseError(MagicMock(), (), status=404))
+        request_scheduler = RequestScheduler()
+
+        # When
+        with self.assertRaises(ClientResponseError):
+            await request_scheduler.execute_async('token1', function)
+
+        # Then
+        function.assert_awaited_once()
+        sleep.assert_not_awaited()
+
+
+def create_http_error(status, headers):
+    response = Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return HTTPError(response=response)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,508 @@
+import hashlib
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock, call
+
+from common_utility import ISessionProvider
+from context_logger import setup_logging
+from requests.exceptions import ChunkedEncodingError, ConnectionError, HTTPError
+
+from package_downloader import (
+    ResumableDownloader,
+    FileDigest,
+    IntegrityError,
+    ITransferShaper,
+    IMirrorSelector,
+    StalledTransferError,
+    DownloadTransaction,
+    STAGING_DIR_NAME,
+    StreamWriter,
+)
+
+
+class ResumableDownloaderTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.download_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_downloads_file_to_download_location(self):
+        # Given
+        session_provider, session = create_components([create_response(200, [b'abc', b'def'])])
+        downloader = ResumableDownloader(session_provider, self.download_dir)
+
+        # When
+        result = downloader.download('https://example.com/package1.deb', headers={'Accept': 'application/json'})
+
+        # Then
+        self.assertEqual(os.path.join(self.download_dir, 'package1.deb'), result)
+        self.assertEqual(b'abcdef', read_file(result))
+        self.assertEqual(['package1.deb'], os.listdir(self.download_dir))
+        session.get.assert_called_once_with(
+            'https://example.com/package1.deb', headers={'Accept': 'application/json'}, stream=True, timeout=30.0
+        )
+
+    def test_returns_digest_computed_while_streaming(self):
+        # Given
+        session_provider, session = create_components([create_response(200, [b'abc', b'def'])])
+        downloader = ResumableDownloader(session_provider, self.download_dir)
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(hashlib.sha256(b'abcdef').hexdigest(), downloader.get_digest(result))
+
+    def test_skips_download_when_file_exists(self):
+        # Given
+        session_provider, session = create_components([])
+        downloader = ResumableDownloader(session_provider, self.download_dir)
+        file_path = os.path.join(self.download_dir, 'package1.deb')
+        open(file_path, 'wb').close()
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(file_path, result)
+        session.get.assert_not_called()
+
+    def test_resumes_download_with_range_request_when_interrupted(self):
+        # Given
+        session_provider, session = create_components(
+            [
+                create_response(200, [b'abc', ChunkedEncodingError('Connection broken')], {'ETag': '"etag1"'}),
+                create_response(206, [b'def']),
+            ]
+        )
+        downloader = ResumableDownloader(session_provider, self.download_dir, retry_delay=0)
+
+        # When
+        result = downloader.download('https://example.com/package1.deb', 'package.deb')
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+        self.assertEqual(
+            {'Range': 'bytes=3-', 'If-Range': '"etag1"'}, session.get.call_args_list[1].kwargs['headers']
+        )
+
+    def test_resumes_download_from_part_file_left_by_previous_run(self):
+        # Given
+        session_provider, session = create_components([create_response(206, [b'def'])])
+        downloader = ResumableDownloader(session_provider, self.download_dir)
+        with open(os.path.join(self.download_dir, 'package1.deb.part'), 'wb') as file:
+            file.write(b'abc')
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+        self.assertEqual({'Range': 'bytes=3-'}, session.get.call_args.kwargs['headers'])
+
+    def test_restarts_download_when_server_ignores_range_request(self):
+        # Given
+        session_provider, session = create_components([create_response(200, [b'abcdef'])])
+        downloader = ResumableDownloader(session_provider, self.download_dir)
+        with open(os.path.join(self.download_dir, 'package1.deb.part'), 'wb') as file:
+            file.write(b'xyz')
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+
+    def test_raises_error_when_retries_exhausted_without_progress(self):
+        # Given
+        session_provider, session = create_components(ConnectionError('Connection refused'))
+        downloader = ResumableDownloader(session_provider, self.download_dir, max_retries=2, retry_delay=0)
+
+        # When
+        self.assertRaises(ConnectionError, downloader.download, 'https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(3, session.get.call_count)
+
+    def test_raises_client_error_without_retrying(self):
+        # Given
+        response = create_response(404, [])
+        response.raise_for_status.side_effect = HTTPError('404 Not Found', response=response)
+        session_provider, session = create_components([response])
+        downloader = ResumableDownloader(session_provider, self.download_dir, retry_delay=60)
+
+        # When
+        self.assertRaises(HTTPError, downloader.download, 'https://example.com/package1.deb')
+
+        # Then
+        session.get.assert_called_once()
+
+    def test_retries_server_error(self):
+        # Given
+        response = create_response(503, [])
+        response.raise_for_status.side_effect = HTTPError('503 Service Unavailable', response=response)
+        session_provider, session = create_components([response, create_response(200, [b'abc'])])
+        downloader = ResumableDownloader(session_provider, self.download_dir, retry_delay=0)
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(b'abc', read_file(result))
+        self.assertEqual(2, session.get.call_count)
+
+    def test_verifies_resumed_download_against_digest(self):
+        # Given
+        session_provider, session = create_components(
+            [
+                create_response(200, [b'abc', ChunkedEncodingError('Connection broken')]),
+                create_response(206, [b'def']),
+            ]
+        )
+        downloader = ResumableDownloader(session_provider, self.download_dir, retry_delay=0)
+        digest = FileDigest(hashlib.sha256(b'abcdef').hexdigest(), 6)
+
+        # When
+        result = downloader.download('https://example.com/package1.deb', digest=digest)
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+
+    def test_raises_error_and_removes_part_file_when_verification_fails(self):
+        # Given
+        session_provider, session = create_components([create_response(200, [b'abcdef'])])
+        downloader = ResumableDownloader(session_provider, self.download_dir)
+        digest = FileDigest(hashlib.sha256(b'other').hexdigest())
+
+        # When
+        self.assertRaises(IntegrityError, downloader.download, 'https://example.com/package1.deb', digest=digest)
+
+        # Then
+        self.assertEqual([], os.listdir(self.download_dir))
+
+    def test_downloads_file_in_parallel_ranges(self):
+        # Given
+        content = b'0123456789'
+        session_provider, session = create_components([])
+
+        def get(url, headers, stream, timeout):
+            start, end = headers['Range'][len('bytes='):].split('-')
+            body = content[int(start):int(end) + 1]
+            return create_response(206, [body], {'Content-Range': f'bytes {start}-{end}/{len(content)}'})
+
+        session.get.side_effect = get
+        downloader = ResumableDownloader(session_provider, self.download_dir, parallel_ranges=3, min_range_size=1)
+
+        # When
+        result = downloader.download(
+            'https://example.com/package1.deb', digest=FileDigest(hashlib.sha256(content).hexdigest())
+        )
+
+        # Then
+        self.assertEqual(content, read_file(result))
+        self.assertEqual(['package1.deb'], os.listdir(self.download_dir))
+        self.assertEqual(4, session.get.call_count)
+
+    def test_discards_range_parts_when_range_layout_changed(self):
+        # Given
+        content = b'0123456789'
+        session_provider, session = create_components([])
+        session.get.side_effect = create_range_server(content, '"etag1"')
+        downloader = ResumableDownloader(session_provider, self.download_dir, parallel_ranges=2, min_range_size=1)
+        part_path = os.path.join(self.download_dir, 'package1.deb.part')
+        write_file(f'{part_path}.0', b'XX')
+        write_file(f'{part_path}.ranges', b'{"size": 10, "validator": "\\"etag1\\"", "ranges": [[0, 3]]}')
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(content, read_file(result))
+        self.assertEqual(['package1.deb'], os.listdir(self.download_dir))
+        self.assertEqual(
+            ['bytes=0-0', 'bytes=0-4', 'bytes=5-9'],
+            sorted(request.kwargs['headers']['Range'] for request in session.get.call_args_list),
+        )
+
+    def test_restarts_download_when_resumed_range_no_longer_matches_validator(self):
+        # Given
+        content = b'abcdefghij'
+        session_provider, session = create_components([])
+        range_server = create_range_server(b'0123456789', '"etag1"')
+
+        def get(url, headers, stream, timeout):
+            if 'If-Range' in headers or 'Range' not in headers:
+                return create_response(200, [content], {'ETag': '"etag2"'})
+            return range_server(url, headers, stream, timeout)
+
+        session.get.side_effect = get
+        downloader = ResumableDownloader(session_provider, self.download_dir, parallel_ranges=2, min_range_size=1)
+        part_path = os.path.join(self.download_dir, 'package1.deb.part')
+        write_file(f'{part_path}.0', b'01')
+        write_file(f'{part_path}.0.validator', b'"etag1"')
+        write_file(f'{part_path}.ranges', b'{"size": 10, "validator": "\\"etag1\\"", "ranges": [[0, 4], [5, 9]]}')
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(content, read_file(result))
+        self.assertEqual(['package1.deb'], os.listdir(self.download_dir))
+        self.assertIn(
+            {'Range': 'bytes=2-4', 'If-Range': '"etag1"'},
+            [request.kwargs['headers'] for request in session.get.call_args_list],
+        )
+
+    def test_restarts_download_as_single_stream_when_server_ignores_range_requests(self):
+        # Given
+        content = b'0123456789'
+        session_provider, session = create_components([])
+        range_server = create_range_server(content, '"etag1"')
+
+        def get(url, headers, stream, timeout):
+            if headers.get('Range') == 'bytes=0-0':
+                return range_server(url, headers, stream, timeout)
+            return create_response(200, [content])
+
+        session.get.side_effect = get
+        downloader = ResumableDownloader(session_provider, self.download_dir, parallel_ranges=2, min_range_size=1)
+
+        # When
+        result = downloader.download(
+            'https://example.com/package1.deb', digest=FileDigest(hashlib.sha256(content).hexdigest())
+        )
+
+        # Then
+        self.assertEqual(content, read_file(result))
+        self.assertEqual(['package1.deb'], os.listdir(self.download_dir))
+        self.assertEqual({}, session.get.call_args.kwargs['headers'])
+
+    def test_downloads_range_from_next_mirror_when_source_ignores_range_requests(self):
+        # Given
+        content = b'0123456789'
+        session_provider, session = create_components([])
+        range_server = create_range_server(content, '"etag1"')
+
+        def get(url, headers, stream, timeout):
+            if url == 'https://example.com/package1.deb' and headers.get('Range') != 'bytes=0-0':
+                return create_response(200, [content])
+            return range_server(url, headers, stream, timeout)
+
+        session.get.side_effect = get
+        downloader = ResumableDownloader(session_provider, self.download_dir, parallel_ranges=2, min_range_size=1)
+
+        # When
+        result = downloader.download(
+            'https://example.com/package1.deb', mirrors=['https://mirror.example.com/package1.deb']
+        )
+
+        # Then
+        self.assertEqual(content, read_file(result))
+        self.assertEqual(['package1.deb'], os.listdir(self.download_dir))
+        self.assertEqual(
+            ['bytes=0-4', 'bytes=5-9'],
+            sorted(
+                request.kwargs['headers']['Range']
+                for request in session.get.call_args_list
+                if request.args[0] == 'https://mirror.example.com/package1.deb'
+            ),
+        )
+
+    def test_throttles_chunks_through_transfer_shaper(self):
+        # Given
+        response = create_response(200, [b'abc', b'def'])
+        session_provider, session = create_components([response])
+        transfer_shaper = MagicMock(spec=ITransferShaper)
+        throttle = transfer_shaper.transfer.return_value.__enter__.return_value
+        downloader = ResumableDownloader(session_provider, self.download_dir, transfer_shaper=transfer_shaper)
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+        transfer_shaper.transfer.assert_called_once_with('https://example.com/package1.deb')
+        self.assertEqual([call(3), call(3)], throttle.call_args_list)
+        response.iter_content.assert_called_once_with(chunk_size=64 * 1024)
+
+    def test_reads_chunks_bounded_by_stream_writer_chunk_size(self):
+        # Given
+        response = create_response(200, [b'abc', b'def'], {'Content-Length': '6'})
+        session_provider, session = create_components([response])
+        downloader = ResumableDownloader(
+            session_provider, self.download_dir, stream_writer=StreamWriter(chunk_size=16 * 1024)
+        )
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+        response.iter_content.assert_called_once_with(chunk_size=16 * 1024)
+
+    def test_downloads_from_fastest_mirror(self):
+        # Given
+        session_provider, session = create_components([create_response(200, [b'abcdef'])])
+        mirror_selector = MagicMock(spec=IMirrorSelector)
+        mirror_selector.rank.return_value = ['https://mirror.example.com/p1.deb', 'https://example.com/p1.deb']
+        downloader = ResumableDownloader(session_provider, self.download_dir, mirror_selector=mirror_selector)
+
+        # When
+        result = downloader.download('https://example.com/p1.deb', mirrors=['https://mirror.example.com/p1.deb'])
+
+        # Then
+        self.assertEqual(os.path.join(self.download_dir, 'p1.deb'), result)
+        mirror_selector.rank.assert_called_once_with(
+            ['https://example.com/p1.deb', 'https://mirror.example.com/p1.deb']
+        )
+        self.assertEqual('https://mirror.example.com/p1.deb', session.get.call_args.args[0])
+        mirror_selector.record_transfer.assert_called_once()
+
+    def test_resumes_verified_download_on_next_mirror_when_source_fails(self):
+        # Given
+        session_provider, session = create_components(
+            [
+                create_response(200, [b'abc', ChunkedEncodingError('Connection broken')], {'ETag': '"etag1"'}),
+                create_response(206, [b'def']),
+            ]
+        )
+        mirror_selector = MagicMock(spec=IMirrorSelector)
+        mirror_selector.rank.side_effect = lambda urls: urls
+        downloader = ResumableDownloader(session_provider, self.download_dir, mirror_selector=mirror_selector)
+        digest = FileDigest(hashlib.sha256(b'abcdef').hexdigest(), 6)
+
+        # When
+        result = downloader.download(
+            'https://example.com/p1.deb', digest=digest, mirrors=['https://mirror.example.com/p1.deb']
+        )
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+        self.assertEqual('https://mirror.example.com/p1.deb', session.get.call_args.args[0])
+        self.assertEqual({'Range': 'bytes=3-'}, session.get.call_args.kwargs['headers'])
+        mirror_selector.record_failure.assert_called_once_with('https://example.com/p1.deb')
+
+    def test_restarts_unverified_download_on_next_mirror_when_source_fails(self):
+        # Given
+        session_provider, session = create_components(
+            [
+                create_response(200, [b'abc', ChunkedEncodingError('Connection broken')]),
+                create_response(200, [b'abcdef']),
+            ]
+        )
+        downloader = ResumableDownloader(session_provider, self.download_dir)
+
+        # When
+        result = downloader.download('https://example.com/p1.deb', mirrors=['https://mirror.example.com/p1.deb'])
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+        self.assertEqual({}, session.get.call_args.kwargs['headers'])
+
+    def test_raises_stalled_transfer_error_when_rate_below_minimum(self):
+        # Given
+        session_provider, session = create_components(
+            [create_response(200, [b'a', b'b', b'c']), create_response(200, [b'a', b'b', b'c'])]
+        )
+        downloader = ResumableDownloader(
+            session_provider, self.download_dir, max_retries=0, min_rate=1024 * 1024, stall_timeout=0
+        )
+
+        # When
+        self.assertRaises(StalledTransferError, downloader.download, 'https://example.com/p1.deb')
+
+        # Then
+        session.get.assert_called_once()
+
+    def test_downloads_to_staging_area_and_promotes_file_when_transaction_configured(self):
+        # Given
+        session_provider, session = create_components(
+            [
+                create_response(200, [b'abc', ChunkedEncodingError('Connection broken')], {'ETag': '"etag1"'}),
+                create_response(206, [b'def']),
+            ]
+        )
+        download_transaction = DownloadTransaction(self.download_dir)
+        downloader = ResumableDownloader(
+            session_provider, self.download_dir, retry_delay=0, download_transaction=download_transaction
+        )
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+        self.assertEqual([STAGING_DIR_NAME, 'package1.deb'], sorted(os.listdir(self.download_dir)))
+        self.assertEqual([], os.listdir(os.path.join(self.download_dir, STAGING_DIR_NAME)))
+
+    def test_downloads_file_again_when_existing_file_was_not_committed(self):
+        # Given
+        session_provider, session = create_components([create_response(200, [b'abcdef'])])
+        downloader = ResumableDownloader(
+            session_provider, self.download_dir, download_transaction=DownloadTransaction(self.download_dir)
+        )
+        with open(os.path.join(self.download_dir, 'package1.deb'), 'wb') as file:
+            file.write(b'abc')
+
+        # When
+        result = downloader.download('https://example.com/package1.deb')
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(result))
+        session.get.assert_called_once()
+
+
+def create_components(responses):
+    session_provider = MagicMock(spec=ISessionProvider)
+    session = session_provider.get_session.return_value
+    session.get.side_effect = responses
+    return session_provider, session
+
+
+def create_response(status_code, chunks, headers=None):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.status_code = status_code
+    response.headers = headers or {}
+
+    def iter_content(chunk_size):
+        for chunk in chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    response.iter_content.side_effect = iter_content
+    return response
+
+
+def create_range_server(content, etag):
+    def get(url, headers, stream, timeout):
+        start, end = headers['Range'][len('bytes='):].split('-')
+        body = content[int(start):int(end) + 1]
+        return create_response(206, [body], {'Content-Range': f'bytes {start}-{end}/{len(content)}', 'ETag': etag})
+
+    return get
+
+
+def write_file(file_path, content):
+    with open(file_path, 'wb') as file:
+        file.write(content)
+
+
+def read_file(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from package_downloader import RunMetrics, measure, increment, write_report
+
+
+class RunMetricsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_measures_phase_timings(self):
+        # Given
+        run_metrics = RunMetrics()
+
+        # When
+        with run_metrics.measure('release_lookup'):
+            pass
+        with self.assertRaises(ValueError):
+            with run_metrics.measure('release_lookup'):
+                raise ValueError('Release not found')
+
+        # Then
+        phase = run_metrics.get_report()['phases']['release_lookup']
+        self.assertEqual(2, phase['count'])
+        self.assertGreaterEqual(phase['total'], phase['max'])
+
+    def test_reports_counters_and_bytes(self):
+        # Given
+        run_metrics = RunMetrics()
+
+        # When
+        run_metrics.increment('api_calls')
+        run_metrics.increment('api_calls', 2)
+        run_metrics.add_bytes(1024)
+        run_metrics.add_bytes(1024)
+
+        # Then
+        report = run_metrics.get_report()
+        self.assertEqual({'api_calls': 3}, report['counters'])
+        self.assertEqual(2048, report['bytes_transferred'])
+        self.assertGreater(report['throughput'], 0)
+
+    def test_helpers_ignore_missing_metrics(self):
+        # When
+        with measure(None, 'package'):
+            increment(None, 'packages_downloaded')
+
+        # Then
+        # No error raised
+
+    def test_writes_report_as_json(self):
+        # Given
+        run_metrics = RunMetrics()
+        run_metrics.increment('store_hits')
+
+        with TemporaryDirectory() as temp_dir:
+            report_path = os.path.join(temp_dir, 'reports', 'run.json')
+
+            # When
+            write_report(run_metrics, report_path)
+
+            # Then
+            with open(report_path) as file:
+                report = json.load(file)
+            self.assertEqual({'store_hits': 1}, report['counters'])
+            self.assertEqual(['bytes_transferred', 'counters', 'duration', 'phases', 'started_at', 'throughput'],
+                             sorted(report.keys()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import json
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from context_logger import setup_logging
+
+from package_downloader import StatusServer, IPackageWatcher
+
+
+class StatusServerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_serves_watcher_status_as_json(self):
+        # Given
+        watcher = MagicMock(spec=IPackageWatcher)
+        watcher.get_status.return_value = {'state': 'idle', 'cycles': 3}
+        status_server = StatusServer(watcher, port=0)
+        status_server.start()
+
+        try:
+            # When
+            with urlopen(f'{status_server.url}/status', timeout=5) as response:
+                result = json.load(response)
+
+            # Then
+            self.assertEqual({'state': 'idle', 'cycles': 3}, result)
+        finally:
+            status_server.stop()
+
+    def test_returns_not_found_for_unknown_path(self):
+        # Given
+        status_server = StatusServer(MagicMock(spec=IPackageWatcher), port=0)
+        status_server.start()
+
+        try:
+            # When
+            with self.assertRaises(HTTPError) as context:
+                urlopen(f'{status_server.url}/packages', timeout=5)
+
+            # Then
+            self.assertEqual(404, context.exception.code)
+        finally:
+            status_server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import errno
+import hashlib
+import os
+import tracemalloc
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+from context_logger import setup_logging
+
+from package_downloader import StreamWriter, StreamHasher, reserve_space, copy_file, append_file
+
+
+class StreamWriterTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+        self.temp_dir = TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'package1.deb')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_writes_and_hashes_coalesced_chunks(self):
+        # Given
+        stream_writer = StreamWriter(chunk_size=8 * 1024)
+        chunks = [os.urandom(size) for size in (100, 3000, 9000, 10, 8192, 1)]
+        hasher = StreamHasher()
+
+        # When
+        result = stream_writer.write(chunks, self.file_path, size=sum(map(len, chunks)), hasher=hasher)
+
+        # Then
+        self.assertEqual(sum(map(len, chunks)), result)
+        self.assertEqual(b''.join(chunks), read_file(self.file_path))
+        self.assertEqual(hashlib.sha256(b''.join(chunks)).hexdigest(), hasher.hexdigest())
+
+    def test_appends_to_existing_file(self):
+        # Given
+        write_file(self.file_path, b'abc')
+        stream_writer = StreamWriter()
+
+        # When
+        result = stream_writer.write([b'def', b'ghi'], self.file_path, append=True, size=6)
+
+        # Then
+        self.assertEqual(6, result)
+        self.assertEqual(b'abcdefghi', read_file(self.file_path))
+
+    def test_flushes_buffered_chunks_when_stream_fails(self):
+        # Given
+        stream_writer = StreamWriter()
+        hasher = StreamHasher()
+
+        def chunks():
+            yield b'abc'
+            yield b'def'
+            raise ConnectionError('Connection reset')
+
+        # When
+        with self.assertRaises(ConnectionError):
+            stream_writer.write(chunks(), self.file_path, size=1024, hasher=hasher)
+
+        # Then
+        self.assertEqual(b'abcdef', read_file(self.file_path))
+        self.assertEqual(6, hasher.position)
+
+    def test_keeps_memory_bounded_for_large_streams(self):
+        # Given
+        stream_writer = StreamWriter(chunk_size=64 * 1024)
+        chunk = os.urandom(16 * 1024)
+        tracemalloc.start()
+
+        # When
+        try:
+            for _ in range(4):
+                stream_writer.write((chunk for _ in range(2048)), self.file_path, size=32 * 1024 * 1024)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # Then
+        self.assertEqual(32 * 1024 * 1024, os.path.getsize(self.file_path))
+        self.assertLess(peak, 1024 * 1024)
+
+    def test_reserves_space_without_changing_file_size(self):
+        # Given
+        write_file(self.file_path, b'abc')
+
+        # When
+        with open(self.file_path, 'r+b') as file:
+            result = reserve_space(file.fileno(), 3, 1024 * 1024)
+
+        # Then
+        self.assertEqual(3, os.path.getsize(self.file_path))
+        if result:
+            self.assertGreaterEqual(os.stat(self.file_path).st_blocks * 512, 1024 * 1024)
+
+    def test_copies_file_with_metadata(self):
+        # Given
+        source_path = os.path.join(self.temp_dir.name, 'source.deb')
+        content = os.urandom(300 * 1024)
+        write_file(source_path, content)
+        os.utime(source_path, ns=(1_000_000_000, 2_000_000_000))
+
+        # When
+        result = copy_file(source_path, self.file_path)
+
+        # Then
+        self.assertEqual(len(content), result)
+        self.assertEqual(content, read_file(self.file_path))
+        self.assertEqual(2_000_000_000, os.stat(self.file_path).st_mtime_ns)
+
+    def test_falls_back_to_sendfile_when_copy_file_range_not_supported(self):
+        # Given
+        source_path = os.path.join(self.temp_dir.name, 'source.deb')
+        write_file(source_path, b'abcdef')
+        write_file(self.file_path, b'123')
+
+        # When
+        with mock.patch('package_downloader.streamWriter._copy_range', side_effect=OSError(errno.EXDEV, 'EXDEV')):
+            result = append_file(source_path, self.file_path)
+
+        # Then
+        self.assertEqual(6, result)
+        self.assertEqual(b'123abcdef', read_file(self.file_path))
+
+    def test_falls_back_to_buffered_copy_when_zero_copy_not_supported(self):
+        # Given
+        source_path = os.path.join(self.temp_dir.name, 'source.deb')
+        content = os.urandom(600 * 1024)
+        write_file(source_path, content)
+
+        # When
+        with mock.patch('package_downloader.streamWriter._copy_range', side_effect=OSError(errno.ENOSYS, 'ENOSYS')), \
+                mock.patch('package_downloader.streamWriter._send_file', side_effect=OSError(errno.EINVAL, 'EINVAL')):
+            result = copy_file(source_path, self.file_path)
+
+        # Then
+        self.assertEqual(len(content), result)
+        self.assertEqual(content, read_file(self.file_path))
+
+
+def read_file(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+def write_file(file_path, content):
+    with open(file_path, 'wb') as file:
+        file.write(content)
+
+
+if __name__ == '__main__':
+    unittest.main()
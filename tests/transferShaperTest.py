@@ -0,0 +1,216 @@
+import asyncio
+import time
+import unittest
+from threading import Thread
+from unittest import TestCase, IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch, call
+
+from context_logger import setup_logging
+
+from package_downloader import (
+    TokenBucket,
+    PrioritySlots,
+    AsyncPrioritySlots,
+    TransferShaper,
+    TransferOptions,
+    transfer_options,
+    get_transfer_options,
+    parse_rate,
+)
+
+
+class TransferShaperTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    @patch('package_downloader.transferShaper.time')
+    def test_token_bucket_delays_consumption_above_rate(self, time_mock):
+        # Given
+        time_mock.monotonic.return_value = 100.0
+        bucket = TokenBucket(1000)
+
+        # When
+        bucket.consume(1000)
+        bucket.consume(500)
+        time_mock.monotonic.return_value = 101.0
+        bucket.consume(1000)
+
+        # Then
+        self.assertEqual([call(0.5), call(0.5)], time_mock.sleep.call_args_list)
+
+    def test_priority_slots_grant_waiting_transfers_by_priority(self):
+        # Given
+        slots = PrioritySlots(1)
+        slots.acquire()
+        granted = []
+
+        def transfer(priority):
+            slots.acquire(priority)
+            granted.append(priority)
+            slots.release()
+
+        threads = [Thread(target=transfer, args=(priority,)) for priority in [0, 10, 5]]
+
+        for count, thread in enumerate(threads, 1):
+            thread.start()
+            wait_for_waiters(slots, count)
+
+        # When
+        slots.release()
+        for thread in threads:
+            thread.join(5)
+
+        # Then
+        self.assertEqual([10, 5, 0], granted)
+
+    def test_priority_slots_remove_waiter_when_wait_interrupted(self):
+        # Given
+        slots = PrioritySlots(1)
+        slots.acquire()
+        granted = []
+
+        with patch.object(slots._condition, 'wait', side_effect=KeyboardInterrupt()):
+            self.assertRaises(KeyboardInterrupt, slots.acquire, 10)
+
+        thread = Thread(target=lambda: granted.append(slots.acquire()), daemon=True)
+        thread.start()
+        wait_for_waiters(slots, 1)
+
+        # When
+        slots.release()
+        thread.join(5)
+
+        # Then
+        self.assertEqual([None], granted)
+        self.assertEqual([], slots._waiters)
+
+    def test_transfer_throttles_with_global_host_and_package_limits(self):
+        # Given
+        transfer_shaper = TransferShaper(max_rate=4096, host_rate=2048)
+
+        with transfer_options(TransferOptions.create(priority=1, rate_limit=1024)):
+            with patch('package_downloader.transferShaper.TokenBucket.consume') as consume:
+                # When
+                with transfer_shaper.transfer('https://example.com/package1.deb') as throttle:
+                    throttle(512)
+
+        # Then
+        self.assertEqual(3, consume.call_count)
+
+    def test_transfer_does_not_throttle_without_limits(self):
+        # Given
+        transfer_shaper = TransferShaper(host_connections=2)
+
+        # When
+        with transfer_shaper.transfer('https://example.com/package1.deb') as throttle:
+            # Then
+            self.assertIsNone(throttle)
+
+    def test_transfer_options_are_scoped_to_context(self):
+        # When
+        with transfer_options(TransferOptions(priority=5)):
+            inner = get_transfer_options()
+
+        # Then
+        self.assertEqual(5, inner.priority)
+        self.assertEqual(0, get_transfer_options().priority)
+
+    def test_parses_rates_with_units(self):
+        # Then
+        self.assertEqual(1024, parse_rate('1KB'))
+        self.assertEqual(2 * 1024**2, parse_rate('2MB/s'))
+        self.assertEqual(512 * 1024, parse_rate('0.5M'))
+        self.assertEqual(1000, parse_rate(1000))
+        self.assertIsNone(parse_rate(None))
+        self.assertRaises(ValueError, parse_rate, 'fast')
+
+
+class AsyncTransferShaperTest(IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('debian-package-downloader', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    async def test_priority_slots_grant_waiting_transfers_by_priority(self):
+        # Given
+        slots = AsyncPrioritySlots(1)
+        await slots.acquire()
+        granted = []
+
+        async def transfer(priority):
+            await slots.acquire(priority)
+            granted.append(priority)
+            await slots.release()
+
+        tasks = []
+        for priority in [0, 10, 5]:
+            tasks.append(asyncio.create_task(transfer(priority)))
+            await asyncio.sleep(0)
+
+        # When
+        await slots.release()
+        await asyncio.wait_for(asyncio.gather(*tasks), 5)
+
+        # Then
+        self.assertEqual([10, 5, 0], granted)
+
+    async def test_priority_slots_remove_waiter_when_wait_cancelled(self):
+        # Given
+        slots = AsyncPrioritySlots(1)
+        await slots.acquire()
+        waiter = asyncio.create_task(slots.acquire(10))
+        await asyncio.sleep(0)
+
+        # When
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await slots.release()
+
+        # Then
+        await asyncio.wait_for(slots.acquire(), 5)
+        self.assertEqual([], slots._waiters)
+
+    @patch('package_downloader.transferShaper.asyncio.sleep', new_callable=AsyncMock)
+    @patch('package_downloader.transferShaper.time')
+    async def test_transfer_throttles_with_global_and_package_limits(self, time_mock, sleep):
+        # Given
+        time_mock.monotonic.return_value = 100.0
+        transfer_shaper = TransferShaper(max_rate=2048)
+
+        with transfer_options(TransferOptions.create(priority=1, rate_limit=1024)):
+            # When
+            async with transfer_shaper.transfer_async('https://example.com/package1.deb') as throttle:
+                await throttle(2048)
+
+        # Then
+        self.assertEqual([call(1.0)], sleep.await_args_list)
+
+    async def test_transfer_does_not_throttle_without_limits(self):
+        # Given
+        transfer_shaper = TransferShaper(host_connections=2)
+
+        # When
+        async with transfer_shaper.transfer_async('https://example.com/package1.deb') as throttle:
+            # Then
+            self.assertIsNone(throttle)
+
+
+def wait_for_waiters(slots: PrioritySlots, count: int) -> None:
+    deadline = time.monotonic() + 5
+
+    while len(slots._waiters) < count:
+        if time.monotonic() > deadline:
+            raise AssertionError('Transfers did not queue for a slot')
+        time.sleep(0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()